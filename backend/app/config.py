@@ -646,6 +646,7 @@ class OSSConfig(BaseModel):
     bucket_name: str = ""
     endpoint: str = "https://oss-cn-beijing.aliyuncs.com"  # 包含 https:// 前缀
     prefix: str = "aistudio/"  # OSS 存储目录前缀
+    upload_concurrency: int = 4  # 批量上传并发数
     
     @property
     def endpoint_url(self) -> str:
@@ -660,6 +661,14 @@ class OSSConfig(BaseModel):
         return self.endpoint.replace("https://", "").replace("http://", "")
 
 
+class CacheConfig(BaseModel):
+    """生成结果缓存配置"""
+    generation_enabled: bool = False  # 是否缓存图片生成结果（仅指定种子时生效）
+    generation_ttl_hours: int = 168  # 图片生成结果缓存有效期（小时）
+    llm_enabled: bool = False  # 是否缓存 LLM 回复（提取角色/场景/道具、解析分镜、生成剧本；开启后重新生成需传 use_cache=False）
+    llm_ttl_hours: int = 72  # LLM 回复缓存有效期（小时）
+
+
 class AppConfig(BaseModel):
     """应用配置模型"""
     dashscope_api_key: str = ""
@@ -686,6 +695,9 @@ class AppConfig(BaseModel):
     # OSS 配置
     oss: OSSConfig = OSSConfig()
     
+    # 生成结果缓存配置
+    cache: CacheConfig = CacheConfig()
+    
     @property
     def base_url(self) -> str:
         """根据地域获取 API 基础地址"""
@@ -693,9 +705,10 @@ class AppConfig(BaseModel):
 
 
 import threading
-import fcntl
 from contextvars import ContextVar
 
+from app.services.shared_state import SharedJsonFile
+
 # 当前用户配置的上下文变量
 _current_user_config_dir: ContextVar[Optional[str]] = ContextVar('current_user_config_dir', default=None)
 
@@ -711,7 +724,12 @@ def get_user_config_dir() -> Optional[str]:
 
 
 class ConfigManager:
-    """配置管理器 - 支持多用户独立配置"""
+    """
+    配置管理器 - 支持多用户独立配置
+    
+    配置文件在多个 worker 进程间共享：写入为原子替换并在文件锁内合并，
+    读取时只在文件变化（其他进程保存了设置）后重新解析
+    """
     
     def __init__(self, config_dir: Optional[str] = None):
         """
@@ -727,62 +745,52 @@ class ConfigManager:
         
         self.config_file = self.config_dir / "config.json"
         self._ensure_config_dir()
-        self._lock = threading.RLock()  # 可重入锁，支持并发访问
+        self._file = SharedJsonFile(self.config_file, indent=2)
+        # 已解析的配置：(文件签名, AppConfig)
+        self._parsed: Optional[tuple] = None
     
     def _ensure_config_dir(self):
         """确保配置目录存在"""
         self.config_dir.mkdir(parents=True, exist_ok=True)
     
-    def _read_with_lock(self) -> dict:
-        """带文件锁的读取操作"""
-        if not self.config_file.exists():
-            return {}
-        with open(self.config_file, 'r', encoding='utf-8') as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_SH)  # 共享锁
-            try:
-                return json.load(f)
-            finally:
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-    
-    def _write_with_lock(self, data: dict):
-        """带文件锁的写入操作"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_EX)  # 排他锁
-            try:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            finally:
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-    
     def load(self) -> AppConfig:
-        """加载配置（每次都从文件读取，确保最新）"""
-        with self._lock:
-            data = self._read_with_lock()
-            # 如果文件为空或内容为空字典，则使用默认配置
-            if data and len(data) > 0:
-                try:
-                    return AppConfig(**data)
-                except Exception:
-                    # 如果数据格式错误，使用默认配置
-                    pass
-            # 创建并保存默认配置
-            config = AppConfig()
-            self.save(config)
-            return config
+        """
+        加载配置（文件未变化时返回已解析的 AppConfig，其他进程保存后自动重新读取）
+        返回的对象在调用之间共享，调用方不要修改；修改请使用 update / save
+        """
+        signature, data = self._file.read_with_signature()
+        parsed = self._parsed
+        if parsed is not None and signature is not None and parsed[0] == signature:
+            return parsed[1]
+        # 如果文件为空或内容为空字典，则使用默认配置
+        if data and len(data) > 0:
+            try:
+                config = AppConfig(**data)
+                self._parsed = (signature, config)
+                return config
+            except Exception:
+                # 如果数据格式错误，使用默认配置
+                pass
+        # 创建并保存默认配置
+        config = AppConfig()
+        self.save(config)
+        return config
     
     def save(self, config: AppConfig) -> None:
         """保存配置"""
-        with self._lock:
-            self._write_with_lock(config.model_dump())
+        self._file.replace(config.model_dump())
     
     def update(self, **kwargs) -> AppConfig:
-        """更新配置"""
-        with self._lock:
-            config = self.load()
-            updated_data = config.model_dump()
+        """更新配置（在文件锁内基于最新配置合并，不会覆盖其他进程同时保存的修改）"""
+        def apply(data: dict) -> AppConfig:
+            try:
+                updated_data = AppConfig(**data).model_dump() if data else AppConfig().model_dump()
+            except Exception:
+                updated_data = AppConfig().model_dump()
             
             # 处理嵌套更新
             for key, value in kwargs.items():
-                if key in ['llm', 'image', 'image_edit', 'video', 'text_to_video', 'ref_video', 'oss'] and isinstance(value, dict):
+                if key in ['llm', 'image', 'image_edit', 'video', 'text_to_video', 'ref_video', 'oss', 'cache'] and isinstance(value, dict):
                     # 合并嵌套配置
                     if key in updated_data:
                         updated_data[key].update(value)
@@ -792,8 +800,11 @@ class ConfigManager:
                     updated_data[key] = value
             
             new_config = AppConfig(**updated_data)
-            self.save(new_config)
+            data.clear()
+            data.update(new_config.model_dump())
             return new_config
+        
+        return self._file.update(apply)
     
     def reload(self) -> AppConfig:
         """强制重新加载配置"""
@@ -808,7 +819,7 @@ class ConfigManager:
         self.update(dashscope_api_key=api_key)
 
 
-# 用户配置管理器缓存
+# 用户配置管理器缓存（每个进程各自缓存管理器对象，配置内容通过共享文件在进程间同步）
 _user_config_managers: dict = {}
 _config_managers_lock = threading.Lock()
 
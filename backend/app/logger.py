@@ -4,13 +4,23 @@
 支持多用户环境：
 - 日志记录包含用户上下文
 - 每个用户可以有独立的日志文件（可选）
+
+写终端和文件在后台线程进行（QueueHandler / QueueListener），print 和 logger 调用只把记录放入队列，
+不在事件循环上做文件 I/O。
+日志级别由 LOG_LEVEL 环境变量控制（默认 INFO）；DashScope 轮询响应等详细内容使用 log_debug 输出，
+默认不输出，排查问题时设置 LOG_LEVEL=DEBUG
 """
 
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+import threading
 from pathlib import Path
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from contextvars import ContextVar
 from typing import Optional
 
@@ -21,6 +31,11 @@ LOG_DIR.mkdir(parents=True, exist_ok=True)
 # 日志文件路径（按日期命名）
 LOG_FILE = LOG_DIR / f"api_{datetime.now().strftime('%Y%m%d')}.log"
 
+# 日志级别（DEBUG / INFO / WARNING ...）
+LOG_LEVEL = logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO").upper())
+if not isinstance(LOG_LEVEL, int):
+    LOG_LEVEL = logging.INFO
+
 # 当前用户的上下文变量（用于日志记录）
 _log_user_context: ContextVar[Optional[str]] = ContextVar('log_user_context', default=None)
 
@@ -52,12 +67,33 @@ DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 DETAILED_FORMAT = "%(asctime)s | %(levelname)-8s | %(user)s %(name)s:%(lineno)d | %(message)s"
 
 
-def setup_logging(level: int = logging.INFO) -> logging.Logger:
+# 后台写日志的监听器
+_listener: Optional[QueueListener] = None
+
+
+def _stop_listener():
+    """停止后台写日志线程（写完队列中剩余的记录）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork():
+    """fork 出的子进程（如进程池）没有后台写日志线程，重新配置"""
+    global _listener
+    if _listener is not None:
+        _listener = None
+        setup_logging(logging.getLogger().level)
+
+
+def setup_logging(level: int = LOG_LEVEL, use_queue: bool = True) -> logging.Logger:
     """
     配置全局日志系统
     
     Args:
-        level: 日志级别，默认 INFO
+        level: 日志级别，默认取 LOG_LEVEL 环境变量（INFO）
+        use_queue: 是否在后台线程写终端和文件（False 时在调用线程同步写入）
         
     Returns:
         根日志记录器
@@ -67,17 +103,16 @@ def setup_logging(level: int = logging.INFO) -> logging.Logger:
     root_logger.setLevel(level)
     
     # 清除已有的处理器（避免重复添加）
+    _stop_listener()
     root_logger.handlers.clear()
     
     # 创建用户上下文过滤器
     user_filter = UserContextFilter()
     
-    # 创建终端处理器
-    console_handler = logging.StreamHandler(sys.stdout)
+    # 创建终端处理器（print 已被重定向时写入原始 stdout）
+    console_handler = logging.StreamHandler(getattr(sys.stdout, "original_stdout", sys.stdout))
     console_handler.setLevel(level)
     console_handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
-    console_handler.addFilter(user_filter)
-    root_logger.addHandler(console_handler)
     
     # 创建文件处理器（轮转日志，最大10MB，保留10个备份）
     file_handler = RotatingFileHandler(
@@ -88,8 +123,19 @@ def setup_logging(level: int = logging.INFO) -> logging.Logger:
     )
     file_handler.setLevel(level)
     file_handler.setFormatter(logging.Formatter(DETAILED_FORMAT, DATE_FORMAT))
-    file_handler.addFilter(user_filter)
-    root_logger.addHandler(file_handler)
+    
+    if use_queue:
+        # 用户上下文在 ContextVar 中，必须在调用线程读取，因此过滤器加在 QueueHandler 上
+        queue_handler = QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(user_filter)
+        root_logger.addHandler(queue_handler)
+        global _listener
+        _listener = QueueListener(queue_handler.queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in (console_handler, file_handler):
+            handler.addFilter(user_filter)
+            root_logger.addHandler(handler)
     
     # 设置第三方库日志级别（减少噪音）
     logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -177,24 +223,56 @@ class APILogger:
         self.logger.warning(message)
 
 
+def log_debug(logger: logging.Logger, event: str, **fields):
+    """
+    调试级结构化日志（默认不输出）
+    
+    字段序列化为一行 JSON；未启用 DEBUG 时直接返回，不做序列化。
+    用于 DashScope 轮询响应、请求体等每次调用都会产生的大段内容。
+    
+    Args:
+        logger: 日志记录器
+        event: 事件名，如 "[HTTP 状态查询]"
+        **fields: 字段，值为 None 的不输出
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    payload = {key: value for key, value in fields.items() if value is not None}
+    logger.debug("%s %s", event, json.dumps(payload, ensure_ascii=False, default=str))
+
+
 # 重定向 print 到日志（可选）
 class PrintLogger:
-    """将 print 输出重定向到日志文件"""
+    """
+    将 print 输出重定向到日志
+    
+    按行缓冲后作为 INFO 记录交给日志系统，终端和文件都由日志处理器输出（不再额外同步写一次 stdout）
+    """
     
     def __init__(self, logger: logging.Logger, original_stdout):
         self.logger = logger
         self.original_stdout = original_stdout
+        # print 会分多次调用 write（内容、分隔符、换行），按线程缓冲到换行再记录
+        self._local = threading.local()
     
-    def write(self, message: str):
-        # 写入原始 stdout
-        self.original_stdout.write(message)
-        # 同时写入日志文件（过滤空行）
-        message = message.strip()
-        if message:
-            self.logger.info(message)
+    def write(self, message: str) -> int:
+        buffer = getattr(self._local, "buffer", "") + message
+        if "\n" in buffer:
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                # 过滤空行
+                line = line.strip()
+                if line:
+                    self.logger.info(line)
+        self._local.buffer = buffer
+        return len(message)
     
     def flush(self):
         self.original_stdout.flush()
+    
+    def __getattr__(self, name):
+        # isatty / fileno / encoding 等交给原始 stdout
+        return getattr(self.original_stdout, name)
 
 
 def redirect_print_to_log():
@@ -212,6 +290,9 @@ def init_logging():
     if not _initialized:
         setup_logging()
         redirect_print_to_log()
+        atexit.register(_stop_listener)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_restart_after_fork)
         _initialized = True
         
         # 记录启动信息
@@ -2,10 +2,13 @@
 AI 视频生成平台 - FastAPI 后端入口
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+import hmac
+import os
 
 # 初始化日志系统（必须在导入其他模块之前）
 from app.logger import init_logging
@@ -14,9 +17,18 @@ init_logging()
 from app.routers import (
     settings, scripts, characters, scenes, props, frames, videos, projects, 
     styles, gallery, studio, audio, video_library, text_library, video_studio,
-    models, auth
+    models, auth, jobs, debug
 )
 from app.middleware.auth import AuthMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.services.dashscope.http_client import close_http_client, instrument_dashscope_requests
+from app.services.thumbnails import thumbnail_service
+from app.services.job_queue import job_queue, JOB_WORKERS
+from app.services.task_tracker import task_tracker
+from app.services.metrics import metrics, METRICS_TOKEN
+
+# 统计发往 DashScope 的请求（包括 SDK 内部的请求）
+instrument_dashscope_requests()
 
 # 创建 FastAPI 应用
 app = FastAPI(
@@ -32,11 +44,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
 # 添加认证中间件
 app.add_middleware(AuthMiddleware)
 
+# 请求指标（最后添加的中间件在最外层，未通过认证的请求同样统计）
+app.add_middleware(MetricsMiddleware)
+
 # 静态文件服务 - 用于提供生成的素材
 data_dir = Path(__file__).parent.parent / "data"
 assets_dir = data_dir / "assets"
@@ -61,6 +77,31 @@ app.include_router(video_library.router, prefix="/api/video-library", tags=["视
 app.include_router(text_library.router, prefix="/api/text-library", tags=["文本库"])
 app.include_router(video_studio.router, prefix="/api/video-studio", tags=["视频工作室"])
 app.include_router(models.router, prefix="/api/models", tags=["模型配置"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["后台任务"])
+app.include_router(debug.router, prefix="/api/debug", tags=["调试"])
+
+
+@app.on_event("startup")
+async def startup():
+    """
+    启动后台任务 worker（设置 JOB_WORKERS=0 时只提交任务，由独立的 python -m app.worker 执行），
+    恢复未结束的 DashScope 任务并开始后台轮询，开始事件循环延迟监控
+    """
+    workers = int(os.environ.get("JOB_WORKERS", JOB_WORKERS))
+    if workers > 0:
+        job_queue.start(workers)
+    task_tracker.start()
+    metrics.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """停止后台任务 worker 和任务轮询，关闭共享 HTTP 连接池和缩略图进程池"""
+    await job_queue.stop()
+    await task_tracker.stop()
+    await metrics.stop()
+    await close_http_client()
+    thumbnail_service.shutdown()
 
 
 @app.get("/")
@@ -77,3 +118,19 @@ async def root():
 async def health_check():
     """健康检查"""
     return {"status": "ok"}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint(request: Request):
+    """
+    运行指标（Prometheus 文本格式，多进程部署时合并所有 worker 进程）
+
+    设置 METRICS_TOKEN 后需携带 Authorization: Bearer <token>，并导出 user 标签；
+    未设置时公开访问，按用户合并（不导出用户ID）
+    """
+    if METRICS_TOKEN:
+        auth_header = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(auth_header.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=401, detail="指标抓取 token 无效")
+    text = metrics.render(include_user=bool(METRICS_TOKEN))
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
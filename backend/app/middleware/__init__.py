@@ -3,6 +3,7 @@
 """
 
 from app.middleware.auth import AuthMiddleware
+from app.middleware.metrics import MetricsMiddleware
 
-__all__ = ["AuthMiddleware"]
+__all__ = ["AuthMiddleware", "MetricsMiddleware"]
 
@@ -17,6 +17,8 @@ from app.services.user_service import get_user_service
 from app.services.storage import set_current_user
 from app.config import set_user_config_dir
 from app.logger import set_log_user_context
+from app.services.tracing import start_trace, finish_trace, current_trace
+from app.middleware.metrics import route_label
 
 
 logger = logging.getLogger(__name__)
@@ -28,12 +30,17 @@ PUBLIC_PATHS = [
     "/redoc",
     "/openapi.json",
     "/api/health",
+    "/api/metrics",  # Prometheus 抓取不带登录 token（可用 METRICS_TOKEN 单独保护）
     "/api/auth/login",
     "/api/auth/register",
     "/assets",  # 静态资源
 ]
 
 
+# 不记录链路追踪的路径（健康检查、指标抓取频繁且没有意义）
+UNTRACED_PATHS = {"/api/health", "/api/metrics"}
+
+
 def is_public_path(path: str) -> bool:
     """检查路径是否公开（不需要认证）"""
     for public_path in PUBLIC_PATHS:
@@ -56,6 +63,19 @@ def set_user_context(user_id: str, username: str, user_data_path: str):
     set_log_user_context(username)
 
 
+def enter_user_context(user_id: Optional[str]):
+    """
+    按用户ID切换当前上下文（后台任务中使用，没有请求和 token）
+    user_id 为空时切换到默认（未登录）上下文
+    """
+    if not user_id:
+        clear_user_context()
+        return
+    user_service = get_user_service()
+    user = user_service.get_user_by_id(user_id)
+    set_user_context(user_id, user.username if user else user_id, user_service.get_user_data_path(user_id))
+
+
 class AuthMiddleware(BaseHTTPMiddleware):
     """
     认证中间件
@@ -66,9 +86,29 @@ class AuthMiddleware(BaseHTTPMiddleware):
     3. 设置当前用户上下文（存储和配置都使用用户专属目录）
     4. 公开路径跳过认证
     5. 确保请求结束后清除上下文（支持并发）
+    6. 为每个请求创建链路追踪，响应头 X-Trace-Id 返回 trace ID
     """
     
     async def dispatch(self, request: Request, call_next):
+        if request.url.path in UNTRACED_PATHS:
+            return await self._authenticate(request, call_next)
+        
+        # 在调用下游之前设置，路由处理函数及其创建的子任务都归入这个 trace
+        trace = start_trace(f"{request.method} {request.url.path}", method=request.method, path=request.url.path)
+        status = 500
+        try:
+            response = await self._authenticate(request, call_next)
+            status = response.status_code
+            response.headers["X-Trace-Id"] = trace.trace_id
+            return response
+        finally:
+            # 用路由模板命名，便于按接口比较
+            route = route_label(request)
+            if route != "<unmatched>":
+                trace.name = f"{request.method} {route}"
+            finish_trace(trace, status=status)
+    
+    async def _authenticate(self, request: Request, call_next):
         # 公开路径直接通过（不设置用户上下文）
         if is_public_path(request.url.path):
             clear_user_context()
@@ -103,6 +143,9 @@ class AuthMiddleware(BaseHTTPMiddleware):
         
         # 设置当前用户上下文（让 storage_service 和 config_manager 自动使用正确的用户目录）
         set_user_context(user.id, user.username, user_data_path)
+        trace = current_trace()
+        if trace is not None:
+            trace.user_id = user.id
         
         # 将用户信息注入到 request.state
         request.state.user = user
@@ -110,7 +153,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         request.state.user_data_path = user_data_path
         
         # 添加用户上下文到日志
-        logger.debug(f"[User: {user.username}] Processing request: {request.method} {request.url.path}")
+        logger.debug("[User: %s] Processing request: %s %s", user.username, request.method, request.url.path)
         
         # 继续处理请求
         try:
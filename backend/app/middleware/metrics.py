@@ -0,0 +1,62 @@
+"""
+请求指标中间件 - 按路由统计请求耗时和状态码
+"""
+
+import time
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Mount
+
+from app.services.metrics import metrics, user_labels, PER_USER_LABELS
+
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP 请求耗时（到响应头返回为止）",
+    ["method", "route", "status"] + user_labels()
+)
+REQUESTS_IN_PROGRESS = metrics.gauge("http_requests_in_progress", "正在处理的 HTTP 请求数")
+
+
+def route_label(request: Request) -> str:
+    """
+    路由模板（如 /api/projects/{project_id}），避免按实际路径产生无限多的标签
+    
+    include_router 的路由对象上不一定带前缀，这里用实际路径把路径参数替换回占位符
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "<unmatched>"
+    if isinstance(route, Mount):
+        return route.path
+    params = {str(value): name for name, value in (request.scope.get("path_params") or {}).items()}
+    segments = request.scope.get("path", "").split("/")
+    return "/".join(f"{{{params[segment]}}}" if segment in params else segment for segment in segments)
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """
+    请求指标中间件（位于认证中间件之外，未登录被拒绝的请求同样统计）
+    """
+    
+    def __init__(self, app):
+        super().__init__(app)
+        self._in_progress = 0
+    
+    async def dispatch(self, request: Request, call_next):
+        started = time.perf_counter()
+        self._in_progress += 1
+        REQUESTS_IN_PROGRESS.set(self._in_progress)
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            self._in_progress -= 1
+            REQUESTS_IN_PROGRESS.set(self._in_progress)
+            labels = {"method": request.method, "route": route_label(request), "status": str(status)}
+            if PER_USER_LABELS:
+                # 用户上下文由内层的认证中间件设置，这里从 request.state 读取
+                labels["user"] = getattr(request.state, "user_id", "")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, **labels)
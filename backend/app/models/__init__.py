@@ -2,7 +2,7 @@
 Pydantic 数据模型
 """
 
-from app.models.project import Project, Script, Shot
+from app.models.project import Project, ProjectSummary, Script, Shot
 from app.models.character import Character, CharacterImage, VoiceConfig
 from app.models.scene import Scene, SceneImage
 from app.models.prop import Prop, PropImage
@@ -10,7 +10,7 @@ from app.models.frame import Frame, FrameImage
 from app.models.video import Video, VideoTask
 
 __all__ = [
-    "Project", "Script", "Shot",
+    "Project", "ProjectSummary", "Script", "Shot",
     "Character", "CharacterImage", "VoiceConfig",
     "Scene", "SceneImage",
     "Prop", "PropImage",
@@ -2,7 +2,7 @@
 角色数据模型
 """
 
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
@@ -15,6 +15,7 @@ class CharacterImage(BaseModel):
     front_url: Optional[str] = None  # 正面图 URL
     side_url: Optional[str] = None  # 侧面图 URL
     back_url: Optional[str] = None  # 背面图 URL
+    thumbnails: Dict[str, Dict[str, str]] = {}  # 三视图缩略图（front/side/back -> 尺寸名 -> URL）
     prompt_used: Optional[str] = None  # 生成时使用的提示词
     created_at: datetime = Field(default_factory=datetime.now)
 
@@ -2,7 +2,7 @@
 分镜首帧数据模型
 """
 
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
@@ -14,6 +14,7 @@ class FrameImage(BaseModel):
     group_index: int = 0  # 组索引
     url: Optional[str] = None  # 图片 URL
     prompt_used: Optional[str] = None  # 生成时使用的提示词
+    thumbnails: Dict[str, str] = {}  # 缩略图 URL（尺寸名 sm/md/lg -> URL）
     created_at: datetime = Field(default_factory=datetime.now)
 
 
@@ -2,7 +2,7 @@
 图库数据模型
 """
 
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
@@ -19,6 +19,10 @@ class GalleryImage(BaseModel):
     source: str = "studio"  # 来源：studio（图片工作室）、upload（上传）
     task_id: Optional[str] = None  # 关联的生成任务ID
     tags: List[str] = []  # 标签
+    content_hash: Optional[str] = None  # 内容 SHA-256（上传文件时记录）
+    width: Optional[int] = None  # 图片宽度（像素）
+    height: Optional[int] = None  # 图片高度（像素）
+    thumbnails: Dict[str, str] = {}  # 缩略图 URL（尺寸名 sm/md/lg -> URL）
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -0,0 +1,50 @@
+"""
+后台任务数据模型
+"""
+
+from typing import Optional, Any, Dict
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, Field
+import uuid
+
+
+class JobStatus(str, Enum):
+    """后台任务状态"""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# 结束状态（不会再变化）
+TERMINAL_JOB_STATUSES = {JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED}
+
+
+class Job(BaseModel):
+    """后台任务（导出视频、批量生成等耗时操作）"""
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    kind: str  # 任务类型，如 video_export、frames_batch
+    project_id: Optional[str] = None  # 所属项目ID
+    user_id: Optional[str] = None  # 所属用户ID（未登录时为空）
+    params: Dict[str, Any] = {}  # 任务参数
+    
+    status: JobStatus = JobStatus.QUEUED
+    progress: float = 0.0  # 进度（0-1）
+    message: str = ""  # 当前进度说明
+    result: Optional[Any] = None  # 执行结果（与原同步接口的返回值一致）
+    error: Optional[str] = None  # 失败原因
+    
+    attempts: int = 0  # 已开始执行的次数（进程重启后会重新执行）
+    cancel_requested: bool = False  # 已请求取消（由执行该任务的进程处理）
+    worker: Optional[str] = None  # 执行者（主机名:进程号）
+    
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.now)
+    
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_JOB_STATUSES
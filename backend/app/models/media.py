@@ -18,6 +18,7 @@ class MediaItem(BaseModel):
     file_type: str = ""  # 文件类型 (mp3, wav, mp4, etc.)
     file_size: int = 0  # 文件大小（字节）
     duration: Optional[float] = None  # 时长（秒）
+    content_hash: Optional[str] = None  # 内容 SHA-256（上传文件时记录）
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
@@ -28,12 +29,26 @@ class AudioItem(MediaItem):
     channels: Optional[int] = None  # 声道数
     
 
+class VideoSprite(BaseModel):
+    """视频预览雪碧图（按时间顺序从左到右、从上到下排列的缩略帧）"""
+    url: str  # 雪碧图 URL
+    interval: float  # 相邻两帧的时间间隔（秒）
+    count: int  # 帧数
+    columns: int  # 列数
+    rows: int  # 行数
+    tile_width: int  # 单帧宽度
+    tile_height: int  # 单帧高度
+
+
 class VideoItem(MediaItem):
     """视频项"""
     width: Optional[int] = None  # 视频宽度
     height: Optional[int] = None  # 视频高度
     fps: Optional[float] = None  # 帧率
-    thumbnail_url: Optional[str] = None  # 缩略图URL
+    thumbnail_url: Optional[str] = None  # 缩略图URL（封面帧 JPEG）
+    sprite: Optional[VideoSprite] = None  # 拖动预览雪碧图
+    ingest_status: Optional[str] = None  # 预处理状态：pending, processing, completed, failed
+    ingest_error: Optional[str] = None  # 预处理失败原因
 
 
 class TextItemVersion(BaseModel):
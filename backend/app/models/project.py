@@ -105,3 +105,18 @@ class Project(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
 
+
+class ProjectSummary(BaseModel):
+    """项目摘要（项目目录中的轻量记录，项目列表和摘要接口只读取它）"""
+    id: str
+    name: str
+    description: str = ""
+    shots_count: int = 0  # 分镜数
+    characters_count: int = 0
+    scenes_count: int = 0
+    props_count: int = 0
+    frames_generated: int = 0  # 已选定首帧的分镜数
+    videos_generated: int = 0  # 已生成视频的分镜数
+    created_at: datetime
+    updated_at: datetime
+
@@ -2,7 +2,7 @@
 图片工作室数据模型
 """
 
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from pydantic import BaseModel, Field
 import uuid
@@ -15,6 +15,18 @@ class StudioTaskImage(BaseModel):
     url: Optional[str] = None  # 图片 URL
     prompt_used: Optional[str] = None  # 使用的提示词
     is_selected: bool = False  # 是否被选中保存到图库
+    thumbnails: Dict[str, str] = {}  # 缩略图 URL（尺寸名 sm/md/lg -> URL）
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class StudioGenerationTask(BaseModel):
+    """一组图片对应的 DashScope 生成任务（创建后由后台轮询取回结果）"""
+    group_index: int = 0  # 组索引
+    task_id: str  # DashScope 任务ID
+    n: int = 1  # 本组请求的图片数量
+    cache_key: Optional[str] = None  # 结果缓存键（指定种子时有效）
+    status: str = "pending"  # pending, succeeded, failed
+    error: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
 
 
@@ -60,6 +72,9 @@ class StudioTask(BaseModel):
     status: str = "pending"  # pending, generating, completed, failed
     error_message: Optional[str] = None
     
+    # 已提交、由后台轮询取回结果的 DashScope 任务（每组一个）
+    generation_tasks: List[StudioGenerationTask] = []
+    
     # 最近一次生成的任务ID（用于追踪）
     last_task_id: Optional[str] = None  # DashScope 任务ID
     last_request_id: Optional[str] = None  # DashScope 请求ID
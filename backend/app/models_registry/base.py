@@ -396,6 +396,8 @@ class ModelRegistry:
     模型注册中心
     
     负责管理所有已注册的模型
+    
+    模型在导入时由代码注册，多个 worker 进程各自构建的注册表内容相同，不需要在进程间同步
     """
     
     _instance: Optional['ModelRegistry'] = None
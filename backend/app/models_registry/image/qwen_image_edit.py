@@ -38,6 +38,9 @@ from ..base import (
     BaseModelService, TaskResult, TaskStatus, registry
 )
 from app.services.oss import oss_service
+from app.services.dashscope.result_cache import (
+    generation_cache_key, get_cached_generation, save_generation
+)
 
 
 # ============ 模型定义 ============
@@ -220,6 +223,7 @@ class QwenImageEditService(BaseModelService[List[str]]):
         watermark: bool = False,
         seed: Optional[int] = None,
         project_id: str = "",
+        use_cache: Optional[bool] = None,
         **kwargs
     ) -> List[str]:
         """
@@ -235,6 +239,7 @@ class QwenImageEditService(BaseModelService[List[str]]):
             watermark: 是否添加水印
             seed: 随机种子
             project_id: 项目ID，用于 OSS 上传路径
+            use_cache: 为 False 时跳过结果缓存读取（指定种子且开启缓存时生效）
             
         Returns:
             生成的图片URL列表（如果启用 OSS，返回 OSS URL）
@@ -251,6 +256,20 @@ class QwenImageEditService(BaseModelService[List[str]]):
         if size and n > 1:
             raise ValueError("设置 size 参数时，生成数量 n 必须为 1")
         
+        # 相同请求（指定种子）直接返回缓存的结果
+        cache_key = generation_cache_key(self.model_info.api_model_name, {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "n": n,
+            "size": size,
+            "prompt_extend": prompt_extend,
+            "watermark": watermark,
+            "seed": seed
+        }, images)
+        cached_urls = get_cached_generation(cache_key, use_cache)
+        if cached_urls:
+            return cached_urls
+        
         # 构建消息内容
         content = self._build_content(images, prompt)
         
@@ -319,6 +338,7 @@ class QwenImageEditService(BaseModelService[List[str]]):
             for url in urls:
                 oss_url = await oss_service.upload_image_async(url, project_id)
                 oss_urls.append(oss_url)
+            save_generation(cache_key, oss_urls)
             return oss_urls
         
         return urls
@@ -12,6 +12,7 @@ from datetime import datetime
 from app.models.media import AudioItem
 from app.services.storage import storage_service
 from app.services.oss import oss_service
+from app.services.upload_pipeline import UploadPipeline, UploadError, run_blocking, compute_hash
 
 router = APIRouter()
 
@@ -50,42 +51,50 @@ async def upload_audio_files(
     project_id: str,
     files: List[UploadFile] = File(...)
 ):
-    """上传音频文件"""
+    """上传音频文件（通过上传流水线并发处理，结果按上传顺序返回）"""
     if not oss_service.is_enabled():
         raise HTTPException(status_code=400, detail="OSS未配置，无法上传文件")
     
-    audios = []
-    errors = []
+    pipeline = UploadPipeline()
     
-    for file in files:
-        try:
-            # 读取文件内容
-            content = await file.read()
-            
-            # 获取文件扩展名
-            ext = os.path.splitext(file.filename or "audio.mp3")[1].lower()
-            if ext not in [".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac"]:
-                errors.append({"filename": file.filename, "error": "不支持的音频格式"})
-                continue
-            
-            # 上传到OSS
-            filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}{ext}"
-            oss_url = oss_service.upload_bytes(content, f"audio/{project_id}/{filename}")
-            
-            # 创建音频记录
-            audio = AudioItem(
-                project_id=project_id,
-                name=file.filename or "未命名音频",
-                url=oss_url,
-                file_type=ext[1:],
-                file_size=len(content)
-            )
-            
-            storage_service.save_audio_item(audio)
-            audios.append(audio)
-            
-        except Exception as e:
-            errors.append({"filename": file.filename, "error": str(e)})
+    async def handle_file(index: int, file: UploadFile) -> AudioItem:
+        # 获取文件扩展名（先校验格式，不支持的文件不读取内容）
+        ext = os.path.splitext(file.filename or "audio.mp3")[1].lower()
+        if ext not in [".mp3", ".wav", ".m4a", ".aac", ".ogg", ".flac"]:
+            raise UploadError("不支持的音频格式")
+        
+        # 读取文件内容
+        content = await file.read()
+        
+        # 计算内容哈希，同一批次中相同内容只上传一次
+        content_hash = await run_blocking(compute_hash, content)
+        
+        # 上传到OSS
+        filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}{ext}"
+        oss_url = await pipeline.upload_once(
+            content_hash, oss_service.upload_bytes, content, f"audio/{project_id}/{filename}"
+        )
+        
+        # 创建音频记录
+        audio = AudioItem(
+            project_id=project_id,
+            name=file.filename or "未命名音频",
+            url=oss_url,
+            file_type=ext[1:],
+            file_size=len(content),
+            content_hash=content_hash
+        )
+        
+        await run_blocking(storage_service.save_audio_item, audio)
+        return audio
+    
+    results = await pipeline.run(files, handle_file)
+    
+    audios = [r.item for r in results if r.ok]
+    errors = [
+        {"filename": files[r.index].filename, "error": r.error}
+        for r in results if not r.ok
+    ]
     
     return {
         "audios": audios,
@@ -97,52 +106,55 @@ async def upload_audio_files(
 
 @router.post("/upload-urls")
 async def upload_audio_urls(request: AudioUploadRequest):
-    """通过URL上传音频"""
+    """通过URL上传音频（通过上传流水线并发处理，结果按输入顺序返回）"""
     if not oss_service.is_enabled():
         raise HTTPException(status_code=400, detail="OSS未配置，无法上传文件")
     
-    audios = []
-    errors = []
+    # 保留原始序号（用于匹配名称），跳过空行
+    sources = [(i, url.strip()) for i, url in enumerate(request.urls) if url.strip()]
+    pipeline = UploadPipeline()
+    
+    async def handle_url(_: int, source) -> AudioItem:
+        i, url = source
+        
+        # 从URL下载并上传到OSS
+        ext = os.path.splitext(url.split("?")[0])[1].lower() or ".mp3"
+        if not ext.startswith("."):
+            ext = f".{ext}"
+        
+        # upload_from_url 返回 (success, result)
+        success, oss_url = await pipeline.upload_once(
+            url,
+            oss_service.upload_from_url,
+            url,
+            file_type="audio",
+            extension=ext[1:],
+            project_id=request.project_id
+        )
+        if not success:
+            raise UploadError(oss_url)
+        
+        # 获取名称
+        name = request.names[i] if request.names and i < len(request.names) else f"音频 {i+1}"
+        
+        # 创建音频记录
+        audio = AudioItem(
+            project_id=request.project_id,
+            name=name,
+            url=oss_url,
+            file_type=ext[1:] if ext else "mp3"
+        )
+        
+        await run_blocking(storage_service.save_audio_item, audio)
+        return audio
+    
+    results = await pipeline.run(sources, handle_url)
     
-    for i, url in enumerate(request.urls):
-        url = url.strip()
-        if not url:
-            continue
-            
-        try:
-            # 从URL下载并上传到OSS
-            ext = os.path.splitext(url.split("?")[0])[1].lower() or ".mp3"
-            if not ext.startswith("."):
-                ext = f".{ext}"
-            
-            # upload_from_url 返回 (success, result)
-            success, oss_url = oss_service.upload_from_url(
-                url, 
-                file_type="audio", 
-                extension=ext[1:],
-                project_id=request.project_id
-            )
-            
-            if not success:
-                errors.append({"url": url, "error": oss_url})
-                continue
-            
-            # 获取名称
-            name = request.names[i] if request.names and i < len(request.names) else f"音频 {i+1}"
-            
-            # 创建音频记录
-            audio = AudioItem(
-                project_id=request.project_id,
-                name=name,
-                url=oss_url,
-                file_type=ext[1:] if ext else "mp3"
-            )
-            
-            storage_service.save_audio_item(audio)
-            audios.append(audio)
-            
-        except Exception as e:
-            errors.append({"url": url, "error": str(e)})
+    audios = [r.item for r in results if r.ok]
+    errors = [
+        {"url": sources[r.index][1], "error": r.error}
+        for r in results if not r.ok
+    ]
     
     return {
         "audios": audios,
@@ -8,10 +8,13 @@ from typing import Optional, List
 import json
 
 from app.models.character import Character, CharacterImage, VoiceConfig
+from app.models.job import Job
 from app.services.storage import storage_service
 from app.services.dashscope.llm import LLMService
 from app.services.dashscope.text_to_image import TextToImageService
 from app.services.dashscope.image_to_image import ImageToImageService
+from app.services.thumbnails import thumbnail_service
+from app.services.job_queue import job_queue, JobContext
 from typing import List as TypingList
 
 router = APIRouter()
@@ -20,6 +23,7 @@ router = APIRouter()
 class CharacterExtractRequest(BaseModel):
     """角色提取请求"""
     project_id: str
+    use_cache: Optional[bool] = None  # 为 False 时跳过 LLM 缓存，强制重新提取
 
 
 class CharacterGenerateRequest(BaseModel):
@@ -38,6 +42,7 @@ class CharacterGenerateRequest(BaseModel):
     prompt_extend: Optional[bool] = None  # 智能改写
     watermark: Optional[bool] = None  # 水印
     seed: Optional[int] = None  # 随机种子
+    use_cache: Optional[bool] = None  # 为 False 时跳过生成结果缓存，强制重新生成
 
 
 class CharacterGenerateAllRequest(BaseModel):
@@ -56,6 +61,7 @@ class CharacterGenerateAllRequest(BaseModel):
     prompt_extend: Optional[bool] = None  # 智能改写
     watermark: Optional[bool] = None  # 水印
     seed: Optional[int] = None  # 随机种子
+    use_cache: Optional[bool] = None  # 为 False 时跳过生成结果缓存，强制重新生成
 
 
 class CharacterUpdateRequest(BaseModel):
@@ -165,7 +171,8 @@ async def extract_characters(request: CharacterExtractRequest):
     try:
         result = await llm_service.chat(
             prompt=CHARACTER_EXTRACT_PROMPT + content,
-            model="qwen3-max"
+            model="qwen3-max",
+            use_cache=request.use_cache
         )
         
         # 解析 JSON
@@ -190,6 +197,7 @@ async def extract_characters(request: CharacterExtractRequest):
         
         return {"characters": characters}
     except json.JSONDecodeError:
+        llm_service.discard_last_cached()
         raise HTTPException(status_code=500, detail="角色提取失败，返回格式不正确")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"角色提取失败: {str(e)}")
@@ -208,6 +216,21 @@ async def list_characters(project_id: str):
         if character:
             characters.append(character)
     
+    # 填充三视图缩略图，缺少的在后台生成
+    missing = []
+    for character in characters:
+        for group in character.image_groups:
+            for view in ("front", "side", "back"):
+                url = getattr(group, f"{view}_url")
+                if not thumbnail_service.is_supported(url):
+                    continue
+                thumbs = thumbnail_service.get(url)
+                if thumbs:
+                    group.thumbnails[view] = thumbs
+                else:
+                    missing.append(url)
+    thumbnail_service.schedule(missing, project_id)
+    
     return {"characters": characters}
 
 
@@ -345,7 +368,8 @@ async def generate_character_images(character_id: str, request: CharacterGenerat
                 prompt=final_prompt,
                 image_urls=image_urls,
                 negative_prompt=negative_prompt,
-                project_id=character.project_id
+                project_id=character.project_id,
+                use_cache=request.use_cache
             )
         else:
             # 使用文生图服务 - 服务层会自动处理 OSS 上传
@@ -359,7 +383,8 @@ async def generate_character_images(character_id: str, request: CharacterGenerat
                 prompt_extend=request.prompt_extend,
                 watermark=request.watermark,
                 seed=request.seed,
-                project_id=character.project_id
+                project_id=character.project_id,
+                use_cache=request.use_cache
             )
         
         # 将三视图合成图存储在 front_url 字段中
@@ -389,12 +414,29 @@ async def generate_character_images(character_id: str, request: CharacterGenerat
 
 @router.post("/{character_id}/generate-all")
 async def generate_all_character_images(character_id: str, request: CharacterGenerateAllRequest):
-    """并发生成角色多组三视图合成图"""
+    """并发生成角色多组三视图合成图（后台任务，立即返回任务ID）"""
+    character = storage_service.get_character(character_id)
+    if not character:
+        raise HTTPException(status_code=404, detail="角色不存在")
+    
+    job = job_queue.submit(
+        "character_generate_all",
+        {"character_id": character_id, "request": request.model_dump()},
+        project_id=character.project_id
+    )
+    return {"message": "生成任务已提交", "job_id": job.id, "job": job}
+
+
+@job_queue.handler("character_generate_all")
+async def run_character_generate_all(job: Job, ctx: JobContext) -> dict:
+    """后台生成角色多组三视图合成图，返回值与原同步接口一致"""
     import asyncio
     
+    character_id = job.params["character_id"]
+    request = CharacterGenerateAllRequest(**job.params["request"])
     character = storage_service.get_character(character_id)
     if not character:
-        raise HTTPException(status_code=404, detail="角色不存在")
+        raise Exception("角色不存在")
     
     # 使用提供的提示词或角色已有的提示词
     common_prompt = request.common_prompt or character.common_prompt
@@ -406,8 +448,11 @@ async def generate_all_character_images(character_id: str, request: CharacterGen
     if request.use_style and request.style_id:
         style = storage_service.get_style(request.style_id)
     
+    completed = 0
+    
     async def generate_group(group_index: int) -> CharacterImage:
         """生成单组三视图合成图"""
+        nonlocal completed
         image_group = CharacterImage(group_index=group_index)
         
         final_prompt, image_urls = build_character_prompt(
@@ -421,7 +466,8 @@ async def generate_all_character_images(character_id: str, request: CharacterGen
                 prompt=final_prompt,
                 image_urls=image_urls,
                 negative_prompt=negative_prompt,
-                project_id=character.project_id
+                project_id=character.project_id,
+                use_cache=request.use_cache
             )
         else:
             # 服务层会自动处理 OSS 上传
@@ -435,35 +481,41 @@ async def generate_all_character_images(character_id: str, request: CharacterGen
                 prompt_extend=request.prompt_extend,
                 watermark=request.watermark,
                 seed=request.seed,
-                project_id=character.project_id
+                project_id=character.project_id,
+                use_cache=request.use_cache
             )
         
         # 将三视图合成图存储在 front_url 字段中
         image_group.front_url = url
         image_group.prompt_used = f"{common_prompt}, {char_prompt}"
+        completed += 1
+        ctx.report(completed / request.group_count, f"已生成 {completed}/{request.group_count} 组")
         return image_group
     
     try:
         # 并发生成指定组数
         tasks = [generate_group(i) for i in range(request.group_count)]
         image_groups = await asyncio.gather(*tasks)
-        
-        # 更新角色
-        character.image_groups = list(image_groups)
-        
-        # 保存更新的提示词
-        if request.common_prompt:
-            character.common_prompt = request.common_prompt
-        if request.character_prompt:
-            character.character_prompt = request.character_prompt
-        if request.negative_prompt is not None:
-            character.negative_prompt = request.negative_prompt
-        
-        storage_service.save_character(character)
-        
-        return {"image_groups": image_groups}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"图片生成失败: {str(e)}")
+        raise Exception(f"图片生成失败: {str(e)}")
+    
+    # 重新读取角色后更新（生成期间角色可能被修改）
+    character = storage_service.get_character(character_id)
+    if not character:
+        raise Exception("角色已被删除")
+    character.image_groups = list(image_groups)
+    
+    # 保存更新的提示词
+    if request.common_prompt:
+        character.common_prompt = request.common_prompt
+    if request.character_prompt:
+        character.character_prompt = request.character_prompt
+    if request.negative_prompt is not None:
+        character.negative_prompt = request.negative_prompt
+    
+    storage_service.save_character(character)
+    
+    return {"image_groups": image_groups}
 
 
 @router.delete("/{character_id}")
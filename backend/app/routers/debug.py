@@ -0,0 +1,36 @@
+"""
+调试 API 路由
+查看最近最慢的请求及其各环节耗时（链路追踪）
+"""
+
+from fastapi import APIRouter
+from typing import Optional
+
+from app.services.storage import get_current_user_id
+from app.services.tracing import tracer
+
+router = APIRouter()
+
+
+@router.get("/traces")
+async def slowest_traces(limit: int = 20, name: Optional[str] = None, spans: bool = True):
+    """
+    最近最慢的请求（仅当前用户）
+    
+    Args:
+        limit: 返回条数
+        name: 按名称过滤，如 "POST /api/frames"
+        spans: 是否返回各环节明细；为 false 时只返回按 span 名称汇总的耗时
+    """
+    traces = tracer.slowest(limit=limit, user_id=get_current_user_id(), name=name)
+    for trace in traces:
+        # 按 span 名称汇总（如 storage.read 共 120 次、合计 80ms）
+        summary = {}
+        for item in trace["spans"]:
+            entry = summary.setdefault(item["name"], {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + item["duration_ms"], 2)
+        trace["summary"] = summary
+        if not spans:
+            trace.pop("spans")
+    return {"traces": traces}
@@ -8,9 +8,12 @@ from typing import Optional, List
 
 from app.models.frame import Frame, FrameImage
 from app.models.gallery import GalleryImage
+from app.models.job import Job
 from app.services.storage import storage_service
 from app.services.dashscope.text_to_image import TextToImageService
 from app.services.dashscope.image_to_image import ImageToImageService
+from app.services.thumbnails import thumbnail_service
+from app.services.job_queue import job_queue, JobContext
 from app.config import get_config
 
 router = APIRouter()
@@ -317,16 +320,32 @@ async def generate_frames_batch(request: FrameBatchGenerateRequest):
     if not project.script.shots:
         raise HTTPException(status_code=400, detail="分镜列表为空")
     
+    job = job_queue.submit("frames_batch", {}, project_id=request.project_id)
+    return {"message": "批量生成任务已提交", "job_id": job.id, "job": job}
+
+
+@job_queue.handler("frames_batch")
+async def run_frames_batch(job: Job, ctx: JobContext) -> dict:
+    """后台批量生成所有分镜首帧，返回值与原同步接口一致"""
+    project_id = job.project_id
+    project = storage_service.get_project(project_id)
+    if not project or not project.script or not project.script.shots:
+        raise Exception("项目或分镜不存在")
+    
     frames = []
     errors = []
+    # 生成成功的分镜首帧：分镜ID -> URL
+    first_frame_urls = {}
+    shots = project.script.shots
     
-    for shot in project.script.shots:
+    for index, shot in enumerate(shots):
+        ctx.report(index / len(shots), f"生成分镜 {shot.shot_number} 首帧")
         try:
             # 自动生成提示词
             prompt = generate_shot_prompt(shot)
             
             # 获取关联素材的图片URL
-            ref_urls = get_shot_reference_urls(request.project_id, shot)
+            ref_urls = get_shot_reference_urls(project_id, shot)
             
             if ref_urls:
                 # 使用多图生图（服务层会自动处理 OSS 上传）
@@ -335,17 +354,17 @@ async def generate_frames_batch(request: FrameBatchGenerateRequest):
                 url = await i2i_service.generate_with_multi_images(
                     prompt=enhanced_prompt,
                     image_urls=ref_urls,
-                    project_id=request.project_id
+                    project_id=project_id
                 )
             else:
                 # 使用纯文生图（服务层会自动处理 OSS 上传）
                 t2i_service = TextToImageService()
-                url = await t2i_service.generate(prompt, project_id=request.project_id)
+                url = await t2i_service.generate(prompt, project_id=project_id)
             
-            frame = storage_service.get_frame_by_shot(request.project_id, shot.id)
+            frame = storage_service.get_frame_by_shot(project_id, shot.id)
             if not frame:
                 frame = Frame(
-                    project_id=request.project_id,
+                    project_id=project_id,
                     shot_id=shot.id,
                     shot_number=shot.shot_number,
                     prompt=prompt
@@ -365,8 +384,7 @@ async def generate_frames_batch(request: FrameBatchGenerateRequest):
             storage_service.save_frame(frame)
             frames.append(frame)
             
-            # 更新分镜的首帧URL
-            shot.first_frame_url = url
+            first_frame_urls[shot.id] = url
             
         except Exception as e:
             errors.append({
@@ -375,8 +393,13 @@ async def generate_frames_batch(request: FrameBatchGenerateRequest):
                 "error": str(e)
             })
     
-    # 保存更新后的分镜
-    storage_service.save_project(project)
+    # 更新分镜的首帧URL（重新读取项目，生成期间项目可能被修改）
+    project = storage_service.get_project(project_id)
+    if project and project.script:
+        for shot in project.script.shots:
+            if shot.id in first_frame_urls:
+                shot.first_frame_url = first_frame_urls[shot.id]
+        storage_service.save_project(project)
     
     return {
         "frames": frames,
@@ -389,7 +412,9 @@ async def generate_frames_batch(request: FrameBatchGenerateRequest):
 @router.get("")
 async def list_frames(project_id: str):
     """获取项目所有首帧"""
-    frames = storage_service.get_frames_by_project(project_id)
+    frames = await storage_service.get_frames_by_project_async(project_id)
+    # 填充缩略图，缺少的在后台生成
+    thumbnail_service.attach([image for frame in frames for image in frame.image_groups], project_id)
     return {"frames": frames}
 
 
@@ -11,6 +11,9 @@ import asyncio
 from app.models.gallery import GalleryImage
 from app.services.storage import storage_service
 from app.services.oss import oss_service
+from app.services.upload_pipeline import UploadPipeline, UploadError, run_blocking, compute_hash
+from app.services.image_probe import parse_image_size, probe_image_size, probe_many
+from app.services.thumbnails import thumbnail_service
 from app.config import get_config
 
 router = APIRouter()
@@ -26,6 +29,8 @@ class GalleryImageCreateRequest(BaseModel):
     source: str = "studio"
     task_id: Optional[str] = None
     tags: List[str] = []
+    width: Optional[int] = None  # 不传时自动探测
+    height: Optional[int] = None
 
 
 class GalleryImageUpdateRequest(BaseModel):
@@ -71,48 +76,60 @@ async def upload_files(
     """
     上传多个图片文件到OSS并保存到图库
     需要启用OSS功能
+    
+    文件通过上传流水线并发处理，结果按上传顺序返回
     """
     # 检查OSS是否启用
     if not oss_service.is_enabled():
         raise HTTPException(status_code=400, detail="OSS未启用，请先在设置中配置并启用OSS")
     
-    uploaded_images = []
-    errors = []
+    pipeline = UploadPipeline()
     
-    for file in files:
-        try:
-            # 读取文件内容
-            content = await file.read()
-            
-            # 获取文件扩展名
-            filename = file.filename or "image.png"
-            ext = filename.split('.')[-1].lower() if '.' in filename else 'png'
-            if ext not in ['png', 'jpg', 'jpeg', 'gif', 'webp']:
-                ext = 'png'
-            
-            # 生成唯一文件名
-            object_name = f"gallery/{uuid.uuid4().hex[:8]}.{ext}"
-            
-            # 上传到OSS
-            success, result = oss_service.upload_from_bytes(content, "image", ext, project_id)
-            
-            if not success:
-                errors.append({"filename": filename, "error": result})
-                continue
-            
-            # 创建图库记录
-            image = GalleryImage(
-                project_id=project_id,
-                name=filename.rsplit('.', 1)[0] if '.' in filename else filename,
-                description="用户上传",
-                url=result,
-                source="upload"
-            )
-            storage_service.save_gallery_image(image)
-            uploaded_images.append(image)
-            
-        except Exception as e:
-            errors.append({"filename": file.filename, "error": str(e)})
+    async def handle_file(index: int, file: UploadFile) -> GalleryImage:
+        # 读取文件内容
+        content = await file.read()
+        
+        # 获取文件扩展名
+        filename = file.filename or "image.png"
+        ext = filename.split('.')[-1].lower() if '.' in filename else 'png'
+        if ext not in ['png', 'jpg', 'jpeg', 'gif', 'webp']:
+            ext = 'png'
+        
+        # 计算内容哈希，同一批次中相同内容只上传一次
+        content_hash = await run_blocking(compute_hash, content)
+        # 文件内容已在内存中，直接从头部解析尺寸
+        size = parse_image_size(content) or (None, None)
+        
+        # 上传到OSS
+        success, result = await pipeline.upload_once(
+            content_hash, oss_service.upload_from_bytes, content, "image", ext, project_id
+        )
+        if not success:
+            raise UploadError(result)
+        
+        # 创建图库记录
+        image = GalleryImage(
+            project_id=project_id,
+            name=filename.rsplit('.', 1)[0] if '.' in filename else filename,
+            description="用户上传",
+            url=result,
+            source="upload",
+            content_hash=content_hash,
+            width=size[0],
+            height=size[1]
+        )
+        await run_blocking(storage_service.save_gallery_image, image)
+        return image
+    
+    results = await pipeline.run(files, handle_file)
+    
+    uploaded_images = [r.item for r in results if r.ok]
+    # 入库后在后台生成缩略图
+    thumbnail_service.schedule([image.url for image in uploaded_images], project_id)
+    errors = [
+        {"filename": files[r.index].filename, "error": r.error}
+        for r in results if not r.ok
+    ]
     
     return {
         "images": uploaded_images,
@@ -132,39 +149,48 @@ async def upload_from_urls(request: UploadUrlsRequest):
     if not oss_service.is_enabled():
         raise HTTPException(status_code=400, detail="OSS未启用，请先在设置中配置并启用OSS")
     
-    uploaded_images = []
-    errors = []
+    # 保留原始序号（用于默认命名），跳过空行
+    sources = [(idx, url.strip()) for idx, url in enumerate(request.urls) if url.strip()]
+    pipeline = UploadPipeline()
     
-    for idx, url in enumerate(request.urls):
-        url = url.strip()
-        if not url:
-            continue
-            
-        try:
-            # 从URL上传到OSS
-            success, result = oss_service.upload_from_url(url, "image", "png", request.project_id)
-            
-            if not success:
-                errors.append({"url": url, "error": result})
-                continue
-            
-            # 从URL提取文件名
-            url_filename = url.split('/')[-1].split('?')[0]
-            name = url_filename.rsplit('.', 1)[0] if '.' in url_filename else f"图片_{idx + 1}"
-            
-            # 创建图库记录
-            image = GalleryImage(
-                project_id=request.project_id,
-                name=name,
-                description=f"从URL导入: {url[:50]}...",
-                url=result,
-                source="upload"
-            )
-            storage_service.save_gallery_image(image)
-            uploaded_images.append(image)
-            
-        except Exception as e:
-            errors.append({"url": url, "error": str(e)})
+    async def handle_url(_: int, source) -> GalleryImage:
+        idx, url = source
+        
+        # 从URL上传到OSS
+        success, result = await pipeline.upload_once(
+            url, oss_service.upload_from_url, url, "image", "png", request.project_id
+        )
+        if not success:
+            raise UploadError(result)
+        
+        # 只读取头部探测尺寸（优先使用上传后的 OSS 地址）
+        size = await probe_image_size(result) or (None, None)
+        
+        # 从URL提取文件名
+        url_filename = url.split('/')[-1].split('?')[0]
+        name = url_filename.rsplit('.', 1)[0] if '.' in url_filename else f"图片_{idx + 1}"
+        
+        # 创建图库记录
+        image = GalleryImage(
+            project_id=request.project_id,
+            name=name,
+            description=f"从URL导入: {url[:50]}...",
+            url=result,
+            source="upload",
+            width=size[0],
+            height=size[1]
+        )
+        await run_blocking(storage_service.save_gallery_image, image)
+        return image
+    
+    results = await pipeline.run(sources, handle_url)
+    
+    uploaded_images = [r.item for r in results if r.ok]
+    thumbnail_service.schedule([image.url for image in uploaded_images], request.project_id)
+    errors = [
+        {"url": sources[r.index][1], "error": r.error}
+        for r in results if not r.ok
+    ]
     
     return {
         "images": uploaded_images,
@@ -178,9 +204,27 @@ async def upload_from_urls(request: UploadUrlsRequest):
 async def list_gallery_images(project_id: str):
     """获取项目图库所有图片"""
     images = storage_service.get_gallery_images_by_project(project_id)
+    # 填充缩略图，缺少的在后台生成
+    thumbnail_service.attach(images, project_id)
     return {"images": images}
 
 
+async def _fill_sizes(images: List[GalleryImage]) -> int:
+    """
+    批量探测缺少尺寸的图片（只读取文件头部），返回成功填充的数量
+    """
+    missing = [image for image in images if not image.width or not image.height]
+    if not missing:
+        return 0
+    sizes = await probe_many([image.url for image in missing])
+    filled = 0
+    for image, size in zip(missing, sizes):
+        if size is not None:
+            image.width, image.height = size
+            filled += 1
+    return filled
+
+
 @router.post("")
 async def create_gallery_image(request: GalleryImageCreateRequest):
     """创建图库图片"""
@@ -192,18 +236,21 @@ async def create_gallery_image(request: GalleryImageCreateRequest):
         prompt_used=request.prompt_used,
         source=request.source,
         task_id=request.task_id,
-        tags=request.tags
+        tags=request.tags,
+        width=request.width,
+        height=request.height
     )
+    await _fill_sizes([image])
     storage_service.save_gallery_image(image)
+    thumbnail_service.schedule([image.url], request.project_id)
     return image
 
 
 @router.post("/batch")
 async def batch_save_to_gallery(request: BatchSaveRequest):
-    """批量保存图片到图库"""
-    saved_images = []
-    for img_data in request.images:
-        image = GalleryImage(
+    """批量保存图片到图库（并发探测图片尺寸）"""
+    saved_images = [
+        GalleryImage(
             project_id=request.project_id,
             name=img_data.name,
             description=img_data.description,
@@ -211,10 +258,16 @@ async def batch_save_to_gallery(request: BatchSaveRequest):
             prompt_used=img_data.prompt_used,
             source=img_data.source,
             task_id=img_data.task_id,
-            tags=img_data.tags
+            tags=img_data.tags,
+            width=img_data.width,
+            height=img_data.height
         )
+        for img_data in request.images
+    ]
+    await _fill_sizes(saved_images)
+    for image in saved_images:
         storage_service.save_gallery_image(image)
-        saved_images.append(image)
+    thumbnail_service.schedule([image.url for image in saved_images], request.project_id)
     return {"images": saved_images}
 
 
@@ -254,6 +307,25 @@ async def delete_gallery_image(image_id: str):
     return {"message": "图片已删除"}
 
 
+@router.post("/project/{project_id}/probe-sizes")
+async def probe_gallery_sizes(project_id: str):
+    """
+    补全项目图库中缺少尺寸的图片
+    只读取每张图片的文件头部，不下载完整图片
+    """
+    images = storage_service.get_gallery_images_by_project(project_id)
+    missing = [image for image in images if not image.width or not image.height]
+    filled = await _fill_sizes(missing)
+    for image in missing:
+        if image.width and image.height:
+            storage_service.save_gallery_image(image)
+    return {
+        "total": len(missing),
+        "filled": filled,
+        "failed": len(missing) - filled
+    }
+
+
 @router.delete("/project/{project_id}/all")
 async def delete_all_gallery_images(project_id: str):
     """删除项目所有图库图片"""
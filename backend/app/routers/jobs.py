@@ -0,0 +1,54 @@
+"""
+后台任务 API 路由
+导出视频、批量生成等耗时接口返回任务ID，前端通过这里查询进度、结果和取消任务
+"""
+
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from app.models.job import JobStatus
+from app.services.storage import storage_service
+from app.services.job_queue import job_queue
+
+router = APIRouter()
+
+
+@router.get("")
+async def list_jobs(project_id: Optional[str] = None, status: Optional[JobStatus] = None, limit: int = 50):
+    """获取后台任务列表（按创建时间倒序）"""
+    jobs = storage_service.get_jobs(project_id)
+    if status is not None:
+        jobs = [job for job in jobs if job.status == status]
+    return {"jobs": jobs[:limit]}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """获取后台任务状态和结果"""
+    job = storage_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """取消后台任务（执行中的任务会在当前步骤中断）"""
+    job = storage_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job.is_terminal:
+        raise HTTPException(status_code=400, detail="任务已结束")
+    return job_queue.cancel(job)
+
+
+@router.delete("/{job_id}")
+async def delete_job(job_id: str):
+    """删除已结束的后台任务记录"""
+    job = storage_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if not job.is_terminal:
+        raise HTTPException(status_code=400, detail="任务未结束，请先取消")
+    storage_service.delete_job(job_id)
+    return {"message": "删除成功"}
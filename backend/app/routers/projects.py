@@ -7,7 +7,7 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict
 from datetime import datetime
 
-from app.models.project import Project, Script, ProjectLLMConfig
+from app.models.project import Project, ProjectSummary, Script, ProjectLLMConfig
 from app.services.storage import storage_service
 
 router = APIRouter()
@@ -26,8 +26,8 @@ class ProjectUpdateRequest(BaseModel):
 
 
 class ProjectListResponse(BaseModel):
-    """项目列表响应"""
-    projects: List[Project]
+    """项目列表响应（项目摘要，不含剧本等完整内容）"""
+    projects: List[ProjectSummary]
     total: int
 
 
@@ -52,7 +52,7 @@ async def list_projects():
 @router.get("/{project_id}", response_model=Project)
 async def get_project(project_id: str):
     """获取项目详情"""
-    project = storage_service.get_project(project_id)
+    project = await storage_service.get_project_async(project_id)
     if not project:
         raise HTTPException(status_code=404, detail="项目不存在")
     return project
@@ -108,34 +108,22 @@ async def delete_project(project_id: str):
 
 @router.get("/{project_id}/summary")
 async def get_project_summary(project_id: str):
-    """获取项目摘要信息"""
-    project = storage_service.get_project(project_id)
-    if not project:
+    """获取项目摘要信息（只读取项目目录）"""
+    summary = storage_service.get_project_summary(project_id)
+    if not summary:
         raise HTTPException(status_code=404, detail="项目不存在")
     
-    # 统计各项数据
-    shots_count = len(project.script.shots) if project.script else 0
-    characters_count = len(project.character_ids)
-    scenes_count = len(project.scene_ids)
-    props_count = len(project.prop_ids)
-    
-    frames = storage_service.get_frames_by_project(project_id)
-    frames_count = sum(1 for f in frames if f.selected_url)
-    
-    videos = storage_service.get_videos_by_project(project_id)
-    videos_count = sum(1 for v in videos if v.video_url)
-    
     return {
         "project_id": project_id,
-        "name": project.name,
-        "shots_count": shots_count,
-        "characters_count": characters_count,
-        "scenes_count": scenes_count,
-        "props_count": props_count,
-        "frames_generated": frames_count,
-        "videos_generated": videos_count,
-        "created_at": project.created_at,
-        "updated_at": project.updated_at
+        "name": summary.name,
+        "shots_count": summary.shots_count,
+        "characters_count": summary.characters_count,
+        "scenes_count": summary.scenes_count,
+        "props_count": summary.props_count,
+        "frames_generated": summary.frames_generated,
+        "videos_generated": summary.videos_generated,
+        "created_at": summary.created_at,
+        "updated_at": summary.updated_at
     }
 
 
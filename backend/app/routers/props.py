@@ -43,6 +43,7 @@ def build_prop_prompt(common_prompt: str, prop_prompt: str, style=None) -> tuple
 class PropExtractRequest(BaseModel):
     """道具提取请求"""
     project_id: str
+    use_cache: Optional[bool] = None  # 为 False 时跳过 LLM 缓存，强制重新提取
 
 
 class PropGenerateRequest(BaseModel):
@@ -186,7 +187,8 @@ async def extract_props(request: PropExtractRequest):
     try:
         result = await llm_service.chat(
             prompt=PROP_EXTRACT_PROMPT + content,
-            model="qwen3-max"
+            model="qwen3-max",
+            use_cache=request.use_cache
         )
         
         props_data = json.loads(result)
@@ -207,6 +209,7 @@ async def extract_props(request: PropExtractRequest):
         
         return {"props": props}
     except json.JSONDecodeError:
+        llm_service.discard_last_cached()
         raise HTTPException(status_code=500, detail="道具提取失败，返回格式不正确")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"道具提取失败: {str(e)}")
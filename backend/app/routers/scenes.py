@@ -43,6 +43,7 @@ def build_scene_prompt(common_prompt: str, scene_prompt: str, style=None) -> tup
 class SceneExtractRequest(BaseModel):
     """场景提取请求"""
     project_id: str
+    use_cache: Optional[bool] = None  # 为 False 时跳过 LLM 缓存，强制重新提取
 
 
 class SceneGenerateRequest(BaseModel):
@@ -181,7 +182,8 @@ async def extract_scenes(request: SceneExtractRequest):
     try:
         result = await llm_service.chat(
             prompt=SCENE_EXTRACT_PROMPT + content,
-            model="qwen3-max"
+            model="qwen3-max",
+            use_cache=request.use_cache
         )
         
         scenes_data = json.loads(result)
@@ -202,6 +204,7 @@ async def extract_scenes(request: SceneExtractRequest):
         
         return {"scenes": scenes}
     except json.JSONDecodeError:
+        llm_service.discard_last_cached()
         raise HTTPException(status_code=500, detail="场景提取失败，返回格式不正确")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"场景提取失败: {str(e)}")
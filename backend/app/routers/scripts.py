@@ -5,13 +5,22 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
+import asyncio
 import json
+import time
 
 from app.models.project import Script, Shot, ScriptVersion, PromptVersion
+from app.models.character import Character
+from app.models.scene import Scene
+from app.models.prop import Prop
 from app.services.storage import storage_service
 from app.services.dashscope.llm import LLMService
+from app.config import LLM_MODELS
 from app.services.file_parser import parse_file
+from app.services.shot_parser import (
+    parse_shots_chunked, ChunkParseError, CHUNK_THRESHOLD_CHARS
+)
 
 router = APIRouter()
 
@@ -22,6 +31,7 @@ class ScriptGenerateRequest(BaseModel):
     content: str  # 原始剧本内容
     model: str = "qwen3-max"  # 使用的模型
     prompt: Optional[str] = None  # 自定义提示词
+    use_cache: Optional[bool] = None  # 为 False 时跳过 LLM 缓存，强制重新生成
 
 
 class ScriptSaveRequest(BaseModel):
@@ -85,6 +95,14 @@ class ShotCreateRequest(BaseModel):
     insert_after_shot_id: Optional[str] = None  # 在哪个镜头后插入，None 表示末尾
 
 
+class ExtractAllRequest(BaseModel):
+    """一次性提取角色、场景、道具和分镜请求"""
+    model: str = "qwen3-max"
+    include_shots: bool = True  # 是否同时解析分镜
+    mode: str = "auto"  # auto：按剧本长度自动选择 / combined：单次合并请求 / concurrent：分别并发请求
+    use_cache: Optional[bool] = None  # 为 False 时跳过 LLM 缓存
+
+
 # 默认分镜脚本生成提示词
 DEFAULT_SCRIPT_PROMPT = """你是一位资深的影视编剧、分镜师和AI视频制作专家。请根据以下剧本/故事内容，生成专业详细的分镜脚本。
 
@@ -178,7 +196,8 @@ async def generate_script(request: ScriptGenerateRequest):
         try:
             async for chunk in llm_service.stream_chat(
                 prompt=full_prompt,
-                model=request.model
+                model=request.model,
+                use_cache=request.use_cache
             ):
                 # SSE 格式
                 yield f"data: {json.dumps({'content': chunk}, ensure_ascii=False)}\n\n"
@@ -227,8 +246,17 @@ async def get_script(project_id: str):
 
 
 @router.post("/{project_id}/parse-shots")
-async def parse_shots(project_id: str):
-    """解析剧本内容为分镜列表"""
+async def parse_shots(
+    project_id: str,
+    use_cache: Optional[bool] = None,
+    chunked: Optional[bool] = None
+):
+    """解析剧本内容为分镜列表
+    
+    Args:
+        use_cache: 为 False 时跳过 LLM 缓存，强制重新解析
+        chunked: 是否按场景分段并发解析，不指定时超过 CHUNK_THRESHOLD_CHARS 字自动分段
+    """
     project = storage_service.get_project(project_id)
     if not project or not project.script:
         raise HTTPException(status_code=404, detail="项目或剧本不存在")
@@ -237,13 +265,35 @@ async def parse_shots(project_id: str):
     if not content:
         raise HTTPException(status_code=400, detail="剧本内容为空")
     
+    if chunked is None:
+        chunked = len(content) > CHUNK_THRESHOLD_CHARS
+    
+    if chunked:
+        try:
+            shots_data, stats = await parse_shots_chunked(
+                prompt=DEFAULT_SCRIPT_PROMPT,
+                content=content,
+                model="qwen3-max",
+                use_cache=use_cache
+            )
+            shots = [Shot(**shot) for shot in shots_data]
+        except ChunkParseError as e:
+            raise HTTPException(status_code=500, detail=f"分镜解析失败: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"分镜解析失败，数据格式不正确: {str(e)}")
+        
+        project.script.shots = shots
+        storage_service.save_project(project)
+        return {"shots": shots, "chunks": stats["chunks"]}
+    
     llm_service = LLMService()
     
     try:
         # 使用 LLM 解析分镜
         result = await llm_service.chat(
             prompt=DEFAULT_SCRIPT_PROMPT + content,
-            model="qwen3-max"
+            model="qwen3-max",
+            use_cache=use_cache
         )
         
         # 尝试解析 JSON
@@ -256,11 +306,283 @@ async def parse_shots(project_id: str):
         
         return {"shots": shots}
     except json.JSONDecodeError:
+        llm_service.discard_last_cached()
         raise HTTPException(status_code=500, detail="分镜解析失败，返回格式不正确")
     except Exception as e:
+        llm_service.discard_last_cached()
         raise HTTPException(status_code=500, detail=f"分镜解析失败: {str(e)}")
 
 
+# 流式解析时每解析出多少个分镜保存一次项目
+STREAM_SAVE_EVERY = 5
+
+
+@router.post("/{project_id}/parse-shots/stream")
+async def parse_shots_stream(project_id: str, use_cache: Optional[bool] = None):
+    """流式解析分镜（SSE 流式输出）
+    
+    LLM 输出过程中每个分镜 JSON 对象闭合后立即推送 {"shot": {...}}，并分批保存到项目，
+    结束时推送 {"done": true, "total": n}
+    """
+    project = storage_service.get_project(project_id)
+    if not project or not project.script:
+        raise HTTPException(status_code=404, detail="项目或剧本不存在")
+    
+    content = project.script.processed_content or project.script.original_content
+    if not content:
+        raise HTTPException(status_code=400, detail="剧本内容为空")
+    
+    async def generate():
+        llm_service = LLMService()
+        shots: List[Shot] = []
+        
+        try:
+            async for item in llm_service.stream_json_array(
+                prompt=DEFAULT_SCRIPT_PROMPT + content,
+                model="qwen3-max",
+                use_cache=use_cache
+            ):
+                if not isinstance(item, dict):
+                    continue
+                item["shot_number"] = len(shots) + 1
+                shot = Shot(**item)
+                shots.append(shot)
+                yield f"data: {json.dumps({'shot': shot.model_dump()}, ensure_ascii=False)}\n\n"
+                
+                # 收到第一个分镜后才替换原有分镜，之后分批保存
+                if len(shots) % STREAM_SAVE_EVERY == 1 or STREAM_SAVE_EVERY == 1:
+                    project.script.shots = list(shots)
+                    storage_service.save_project(project)
+            
+            project.script.shots = shots
+            storage_service.save_project(project)
+            yield f"data: {json.dumps({'done': True, 'total': len(shots)}, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            llm_service.discard_last_cached()
+            if shots:
+                # 保留已解析的分镜
+                project.script.shots = shots
+                storage_service.save_project(project)
+            yield f"data: {json.dumps({'error': str(e), 'total': len(shots)}, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+        }
+    )
+
+
+# 合并提取时输出内容约为剧本长度的数倍，按模型最大输出 token 估算可合并的剧本长度
+COMBINED_OUTPUT_CHARS_RATIO = 8
+
+EXTRACT_ALL_HEADER = """你是一位资深的影视编剧、分镜师和AI视频制作专家。请根据以下剧本内容一次性完成下列 {count} 项任务，并把结果合并到一个JSON对象中输出。
+
+【输出格式】
+直接输出一个JSON对象，不要包含任何其他文字、解释或markdown代码块标记：
+{{{keys}}}
+每个字段的值都是JSON数组，数组元素的格式见下方对应任务的要求；某类内容不存在时返回空数组 []。
+下方各任务中"输出JSON数组"的要求均指对应字段的值。
+"""
+
+
+def _extract_tasks(include_shots: bool) -> List[tuple]:
+    """提取任务列表：(字段名, 名称, 单独提取时使用的提示词)"""
+    from app.routers.characters import CHARACTER_EXTRACT_PROMPT
+    from app.routers.scenes import SCENE_EXTRACT_PROMPT
+    from app.routers.props import PROP_EXTRACT_PROMPT
+    
+    tasks = [
+        ("characters", "角色", CHARACTER_EXTRACT_PROMPT),
+        ("scenes", "场景", SCENE_EXTRACT_PROMPT),
+        ("props", "道具", PROP_EXTRACT_PROMPT),
+    ]
+    if include_shots:
+        tasks.append(("shots", "分镜", DEFAULT_SCRIPT_PROMPT))
+    return tasks
+
+
+def _build_extract_all_prompt(tasks: List[tuple]) -> str:
+    """把各单项提取提示词合并为一个提示词（去掉各自的输出说明和剧本内容标记）"""
+    parts = [EXTRACT_ALL_HEADER.format(
+        count=len(tasks),
+        keys=", ".join(f'"{key}": [...]' for key, _, _ in tasks)
+    ).strip()]
+    for i, (key, label, prompt) in enumerate(tasks, 1):
+        lines = [
+            line for line in prompt.strip().splitlines()
+            if line.strip() not in ("剧本内容：", "请直接输出JSON数组：")
+            and not line.startswith("请直接输出JSON数组格式")
+        ]
+        parts.append(f"【任务{i}：提取{label}，输出到字段 {key}】\n" + "\n".join(lines).strip())
+    parts.append("剧本内容：\n")
+    return "\n\n".join(parts)
+
+
+def _combined_char_limit(model: str) -> int:
+    """可使用单次合并请求的剧本最大长度"""
+    max_output_tokens = LLM_MODELS.get(model, {}).get("max_output_tokens", 32768)
+    return max_output_tokens // COMBINED_OUTPUT_CHARS_RATIO
+
+
+@router.post("/{project_id}/extract-all")
+async def extract_all(project_id: str, request: ExtractAllRequest):
+    """一次性提取角色、场景、道具并解析分镜
+    
+    - combined：单次 JSON Mode 请求返回全部结果，剧本只发送一次
+    - concurrent：各项分别请求并发执行（剧本较长、合并输出可能超出模型输出上限时使用）
+    - auto：按剧本长度自动选择，合并结果无法解析时自动回退到并发模式
+    
+    所有结果在一次批量写入中保存，返回各阶段耗时（秒）
+    """
+    total_started = time.perf_counter()
+    project = storage_service.get_project(project_id)
+    if not project or not project.script:
+        raise HTTPException(status_code=404, detail="项目或剧本不存在")
+    
+    content = project.script.processed_content or project.script.original_content
+    if not content:
+        raise HTTPException(status_code=400, detail="剧本内容为空")
+    if request.mode not in ("auto", "combined", "concurrent"):
+        raise HTTPException(status_code=400, detail=f"无效的提取模式: {request.mode}")
+    
+    tasks = _extract_tasks(request.include_shots)
+    mode = request.mode
+    if mode == "auto":
+        mode = "combined" if len(content) <= _combined_char_limit(request.model) else "concurrent"
+    
+    timings: Dict[str, Any] = {}
+    data: Optional[Dict[str, list]] = None
+    
+    if mode == "combined":
+        llm_service = LLMService()
+        started = time.perf_counter()
+        try:
+            result = await llm_service.chat(
+                prompt=_build_extract_all_prompt(tasks) + content,
+                model=request.model,
+                result_format="json_object",
+                enable_thinking=False,  # JSON Mode 不支持思考模式
+                use_cache=request.use_cache
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"剧本提取失败: {str(e)}")
+        timings["llm"] = round(time.perf_counter() - started, 3)
+        
+        started = time.perf_counter()
+        try:
+            parsed = json.loads(result)
+            if isinstance(parsed, dict) and all(isinstance(parsed.get(key), list) for key, _, _ in tasks):
+                data = {key: parsed[key] for key, _, _ in tasks}
+        except json.JSONDecodeError:
+            pass
+        timings["parse"] = round(time.perf_counter() - started, 3)
+        
+        if data is None:
+            llm_service.discard_last_cached()
+            if request.mode == "combined":
+                raise HTTPException(status_code=500, detail="剧本提取失败，返回格式不正确")
+            print("[剧本提取] 合并结果无法解析，回退到并发模式")
+            mode = "concurrent"
+    
+    if data is None:
+        async def run_task(key: str, prompt: str) -> list:
+            started = time.perf_counter()
+            if key == "shots" and len(content) > CHUNK_THRESHOLD_CHARS:
+                # 长剧本的分镜按场景分段并发解析
+                shots_data, _ = await parse_shots_chunked(
+                    prompt=prompt,
+                    content=content,
+                    model=request.model,
+                    use_cache=request.use_cache
+                )
+                timings["llm_shots"] = round(time.perf_counter() - started, 3)
+                return shots_data
+            
+            llm_service = LLMService()
+            result = await llm_service.chat(
+                prompt=prompt + content,
+                model=request.model,
+                use_cache=request.use_cache
+            )
+            timings[f"llm_{key}"] = round(time.perf_counter() - started, 3)
+            try:
+                items = json.loads(result)
+            except json.JSONDecodeError:
+                llm_service.discard_last_cached()
+                raise Exception(f"{key} 返回格式不正确")
+            if not isinstance(items, list):
+                llm_service.discard_last_cached()
+                raise Exception(f"{key} 返回的不是数组")
+            return items
+        
+        started = time.perf_counter()
+        try:
+            results = await asyncio.gather(*[run_task(key, prompt) for key, _, prompt in tasks])
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"剧本提取失败: {str(e)}")
+        timings["llm_concurrent"] = round(time.perf_counter() - started, 3)
+        data = {key: items for (key, _, _), items in zip(tasks, results)}
+    
+    # 构建实体（字段默认值与单项提取接口一致）
+    started = time.perf_counter()
+    try:
+        characters = [
+            Character(
+                project_id=project_id,
+                name=item.get("name", "未命名角色"),
+                description=item.get("description", ""),
+                appearance=item.get("appearance", ""),
+                personality=item.get("personality", ""),
+                character_prompt=item.get("character_prompt", "")
+            )
+            for item in data["characters"]
+        ]
+        scenes = [
+            Scene(
+                project_id=project_id,
+                name=item.get("name", "未命名场景"),
+                description=item.get("description", ""),
+                scene_prompt=item.get("scene_prompt", "")
+            )
+            for item in data["scenes"]
+        ]
+        props = [
+            Prop(
+                project_id=project_id,
+                name=item.get("name", "未命名道具"),
+                description=item.get("description", ""),
+                prop_prompt=item.get("prop_prompt", "")
+            )
+            for item in data["props"]
+        ]
+        shots = [Shot(**item) for item in data["shots"]] if request.include_shots else None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"剧本提取失败，数据格式不正确: {str(e)}")
+    timings["build"] = round(time.perf_counter() - started, 3)
+    
+    started = time.perf_counter()
+    if shots is not None:
+        project.script.shots = shots
+    storage_service.save_extracted(project, characters, scenes, props)
+    timings["save"] = round(time.perf_counter() - started, 3)
+    timings["total"] = round(time.perf_counter() - total_started, 3)
+    
+    print(f"[剧本提取] 模式={mode}，角色 {len(characters)}，场景 {len(scenes)}，道具 {len(props)}，"
+          f"分镜 {len(shots) if shots is not None else '-'}，耗时 {timings}")
+    
+    return {
+        "characters": characters,
+        "scenes": scenes,
+        "props": props,
+        "shots": shots if shots is not None else project.script.shots,
+        "mode": mode,
+        "timings": timings
+    }
+
+
 @router.put("/{project_id}/shots")
 async def update_shots(project_id: str, request: ShotUpdateRequest):
     """更新分镜列表"""
@@ -99,6 +99,15 @@ class OSSConfigRequest(BaseModel):
     bucket_name: Optional[str] = None
     endpoint: Optional[str] = None
     prefix: Optional[str] = None
+    upload_concurrency: Optional[int] = None  # 批量上传并发数
+
+
+class CacheConfigRequest(BaseModel):
+    """生成结果缓存配置请求"""
+    generation_enabled: Optional[bool] = None
+    generation_ttl_hours: Optional[int] = None
+    llm_enabled: Optional[bool] = None
+    llm_ttl_hours: Optional[int] = None
 
 
 class ConfigUpdateRequest(BaseModel):
@@ -112,6 +121,7 @@ class ConfigUpdateRequest(BaseModel):
     text_to_video: Optional[TextToVideoConfigRequest] = None  # 文生视频配置
     ref_video: Optional[RefVideoConfigRequest] = None  # 参考生视频配置
     oss: Optional[OSSConfigRequest] = None
+    cache: Optional[CacheConfigRequest] = None  # 生成结果缓存配置
 
 
 class OSSConfigResponse(BaseModel):
@@ -123,6 +133,7 @@ class OSSConfigResponse(BaseModel):
     bucket_name: str
     endpoint: str
     prefix: str
+    upload_concurrency: int = 4
 
 
 class ConfigResponse(BaseModel):
@@ -153,6 +164,9 @@ class ConfigResponse(BaseModel):
     # OSS 配置
     oss: OSSConfigResponse
     
+    # 生成结果缓存配置
+    cache: Dict[str, Any]
+    
     # 可用选项
     available_regions: Dict[str, Dict[str, str]]
     available_llm_models: Dict[str, Dict[str, Any]]
@@ -194,7 +208,8 @@ async def get_settings():
         is_configured=oss_is_configured,
         bucket_name=oss_config.bucket_name,
         endpoint=oss_config.endpoint,
-        prefix=oss_config.prefix
+        prefix=oss_config.prefix,
+        upload_concurrency=oss_config.upload_concurrency
     )
     
     return ConfigResponse(
@@ -209,6 +224,7 @@ async def get_settings():
         text_to_video=config.text_to_video.model_dump(),
         ref_video=config.ref_video.model_dump(),
         oss=oss_response,
+        cache=config.cache.model_dump(),
         available_regions=API_REGIONS,
         available_llm_models=LLM_MODELS,
         available_image_models=IMAGE_MODELS,
@@ -292,8 +308,18 @@ async def update_settings(request: ConfigUpdateRequest):
                 endpoint = oss_update["endpoint"]
                 if endpoint and not endpoint.startswith("https://"):
                     raise HTTPException(status_code=400, detail="OSS Endpoint 必须以 https:// 开头")
+            if "upload_concurrency" in oss_update and not 1 <= oss_update["upload_concurrency"] <= 16:
+                raise HTTPException(status_code=400, detail="上传并发数必须在 1-16 之间")
             update_data["oss"] = oss_update
     
+    if request.cache is not None:
+        cache_update = {k: v for k, v in request.cache.model_dump().items() if v is not None}
+        if cache_update:
+            for ttl_field in ("generation_ttl_hours", "llm_ttl_hours"):
+                if ttl_field in cache_update and cache_update[ttl_field] < 1:
+                    raise HTTPException(status_code=400, detail="缓存有效期必须大于 0 小时")
+            update_data["cache"] = cache_update
+    
     if update_data:
         config_manager.update(**update_data)
         # 如果更新了 OSS 配置，重新初始化 OSS 服务
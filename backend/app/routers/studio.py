@@ -7,20 +7,32 @@
 """
 
 import asyncio
+from datetime import datetime
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, List, Any, Tuple
+from typing import Optional, List, Any, Tuple, Callable, Awaitable
 
-from app.models.studio import StudioTask, StudioTaskImage, ReferenceItem
+from app.models.studio import StudioTask, StudioTaskImage, StudioGenerationTask, ReferenceItem
 from app.models.gallery import GalleryImage
+from app.models.job import Job
 from app.services.storage import storage_service
 from app.services.dashscope.image_to_image import ImageToImageService
+from app.services.dashscope.image_tasks import (
+    SubmittedImageTask, query_image_task, extract_image_urls, upload_image_results
+)
+from app.services.dashscope.result_cache import save_generation
+from app.services.task_tracker import task_tracker
 from app.services.oss import oss_service
+from app.services.thumbnails import thumbnail_service
+from app.services.job_queue import job_queue, JobContext
 from app.config import get_config
 from app.models_registry import registry
 
 router = APIRouter()
 
+# 生成任务超时（秒）：超过后仍未结束的组记为失败
+GENERATION_TIMEOUT = 300
+
 
 class ReferenceItemInput(BaseModel):
     """参考素材输入"""
@@ -75,6 +87,7 @@ class TaskGenerateRequest(BaseModel):
     # wan2.6-image 专用参数
     enable_interleave: Optional[bool] = False  # 是否启用图文混合模式
     max_images: Optional[int] = 5  # 图文混合模式下最大生成图片数（1-5）
+    use_cache: Optional[bool] = None  # 为 False 时跳过生成结果缓存，强制重新生成
 
 
 class SaveToGalleryRequest(BaseModel):
@@ -114,6 +127,8 @@ def get_reference_url(ref_type: str, ref_id: str) -> tuple[str, str]:
 async def list_studio_tasks(project_id: str):
     """获取项目所有图片工作室任务"""
     tasks = storage_service.get_studio_tasks_by_project(project_id)
+    # 填充缩略图，缺少的在后台生成
+    thumbnail_service.attach([image for task in tasks for image in task.images], project_id)
     return {"tasks": tasks}
 
 
@@ -149,10 +164,16 @@ async def create_studio_task(request: TaskCreateRequest):
 
 @router.get("/{task_id}")
 async def get_studio_task(task_id: str):
-    """获取任务详情"""
+    """获取任务详情（生成中时先查询一次 DashScope 任务状态）"""
     task = storage_service.get_studio_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="任务不存在")
+    if task.status == "generating" and task_tracker.is_tracked("studio", task_id):
+        try:
+            await task_tracker.refresh("studio", task_id)
+        except Exception as e:
+            print(f"[图片工作室] 查询生成任务失败: {e}")
+        task = storage_service.get_studio_task(task_id) or task
     return task
 
 
@@ -251,8 +272,38 @@ async def generate_task_images(task_id: str, request: TaskGenerateRequest):
     
     task.status = "generating"
     task.images = []
+    task.generation_tasks = []
+    task.error_message = None
     storage_service.save_studio_task(task)
     
+    job = job_queue.submit(
+        "studio_generate",
+        {"task_id": task_id, "request": request.model_dump()},
+        project_id=task.project_id
+    )
+    return {"task": task, "job_id": job.id, "job": job}
+
+
+@job_queue.handler("studio_generate")
+async def run_studio_generate(job: Job, ctx: JobContext) -> dict:
+    """
+    后台生成图片工作室任务的图片
+    支持异步任务的模型只创建 DashScope 任务就返回（任务保持 generating），
+    结果由后台任务跟踪取回；同步接口的模型在这里等待结果
+    """
+    from app.config import IMAGE_MODELS
+    from app.services.dashscope.text_to_image import TextToImageService
+    
+    task = storage_service.get_studio_task(job.params["task_id"])
+    if not task:
+        raise Exception("任务不存在")
+    request = TaskGenerateRequest(**job.params["request"])
+    
+    config = get_config()
+    model_name = task.model or "wan2.5-i2i-preview"
+    is_text_to_image = model_name in IMAGE_MODELS
+    ref_urls = [ref.url for ref in task.references if ref.url]
+    
     # 使用任务中保存的参数（如果请求中没有指定，则使用任务保存的值）
     size = request.size if request.size is not None else task.size
     prompt_extend = request.prompt_extend if request.prompt_extend is not None else task.prompt_extend
@@ -262,35 +313,47 @@ async def generate_task_images(task_id: str, request: TaskGenerateRequest):
     try:
         # 根据模型选择不同的生成方式
         if model_name == "wan2.6-image":
-            # 使用 wan2.6-image 模型（支持参考图和纯文生图）
-            enable_interleave = request.enable_interleave if hasattr(request, 'enable_interleave') else False
-            max_images = request.max_images if hasattr(request, 'max_images') else 5
-            images = await generate_with_wan26_image(
+            # 使用 wan2.6-image 模型（支持参考图和纯文生图），只创建任务，由后台取回结果
+            await submit_with_wan26_image(
                 task=task,
                 ref_urls=ref_urls if ref_urls else None,
                 size=size,
                 prompt_extend=prompt_extend,
                 watermark=watermark,
                 seed=seed,
-                enable_interleave=enable_interleave,
-                max_images=max_images
+                enable_interleave=bool(request.enable_interleave),
+                max_images=request.max_images or 5,
+                use_cache=request.use_cache
+            )
+        elif is_text_to_image and TextToImageService().supports_submit(model_name):
+            # 异步文生图模型只创建任务，由后台取回结果
+            await submit_with_text_to_image(
+                task=task,
+                model_name=model_name,
+                prompt_extend=prompt_extend,
+                watermark=watermark,
+                seed=seed,
+                size=request.size,
+                use_cache=request.use_cache
             )
         elif is_text_to_image:
-            # 使用文生图模型
+            # 同步文生图模型
             images, last_task_id, last_request_id = await generate_with_text_to_image(
                 task=task,
                 model_name=model_name,
                 prompt_extend=prompt_extend,
                 watermark=watermark,
                 seed=seed,
-                size=request.size
+                size=request.size,
+                use_cache=request.use_cache
             )
             # 保存追踪ID
             task.last_task_id = last_task_id
             task.last_request_id = last_request_id
+            task.images = images
         elif model_name == "qwen-image-edit-plus":
-            # 使用通义千问图像编辑模型
-            images = await generate_with_qwen_image_edit(
+            # 使用通义千问图像编辑模型（只有同步接口）
+            task.images = await generate_with_qwen_image_edit(
                 task=task,
                 ref_urls=ref_urls,
                 api_key=config.dashscope_api_key,
@@ -298,25 +361,44 @@ async def generate_task_images(task_id: str, request: TaskGenerateRequest):
                 size=size,
                 prompt_extend=prompt_extend,
                 watermark=watermark,
-                seed=seed
+                seed=seed,
+                use_cache=request.use_cache
             )
         else:
-            # 使用万相图生图模型
-            images = await generate_with_wanx_i2i(
+            # 使用万相图生图模型，只创建任务，由后台取回结果
+            await submit_with_wanx_i2i(
                 task=task,
-                ref_urls=ref_urls
+                ref_urls=ref_urls,
+                use_cache=request.use_cache
             )
         
-        task.images = images
-        task.status = "completed"
+        # 已创建的任务由后台轮询取回结果，这里直接返回（status 保持 generating）
+        finish_generation(task)
         storage_service.save_studio_task(task)
         
         return {"task": task}
+    except asyncio.CancelledError:
+        task.status = "failed"
+        task.error_message = "已取消"
+        storage_service.save_studio_task(task)
+        raise
     except Exception as e:
         task.status = "failed"
         task.error_message = str(e)
         storage_service.save_studio_task(task)
-        raise HTTPException(status_code=500, detail=f"图片生成失败: {str(e)}")
+        raise Exception(f"图片生成失败: {str(e)}")
+
+
+def _parse_size(size: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """解析"宽*高"格式的尺寸"""
+    if size:
+        try:
+            parts = size.split('*')
+            if len(parts) == 2:
+                return int(parts[0]), int(parts[1])
+        except ValueError:
+            pass
+    return None, None
 
 
 async def generate_with_text_to_image(
@@ -325,7 +407,8 @@ async def generate_with_text_to_image(
     prompt_extend: bool = True,
     watermark: bool = False,
     seed: Optional[int] = None,
-    size: Optional[str] = None
+    size: Optional[str] = None,
+    use_cache: Optional[bool] = None
 ) -> Tuple[List[StudioTaskImage], Optional[str], Optional[str]]:
     """使用文生图模型生成
     
@@ -345,17 +428,7 @@ async def generate_with_text_to_image(
     
     print(f"[文生图] 开始生成: n={n}, group_count={group_count}, total={n * group_count}")
     
-    # 解析 size 参数
-    width = None
-    height = None
-    if size:
-        try:
-            parts = size.split('*')
-            if len(parts) == 2:
-                width = int(parts[0])
-                height = int(parts[1])
-        except ValueError:
-            pass
+    width, height = _parse_size(size)
     
     # 用于追踪最后一次生成的 task_id 和 request_id
     last_task_id = None
@@ -378,7 +451,8 @@ async def generate_with_text_to_image(
                 prompt_extend=prompt_extend,
                 watermark=watermark,
                 seed=seed,
-                project_id=task.project_id
+                project_id=task.project_id,
+                use_cache=use_cache
             )
             
             images = []
@@ -462,7 +536,146 @@ async def generate_with_text_to_image(
     return all_images, last_task_id, last_request_id
 
 
-async def generate_with_wan26_image(
+async def submit_generation_groups(
+    task: StudioTask,
+    n: int,
+    submit_group: Callable[[], Awaitable[SubmittedImageTask]]
+):
+    """
+    并发创建 group_count 组生成任务，不等待结果
+    
+    - 命中结果缓存的组直接写入图片
+    - 创建成功的组记录到 task.generation_tasks，由后台任务跟踪取回结果
+    - 创建失败（如限流）的组串行重试，全部失败时添加空图片占位
+    """
+    async def submit(group_index: int) -> Tuple[Optional[SubmittedImageTask], str]:
+        try:
+            return await submit_group(), ""
+        except Exception as e:
+            print(f"[图片工作室] 创建生成任务失败 (组{group_index}): {e}")
+            return None, str(e)
+    
+    def apply(group_index: int, submitted: SubmittedImageTask):
+        if submitted.task_id:
+            task.generation_tasks.append(StudioGenerationTask(
+                group_index=group_index,
+                task_id=submitted.task_id,
+                n=n,
+                cache_key=submitted.cache_key
+            ))
+            task.last_task_id = submitted.task_id
+            task.last_request_id = submitted.request_id or task.last_request_id
+        else:
+            task.images.extend(_group_images(task, group_index, n, submitted.urls))
+    
+    results = await asyncio.gather(*[submit(i) for i in range(task.group_count)])
+    
+    for group_index, (submitted, error_msg) in enumerate(results):
+        if submitted:
+            apply(group_index, submitted)
+            continue
+        # 串行重试（指数退避）
+        for retry in range(3):
+            wait_time = 2 * (retry + 1)
+            print(f"[图片工作室] 组{group_index} 等待 {wait_time}s 后重试 ({retry + 1}/3)...")
+            await asyncio.sleep(wait_time)
+            submitted, error_msg = await submit(group_index)
+            if submitted:
+                apply(group_index, submitted)
+                break
+        else:
+            print(f"[图片工作室] 组{group_index} 重试全部失败: {error_msg}")
+            task.images.extend(_group_images(task, group_index, n))
+    
+    print(f"[图片工作室] 已创建 {len(task.generation_tasks)} 个生成任务，命中缓存/失败 {task.group_count - len(task.generation_tasks)} 组")
+
+
+def _group_images(task: StudioTask, group_index: int, n: int, urls: Optional[List[str]] = None) -> List[StudioTaskImage]:
+    """一组的图片；没有结果时为 n 个空图片占位"""
+    if not urls:
+        urls = [None] * n
+    return [
+        StudioTaskImage(group_index=group_index * n + i, url=url, prompt_used=task.prompt)
+        for i, url in enumerate(urls)
+    ]
+
+
+def finish_generation(task: StudioTask):
+    """所有组都有结果后结束任务（仍有未完成的生成任务时保持 generating）"""
+    if any(t.status == "pending" for t in task.generation_tasks):
+        return
+    # 与同步生成一致：失败的组以空图片占位，任务仍为 completed
+    task.images.sort(key=lambda img: img.group_index)
+    task.status = "completed"
+
+
+async def _check_generation_task(generation: StudioGenerationTask, project_id: str) -> Optional[Tuple[str, List[str], Optional[str]]]:
+    """
+    查询一次生成任务
+    
+    Returns:
+        (状态, 图片URL, 错误信息)；任务仍在进行时返回 None
+    """
+    output = await query_image_task(generation.task_id)
+    status = output.get("task_status", "")
+    if status in ("PENDING", "RUNNING"):
+        if (datetime.now() - generation.created_at).total_seconds() > GENERATION_TIMEOUT:
+            return "failed", [], f"图片生成超时（已等待 {GENERATION_TIMEOUT} 秒）"
+        return None
+    if status == "SUCCEEDED":
+        urls = await upload_image_results(extract_image_urls(output), project_id)
+        if not urls:
+            return "failed", [], "图片生成成功但未返回URL"
+        save_generation(generation.cache_key, urls)
+        return "succeeded", urls, None
+    return "failed", [], f"图片生成失败: {output.get('code', '')} - {output.get('message', status or '未知错误')}"
+
+
+@task_tracker.refresher("studio")
+async def refresh_studio_generation(task_id: str, entry: dict) -> bool:
+    """
+    查询一次图片工作室任务中未完成的生成任务，取得结果后写回
+    
+    Returns:
+        任务是否已结束
+    """
+    task = storage_service.get_studio_task(task_id)
+    if not task or task.status != "generating":
+        return True
+    pending = [t for t in task.generation_tasks if t.status == "pending"]
+    results = await asyncio.gather(
+        *[_check_generation_task(t, task.project_id) for t in pending],
+        return_exceptions=True
+    )
+    updates = {}
+    for generation, result in zip(pending, results):
+        if isinstance(result, Exception):
+            print(f"[图片工作室] 查询生成任务失败: {generation.task_id} ({result})")
+        elif result is not None:
+            updates[generation.task_id] = result
+    if not updates:
+        return False
+    
+    # 查询和上传期间任务可能被重新生成，重新读取后只更新仍属于本任务的组
+    task = storage_service.get_studio_task(task_id)
+    if not task or task.status != "generating":
+        return True
+    for generation in task.generation_tasks:
+        if generation.task_id not in updates or generation.status != "pending":
+            continue
+        generation.status, urls, generation.error = updates[generation.task_id]
+        task.images.extend(_group_images(task, generation.group_index, generation.n, urls))
+        if generation.error:
+            print(f"[图片工作室] 组{generation.group_index} {generation.error}")
+    finish_generation(task)
+    storage_service.save_studio_task(task)
+    if task.status != "generating":
+        success_count = sum(1 for img in task.images if img.url)
+        print(f"[图片工作室] 任务 {task_id} 生成完成: 共 {len(task.images)} 张图片，成功 {success_count} 张")
+    return task.status != "generating"
+
+
+async def submit_with_wan26_image(
     task: StudioTask,
     ref_urls: Optional[List[str]] = None,
     size: Optional[str] = None,
@@ -470,9 +683,10 @@ async def generate_with_wan26_image(
     watermark: bool = False,
     seed: Optional[int] = None,
     enable_interleave: bool = False,
-    max_images: int = 5
-) -> List[StudioTaskImage]:
-    """使用 wan2.6-image 模型生成
+    max_images: int = 5,
+    use_cache: Optional[bool] = None
+):
+    """使用 wan2.6-image 模型创建生成任务
     
     支持：
     - 参考图生图 (ref_urls 不为空, enable_interleave=False)
@@ -496,58 +710,63 @@ async def generate_with_wan26_image(
     else:
         n = min(n, 4)  # 参考图模式最多4张
     
-    async def generate_single_group(group_index: int) -> List[StudioTaskImage]:
-        """生成单组图片"""
-        try:
-            urls = await t2i_service.generate_with_wan26_image(
-                prompt=task.prompt,
-                image_urls=ref_urls,
-                negative_prompt=task.negative_prompt or "",
-                n=n,
-                size=size or "1280*1280",
-                prompt_extend=prompt_extend,
-                watermark=watermark,
-                seed=seed,
-                enable_interleave=enable_interleave,
-                max_images=max_images,
-                project_id=task.project_id
-            )
-            
-            images = []
-            for i, url in enumerate(urls):
-                images.append(StudioTaskImage(
-                    group_index=group_index * n + i,
-                    url=url,
-                    prompt_used=task.prompt
-                ))
-            return images
-        except Exception as e:
-            import traceback
-            print(f"wan2.6-image 生成失败: {e}")
-            traceback.print_exc()
-            # 返回失败的图片
-            return [StudioTaskImage(
-                group_index=group_index * n + i,
-                url=None,
-                prompt_used=task.prompt
-            ) for i in range(n)]
+    await submit_generation_groups(task, n, lambda: t2i_service.submit_wan26_image(
+        prompt=task.prompt,
+        image_urls=ref_urls,
+        negative_prompt=task.negative_prompt or "",
+        n=n,
+        size=size or "1280*1280",
+        prompt_extend=prompt_extend,
+        watermark=watermark,
+        seed=seed,
+        enable_interleave=enable_interleave,
+        max_images=max_images,
+        project_id=task.project_id,
+        use_cache=use_cache
+    ))
+
+
+async def submit_with_text_to_image(
+    task: StudioTask,
+    model_name: str,
+    prompt_extend: bool = True,
+    watermark: bool = False,
+    seed: Optional[int] = None,
+    size: Optional[str] = None,
+    use_cache: Optional[bool] = None
+):
+    """使用异步文生图模型创建生成任务（如 wan2.6-t2i）
     
-    # 并发生成 group_count 组
-    group_tasks = [generate_single_group(i) for i in range(task.group_count)]
-    results = await asyncio.gather(*group_tasks)
+    Args:
+        size: 输出尺寸，格式为"宽*高"，如"1280*1280"
+    """
+    from app.services.dashscope.text_to_image import TextToImageService
     
-    # 展平结果列表
-    all_images = []
-    for group_images in results:
-        all_images.extend(group_images)
-    return all_images
-
-
-async def generate_with_wanx_i2i(
+    t2i_service = TextToImageService()
+    n = task.n or 1
+    width, height = _parse_size(size)
+    
+    await submit_generation_groups(task, n, lambda: t2i_service.submit_batch(
+        prompt=task.prompt,
+        negative_prompt=task.negative_prompt or "",
+        width=width,
+        height=height,
+        n=n,
+        model=model_name,
+        prompt_extend=prompt_extend,
+        watermark=watermark,
+        seed=seed,
+        project_id=task.project_id,
+        use_cache=use_cache
+    ))
+
+
+async def submit_with_wanx_i2i(
     task: StudioTask,
-    ref_urls: List[str]
-) -> List[StudioTaskImage]:
-    """使用万相图生图模型生成
+    ref_urls: List[str],
+    use_cache: Optional[bool] = None
+):
+    """使用万相图生图模型创建生成任务
     
     n: 每次请求生成的图片数量
     group_count: 并发请求数
@@ -556,46 +775,13 @@ async def generate_with_wanx_i2i(
     i2i_service = ImageToImageService()
     n = task.n or 1  # 每次请求生成的图片数量
     
-    async def generate_single_group(group_index: int) -> List[StudioTaskImage]:
-        """生成单组图片（一次请求生成 n 张）"""
-        try:
-            # 服务层会自动处理 OSS 上传
-            urls = await i2i_service.generate_with_multi_images(
-                prompt=task.prompt,
-                image_urls=ref_urls,
-                negative_prompt=task.negative_prompt,
-                n=n,
-                project_id=task.project_id  # 传递 project_id 让服务层处理 OSS 上传
-            )
-            # 如果返回单个URL，转为列表
-            if isinstance(urls, str):
-                urls = [urls]
-            
-            images = []
-            for i, url in enumerate(urls):
-                images.append(StudioTaskImage(
-                    group_index=group_index * n + i,  # 全局索引
-                    url=url,
-                    prompt_used=task.prompt
-                ))
-            return images
-        except Exception as e:
-            # 返回 n 个失败的图片
-            return [StudioTaskImage(
-                group_index=group_index * n + i,
-                url=None,
-                prompt_used=task.prompt
-            ) for i in range(n)]
-    
-    # 并发生成 group_count 组
-    group_tasks = [generate_single_group(i) for i in range(task.group_count)]
-    results = await asyncio.gather(*group_tasks)
-    
-    # 展平结果列表
-    all_images = []
-    for group_images in results:
-        all_images.extend(group_images)
-    return all_images
+    await submit_generation_groups(task, n, lambda: i2i_service.submit_multi_images(
+        prompt=task.prompt,
+        image_urls=ref_urls,
+        negative_prompt=task.negative_prompt,
+        n=n,
+        use_cache=use_cache
+    ))
 
 
 async def generate_with_qwen_image_edit(
@@ -606,7 +792,8 @@ async def generate_with_qwen_image_edit(
     size: Optional[str] = None,
     prompt_extend: bool = True,
     watermark: bool = False,
-    seed: Optional[int] = None
+    seed: Optional[int] = None,
+    use_cache: Optional[bool] = None
 ) -> List[StudioTaskImage]:
     """使用通义千问图像编辑模型生成
     
@@ -658,7 +845,8 @@ async def generate_with_qwen_image_edit(
                 prompt_extend=prompt_extend,
                 watermark=watermark,
                 seed=seed,
-                project_id=task.project_id
+                project_id=task.project_id,
+                use_cache=use_cache
             )
             
             # 服务层已处理 OSS 上传
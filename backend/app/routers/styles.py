@@ -33,6 +33,7 @@ class StyleGenerateRequest(BaseModel):
     group_index: int = 0
     style_prompt: Optional[str] = None
     negative_prompt: Optional[str] = None
+    use_cache: Optional[bool] = None  # 为 False 时跳过生成结果缓存，强制重新生成
 
 
 class StyleGenerateAllRequest(BaseModel):
@@ -40,6 +41,7 @@ class StyleGenerateAllRequest(BaseModel):
     style_prompt: Optional[str] = None
     negative_prompt: Optional[str] = None
     group_count: int = 3
+    use_cache: Optional[bool] = None  # 为 False 时跳过生成结果缓存，强制重新生成
 
 
 class StyleUpdateRequest(BaseModel):
@@ -234,7 +236,12 @@ async def generate_style_images(style_id: str, request: StyleGenerateRequest):
     
     try:
         # 服务层会自动处理 OSS 上传
-        url = await t2i_service.generate(style_prompt, negative_prompt=negative_prompt, project_id=style.project_id)
+        url = await t2i_service.generate(
+            style_prompt,
+            negative_prompt=negative_prompt,
+            project_id=style.project_id,
+            use_cache=request.use_cache
+        )
         
         image = StyleImage(
             group_index=request.group_index,
@@ -276,7 +283,12 @@ async def generate_all_style_images(style_id: str, request: StyleGenerateAllRequ
     
     async def generate_group(group_index: int) -> StyleImage:
         # 服务层会自动处理 OSS 上传
-        url = await t2i_service.generate(style_prompt, negative_prompt=negative_prompt, project_id=style.project_id)
+        url = await t2i_service.generate(
+            style_prompt,
+            negative_prompt=negative_prompt,
+            project_id=style.project_id,
+            use_cache=request.use_cache
+        )
         return StyleImage(
             group_index=group_index,
             url=url,
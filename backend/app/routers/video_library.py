@@ -7,17 +7,20 @@ from pydantic import BaseModel
 from typing import Optional, List
 import os
 import uuid
-import tempfile
-import httpx
-import cv2
-import numpy as np
-from io import BytesIO
+import asyncio
 from datetime import datetime
 
 from app.models.media import VideoItem
 from app.models.gallery import GalleryImage
 from app.services.storage import storage_service
 from app.services.oss import oss_service
+from app.services.media_store import media_store
+from app.services.upload_pipeline import UploadPipeline, UploadError, run_blocking, compute_hash
+from app.services.video_ingest import video_ingest_service
+from app.services.frame_extract import frame_extract_service, ExtractedFrame, FrameExtractError, LAST_FRAME
+
+# 单次请求最多提取的帧数
+MAX_FRAMES_PER_REQUEST = 20
 
 router = APIRouter()
 
@@ -39,6 +42,8 @@ class VideoUpdateRequest(BaseModel):
 async def list_videos(project_id: str):
     """获取项目所有视频"""
     videos = storage_service.get_video_items(project_id)
+    # 早期入库还没有预处理过、或预处理中断（进程重启/崩溃）的视频在后台补做
+    video_ingest_service.schedule([v.id for v in videos if video_ingest_service.needs_ingest(v)])
     return {"videos": videos}
 
 
@@ -56,42 +61,53 @@ async def upload_video_files(
     project_id: str,
     files: List[UploadFile] = File(...)
 ):
-    """上传视频文件"""
+    """上传视频文件（通过上传流水线并发处理，结果按上传顺序返回）"""
     if not oss_service.is_enabled():
         raise HTTPException(status_code=400, detail="OSS未配置，无法上传文件")
     
-    videos = []
-    errors = []
+    pipeline = UploadPipeline()
+    
+    async def handle_file(index: int, file: UploadFile) -> VideoItem:
+        # 获取文件扩展名（先校验格式，不支持的文件不读取内容）
+        ext = os.path.splitext(file.filename or "video.mp4")[1].lower()
+        if ext not in [".mp4", ".mov", ".avi", ".webm", ".mkv"]:
+            raise UploadError("不支持的视频格式")
+        
+        # 读取文件内容
+        content = await file.read()
+        
+        # 计算内容哈希，同一批次中相同内容只上传一次
+        content_hash = await run_blocking(compute_hash, content)
+        
+        # 上传到OSS
+        filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}{ext}"
+        oss_url = await pipeline.upload_once(
+            content_hash, oss_service.upload_bytes, content, f"video_library/{project_id}/{filename}"
+        )
+        
+        # 创建视频记录
+        video = VideoItem(
+            project_id=project_id,
+            name=file.filename or "未命名视频",
+            url=oss_url,
+            file_type=ext[1:],
+            file_size=len(content),
+            content_hash=content_hash,
+            ingest_status="pending"
+        )
+        
+        await run_blocking(storage_service.save_video_item, video)
+        return video
     
-    for file in files:
-        try:
-            # 读取文件内容
-            content = await file.read()
-            
-            # 获取文件扩展名
-            ext = os.path.splitext(file.filename or "video.mp4")[1].lower()
-            if ext not in [".mp4", ".mov", ".avi", ".webm", ".mkv"]:
-                errors.append({"filename": file.filename, "error": "不支持的视频格式"})
-                continue
-            
-            # 上传到OSS
-            filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}{ext}"
-            oss_url = oss_service.upload_bytes(content, f"video_library/{project_id}/{filename}")
-            
-            # 创建视频记录
-            video = VideoItem(
-                project_id=project_id,
-                name=file.filename or "未命名视频",
-                url=oss_url,
-                file_type=ext[1:],
-                file_size=len(content)
-            )
-            
-            storage_service.save_video_item(video)
-            videos.append(video)
-            
-        except Exception as e:
-            errors.append({"filename": file.filename, "error": str(e)})
+    results = await pipeline.run(files, handle_file)
+    
+    videos = [r.item for r in results if r.ok]
+    # 入库后在后台探测参数并生成封面和雪碧图
+    video_ingest_service.schedule([v.id for v in videos])
+    errors = [
+        {"filename": files[r.index].filename, "error": r.error}
+        for r in results if not r.ok
+    ]
     
     return {
         "videos": videos,
@@ -103,52 +119,57 @@ async def upload_video_files(
 
 @router.post("/upload-urls")
 async def upload_video_urls(request: VideoUploadRequest):
-    """通过URL上传视频"""
+    """通过URL上传视频（通过上传流水线并发处理，结果按输入顺序返回）"""
     if not oss_service.is_enabled():
         raise HTTPException(status_code=400, detail="OSS未配置，无法上传文件")
     
-    videos = []
-    errors = []
+    # 保留原始序号（用于匹配名称），跳过空行
+    sources = [(i, url.strip()) for i, url in enumerate(request.urls) if url.strip()]
+    pipeline = UploadPipeline()
+    
+    async def handle_url(_: int, source) -> VideoItem:
+        i, url = source
+        
+        # 从URL下载并上传到OSS
+        ext = os.path.splitext(url.split("?")[0])[1].lower() or ".mp4"
+        if not ext.startswith("."):
+            ext = f".{ext}"
+        
+        # upload_from_url 返回 (success, result)
+        success, oss_url = await pipeline.upload_once(
+            url,
+            oss_service.upload_from_url,
+            url,
+            file_type="video_library",
+            extension=ext[1:],
+            project_id=request.project_id
+        )
+        if not success:
+            raise UploadError(oss_url)
+        
+        # 获取名称
+        name = request.names[i] if request.names and i < len(request.names) else f"视频 {i+1}"
+        
+        # 创建视频记录
+        video = VideoItem(
+            project_id=request.project_id,
+            name=name,
+            url=oss_url,
+            file_type=ext[1:] if ext else "mp4",
+            ingest_status="pending"
+        )
+        
+        await run_blocking(storage_service.save_video_item, video)
+        return video
+    
+    results = await pipeline.run(sources, handle_url)
     
-    for i, url in enumerate(request.urls):
-        url = url.strip()
-        if not url:
-            continue
-            
-        try:
-            # 从URL下载并上传到OSS
-            ext = os.path.splitext(url.split("?")[0])[1].lower() or ".mp4"
-            if not ext.startswith("."):
-                ext = f".{ext}"
-            
-            # upload_from_url 返回 (success, result)
-            success, oss_url = oss_service.upload_from_url(
-                url, 
-                file_type="video_library", 
-                extension=ext[1:],
-                project_id=request.project_id
-            )
-            
-            if not success:
-                errors.append({"url": url, "error": oss_url})
-                continue
-            
-            # 获取名称
-            name = request.names[i] if request.names and i < len(request.names) else f"视频 {i+1}"
-            
-            # 创建视频记录
-            video = VideoItem(
-                project_id=request.project_id,
-                name=name,
-                url=oss_url,
-                file_type=ext[1:] if ext else "mp4"
-            )
-            
-            storage_service.save_video_item(video)
-            videos.append(video)
-            
-        except Exception as e:
-            errors.append({"url": url, "error": str(e)})
+    videos = [r.item for r in results if r.ok]
+    video_ingest_service.schedule([v.id for v in videos])
+    errors = [
+        {"url": sources[r.index][1], "error": r.error}
+        for r in results if not r.ok
+    ]
     
     return {
         "videos": videos,
@@ -158,6 +179,20 @@ async def upload_video_urls(request: VideoUploadRequest):
     }
 
 
+@router.post("/{video_id}/ingest")
+async def ingest_video(video_id: str):
+    """重新探测视频参数并生成封面和雪碧图（等待处理完成；正在处理中时等待进行中的处理）"""
+    if not storage_service.get_video_item(video_id):
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    video = await video_ingest_service.run(video_id)
+    if video is None:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    if video.ingest_status == "failed":
+        raise HTTPException(status_code=500, detail=f"视频预处理失败: {video.ingest_error}")
+    return video
+
+
 @router.put("/{video_id}")
 async def update_video(video_id: str, request: VideoUpdateRequest):
     """更新视频信息"""
@@ -196,11 +231,121 @@ async def delete_all_videos(project_id: str):
     return {"message": f"已删除 {len(videos)} 个视频"}
 
 
+class FrameExtractRequest(BaseModel):
+    """提取视频帧请求"""
+    timestamps: List[float] = []  # 时间点（秒），负数表示距结尾的时间
+    include_last: bool = False  # 是否同时提取尾帧
+    name: Optional[str] = None  # 图库名称前缀（默认使用视频名称）
+
+
+class BatchLastFrameRequest(BaseModel):
+    """批量提取尾帧请求"""
+    video_ids: List[str]
+
+
+def _format_timestamp(timestamp) -> str:
+    """图库名称中的时间点描述"""
+    if timestamp == LAST_FRAME:
+        return "尾帧"
+    if timestamp < 0:
+        return f"倒数{-timestamp:g}秒"
+    return f"{timestamp:g}秒"
+
+
+async def _save_frame(video: VideoItem, frame: ExtractedFrame, name: str, tags: List[str]) -> GalleryImage:
+    """把提取出的帧上传（未启用 OSS 时保存到本地媒体存储）并保存到图库"""
+    if oss_service.is_enabled():
+        filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}.jpg"
+        url = await run_blocking(oss_service.upload_bytes, frame.data, f"gallery/{video.project_id}/{filename}")
+    else:
+        url = media_store.save(frame.data, "jpg")
+    
+    gallery_image = GalleryImage(
+        project_id=video.project_id,
+        name=name,
+        description=f"从视频《{video.name}》提取的{_format_timestamp(frame.timestamp)}画面",
+        url=url,
+        source="video_library",
+        width=frame.width,
+        height=frame.height,
+        tags=tags
+    )
+    await run_blocking(storage_service.save_gallery_image, gallery_image)
+    return gallery_image
+
+
+@router.post("/extract-last-frames")
+async def extract_last_frames(request: BatchLastFrameRequest):
+    """
+    批量提取多个视频的尾帧并保存到图库（用于首尾帧生视频的衔接）
+    
+    各视频并发提取，结果按 video_ids 顺序返回，单个视频失败不影响其他视频
+    """
+    videos = [storage_service.get_video_item(video_id) for video_id in request.video_ids]
+    
+    async def handle(video: Optional[VideoItem]) -> GalleryImage:
+        if video is None:
+            raise FrameExtractError("视频不存在")
+        frame = await frame_extract_service.extract_last_frame(video.url)
+        return await _save_frame(video, frame, f"{video.name}_尾帧", ["尾帧", "视频提取"])
+    
+    results = await asyncio.gather(*[handle(video) for video in videos], return_exceptions=True)
+    
+    images = []
+    errors = []
+    for video_id, result in zip(request.video_ids, results):
+        if isinstance(result, Exception):
+            errors.append({"video_id": video_id, "error": str(result)})
+        else:
+            images.append({"video_id": video_id, "image": result})
+    
+    return {
+        "images": images,
+        "errors": errors,
+        "success_count": len(images),
+        "error_count": len(errors)
+    }
+
+
+@router.post("/{video_id}/extract-frames")
+async def extract_frames(video_id: str, request: FrameExtractRequest):
+    """
+    按时间点提取视频帧并保存到图库
+    
+    远程视频只读取目标时间点附近的数据，多个时间点并发提取，结果按请求顺序返回（尾帧在最后）
+    """
+    video = storage_service.get_video_item(video_id)
+    if not video:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    
+    timestamps = list(request.timestamps)
+    if request.include_last:
+        timestamps.append(LAST_FRAME)
+    if not timestamps:
+        raise HTTPException(status_code=400, detail="请指定要提取的时间点")
+    if len(timestamps) > MAX_FRAMES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"单次最多提取 {MAX_FRAMES_PER_REQUEST} 帧")
+    
+    try:
+        frames = await frame_extract_service.extract(video.url, timestamps)
+    except FrameExtractError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    prefix = request.name or video.name
+    images = await asyncio.gather(*[
+        _save_frame(video, frame, f"{prefix}_{_format_timestamp(frame.timestamp)}", ["视频提取"])
+        for frame in frames
+    ])
+    return {"images": images}
+
+
 @router.post("/{video_id}/extract-last-frame")
 async def extract_last_frame(video_id: str, name: Optional[str] = None):
     """
     提取视频尾帧并保存到图库
     
+    使用 FFmpeg -sseof 直接定位到视频结尾解码，远程视频无需下载完整文件
+    
     Args:
         video_id: 视频ID
         name: 保存到图库的名称（可选，默认使用"视频名称_尾帧"）
@@ -208,93 +353,23 @@ async def extract_last_frame(video_id: str, name: Optional[str] = None):
     Returns:
         保存的图库图片信息
     """
-    # 检查OSS是否启用
-    if not oss_service.is_enabled():
-        raise HTTPException(status_code=400, detail="OSS未启用，请先在设置中配置并启用OSS")
-    
     # 获取视频信息
     video = storage_service.get_video_item(video_id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     
     try:
-        # 下载视频到临时文件
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.get(video.url)
-            if response.status_code != 200:
-                raise HTTPException(status_code=400, detail=f"无法下载视频: HTTP {response.status_code}")
-            
-            video_content = response.content
-        
-        # 创建临时文件保存视频
-        with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp_file:
-            tmp_file.write(video_content)
-            tmp_path = tmp_file.name
-        
-        try:
-            # 使用 OpenCV 提取最后一帧
-            cap = cv2.VideoCapture(tmp_path)
-            
-            if not cap.isOpened():
-                raise HTTPException(status_code=400, detail="无法打开视频文件")
-            
-            # 获取视频总帧数
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            if total_frames <= 0:
-                raise HTTPException(status_code=400, detail="无法获取视频帧数")
-            
-            # 定位到最后一帧
-            cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames - 1)
-            
-            # 读取最后一帧
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret or frame is None:
-                raise HTTPException(status_code=400, detail="无法提取视频尾帧")
-            
-            # 将 BGR 转换为 RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # 编码为 JPEG
-            _, buffer = cv2.imencode('.jpg', cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR), 
-                                     [cv2.IMWRITE_JPEG_QUALITY, 95])
-            image_bytes = buffer.tobytes()
-            
-            # 获取图片尺寸
-            height, width = frame.shape[:2]
-            
-        finally:
-            # 删除临时文件
-            os.unlink(tmp_path)
-        
-        # 上传到 OSS
-        filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}.jpg"
-        oss_url = oss_service.upload_bytes(image_bytes, f"gallery/{video.project_id}/{filename}")
-        
-        # 创建图库图片记录
-        image_name = name or f"{video.name}_尾帧"
-        gallery_image = GalleryImage(
-            project_id=video.project_id,
-            name=image_name,
-            description=f"从视频《{video.name}》提取的尾帧",
-            url=oss_url,
-            source="video_library",
-            width=width,
-            height=height,
-            tags=["尾帧", "视频提取"]
-        )
-        
-        storage_service.save_gallery_image(gallery_image)
-        
-        return {
-            "message": "尾帧已保存到图库",
-            "image": gallery_image
-        }
-        
-    except HTTPException:
-        raise
+        frame = await frame_extract_service.extract_last_frame(video.url)
+    except FrameExtractError as e:
+        raise HTTPException(status_code=400, detail=f"无法提取视频尾帧: {str(e)}")
+    
+    try:
+        gallery_image = await _save_frame(video, frame, name or f"{video.name}_尾帧", ["尾帧", "视频提取"])
     except Exception as e:
         print(f"[视频尾帧提取] 错误: {e}")
         raise HTTPException(status_code=500, detail=f"提取尾帧失败: {str(e)}")
-
+    
+    return {
+        "message": "尾帧已保存到图库",
+        "image": gallery_image
+    }
@@ -11,6 +11,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
+import logging
 
 from app.models.media import VideoStudioTask
 from app.services.storage import storage_service
@@ -19,8 +20,11 @@ from app.services.dashscope.reference_to_video import ReferenceToVideoService
 from app.services.dashscope.text_to_video import TextToVideoService
 from app.services.dashscope.keyframe_to_video import KeyframeToVideoService
 from app.services.oss import oss_service
+from app.services.task_tracker import task_tracker
+from app.logger import log_debug
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 class VideoStudioTaskCreateRequest(BaseModel):
@@ -320,24 +324,17 @@ async def create_task(request: VideoStudioTaskCreateRequest):
         raise HTTPException(status_code=500, detail=f"创建任务失败: {str(e)}")
 
 
-@router.get("/{task_id}/status")
-async def get_task_status(task_id: str):
-    """查询任务状态"""
-    print(f"\n[视频工作室状态查询] task_id: {task_id}")
+@task_tracker.refresher("video_studio")
+async def refresh_studio_task(task_id: str, entry: dict) -> bool:
+    """
+    查询视频工作室任务的所有子任务并写回记录（后台轮询与状态查询接口共用）
     
+    Returns:
+        任务是否已结束
+    """
     task = storage_service.get_video_studio_task(task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
-    print(f"[视频工作室状态查询] 任务名: {task.name}")
-    print(f"[视频工作室状态查询] 任务类型: {getattr(task, 'task_type', 'image_to_video')}")
-    print(f"[视频工作室状态查询] 模型: {task.model}")
-    print(f"[视频工作室状态查询] 当前状态: {task.status}")
-    print(f"[视频工作室状态查询] API任务IDs: {task.task_ids}")
-    
-    if task.status != "processing":
-        print(f"[视频工作室状态查询] 任务已完成，无需轮询")
-        return {"task": task}
+    if not task or task.status != "processing":
+        return True
     
     all_succeeded = True
     all_finished = True
@@ -347,21 +344,17 @@ async def get_task_status(task_id: str):
     task_type = getattr(task, 'task_type', 'image_to_video')
     
     for api_task_id in task.task_ids:
-        print(f"\n[视频工作室状态查询] 查询子任务: {api_task_id}")
         try:
             if task_type == "reference_to_video" or task.model == "wan2.6-r2v":
                 # 参考生视频任务使用 HTTP 查询
-                print(f"[视频工作室状态查询] 使用 参考生视频服务 (HTTP)")
                 r2v_service = ReferenceToVideoService()
                 status, video_url = await r2v_service.get_task_status(api_task_id, task.project_id)
             elif task_type == "text_to_video":
                 # 文生视频任务使用 HTTP 查询
-                print(f"[视频工作室状态查询] 使用 文生视频服务 (HTTP)")
                 t2v_service = TextToVideoService()
                 status, video_url = await t2v_service.get_task_status(api_task_id, task.project_id)
             elif task_type == "keyframe_to_video":
                 # 首尾帧生视频任务使用 HTTP 查询
-                print(f"[视频工作室状态查询] 使用 首尾帧生视频服务 (HTTP)")
                 kf2v_service = KeyframeToVideoService()
                 status, video_url = await kf2v_service.get_task_status(api_task_id, task.project_id)
             else:
@@ -369,22 +362,19 @@ async def get_task_status(task_id: str):
                 i2v_service = ImageToVideoService()
                 # wan2.6-i2v 模型也使用 HTTP 查询
                 use_http = 'wan2.6' in task.model
-                print(f"[视频工作室状态查询] 使用 图生视频服务 (HTTP={use_http})")
                 status, video_url = await i2v_service.get_task_status(api_task_id, task.project_id, use_http=use_http)
             
-            print(f"[视频工作室状态查询] 子任务 {api_task_id} 状态: {status}")
+            log_debug(logger, "[视频工作室状态查询] 子任务", task_id=task.id, api_task_id=api_task_id, task_type=task_type, status=status)
             
             if status == "SUCCEEDED" and video_url:
                 # 注意：服务层已经处理了 OSS 上传（传入了 task.project_id）
                 # 这里不需要重复上传
                 video_urls.append(video_url)
-                print(f"[视频工作室状态查询] 子任务成功，视频URL已获取")
             elif status == "FAILED":
                 all_succeeded = False
-                print(f"[视频工作室状态查询] 子任务失败")
+                print(f"[视频工作室状态查询] 子任务 {api_task_id} 失败")
             elif status in ["PENDING", "RUNNING"]:
                 all_finished = False
-                print(f"[视频工作室状态查询] 子任务进行中")
                 
         except Exception as e:
             all_succeeded = False
@@ -404,11 +394,34 @@ async def get_task_status(task_id: str):
                 task.error_message = "部分视频生成失败"
             print(f"[视频工作室状态查询] 任务失败: {task.error_message}")
     else:
-        print(f"[视频工作室状态查询] 任务进行中，已完成 {len(video_urls)}/{len(task.task_ids)}")
+        log_debug(logger, "[视频工作室状态查询] 任务进行中", task_id=task.id, done=len(video_urls), total=len(task.task_ids))
     
     task.updated_at = datetime.now()
     storage_service.save_video_studio_task(task)
     
+    return task.status != "processing"
+
+
+@router.get("/{task_id}/status")
+async def get_task_status(task_id: str):
+    """查询任务状态"""
+    task = storage_service.get_video_studio_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    log_debug(
+        logger, "[视频工作室状态查询]",
+        task_id=task_id, name=task.name, task_type=getattr(task, 'task_type', 'image_to_video'),
+        model=task.model, status=task.status, api_task_ids=task.task_ids
+    )
+    
+    if task.status != "processing":
+        return {"task": task}
+    
+    # 与后台轮询共用同一次查询
+    await task_tracker.refresh("video_studio", task_id)
+    task = storage_service.get_video_studio_task(task_id) or task
+    
     return {"task": task}
 
 
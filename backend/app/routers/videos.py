@@ -8,16 +8,25 @@ from typing import Optional, List
 
 from app.models.video import Video, VideoTask, TaskStatus
 from app.models.media import VideoItem
+from app.models.job import Job
 from app.services.storage import storage_service
 from app.services.dashscope.image_to_video import ImageToVideoService
 from app.services.video_concat import video_concat_service
+from app.services.video_ingest import video_ingest_service
 from app.services.oss import oss_service
+from app.services.media_store import media_store
+from app.services.job_queue import job_queue, JobContext
+from app.services.task_tracker import task_tracker
 from app.config import get_config
+from app.logger import log_debug
 from datetime import datetime
+import asyncio
+import logging
 import uuid
 import os
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 class VideoGenerateRequest(BaseModel):
@@ -301,50 +310,71 @@ async def generate_videos_batch(request: VideoBatchGenerateRequest):
     }
 
 
+def _apply_video_status(video: Video, status: str, video_url: Optional[str]):
+    """把 DashScope 任务状态写回视频记录，成功时同步更新分镜的视频URL"""
+    if status == "SUCCEEDED":
+        video.task.status = TaskStatus.SUCCEEDED
+        # 服务层已经处理了 OSS 上传
+        video.video_url = video_url
+        print(f"[状态查询API] 视频生成成功！正在更新数据库...")
+        
+        # 更新分镜的视频URL
+        project = storage_service.get_project(video.project_id)
+        if project and project.script:
+            for shot in project.script.shots:
+                if shot.id == video.shot_id:
+                    shot.video_url = video_url
+                    break
+            storage_service.save_project(project)
+            
+    elif status == "FAILED":
+        video.task.status = TaskStatus.FAILED
+        print(f"[状态查询API] 视频生成失败")
+    elif status == "PROCESSING":
+        video.task.status = TaskStatus.PROCESSING
+    
+    storage_service.save_video(video)
+
+
+@task_tracker.refresher("video")
+async def refresh_video_task(video_id: str, entry: dict) -> bool:
+    """
+    查询视频生成任务并写回记录（后台轮询与状态查询接口共用）
+    
+    Returns:
+        任务是否已结束
+    """
+    video = storage_service.get_video(video_id)
+    if not video or not video.task or not video.task.task_id:
+        return True
+    if video.task.status in (TaskStatus.SUCCEEDED, TaskStatus.FAILED):
+        return True
+    
+    i2v_service = ImageToVideoService()
+    # 传入 project_id，服务层会自动处理 OSS 上传
+    status, video_url = await i2v_service.get_task_status(video.task.task_id, project_id=video.project_id)
+    _apply_video_status(video, status, video_url)
+    return status in ("SUCCEEDED", "FAILED")
+
+
 @router.get("/status/{task_id}")
 async def get_video_status(task_id: str):
     """查询视频生成状态"""
-    print(f"\n[状态查询API] task_id: {task_id}")
-    
-    i2v_service = ImageToVideoService()
-    
     # 先获取视频记录以获取 project_id
     video = storage_service.get_video_by_task(task_id)
-    project_id = video.project_id if video else ""
     
     try:
-        # 传入 project_id，服务层会自动处理 OSS 上传
-        status, video_url = await i2v_service.get_task_status(task_id, project_id=project_id)
-        
-        print(f"[状态查询API] 返回状态: {status}")
-        if video_url:
-            print(f"[状态查询API] 视频URL: {video_url[:100]}...")
-        
-        # 更新数据库中的视频记录
         if video and video.task:
-            if status == "SUCCEEDED":
-                video.task.status = TaskStatus.SUCCEEDED
-                # 服务层已经处理了 OSS 上传
-                video.video_url = video_url
-                print(f"[状态查询API] 视频生成成功！正在更新数据库...")
-                
-                # 更新分镜的视频URL
-                project = storage_service.get_project(video.project_id)
-                if project and project.script:
-                    for shot in project.script.shots:
-                        if shot.id == video.shot_id:
-                            shot.video_url = video_url
-                            break
-                    storage_service.save_project(project)
-                    
-            elif status == "FAILED":
-                video.task.status = TaskStatus.FAILED
-                print(f"[状态查询API] 视频生成失败")
-            elif status == "PROCESSING":
-                video.task.status = TaskStatus.PROCESSING
-                print(f"[状态查询API] 视频正在生成中...")
-            
-            storage_service.save_video(video)
+            # 与后台轮询共用同一次查询；已结束的任务直接返回保存的结果
+            await task_tracker.refresh("video", video.id)
+            video = storage_service.get_video(video.id) or video
+            status = video.task.status.value.upper()
+            video_url = video.video_url
+        else:
+            i2v_service = ImageToVideoService()
+            status, video_url = await i2v_service.get_task_status(task_id)
+        
+        log_debug(logger, "[状态查询API]", task_id=task_id, status=status, video_url=video_url)
         
         return {
             "task_id": task_id,
@@ -359,7 +389,7 @@ async def get_video_status(task_id: str):
 @router.get("")
 async def list_videos(project_id: str):
     """获取项目所有视频"""
-    videos = storage_service.get_videos_by_project(project_id)
+    videos = await storage_service.get_videos_by_project_async(project_id)
     return {"videos": videos}
 
 
@@ -499,13 +529,6 @@ async def export_video(request: VideoExportRequest):
             detail="FFmpeg 未安装，无法导出视频。请在服务器上安装 FFmpeg。"
         )
     
-    # 检查 OSS 是否可用
-    if not oss_service.is_enabled():
-        raise HTTPException(
-            status_code=500,
-            detail="OSS 未配置，无法保存导出的视频。请先配置 OSS。"
-        )
-    
     # 获取项目
     project = storage_service.get_project(request.project_id)
     if not project:
@@ -538,54 +561,82 @@ async def export_video(request: VideoExportRequest):
         warning = f"以下分镜缺少视频，将被跳过: {missing_shots}"
         print(f"[视频导出] 警告: {warning}")
     
+    job = job_queue.submit(
+        "video_export",
+        {"video_urls": video_urls, "warning": warning, "name": request.name},
+        project_id=request.project_id
+    )
+    return {"message": "导出任务已提交", "job_id": job.id, "job": job}
+
+
+@job_queue.handler("video_export")
+async def run_video_export(job: Job, ctx: JobContext) -> dict:
+    """
+    后台执行视频导出：拼接、上传并保存到视频库
+    返回值与原同步导出接口一致
+    """
+    project = storage_service.get_project(job.project_id)
+    if not project:
+        raise Exception("项目不存在")
+    video_urls = job.params["video_urls"]
+    warning = job.params.get("warning")
+    
     print(f"\n{'='*60}")
     print(f"开始导出视频")
     print(f"{'='*60}")
     print(f"项目: {project.name}")
-    print(f"总分镜数: {len(sorted_shots)}")
     print(f"有视频的分镜数: {len(video_urls)}")
     print(f"{'='*60}\n")
     
     # 拼接视频
-    success, result = await video_concat_service.concat_videos(video_urls)
+    ctx.report(0.1, "拼接视频")
+    timings = {}
+    success, result = await video_concat_service.concat_videos(video_urls, timings=timings)
     
     if not success:
-        raise HTTPException(status_code=500, detail=f"视频拼接失败: {result}")
+        raise Exception(f"视频拼接失败: {result}")
     
     output_path = result
     
     try:
+        ctx.report(0.8, "上传视频")
         # 读取拼接后的视频文件
         with open(output_path, 'rb') as f:
             video_content = f.read()
         
-        # 上传到 OSS
-        timestamp = datetime.now().strftime('%Y%m%d/%H%M%S')
-        filename = f"export/{request.project_id}/{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
-        oss_url = oss_service.upload_bytes(video_content, filename)
+        # 上传到 OSS（未启用 OSS 时保存到本地媒体存储）
+        if oss_service.is_enabled():
+            timestamp = datetime.now().strftime('%Y%m%d/%H%M%S')
+            filename = f"export/{job.project_id}/{timestamp}_{uuid.uuid4().hex[:8]}.mp4"
+            oss_url = await asyncio.to_thread(oss_service.upload_bytes, video_content, filename)
+        else:
+            oss_url = media_store.save(video_content, "mp4")
         
         if not oss_url:
-            raise HTTPException(status_code=500, detail="上传到 OSS 失败")
+            raise Exception("上传到 OSS 失败")
         
         # 保存到视频库
-        video_name = request.name or f"{project.name}_导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        video_name = job.params.get("name") or f"{project.name}_导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         video_item = VideoItem(
-            project_id=request.project_id,
+            project_id=job.project_id,
             name=video_name,
             url=oss_url,
             file_type="mp4",
             file_size=len(video_content),
-            description=f"由 {len(video_urls)} 个分镜视频拼接导出"
+            description=f"由 {len(video_urls)} 个分镜视频拼接导出",
+            ingest_status="pending"
         )
         
         storage_service.save_video_item(video_item)
+        # 在后台生成封面和雪碧图（上传时已写入本地缓存，无需重新下载）
+        video_ingest_service.schedule([video_item.id])
         
         print(f"\n{'='*60}")
         print(f"视频导出成功!")
         print(f"{'='*60}")
         print(f"视频名称: {video_name}")
         print(f"视频大小: {len(video_content) / 1024 / 1024:.2f} MB")
-        print(f"OSS URL: {oss_url[:80]}...")
+        print(f"视频 URL: {oss_url[:80]}...")
         print(f"{'='*60}\n")
         
         return {
@@ -593,7 +644,8 @@ async def export_video(request: VideoExportRequest):
             "video": video_item,
             "url": oss_url,
             "shot_count": len(video_urls),
-            "warning": warning
+            "warning": warning,
+            "timings": timings
         }
         
     finally:
@@ -0,0 +1,161 @@
+"""
+日志写入对请求延迟的影响测试脚本
+
+模拟前端轮询视频任务状态：每个请求等待 10ms（查询 DashScope）后解析一份任务查询响应并输出日志，
+并发请求下统计延迟分位数和吞吐量（写日志阻塞事件循环的时间会叠加到同时进行的其他请求上）。
+依次比较三种配置：
+1. 同步写入 + 每次轮询打印完整响应（调整前：print 在事件循环上直接写终端和日志文件）
+2. 后台线程写入 + 每次轮询打印完整响应
+3. 后台线程写入 + 详细响应改为调试级日志（调整后的默认配置）
+
+终端输出写入临时文件，日志文件写入临时目录，不影响 backend/logs。
+
+运行方式:
+    cd backend
+    python -m app.services.benchmark_logging [请求数] [并发数]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+from fastapi import FastAPI
+
+from app import logger as app_logger
+from app.logger import PrintLogger, setup_logging, log_debug
+
+# 一次任务查询响应（与 DashScope 返回的结构相同）
+TASK_RESULT = {
+    "request_id": "7f2c1a8e-5b3d-9c4e-a1f0-2d6b8e9c3a71",
+    "output": {
+        "task_id": "0385dc79-5ff8-4d82-bcb6-xxxxxx",
+        "task_status": "RUNNING",
+        "submit_time": "2025-01-08 16:03:59.840",
+        "scheduled_time": "2025-01-08 16:03:59.863",
+        "orig_prompt": "一只小猫在月光下奔跑，" * 20,
+        "actual_prompt": "一只橘色小猫在洒满月光的石板路上奔跑，毛发随风飘动，" * 20,
+        "video_url": "https://dashscope-result-sh.oss-cn-shanghai.aliyuncs.com/xxx.mp4?" + "x" * 300
+    },
+    "usage": {"video_duration": 5, "video_ratio": "1280*720", "video_count": 1}
+}
+
+bench_logger = logging.getLogger("benchmark")
+
+
+def create_app(verbose: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/status/{task_id}")
+    async def status(task_id: str):
+        # 模拟查询 DashScope 的网络等待，让并发请求交错执行
+        await asyncio.sleep(0.01)
+        result = json.loads(json.dumps(TASK_RESULT))
+        output = result["output"]
+        if verbose:
+            # 调整前的输出方式
+            print(f"\n[HTTP 状态查询] task_id: {task_id}")
+            print(f"[HTTP 状态查询] status_code: 200")
+            print(f"[HTTP 状态查询] request_id: {result['request_id']}")
+            print(f"[HTTP 状态查询] task_status: {output['task_status']}")
+            print(f"[HTTP 状态查询] video_url: {output['video_url'][:100]}...")
+            print(f"[HTTP 状态查询] orig_prompt: {output['orig_prompt'][:100]}...")
+            print(f"[HTTP 状态查询] usage: {json.dumps(result['usage'], ensure_ascii=False)}")
+            print(f"[HTTP 状态查询] 完整响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
+        else:
+            log_debug(
+                bench_logger, "[HTTP 状态查询]",
+                task_id=task_id, status_code=200,
+                request_id=result["request_id"], output=output, usage=result["usage"]
+            )
+        return {"task_id": task_id, "status": output["task_status"]}
+
+    return app
+
+
+async def run_load(app: FastAPI, total: int, concurrency: int) -> dict:
+    latencies = []
+    remaining = iter(range(total))
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for index in remaining:
+                started = time.perf_counter()
+                response = await client.get(f"/status/task-{index}")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "rps": total / elapsed,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+def run_case(work_dir: Path, name: str, use_queue: bool, verbose: bool, total: int, concurrency: int) -> dict:
+    original_stdout = sys.stdout
+    case_dir = work_dir / name
+    case_dir.mkdir()
+    app_logger.LOG_FILE = case_dir / "api.log"
+    console = open(case_dir / "console.log", "w", encoding="utf-8")
+    sys.stdout = PrintLogger(logging.getLogger("print"), console)
+    try:
+        setup_logging(logging.INFO, use_queue=use_queue)
+        result = asyncio.run(run_load(create_app(verbose), total, concurrency))
+    finally:
+        app_logger._stop_listener()
+        logging.getLogger().handlers.clear()
+        sys.stdout = original_stdout
+        console.close()
+    result["log_bytes"] = sum(f.stat().st_size for f in case_dir.iterdir())
+    return result
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print("=" * 60)
+    print(f"日志写入延迟测试（{total} 个请求，并发 {concurrency}）")
+    print("=" * 60)
+
+    cases = [
+        ("sync_verbose", "同步写入 + 打印完整响应（调整前）", False, True),
+        ("queue_verbose", "后台线程写入 + 打印完整响应", True, True),
+        ("queue_debug", "后台线程写入 + 调试级日志（调整后）", True, False),
+    ]
+    work_dir = Path(tempfile.mkdtemp(prefix="logging_bench_"))
+    try:
+        for name, label, use_queue, verbose in cases:
+            result = run_case(work_dir, name, use_queue, verbose, total, concurrency)
+            print(f"\n{label}")
+            print(f"  吞吐: {result['rps']:.0f} 请求/秒")
+            print(f"  延迟: p50 {result['p50']:.2f}ms, p95 {result['p95']:.2f}ms, p99 {result['p99']:.2f}ms")
+            print(f"  日志量: {result['log_bytes'] / 1024 / 1024:.1f} MB")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
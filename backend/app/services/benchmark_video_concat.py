@@ -0,0 +1,139 @@
+"""
+视频拼接性能测试脚本
+
+使用 FFmpeg testsrc 在本地生成测试视频，对比：
+1. 全部转码（旧流程）
+2. 参数一致时直接流复制（快速路径）
+3. 混合参数时只转码不一致的视频
+4. 修改一个分镜后重新导出（命中片段缓存）
+
+运行方式:
+    cd backend
+    python -m app.services.benchmark_video_concat [视频数量] [每段时长秒]
+"""
+
+import sys
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+import subprocess
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.services import video_concat
+from app.services.video_concat import VideoConcatService, ClipSpec
+from app.services.clip_cache import ClipCache
+
+
+def make_clip(path: str, duration: int, size: str = "1280x720", fps: int = 30, audio: bool = True):
+    """用 testsrc + sine 生成测试视频"""
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size={size}:rate={fps}',
+    ]
+    if audio:
+        cmd += ['-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}:sample_rate=48000']
+    cmd += ['-c:v', 'libx264', '-preset', 'ultrafast', '-pix_fmt', 'yuv420p']
+    if audio:
+        cmd += ['-c:a', 'aac', '-ac', '2', '-shortest']
+    cmd.append(path)
+    subprocess.run(cmd, check=True)
+
+
+class LocalConcatService(VideoConcatService):
+    """测试用：从本地路径“下载”"""
+
+    async def download_video(self, url: str, output_path: str) -> bool:
+        shutil.copyfile(url, output_path)
+        return True
+
+
+class AlwaysNormalizeService(LocalConcatService):
+    """测试用：模拟旧流程，所有视频都转码"""
+
+    def plan_normalization(self, specs):
+        target = self.default_target(specs[0] if specs else None)
+        return target, [True] * len(specs)
+
+
+async def run_case(name: str, service: VideoConcatService, clips: list) -> float:
+    timings = {}
+    started = time.perf_counter()
+    success, result = await service.concat_videos(clips, timings=timings)
+    elapsed = time.perf_counter() - started
+    if not success:
+        print(f"  ❌ {name}: {result}")
+        return elapsed
+
+    info = await service.get_video_info(result)
+    duration = float(info.get('format', {}).get('duration', 0))
+    print(f"  ✅ {name}: {elapsed:.2f}s, 输出时长 {duration:.2f}s, 转码 {timings.get('normalized', '-')} 个")
+    print(f"     阶段耗时: {timings}")
+    shutil.rmtree(os.path.dirname(result), ignore_errors=True)
+    return elapsed
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    duration = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    print("=" * 60)
+    print(f"视频拼接性能测试（{count} 段 x {duration}s）")
+    print("=" * 60)
+
+    if not VideoConcatService().check_ffmpeg():
+        print("FFmpeg 不可用，跳过测试")
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="concat_bench_")
+    # 使用独立的片段缓存，避免影响正式数据
+    video_concat.clip_cache = ClipCache(os.path.join(work_dir, "clip_cache"))
+    try:
+        print("\n🎬 生成测试视频...")
+        uniform = []
+        for i in range(count):
+            path = os.path.join(work_dir, f"uniform_{i}.mp4")
+            make_clip(path, duration)
+            uniform.append(path)
+
+        # 混合：替换两段为不同分辨率/无音频
+        mixed = list(uniform)
+        odd_size = os.path.join(work_dir, "odd_size.mp4")
+        make_clip(odd_size, duration, size="960x540", fps=24)
+        no_audio = os.path.join(work_dir, "no_audio.mp4")
+        make_clip(no_audio, duration, audio=False)
+        mixed[1 % count] = odd_size
+        if count > 2:
+            mixed[2] = no_audio
+
+        spec = ClipSpec.from_probe(await LocalConcatService().get_video_info(uniform[0]))
+        print(f"  测试视频参数: {spec}")
+
+        print("\n⏱  测试结果:")
+        baseline = await run_case("全部转码", AlwaysNormalizeService(), uniform)
+        fast = await run_case("参数一致（流复制）", LocalConcatService(), uniform)
+        await run_case("混合参数（部分转码）", LocalConcatService(), mixed)
+
+        # 修改一个分镜后重新导出：只有新分镜需要转码
+        changed = list(mixed)
+        changed_clip = os.path.join(work_dir, "changed.mp4")
+        make_clip(changed_clip, duration, size="960x540", fps=24)
+        changed[-1] = changed_clip
+        await run_case("修改一个分镜后重新导出", LocalConcatService(), changed)
+
+        if fast > 0:
+            print(f"\n📈 快速路径加速: {baseline / fast:.1f}x")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 测试完成!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,155 @@
+"""
+多进程部署吞吐测试脚本
+
+把后端代码复制到临时目录（数据目录互不影响），依次以 1..N 个 worker 进程启动 uvicorn，
+并发请求以下接口，统计每秒请求数和延迟（p50 / p99）：
+1. GET /api/health（不需要认证）
+2. GET /api/projects（需要认证：会话校验 + 用户存储 + 配置）
+
+每轮启动后先注册用户并建一个项目；请求不复用连接，会落到不同 worker 上，
+全部成功即说明会话和数据在进程间可见。
+
+运行方式:
+    cd backend
+    python -m app.services.benchmark_workers [最大worker数] [每项测试秒数] [并发数]
+"""
+
+import sys
+import os
+import time
+import shutil
+import socket
+import asyncio
+import tempfile
+import subprocess
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(work_dir: Path, port: int, workers: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=str(work_dir),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"}
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+def percentile(latencies: list, p: float) -> float:
+    """延迟分位数（毫秒）"""
+    if not latencies:
+        return 0.0
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+
+
+async def load(base_url: str, path: str, headers: dict, seconds: float, concurrency: int) -> tuple:
+    """并发请求 seconds 秒，返回 (请求数, 失败数, 各请求耗时)"""
+    done = 0
+    failed = 0
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    # 不复用连接，请求由不同 worker 处理
+    limits = httpx.Limits(max_keepalive_connections=0)
+
+    async def run():
+        nonlocal done, failed
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    resp = await client.get(path, headers=headers)
+                    if resp.status_code != 200:
+                        failed += 1
+                except httpx.HTTPError:
+                    failed += 1
+                latencies.append(time.perf_counter() - started)
+                done += 1
+
+    await asyncio.gather(*[run() for _ in range(concurrency)])
+    return done, failed, latencies
+
+
+async def bench(work_dir: Path, workers: int, seconds: float, concurrency: int) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    proc = start_server(work_dir, port, workers)
+    try:
+        await wait_ready(base_url)
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            username = f"bench{workers}"
+            resp = await client.post("/api/auth/register", json={"username": username, "password": "bench123"})
+            resp.raise_for_status()
+            headers = {"Authorization": f"Bearer {resp.json()['token']}"}
+            (await client.post("/api/projects", json={"name": "bench"}, headers=headers)).raise_for_status()
+
+        results = {}
+        for name, path, hdrs in [("health", "/api/health", {}), ("projects", "/api/projects", headers)]:
+            started = time.perf_counter()
+            done, failed, latencies = await load(base_url, path, hdrs, seconds, concurrency)
+            results[name] = {
+                "rps": done / (time.perf_counter() - started),
+                "p50": percentile(latencies, 0.50),
+                "p99": percentile(latencies, 0.99),
+                "failed": failed
+            }
+        return results
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    print("=" * 60)
+    print(f"多进程吞吐测试：1..{max_workers} 个 worker，每项 {seconds:.0f}s，并发 {concurrency}（CPU {os.cpu_count()} 核）")
+    print("=" * 60)
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="benchmark_workers_"))
+    work_dir = tmp_dir / "backend"
+    shutil.copytree(BACKEND_DIR / "app", work_dir / "app", ignore=shutil.ignore_patterns("__pycache__"))
+    try:
+        print(f"\n{'workers':>8} {'接口':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'失败':>6}")
+        for workers in range(1, max_workers + 1):
+            results = await bench(work_dir, workers, seconds, concurrency)
+            for name, result in results.items():
+                print(
+                    f"{workers:>8} {name:>10} {result['rps']:>8.0f} "
+                    f"{result['p50']:>8.1f} {result['p99']:>8.1f} {result['failed']:>6}"
+                )
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,166 @@
+"""
+标准化视频片段缓存
+保存视频拼接过程中的探测结果和转码后的片段，重复导出时只需处理有变化的分镜
+
+- 探测结果：按源 URL 缓存 ffprobe 输出，未变化的分镜无需下载即可确定参数
+- 转码片段：按 源 URL + 标准化参数 缓存，按总大小做 LRU 淘汰；
+  总大小用计数维护（首次写入时扫描一次），超过上限时才扫描目录按最近使用时间淘汰到
+  上限的 EVICT_TARGET_RATIO，并校准计数
+
+源 URL 对应的内容不会变化（OSS 对象键和本地媒体存储路径都包含时间戳/内容哈希），
+因此直接以 URL 作为源标识
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.services.shared_state import SharedJsonFile
+
+# 转码片段缓存总大小上限（字节）
+MAX_CLIP_CACHE_BYTES = 5 * 1024 * 1024 * 1024
+# 淘汰时降到上限的比例（留出余量，缓存满后不会每次写入都扫描目录）
+EVICT_TARGET_RATIO = 0.9
+# 探测结果缓存条数上限
+MAX_PROBE_ENTRIES = 5000
+# 标准化算法版本，修改 normalize_video 的编码参数时递增，使旧缓存失效
+NORMALIZE_VERSION = 1
+
+
+class ClipCache:
+    """标准化视频片段缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = MAX_CLIP_CACHE_BYTES):
+        if cache_dir is None:
+            self.cache_dir = Path(__file__).parent.parent.parent / "data" / "cache" / "clips"
+        else:
+            self.cache_dir = Path(cache_dir)
+        self.probe_file = self.cache_dir / "probe_index.json"
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # 转码片段总大小（None 表示尚未扫描）；其他进程的写入和淘汰在下次扫描时校准
+        self._total_bytes: Optional[int] = None
+        # 多个 worker 进程共享探测结果
+        self._probes = SharedJsonFile(self.probe_file)
+
+    # ========== 探测结果 ==========
+
+    def get_probe(self, url: str) -> Optional[dict]:
+        """获取 URL 对应视频的探测结果"""
+        entry = self._probes.read().get(url)
+        return entry.get("info") if entry else None
+
+    def put_probe(self, url: str, info: dict):
+        """保存探测结果"""
+        if not info or url.startswith("data:"):
+            return
+
+        def mutate(probes: Dict[str, dict]):
+            probes[url] = {"info": info, "time": time.time()}
+            # 超出上限时删除最早的记录
+            if len(probes) > MAX_PROBE_ENTRIES:
+                oldest = sorted(probes.items(), key=lambda kv: kv[1].get("time", 0))
+                for key, _ in oldest[:len(probes) - MAX_PROBE_ENTRIES]:
+                    probes.pop(key, None)
+        try:
+            self._probes.update(mutate)
+        except Exception as e:
+            print(f"[片段缓存] 保存探测缓存失败: {e}")
+
+    # ========== 转码片段 ==========
+
+    @staticmethod
+    def _key(url: str, params: str) -> str:
+        raw = f"v{NORMALIZE_VERSION}|{url}|{params}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.mp4"
+
+    def get_normalized(self, url: str, params: str, dest_path: str) -> bool:
+        """
+        把缓存的转码片段放到 dest_path（优先硬链接，避免复制大文件）
+
+        Returns:
+            是否命中缓存
+        """
+        path = self._path(self._key(url, params))
+        with self._lock:
+            if not path.exists():
+                return False
+            try:
+                os.utime(path, None)  # 标记为最近使用
+                try:
+                    os.link(path, dest_path)
+                except OSError:
+                    shutil.copyfile(path, dest_path)
+                return True
+            except OSError as e:
+                print(f"[片段缓存] 读取缓存失败: {e}")
+                return False
+
+    def put_normalized(self, url: str, params: str, src_path: str):
+        """保存转码片段"""
+        if url.startswith("data:"):
+            return
+        path = self._path(self._key(url, params))
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan()[1]
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                replaced = path.stat().st_size if path.exists() else 0
+                tmp = path.with_name(path.name + ".tmp")
+                try:
+                    os.link(src_path, tmp)
+                except OSError:
+                    shutil.copyfile(src_path, tmp)
+                os.replace(tmp, path)
+                self._total_bytes += path.stat().st_size - replaced
+            except OSError as e:
+                print(f"[片段缓存] 写入缓存失败: {e}")
+                return
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self) -> tuple:
+        """扫描缓存目录，返回 ([(修改时间, 大小, 路径)], 总大小)"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*/*.mp4"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return entries, total
+
+    def _evict(self):
+        """超出大小上限时按最近使用时间淘汰（重新扫描目录，同时校准总大小计数）"""
+        entries, total = self._scan()
+        self._total_bytes = total
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        self._total_bytes = total
+        print(f"[片段缓存] 淘汰 {removed} 个片段，当前 {total / 1024 / 1024:.1f} MB")
+
+
+# 全局片段缓存实例
+clip_cache = ClipCache()
@@ -0,0 +1,148 @@
+"""
+DashScope 共享异步 HTTP 客户端
+复用连接池（keep-alive），避免每次请求重新建立 TLS 连接，且不阻塞事件循环
+
+注意：httpx.AsyncClient 绑定创建时的事件循环，因此按事件循环分别缓存
+
+请求指标：instrument_dashscope_requests() 在 httpx 传输层和 requests（DashScope SDK 使用）
+上统计所有发往 DashScope 的请求，按模型和接口记录耗时与错误，并记录为链路追踪 span，
+不需要逐个修改调用处
+"""
+
+import asyncio
+import re
+import time
+import weakref
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+import requests
+
+from app.services.metrics import metrics, user_labels
+from app.services.tracing import span
+
+# 连接池上限
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+# 默认超时（单次请求可通过 timeout 参数覆盖）
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环的共享客户端"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_http_client():
+    """关闭当前事件循环的共享客户端（应用关闭时调用）"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+# ========== 请求指标 ==========
+
+DASHSCOPE_SECONDS = metrics.histogram(
+    "dashscope_request_duration_seconds",
+    "DashScope 请求耗时（到响应头返回为止）",
+    ["model", "endpoint"] + user_labels()
+)
+DASHSCOPE_ERRORS = metrics.counter(
+    "dashscope_request_errors_total",
+    "DashScope 请求错误数（code 为 HTTP 状态码或异常类型）",
+    ["model", "endpoint", "code"] + user_labels()
+)
+
+_MODEL_PATTERN = re.compile(rb'"model"\s*:\s*"([^"]{1,100})"')
+_TASK_PATH_PATTERN = re.compile(r"/tasks/[^/]+")
+_instrumented = False
+
+
+def _is_dashscope(host: Optional[str]) -> bool:
+    return bool(host) and "dashscope" in host
+
+
+def _endpoint(path: str) -> str:
+    """接口路径（任务查询的 task_id 替换为占位符）"""
+    return _TASK_PATH_PATTERN.sub("/tasks/{task_id}", path)
+
+
+def _model(body) -> str:
+    """从请求体中取模型名（任务查询等 GET 请求没有请求体，记为空）"""
+    if isinstance(body, str):
+        body = body.encode("utf-8", errors="ignore")
+    if not isinstance(body, (bytes, bytearray)):
+        return ""
+    match = _MODEL_PATTERN.search(body)
+    return match.group(1).decode("utf-8", errors="ignore") if match else ""
+
+
+def _record(model: str, endpoint: str, started: float, code: Optional[str]):
+    DASHSCOPE_SECONDS.observe(time.perf_counter() - started, model=model, endpoint=endpoint)
+    if code is not None:
+        DASHSCOPE_ERRORS.inc(model=model, endpoint=endpoint, code=code)
+
+
+def instrument_dashscope_requests():
+    """统计发往 DashScope 的 HTTP 请求（应用启动时调用一次）"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    
+    original_handle = httpx.AsyncHTTPTransport.handle_async_request
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not _is_dashscope(request.url.host):
+            return await original_handle(self, request)
+        try:
+            body = request.content
+        except httpx.RequestNotRead:
+            body = None
+        model, endpoint = _model(body), _endpoint(request.url.path)
+        started = time.perf_counter()
+        with span("dashscope", method=request.method, endpoint=endpoint, model=model) as attrs:
+            try:
+                response = await original_handle(self, request)
+            except Exception as e:
+                _record(model, endpoint, started, type(e).__name__)
+                raise
+            attrs["status"] = response.status_code
+        _record(model, endpoint, started, str(response.status_code) if response.status_code >= 400 else None)
+        return response
+    
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+    
+    original_send = requests.Session.send
+    
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        parsed = urlparse(request.url or "")
+        if not _is_dashscope(parsed.hostname):
+            return original_send(self, request, **kwargs)
+        model, endpoint = _model(request.body), _endpoint(parsed.path)
+        started = time.perf_counter()
+        with span("dashscope", method=request.method, endpoint=endpoint, model=model) as attrs:
+            try:
+                response = original_send(self, request, **kwargs)
+            except Exception as e:
+                _record(model, endpoint, started, type(e).__name__)
+                raise
+            attrs["status"] = response.status_code
+        _record(model, endpoint, started, str(response.status_code) if response.status_code >= 400 else None)
+        return response
+    
+    requests.Session.send = send
@@ -0,0 +1,132 @@
+"""
+图片生成任务回收
+图片生成请求在创建 DashScope 任务后自行轮询结果；轮询中断（服务重启、超时、取消）时，
+任务仍登记在任务跟踪索引中，由后台查询并回收已生成的图片：
+
+- 指定种子的请求（有结果缓存键）：写入生成结果缓存，重新执行同一请求时直接命中
+- 其他请求：保存到项目图库，标签为"任务恢复"
+
+也可以只创建任务、不在请求中轮询（submit_* 方法返回 SubmittedImageTask），
+由调用方登记到任务跟踪，后台用 query_image_task 查询结果（如图片工作室）
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.config import get_config
+from app.models.gallery import GalleryImage
+from app.services.oss import oss_service
+from app.services.media_store import media_store
+from app.services.storage import storage_service
+from app.services.task_tracker import task_tracker
+from app.services.dashscope.http_client import get_http_client
+from app.services.dashscope.result_cache import generation_cache
+
+# 回收的图片保存到图库时使用的标签
+RECOVERED_TAG = "任务恢复"
+
+
+@dataclass
+class SubmittedImageTask:
+    """已创建的生成任务；相同请求命中结果缓存时不创建任务，直接给出图片"""
+    task_id: Optional[str] = None
+    request_id: Optional[str] = None
+    cache_key: Optional[str] = None
+    urls: List[str] = field(default_factory=list)
+
+
+def extract_image_urls(output: dict) -> List[str]:
+    """
+    从任务结果中提取图片 URL
+    兼容 results[].url（图生图、旧版文生图）和 choices[].message.content[].image（wan2.6）两种格式
+    """
+    urls = [item["url"] for item in output.get("results", []) if item.get("url")]
+    for choice in output.get("choices", []):
+        for item in choice.get("message", {}).get("content", []):
+            if item.get("type") == "image" and item.get("image"):
+                urls.append(item["image"])
+    return urls
+
+
+def track_image_task(task_id: str, project_id: str = "", cache_key: Optional[str] = None, prompt: str = ""):
+    """登记图片生成任务（创建任务后、开始轮询前调用）"""
+    task_tracker.track("image", task_id, project_id, local=True, cache_key=cache_key, prompt=prompt[:500])
+
+
+def finish_image_task(task_id: str):
+    """取得结果或确认失败后调用"""
+    task_tracker.untrack("image", task_id)
+
+
+def release_image_task(task_id: str):
+    """轮询中断（超时、取消、服务关闭）时调用，交给后台回收"""
+    task_tracker.release("image", task_id)
+
+
+async def query_image_task(task_id: str) -> dict:
+    """查询一次任务状态，返回 output（task_status、结果或 code/message）"""
+    config = get_config()
+    client = get_http_client()
+    response = await client.get(
+        f"{config.base_url}/tasks/{task_id}",
+        headers={"Authorization": f"Bearer {config.dashscope_api_key}"},
+        timeout=30
+    )
+    return response.json().get("output", {})
+
+
+async def upload_image_results(urls: List[str], project_id: str) -> List[str]:
+    """启用 OSS 时上传生成结果（与请求内轮询的处理一致）"""
+    if not oss_service.is_enabled():
+        return urls
+    return [await oss_service.upload_image_async(url, project_id) for url in urls]
+
+
+async def _persist(url: str, project_id: str) -> str:
+    """保存为持久 URL（DashScope 临时链接 24 小时后失效）"""
+    if oss_service.is_enabled():
+        return await oss_service.upload_image_async(url, project_id)
+    data = await media_store.fetch(url, timeout=60.0)
+    extension = url.split("?")[0].rsplit(".", 1)[-1].lower()
+    return media_store.save(data, extension if extension in ("png", "jpg", "jpeg", "webp") else "png")
+
+
+@task_tracker.refresher("image")
+async def harvest_image_task(task_id: str, entry: dict) -> bool:
+    """
+    查询一次图片生成任务，成功时回收结果
+
+    Returns:
+        任务是否已结束
+    """
+    output = await query_image_task(task_id)
+    status = output.get("task_status", "")
+    if status in ("PENDING", "RUNNING"):
+        return False
+    if status != "SUCCEEDED":
+        print(f"[任务跟踪] 图片任务 {task_id} 未成功（{status or '未知'}），不再跟踪")
+        return True
+
+    project_id = entry.get("project_id") or ""
+    urls = [await _persist(url, project_id) for url in extract_image_urls(output)]
+    if not urls:
+        return True
+
+    cache_key = entry.get("cache_key")
+    if cache_key:
+        generation_cache.put(cache_key, urls)
+        print(f"[任务跟踪] 图片任务 {task_id} 已回收 {len(urls)} 张，写入结果缓存")
+    elif project_id:
+        for url in urls:
+            storage_service.save_gallery_image(GalleryImage(
+                project_id=project_id,
+                name=f"恢复的生成结果 {task_id[:8]}",
+                description="服务重启或请求中断后找回的生成结果",
+                url=url,
+                prompt_used=entry.get("prompt") or None,
+                source="studio",
+                task_id=task_id,
+                tags=[RECOVERED_TAG]
+            ))
+        print(f"[任务跟踪] 图片任务 {task_id} 已回收 {len(urls)} 张，保存到图库")
+    return True
@@ -17,7 +17,7 @@
 
 import asyncio
 import time
-import requests
+import httpx
 from typing import Optional, List
 from http import HTTPStatus
 import dashscope
@@ -25,10 +25,22 @@ from dashscope import ImageSynthesis
 
 from app.config import get_config, IMAGE_EDIT_MODELS, IMAGE_MODELS
 from app.services.oss import oss_service
+from app.services.dashscope.http_client import get_http_client
+from app.services.dashscope.result_cache import (
+    generation_cache_key, get_cached_generation, save_generation
+)
+from app.services.dashscope.image_tasks import (
+    SubmittedImageTask, track_image_task, finish_image_task, release_image_task
+)
 
 
 class ImageToImageService:
     """图像编辑/风格迁移服务"""
+    
+    # 任务状态轮询间隔（秒）
+    POLL_INTERVAL = 3
+    # 任务超时（秒）
+    TASK_TIMEOUT = 300
 
     def __init__(self):
         config = get_config()
@@ -120,7 +132,8 @@ class ImageToImageService:
         prompt_extend: Optional[bool] = None,
         seed: Optional[int] = None,
         n: int = 1,
-        project_id: str = ""
+        project_id: str = "",
+        use_cache: Optional[bool] = None
     ) -> List[str]:
         """
         使用多张参考图片生成新图片（多图生图）
@@ -141,10 +154,57 @@ class ImageToImageService:
             seed: 随机种子
             n: 生成图片数量（每次请求生成的图片数）
             project_id: 项目ID，用于 OSS 上传路径
+            use_cache: 为 False 时跳过结果缓存读取（指定种子且开启缓存时生效）
             
         Returns:
             生成的图片 URL 列表（如果启用 OSS，返回 OSS URL）
         """
+        submitted = await self.submit_multi_images(
+            prompt=prompt,
+            image_urls=image_urls,
+            negative_prompt=negative_prompt,
+            width=width,
+            height=height,
+            model=model,
+            prompt_extend=prompt_extend,
+            seed=seed,
+            n=n,
+            use_cache=use_cache
+        )
+        if not submitted.task_id:
+            return submitted.urls
+        task_id = submitted.task_id
+        
+        # 轮询任务状态（中断时由后台回收结果）
+        track_image_task(task_id, project_id, submitted.cache_key, prompt)
+        try:
+            urls = await self._poll_task_multiple(task_id, project_id)
+        except BaseException:
+            release_image_task(task_id)
+            raise
+        finish_image_task(task_id)
+        save_generation(submitted.cache_key, urls)
+        return urls
+    
+    async def submit_multi_images(
+        self,
+        prompt: str,
+        image_urls: List[str],
+        negative_prompt: str = "",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        model: Optional[str] = None,
+        prompt_extend: Optional[bool] = None,
+        seed: Optional[int] = None,
+        n: int = 1,
+        use_cache: Optional[bool] = None
+    ) -> SubmittedImageTask:
+        """
+        只创建多图生图任务，不等待结果（参数同 generate_with_multi_images）
+        
+        Returns:
+            已创建的任务（命中缓存时直接包含图片）
+        """
         if not image_urls:
             raise ValueError("至少需要一张参考图片")
         
@@ -155,6 +215,20 @@ class ImageToImageService:
         final_prompt_extend = prompt_extend if prompt_extend is not None else self.image_edit_config.prompt_extend
 
         self._validate_size(final_model, final_width, final_height)
+        final_seed = seed if seed is not None else self.image_edit_config.seed
+
+        # 相同请求（指定种子）直接返回缓存的结果
+        cache_key = generation_cache_key(final_model, {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "size": f"{final_width}*{final_height}",
+            "n": n,
+            "prompt_extend": final_prompt_extend,
+            "seed": final_seed
+        }, image_urls)
+        cached_urls = get_cached_generation(cache_key, use_cache)
+        if cached_urls:
+            return SubmittedImageTask(cache_key=cache_key, urls=cached_urls)
 
         # 使用 HTTP API 调用 image2image 端点
         url = f"{self.base_url}/services/aigc/image2image/image-synthesis"
@@ -185,31 +259,33 @@ class ImageToImageService:
         if final_prompt_extend:
             payload["parameters"]["prompt_extend"] = final_prompt_extend
             
-        final_seed = seed if seed is not None else self.image_edit_config.seed
         if final_seed is not None:
             payload["parameters"]["seed"] = final_seed
 
+        # 使用共享连接池异步请求，多组并发生成时不会互相阻塞
+        client = get_http_client()
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = await client.post(url, headers=headers, json=payload, timeout=60)
             result = response.json()
             
             if response.status_code != 200:
                 error_msg = result.get("message", result.get("error", {}).get("message", str(result)))
                 raise Exception(f"API错误 ({response.status_code}): {error_msg}")
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             raise Exception("请求超时")
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             raise Exception(f"请求失败: {str(e)}")
         
         if "output" not in result or "task_id" not in result["output"]:
             error_msg = result.get("message", str(result))
             raise Exception(f"创建任务失败: {error_msg}")
         
-        task_id = result["output"]["task_id"]
-        
-        # 轮询任务状态
-        return await self._poll_task_multiple(task_id, project_id)
+        return SubmittedImageTask(
+            task_id=result["output"]["task_id"],
+            request_id=result.get("request_id"),
+            cache_key=cache_key
+        )
 
     async def _poll_task(self, task_id: str, project_id: str = "") -> str:
         """轮询任务状态直到完成（返回单张图片）"""
@@ -219,21 +295,21 @@ class ImageToImageService:
     async def _poll_task_multiple(self, task_id: str, project_id: str = "") -> List[str]:
         """轮询任务状态直到完成（返回多张图片）"""
         status_url = f"{self.base_url}/tasks/{task_id}"
-        timeout = 300  # 5分钟超时
         start_time = time.time()
+        client = get_http_client()
         
         while True:
-            if time.time() - start_time > timeout:
+            if time.time() - start_time > self.TASK_TIMEOUT:
                 raise Exception("图片生成任务超时")
             
             try:
-                status_response = requests.get(
+                status_response = await client.get(
                     status_url, 
                     headers={"Authorization": f"Bearer {self.api_key}"},
                     timeout=30
                 )
                 status_result = status_response.json()
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 raise Exception(f"查询任务失败: {str(e)}")
             
             task_status = status_result.get("output", {}).get("task_status", "")
@@ -257,6 +333,6 @@ class ImageToImageService:
                 code = status_result.get("output", {}).get("code", "")
                 raise Exception(f"图片生成失败: {code} - {error_msg}")
             elif task_status in ["PENDING", "RUNNING"]:
-                await asyncio.sleep(3)
+                await asyncio.sleep(self.POLL_INTERVAL)
             else:
                 raise Exception(f"未知的任务状态: {task_status}")
@@ -31,7 +31,6 @@
   - 不支持音频
 """
 
-import json
 import logging
 from typing import Optional, Tuple
 from http import HTTPStatus
@@ -41,6 +40,7 @@ import httpx
 
 from app.config import get_config, VIDEO_MODELS
 from app.services.oss import oss_service
+from app.logger import log_debug
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -181,7 +181,7 @@ class ImageToVideoService:
         log_params = {k: v for k, v in params.items() if k != 'api_key'}
         print(f"\n{'='*60}")
         print(f"[SDK 图生视频请求] 模型: {model_name}")
-        print(f"[SDK 图生视频请求] 参数: {json.dumps(log_params, ensure_ascii=False, indent=2)}")
+        log_debug(logger, "[SDK 图生视频请求]", params=log_params)
         print(f"{'='*60}\n")
         
         rsp = VideoSynthesis.async_call(**params)
@@ -297,7 +297,7 @@ class ImageToVideoService:
         print(f"\n{'='*60}")
         print(f"[HTTP 图生视频请求] 模型: {model}")
         print(f"[HTTP 图生视频请求] URL: {base_url}/services/aigc/video-generation/video-synthesis")
-        print(f"[HTTP 图生视频请求] Body: {json.dumps(request_body, ensure_ascii=False, indent=2)}")
+        log_debug(logger, "[HTTP 图生视频请求]", body=request_body)
         print(f"{'='*60}\n")
         
         # 发送 HTTP 请求
@@ -325,7 +325,7 @@ class ImageToVideoService:
             else:
                 print(f"[HTTP 图生视频响应] code: {result.get('code', 'N/A')}")
                 print(f"[HTTP 图生视频响应] message: {result.get('message', 'N/A')}")
-            print(f"[HTTP 图生视频响应] 完整响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            log_debug(logger, "[HTTP 图生视频响应]", response=result)
             print(f"{'='*60}\n")
             
             if response.status_code != 200:
@@ -346,7 +346,6 @@ class ImageToVideoService:
         config = get_config()
         base_url = config.base_url
         
-        print(f"\n[HTTP 状态查询] task_id: {task_id}, URL: {base_url}/tasks/{task_id}")
         
         async with httpx.AsyncClient(timeout=30.0) as client:
             response = await client.get(
@@ -358,39 +357,20 @@ class ImageToVideoService:
             
             result = response.json()
             
-            # 打印详细状态信息
             output = result.get("output", {})
             status = output.get("task_status", "UNKNOWN")
             
-            print(f"[HTTP 状态查询] status_code: {response.status_code}")
-            print(f"[HTTP 状态查询] request_id: {result.get('request_id', 'N/A')}")
-            print(f"[HTTP 状态查询] task_status: {status}")
+            # 每次轮询的详细响应只在调试级别输出
+            log_debug(
+                logger, "[HTTP 状态查询]",
+                task_id=task_id, status_code=response.status_code,
+                request_id=result.get("request_id"), output=output, usage=result.get("usage")
+            )
             
-            # 如果任务失败，输出详细的失败信息
+            # 如果任务失败，输出失败原因
             if status == "FAILED":
-                print(f"\n{'!'*60}")
-                print(f"[任务失败] 详细错误信息:")
-                print(json.dumps({
-                    "request_id": result.get('request_id', 'N/A'),
-                    "output": {
-                        "task_id": task_id,
-                        "task_status": status,
-                        "code": output.get('code', 'N/A'),
-                        "message": output.get('message', 'N/A')
-                    }
-                }, ensure_ascii=False, indent=4))
-                print(f"{'!'*60}\n")
-            
-            if output.get('video_url'):
-                print(f"[HTTP 状态查询] video_url: {output.get('video_url')[:100]}...")
-            if output.get('submit_time'):
-                print(f"[HTTP 状态查询] submit_time: {output.get('submit_time')}")
-            if output.get('scheduled_time'):
-                print(f"[HTTP 状态查询] scheduled_time: {output.get('scheduled_time')}")
-            if output.get('end_time'):
-                print(f"[HTTP 状态查询] end_time: {output.get('end_time')}")
-            if result.get('usage'):
-                print(f"[HTTP 状态查询] usage: {json.dumps(result.get('usage'), ensure_ascii=False)}")
+                print(f"[任务失败] task_id: {task_id}, request_id: {result.get('request_id', 'N/A')}, "
+                      f"{output.get('code', 'N/A')} - {output.get('message', 'N/A')}")
             
             if response.status_code != 200:
                 code = result.get("code", "Unknown")
@@ -417,19 +397,20 @@ class ImageToVideoService:
         """
         # 如果指定使用 HTTP 或者默认尝试 HTTP 查询
         if use_http:
-            print(f"\n[状态查询] 使用 HTTP 方式查询, task_id: {task_id}")
             status, video_url = await self._get_task_status_http(task_id)
         else:
             # 尝试使用 SDK
-            print(f"\n[状态查询] 使用 SDK 方式查询, task_id: {task_id}")
             try:
                 rsp = VideoSynthesis.fetch(
                     api_key=self.api_key,
                     task=task_id
                 )
                 
-                print(f"[SDK 状态查询] status_code: {rsp.status_code}")
-                print(f"[SDK 状态查询] request_id: {getattr(rsp, 'request_id', 'N/A')}")
+                log_debug(
+                    logger, "[SDK 状态查询]",
+                    task_id=task_id, status_code=rsp.status_code,
+                    request_id=getattr(rsp, 'request_id', None), output=rsp.output
+                )
                 
                 if rsp.status_code != HTTPStatus.OK:
                     print(f"[SDK 状态查询] SDK查询失败，切换到HTTP方式")
@@ -438,9 +419,6 @@ class ImageToVideoService:
                 else:
                     status = rsp.output.task_status
                     video_url = rsp.output.video_url if status == 'SUCCEEDED' else None
-                    print(f"[SDK 状态查询] task_status: {status}")
-                    if video_url:
-                        print(f"[SDK 状态查询] video_url: {video_url[:100]}...")
             except Exception as e:
                 print(f"[SDK 状态查询] SDK异常: {e}，切换到HTTP方式")
                 # SDK 异常，尝试 HTTP
@@ -0,0 +1,81 @@
+"""
+增量 JSON 解析
+逐块接收 LLM 的流式输出，每个顶层元素闭合后立即解析，无需等待完整回复
+"""
+
+import json
+from typing import Any, List, Optional
+
+
+class IncrementalJSONArrayParser:
+    """
+    增量 JSON 数组解析器
+    
+    逐块输入 LLM 的流式输出（形如 [{...}, {...}]），每当一个顶层元素完整闭合时立即解析返回，
+    无需等待整个数组输出完毕。数组开始前的文字（如 ```json）会被忽略
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0  # 已扫描到的位置
+        self._started = False  # 是否已遇到顶层 [
+        self._finished = False  # 是否已遇到顶层 ]
+        self._depth = 0  # 当前嵌套深度（顶层数组内为 1）
+        self._in_string = False
+        self._escape = False
+        self._item_start: Optional[int] = None
+        self.count = 0  # 已解析的元素数
+    
+    @property
+    def finished(self) -> bool:
+        return self._finished
+    
+    def feed(self, text: str) -> List[Any]:
+        """
+        输入一段文本，返回本次新闭合的元素列表
+        
+        Raises:
+            ValueError: 某个元素不是合法 JSON
+        """
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self._finished:
+            ch = buffer[i]
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 1:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._item_start is not None:
+                    items.append(json.loads(buffer[self._item_start:i + 1]))
+                    self._item_start = None
+                elif self._depth == 0:
+                    self._finished = True
+            i += 1
+        
+        # 丢弃已解析的内容，避免缓冲区无限增长
+        if self._item_start is not None:
+            self._buffer = buffer[self._item_start:]
+            self._pos = i - self._item_start
+            self._item_start = 0
+        else:
+            self._buffer = ""
+            self._pos = 0
+        self.count += len(items)
+        return items
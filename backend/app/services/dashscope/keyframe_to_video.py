@@ -12,13 +12,13 @@
 参考文档: https://help.aliyun.com/zh/model-studio/image-to-video-by-first-and-last-frame-api-reference
 """
 
-import json
 import logging
 from typing import Optional, Tuple
 import httpx
 
 from app.config import get_config, KEYFRAME_TO_VIDEO_MODELS
 from app.services.oss import oss_service
+from app.logger import log_debug
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -115,7 +115,7 @@ class KeyframeToVideoService:
         print(f"\n{'='*60}")
         print(f"[HTTP 首尾帧生视频请求] 模型: {model_name}")
         print(f"[HTTP 首尾帧生视频请求] URL: {self.base_url}/services/aigc/image2video/video-synthesis")
-        print(f"[HTTP 首尾帧生视频请求] Body: {json.dumps(request_body, ensure_ascii=False, indent=2)}")
+        log_debug(logger, "[HTTP 首尾帧生视频请求]", body=request_body)
         print(f"{'='*60}\n")
         
         # 发送 HTTP 请求
@@ -143,7 +143,7 @@ class KeyframeToVideoService:
             else:
                 print(f"[HTTP 首尾帧生视频响应] code: {result.get('code', 'N/A')}")
                 print(f"[HTTP 首尾帧生视频响应] message: {result.get('message', 'N/A')}")
-            print(f"[HTTP 首尾帧生视频响应] 完整响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            log_debug(logger, "[HTTP 首尾帧生视频响应]", response=result)
             print(f"{'='*60}\n")
             
             if response.status_code != 200:
@@ -169,7 +169,6 @@ class KeyframeToVideoService:
             (状态, 视频URL) 元组，状态为 PENDING/RUNNING/SUCCEEDED/FAILED
             如果启用 OSS，视频 URL 将是 OSS URL
         """
-        print(f"\n[HTTP 首尾帧生视频状态查询] task_id: {task_id}, URL: {self.base_url}/tasks/{task_id}")
         
         async with httpx.AsyncClient(timeout=30.0) as client:
             response = await client.get(
@@ -181,41 +180,20 @@ class KeyframeToVideoService:
             
             result = response.json()
             
-            # 打印详细状态信息
             output = result.get("output", {})
             status = output.get("task_status", "UNKNOWN")
             
-            print(f"[HTTP 首尾帧生视频状态查询] status_code: {response.status_code}")
-            print(f"[HTTP 首尾帧生视频状态查询] request_id: {result.get('request_id', 'N/A')}")
-            print(f"[HTTP 首尾帧生视频状态查询] task_status: {status}")
+            # 每次轮询的详细响应只在调试级别输出
+            log_debug(
+                logger, "[HTTP 首尾帧生视频状态查询]",
+                task_id=task_id, status_code=response.status_code,
+                request_id=result.get("request_id"), output=output, usage=result.get("usage")
+            )
             
-            # 如果任务失败，输出详细的失败信息
+            # 如果任务失败，输出失败原因
             if status == "FAILED":
-                print(f"\n{'!'*60}")
-                print(f"[首尾帧生视频任务失败] 详细错误信息:")
-                print(json.dumps({
-                    "request_id": result.get('request_id', 'N/A'),
-                    "output": {
-                        "task_id": task_id,
-                        "task_status": status,
-                        "code": output.get('code', 'N/A'),
-                        "message": output.get('message', 'N/A')
-                    }
-                }, ensure_ascii=False, indent=4))
-                print(f"{'!'*60}\n")
-            
-            if output.get('video_url'):
-                print(f"[HTTP 首尾帧生视频状态查询] video_url: {output.get('video_url')[:100]}...")
-            if output.get('orig_prompt'):
-                print(f"[HTTP 首尾帧生视频状态查询] orig_prompt: {output.get('orig_prompt')[:100]}...")
-            if output.get('actual_prompt'):
-                print(f"[HTTP 首尾帧生视频状态查询] actual_prompt: {output.get('actual_prompt')[:100]}...")
-            if output.get('submit_time'):
-                print(f"[HTTP 首尾帧生视频状态查询] submit_time: {output.get('submit_time')}")
-            if output.get('end_time'):
-                print(f"[HTTP 首尾帧生视频状态查询] end_time: {output.get('end_time')}")
-            if result.get('usage'):
-                print(f"[HTTP 首尾帧生视频状态查询] usage: {json.dumps(result.get('usage'), ensure_ascii=False)}")
+                print(f"[首尾帧生视频任务失败] task_id: {task_id}, request_id: {result.get('request_id', 'N/A')}, "
+                      f"{output.get('code', 'N/A')} - {output.get('message', 'N/A')}")
             
             if response.status_code != 200:
                 code = result.get("code", "Unknown")
@@ -3,11 +3,19 @@
 支持 Qwen 系列模型的调用，包括流式输出
 """
 
-from typing import AsyncGenerator, Optional
+import asyncio
+from typing import Any, AsyncGenerator, Optional
 import dashscope
 from dashscope import Generation
 
 from app.config import get_config, LLM_MODELS
+from app.services.dashscope.json_stream import IncrementalJSONArrayParser
+from app.services.dashscope.result_cache import (
+    llm_cache_key, get_cached_llm, save_llm, discard_llm
+)
+
+# 回放缓存时每个 SSE 分块的字符数
+REPLAY_CHUNK_SIZE = 200
 
 
 class LLMService:
@@ -18,11 +26,26 @@ class LLMService:
         self.api_key = config.dashscope_api_key
         self.llm_config = config.llm
         dashscope.base_http_api_url = config.base_url
+        # 最近一次请求的缓存键，回复无法解析时用于删除缓存
+        self.last_cache_key: Optional[str] = None
     
     def _get_model_info(self, model: str) -> dict:
         """获取模型信息"""
         return LLM_MODELS.get(model, {})
     
+    @staticmethod
+    def _cache_key(params: dict) -> Optional[str]:
+        """缓存键只包含影响回复内容的参数（流式/非流式共享缓存）"""
+        cache_params = {
+            k: v for k, v in params.items()
+            if k not in ('api_key', 'stream', 'incremental_output', 'result_format')
+        }
+        return llm_cache_key(cache_params)
+    
+    def discard_last_cached(self):
+        """删除最近一次请求的缓存（调用方解析回复失败时调用）"""
+        discard_llm(self.last_cache_key)
+    
     async def chat(
         self,
         prompt: str,
@@ -34,10 +57,13 @@ class LLMService:
         enable_thinking: Optional[bool] = None,
         thinking_budget: Optional[int] = None,
         result_format: Optional[str] = None,
-        enable_search: Optional[bool] = None
+        enable_search: Optional[bool] = None,
+        use_cache: Optional[bool] = None
     ) -> str:
         """
         非流式对话
+        
+        相同请求命中缓存时直接返回，use_cache=False 时跳过缓存读取
         """
         model = model or self.llm_config.model
         model_info = self._get_model_info(model)
@@ -82,12 +108,21 @@ class LLMService:
         if search_value and model_info.get('supports_search'):
             params['enable_search'] = True
         
-        response = Generation.call(**params)
+        cache_key = self._cache_key(params)
+        self.last_cache_key = cache_key
+        cached = get_cached_llm(cache_key, use_cache)
+        if cached is not None:
+            return cached
+        
+        # SDK 为同步调用，放到线程中执行，避免阻塞事件循环（多个请求可并发）
+        response = await asyncio.to_thread(Generation.call, **params)
         
         if response.status_code != 200:
             raise Exception(f"LLM 调用失败: {response.code} - {response.message}")
         
-        return response.output.choices[0].message.content
+        content = response.output.choices[0].message.content
+        save_llm(cache_key, content)
+        return content
     
     async def stream_chat(
         self,
@@ -99,10 +134,13 @@ class LLMService:
         temperature: Optional[float] = None,
         enable_thinking: Optional[bool] = None,
         thinking_budget: Optional[int] = None,
-        enable_search: Optional[bool] = None
+        enable_search: Optional[bool] = None,
+        use_cache: Optional[bool] = None
     ) -> AsyncGenerator[str, None]:
         """
         流式对话
+        
+        命中缓存时按分块回放缓存内容；完整输出结束后才写入缓存
         """
         model = model or self.llm_config.model
         model_info = self._get_model_info(model)
@@ -138,21 +176,68 @@ class LLMService:
             budget = thinking_budget or self.llm_config.thinking_budget
             params['thinking_budget'] = budget
         
-        responses = Generation.call(**params)
+        cache_key = self._cache_key(params)
+        self.last_cache_key = cache_key
+        cached = get_cached_llm(cache_key, use_cache)
+        if cached is not None:
+            for i in range(0, len(cached), REPLAY_CHUNK_SIZE):
+                yield cached[i:i + REPLAY_CHUNK_SIZE]
+                await asyncio.sleep(0)
+            return
+        
+        # 流式迭代同样是阻塞调用，逐块放到线程中读取
+        responses = await asyncio.to_thread(Generation.call, **params)
+        iterator = iter(responses)
         
-        for response in responses:
+        chunks = []
+        while True:
+            response = await asyncio.to_thread(next, iterator, None)
+            if response is None:
+                break
             if response.status_code != 200:
                 raise Exception(f"LLM 调用失败: {response.code} - {response.message}")
             
             if response.output.choices:
                 content = response.output.choices[0].message.content
                 if content:
+                    chunks.append(content)
                     yield content
+        
+        save_llm(cache_key, "".join(chunks))
+    
+    async def stream_json_array(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        system_prompt: Optional[str] = None,
+        use_cache: Optional[bool] = None
+    ) -> AsyncGenerator[Any, None]:
+        """
+        流式输出 JSON 数组，每个元素闭合后立即返回（无需等待完整回复）
+        
+        Raises:
+            ValueError: 回复中的元素不是合法 JSON 或数组不完整
+        """
+        parser = IncrementalJSONArrayParser()
+        async for chunk in self.stream_chat(
+            prompt=prompt,
+            model=model,
+            system_prompt=system_prompt,
+            enable_thinking=False,
+            use_cache=use_cache
+        ):
+            for item in parser.feed(chunk):
+                yield item
+        
+        if not parser.finished:
+            discard_llm(self.last_cache_key)
+            raise ValueError("返回的 JSON 数组不完整")
     
     async def extract_json(
         self,
         prompt: str,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        use_cache: Optional[bool] = None
     ) -> str:
         """
         提取 JSON 格式的回复
@@ -165,7 +250,8 @@ class LLMService:
             model=model,
             system_prompt=system_prompt,
             result_format='json_object',
-            enable_thinking=False  # JSON Mode 不支持思考模式
+            enable_thinking=False,  # JSON Mode 不支持思考模式
+            use_cache=use_cache
         )
         
         # 尝试提取 JSON 部分
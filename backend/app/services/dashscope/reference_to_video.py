@@ -12,7 +12,6 @@
 - 通过 character1, character2 等标识引用参考角色（按传入顺序）
 """
 
-import json
 import logging
 from http import HTTPStatus
 from typing import Optional, List, Tuple
@@ -21,6 +20,7 @@ import httpx
 
 from ...config import get_config, REF_VIDEO_MODELS
 from ..oss import oss_service
+from ...logger import log_debug
 
 logger = logging.getLogger(__name__)
 
@@ -126,7 +126,7 @@ class ReferenceToVideoService:
         print(f"\n{'='*60}")
         print(f"[HTTP 参考生视频请求] 模型: {model_name}")
         print(f"[HTTP 参考生视频请求] URL: {self.base_url}/services/aigc/video-generation/video-synthesis")
-        print(f"[HTTP 参考生视频请求] Body: {json.dumps(request_body, ensure_ascii=False, indent=2)}")
+        log_debug(logger, "[HTTP 参考生视频请求]", body=request_body)
         print(f"{'='*60}\n")
         
         async with httpx.AsyncClient(timeout=30.0) as client:
@@ -153,7 +153,7 @@ class ReferenceToVideoService:
             else:
                 print(f"[HTTP 参考生视频响应] code: {result.get('code', 'N/A')}")
                 print(f"[HTTP 参考生视频响应] message: {result.get('message', 'N/A')}")
-            print(f"[HTTP 参考生视频响应] 完整响应: {json.dumps(result, ensure_ascii=False, indent=2)}")
+            log_debug(logger, "[HTTP 参考生视频响应]", response=result)
             print(f"{'='*60}\n")
             
             if response.status_code != 200:
@@ -178,7 +178,6 @@ class ReferenceToVideoService:
         Returns:
             (状态, 视频URL) 元组
         """
-        print(f"\n[HTTP 参考生视频状态查询] task_id: {task_id}")
         print(f"[HTTP 参考生视频状态查询] URL: {self.base_url}/tasks/{task_id}")
         
         async with httpx.AsyncClient(timeout=30.0) as client:
@@ -191,37 +190,20 @@ class ReferenceToVideoService:
             
             result = response.json()
             
-            # 打印详细状态信息
             output = result.get("output", {})
             status = output.get("task_status", "UNKNOWN")
             
-            print(f"[HTTP 参考生视频状态查询] status_code: {response.status_code}")
-            print(f"[HTTP 参考生视频状态查询] request_id: {result.get('request_id', 'N/A')}")
-            print(f"[HTTP 参考生视频状态查询] task_status: {status}")
+            # 每次轮询的详细响应只在调试级别输出
+            log_debug(
+                logger, "[HTTP 参考生视频状态查询]",
+                task_id=task_id, status_code=response.status_code,
+                request_id=result.get("request_id"), output=output, usage=result.get("usage")
+            )
             
-            # 如果任务失败，输出详细的失败信息
+            # 如果任务失败，输出失败原因
             if status == "FAILED":
-                print(f"\n{'!'*60}")
-                print(f"[任务失败] 详细错误信息:")
-                print(json.dumps({
-                    "request_id": result.get('request_id', 'N/A'),
-                    "output": {
-                        "task_id": task_id,
-                        "task_status": status,
-                        "code": output.get('code', 'N/A'),
-                        "message": output.get('message', 'N/A')
-                    }
-                }, ensure_ascii=False, indent=4))
-                print(f"{'!'*60}\n")
-            
-            if output.get('video_url'):
-                print(f"[HTTP 参考生视频状态查询] video_url: {output.get('video_url')[:100]}...")
-            if output.get('submit_time'):
-                print(f"[HTTP 参考生视频状态查询] submit_time: {output.get('submit_time')}")
-            if output.get('end_time'):
-                print(f"[HTTP 参考生视频状态查询] end_time: {output.get('end_time')}")
-            if result.get('usage'):
-                print(f"[HTTP 参考生视频状态查询] usage: {json.dumps(result.get('usage'), ensure_ascii=False)}")
+                print(f"[任务失败] task_id: {task_id}, request_id: {result.get('request_id', 'N/A')}, "
+                      f"{output.get('code', 'N/A')} - {output.get('message', 'N/A')}")
             
             if response.status_code != 200:
                 error_code = result.get("code", "Unknown")
@@ -0,0 +1,210 @@
+"""
+生成结果缓存
+按完整请求指纹缓存生成结果，相同请求直接返回已保存的结果
+
+- 按用户隔离：缓存文件保存在当前用户的数据目录下
+- 单次请求可通过 use_cache=False 跳过读取（结果仍会写入缓存）
+
+图片生成（默认关闭）：
+- 指纹：模型 + 全部参数 + 参考图 URL
+- 仅缓存可复现的请求：未指定种子时每次生成结果不同，不缓存
+- 仅缓存持久 URL：DashScope 临时链接会过期，不缓存
+
+LLM（默认开启）：
+- 指纹：模型 + 系统提示词 + 提示词 + 全部参数
+- 联网搜索的结果随时间变化，不缓存
+"""
+
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.config import get_config, get_user_config_dir
+from app.services.shared_state import SharedJsonFile
+
+# 单个用户的缓存条数上限，超过后淘汰最久未使用的记录
+MAX_GENERATION_ENTRIES = 2000
+MAX_LLM_ENTRIES = 500
+
+
+def _default_data_dir() -> Path:
+    return Path(__file__).parent.parent.parent.parent / "data"
+
+
+class ResultCache:
+    """按用户隔离的持久化结果缓存（LRU + TTL，多个 worker 进程共享缓存文件）"""
+    
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 缓存文件路径 -> 共享文件
+        self._files: Dict[str, SharedJsonFile] = {}
+    
+    # ========== 内部工具 ==========
+    
+    def _cache_file(self) -> Path:
+        """当前用户的缓存文件"""
+        user_dir = get_user_config_dir()
+        base_dir = Path(user_dir) if user_dir else _default_data_dir()
+        return base_dir / "cache" / f"{self.name}.json"
+    
+    def _file(self) -> SharedJsonFile:
+        path = self._cache_file()
+        key = str(path)
+        with self._lock:
+            if key not in self._files:
+                self._files[key] = SharedJsonFile(path)
+            return self._files[key]
+    
+    def _update(self, mutate):
+        try:
+            return self._file().update(mutate)
+        except Exception as e:
+            print(f"[结果缓存] 保存 {self.name} 缓存失败: {e}")
+    
+    # ========== 公开接口 ==========
+    
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """对请求内容做规范化 JSON 序列化后取 SHA-256"""
+        raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str, ttl_seconds: float) -> Optional[Any]:
+        """读取缓存，不存在或已过期返回 None"""
+        entry = self._file().read().get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if now - entry.get("created_at", 0) > ttl_seconds:
+            self._update(lambda entries: entries.pop(key, None))
+            return None
+        # 访问时间只更新内存，下次写入时一并持久化
+        entry["accessed_at"] = now
+        return entry.get("value")
+    
+    def put(self, key: str, value: Any):
+        """写入缓存"""
+        def mutate(entries: Dict[str, dict]):
+            now = time.time()
+            entries[key] = {"value": value, "created_at": now, "accessed_at": now}
+            # 超出上限时淘汰最久未使用的记录
+            if len(entries) > self.max_entries:
+                oldest = sorted(entries.items(), key=lambda kv: kv[1].get("accessed_at", 0))
+                for old_key, _ in oldest[:len(entries) - self.max_entries]:
+                    entries.pop(old_key, None)
+        self._update(mutate)
+    
+    def delete(self, key: str):
+        """删除单条缓存"""
+        if key in self._file().read():
+            self._update(lambda entries: entries.pop(key, None))
+    
+    def clear(self) -> int:
+        """清空当前用户的缓存，返回删除的条数"""
+        def mutate(entries: Dict[str, dict]) -> int:
+            count = len(entries)
+            entries.clear()
+            return count
+        return self._update(mutate) or 0
+
+
+# 全局图片生成结果缓存
+generation_cache = ResultCache("generation", MAX_GENERATION_ENTRIES)
+# 全局 LLM 回复缓存
+llm_cache = ResultCache("llm", MAX_LLM_ENTRIES)
+
+
+def _is_persistent_url(url: str) -> bool:
+    """是否为可长期访问的 URL（DashScope 返回的临时链接会在 24 小时后失效）"""
+    return bool(url) and "dashscope-result" not in url
+
+
+def generation_cache_key(model: str, params: Dict[str, Any], reference_urls: Optional[List[str]] = None) -> Optional[str]:
+    """
+    计算图片生成请求的缓存键
+    
+    Returns:
+        缓存键；缓存未启用或请求不可复现（未指定种子）时返回 None
+    """
+    if not get_config().cache.generation_enabled:
+        return None
+    if params.get("seed") is None:
+        return None
+    return generation_cache.make_key(
+        kind="image",
+        model=model,
+        params=params,
+        reference_urls=list(reference_urls or [])
+    )
+
+
+def get_cached_generation(key: Optional[str], use_cache: Optional[bool] = None) -> Optional[List[str]]:
+    """
+    读取缓存的生成结果
+    
+    Args:
+        key: generation_cache_key 返回的缓存键
+        use_cache: 为 False 时跳过读取（强制重新生成，结果仍会写入缓存）
+    """
+    if key is None or use_cache is False:
+        return None
+    ttl_seconds = get_config().cache.generation_ttl_hours * 3600
+    urls = generation_cache.get(key, ttl_seconds)
+    if urls:
+        print(f"[结果缓存] 命中图片生成缓存: {key[:12]}，返回 {len(urls)} 张")
+    return urls or None
+
+
+def save_generation(key: Optional[str], urls: List[str]):
+    """保存生成结果（只保存持久 URL）"""
+    if key is None or not urls:
+        return
+    if not all(_is_persistent_url(url) for url in urls):
+        return
+    generation_cache.put(key, list(urls))
+
+
+def llm_cache_key(params: Dict[str, Any]) -> Optional[str]:
+    """
+    计算 LLM 请求的缓存键
+    
+    Args:
+        params: 调用参数（model、messages 及全部生成参数，不含 api_key）
+    
+    Returns:
+        缓存键；缓存未启用或启用了联网搜索时返回 None
+    """
+    if not get_config().cache.llm_enabled:
+        return None
+    if params.get("enable_search"):
+        return None
+    return llm_cache.make_key(kind="llm", params=params)
+
+
+def get_cached_llm(key: Optional[str], use_cache: Optional[bool] = None) -> Optional[str]:
+    """读取缓存的 LLM 回复"""
+    if key is None or use_cache is False:
+        return None
+    ttl_seconds = get_config().cache.llm_ttl_hours * 3600
+    content = llm_cache.get(key, ttl_seconds)
+    if content:
+        print(f"[结果缓存] 命中 LLM 缓存: {key[:12]}，{len(content)} 字符")
+    return content or None
+
+
+def save_llm(key: Optional[str], content: str):
+    """保存 LLM 回复"""
+    if key is None or not content:
+        return
+    llm_cache.put(key, content)
+
+
+def discard_llm(key: Optional[str]):
+    """删除 LLM 缓存（回复内容无法解析时调用，避免重复返回错误结果）"""
+    if key is not None:
+        llm_cache.delete(key)
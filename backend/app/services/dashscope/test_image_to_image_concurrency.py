@@ -0,0 +1,125 @@
+"""
+图生图并发测试脚本
+
+使用 httpx.MockTransport 模拟 DashScope 接口（创建任务和查询任务都有固定延迟），验证：
+1. 多组并发生成时请求相互重叠（总耗时接近单组耗时，而不是 N 倍）
+2. 等待接口返回期间事件循环不被阻塞
+
+运行方式:
+    cd backend
+    python -m app.services.dashscope.test_image_to_image_concurrency [并发组数]
+"""
+
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+import httpx
+
+from app.config import set_user_config_dir
+from app.services.dashscope import image_to_image
+from app.services.dashscope.image_to_image import ImageToImageService
+
+# 模拟接口延迟（秒）
+CREATE_DELAY = 0.5
+QUERY_DELAY = 0.2
+
+
+async def mock_handler(request: httpx.Request) -> httpx.Response:
+    """模拟 image2image 创建任务和任务查询接口"""
+    if request.method == "POST":
+        await asyncio.sleep(CREATE_DELAY)
+        return httpx.Response(200, json={"output": {"task_id": f"task-{id(request)}", "task_status": "PENDING"}})
+    await asyncio.sleep(QUERY_DELAY)
+    task_id = request.url.path.rsplit("/", 1)[-1]
+    return httpx.Response(200, json={
+        "output": {
+            "task_status": "SUCCEEDED",
+            "results": [{"url": f"https://example.com/{task_id}.png"}]
+        }
+    })
+
+
+async def measure_loop_lag(stop: asyncio.Event, lags: list):
+    """每 10ms 记录一次事件循环调度延迟"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append(time.perf_counter() - started - 0.01)
+
+
+async def run_test(groups: int) -> bool:
+    client = httpx.AsyncClient(transport=httpx.MockTransport(mock_handler))
+    image_to_image.get_http_client = lambda: client
+    service = ImageToImageService()
+    service.POLL_INTERVAL = 0.05
+    
+    stop = asyncio.Event()
+    lags = []
+    lag_task = asyncio.create_task(measure_loop_lag(stop, lags))
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        service.generate_with_multi_images(
+            prompt=f"测试第 {i + 1} 组",
+            image_urls=["https://example.com/ref.png"],
+            width=1280,
+            height=1280
+        )
+        for i in range(groups)
+    ])
+    elapsed = time.perf_counter() - started
+    
+    stop.set()
+    await lag_task
+    await client.aclose()
+    
+    single = CREATE_DELAY + QUERY_DELAY
+    serial = single * groups
+    max_lag = max(lags) if lags else 0.0
+    
+    print(f"  并发组数: {groups}")
+    print(f"  单组耗时: {single:.2f}s，串行预计: {serial:.2f}s")
+    print(f"  实际耗时: {elapsed:.2f}s")
+    print(f"  事件循环最大延迟: {max_lag * 1000:.1f}ms")
+    
+    ok = True
+    if not all(len(urls) == 1 for urls in results):
+        print("  ❌ 返回结果数量不正确")
+        ok = False
+    if len({urls[0] for urls in results}) != groups:
+        print("  ❌ 各组返回了相同的任务结果")
+        ok = False
+    if elapsed > single * 2:
+        print("  ❌ 各组请求没有重叠执行")
+        ok = False
+    if max_lag > 0.1:
+        print("  ❌ 等待接口期间事件循环被阻塞")
+        ok = False
+    return ok
+
+
+def test_concurrent_groups(groups: int = 6):
+    """测试多组图生图请求并发重叠"""
+    print("=" * 60)
+    print("图生图并发测试")
+    print("=" * 60)
+    
+    # 使用临时配置目录，避免读取本地配置（OSS、结果缓存均为默认关闭）
+    set_user_config_dir(tempfile.mkdtemp(prefix="i2i_test_"))
+    
+    ok = asyncio.run(run_test(groups))
+    
+    print("\n" + "=" * 60)
+    print("✅ 测试通过!" if ok else "❌ 测试失败!")
+    print("=" * 60)
+    assert ok, "图生图并发测试失败"
+
+
+if __name__ == "__main__":
+    test_concurrent_groups(int(sys.argv[1]) if len(sys.argv) > 1 else 6)
@@ -3,6 +3,8 @@
 参考: https://help.aliyun.com/zh/model-studio/text-to-image-v2-api-reference
 """
 
+import asyncio
+import logging
 from typing import List, Optional, Tuple
 from dataclasses import dataclass, field
 from http import HTTPStatus
@@ -11,10 +13,23 @@ from dashscope import ImageSynthesis
 import httpx
 from io import BytesIO
 from PIL import Image
-import base64
 
 from app.config import get_config, IMAGE_MODELS
 from app.services.oss import oss_service
+from app.services.media_store import media_store
+from app.services.image_probe import probe_image_size
+from app.services.reference_cache import reference_cache
+from app.services.tracing import span
+from app.logger import log_debug
+from app.services.dashscope.result_cache import (
+    generation_cache_key, get_cached_generation, save_generation
+)
+from app.services.dashscope.http_client import get_http_client
+from app.services.dashscope.image_tasks import (
+    SubmittedImageTask, track_image_task, finish_image_task, release_image_task
+)
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -30,6 +45,153 @@ WAN26_IMAGE_MIN_DIM = 384
 WAN26_IMAGE_MAX_DIM = 5000
 
 
+def _target_size(width: int, height: int, min_dim: int, max_dim: int) -> Tuple[int, int, bool]:
+    """
+    计算符合尺寸约束的目标尺寸
+    
+    Returns:
+        (new_width, new_height, needs_resize)
+    """
+    # 检查是否需要调整
+    needs_resize = False
+    new_width, new_height = width, height
+    
+    # 检查最小尺寸
+    if width < min_dim or height < min_dim:
+        needs_resize = True
+        # 按比例放大到最小尺寸
+        scale = max(min_dim / width, min_dim / height)
+        new_width = int(width * scale)
+        new_height = int(height * scale)
+    
+    # 检查最大尺寸
+    if new_width > max_dim or new_height > max_dim:
+        needs_resize = True
+        # 按比例缩小到最大尺寸
+        scale = min(max_dim / new_width, max_dim / new_height)
+        new_width = int(new_width * scale)
+        new_height = int(new_height * scale)
+    
+    return new_width, new_height, needs_resize
+
+
+def _resize_image_bytes(image_data: bytes, min_dim: int, max_dim: int) -> dict:
+    """
+    探测图片尺寸并按需缩放（CPU 密集，在线程中执行）
+    
+    Returns:
+        {"width", "height", "new_width", "new_height", "data", "extension"}，无需缩放时 data 为 None
+    """
+    img = Image.open(BytesIO(image_data))
+    width, height = img.size
+    new_width, new_height, needs_resize = _target_size(width, height, min_dim, max_dim)
+    
+    result = {
+        "width": width,
+        "height": height,
+        "new_width": new_width,
+        "new_height": new_height,
+        "data": None,
+        "extension": None
+    }
+    if not needs_resize:
+        return result
+    
+    # 使用高质量重采样
+    resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    
+    # 保存为原格式或默认 PNG
+    buffer = BytesIO()
+    img_format = img.format or 'PNG'
+    if img_format.upper() == 'JPEG':
+        resized_img = resized_img.convert('RGB')
+        extension = 'jpg'
+    else:
+        extension = img_format.lower()
+    resized_img.save(buffer, format=img_format, quality=95)
+    result["data"] = buffer.getvalue()
+    result["extension"] = extension
+    return result
+
+
+async def _preprocess_reference_image(image_url: str, min_dim: int, max_dim: int, project_id: str) -> dict:
+    """
+    探测参考图尺寸并按需缩放，缩放后的图片保存为持久 URL
+    
+    先只读取文件头部探测尺寸，尺寸符合要求时无需下载完整图片
+    
+    Returns:
+        {"width", "height", "resized_url", "message"}，无需缩放时 resized_url 为 None
+    
+    Raises:
+        Exception: 获取或处理图片失败
+    """
+    size = await probe_image_size(image_url)
+    if size is not None:
+        width, height = size
+        if not _target_size(width, height, min_dim, max_dim)[2]:
+            return {
+                "width": width,
+                "height": height,
+                "resized_url": None,
+                "message": f"图片尺寸 {width}x{height} 符合要求"
+            }
+    
+    # 需要缩放（或无法探测尺寸）时下载完整图片，优先读取本地媒体缓存
+    try:
+        image_data = await media_store.fetch(image_url, timeout=30.0)
+    except Exception as e:
+        raise Exception(f"无法获取图片: {str(e)}")
+    
+    info = await asyncio.to_thread(_resize_image_bytes, image_data, min_dim, max_dim)
+    width, height = info["width"], info["height"]
+    new_width, new_height = info["new_width"], info["new_height"]
+    
+    if info["data"] is None:
+        return {
+            "width": width,
+            "height": height,
+            "resized_url": None,
+            "message": f"图片尺寸 {width}x{height} 符合要求"
+        }
+    
+    print(f"[wan2.6-image] 调整参考图尺寸: {width}x{height} -> {new_width}x{new_height}")
+    image_bytes = info["data"]
+    extension = info["extension"]
+    
+    # 上传到 OSS 获取持久化 URL（避免使用 base64）
+    if oss_service.is_enabled():
+        try:
+            success, result = await asyncio.to_thread(
+                oss_service.upload_from_bytes,
+                image_bytes,
+                "image",
+                extension,
+                project_id
+            )
+            if success:
+                print(f"[wan2.6-image] 调整后的图片已上传到 OSS: {result}")
+                return {
+                    "width": width,
+                    "height": height,
+                    "resized_url": result,
+                    "message": f"图片已从 {width}x{height} 调整为 {new_width}x{new_height}，已上传到 OSS"
+                }
+            print(f"[wan2.6-image] OSS 上传失败: {result}")
+        except Exception as e:
+            print(f"[wan2.6-image] OSS 上传异常: {str(e)}")
+    
+    # OSS 未启用或上传失败时，保存到本地媒体存储
+    local_url = media_store.save(image_bytes, extension)
+    print(f"[wan2.6-image] OSS 未启用或上传失败，调整后的图片已保存到本地: {local_url}")
+    return {
+        "width": width,
+        "height": height,
+        "resized_url": local_url,
+        "message": f"图片已从 {width}x{height} 调整为 {new_width}x{new_height}（已保存到本地，建议启用 OSS）"
+    }
+
+
 async def validate_and_resize_reference_image(
     image_url: str, 
     min_dim: int = WAN26_IMAGE_MIN_DIM, 
@@ -40,7 +202,9 @@ async def validate_and_resize_reference_image(
     验证并调整参考图片尺寸，确保符合 wan2.6-image 要求
     
     如果图片尺寸不符合要求，会调整尺寸并上传到 OSS，返回新的 OSS URL。
-    避免使用 base64，因为 base64 编码会导致请求体过大。
+    OSS 未启用时保存到本地媒体存储，仅在发送给 API 时转换为 data URL。
+    处理结果按 源URL + 尺寸约束 缓存，重复使用同一张参考图时无需再次下载；
+    同一张图的并发请求共享同一个处理任务。
     
     Args:
         image_url: 图片URL
@@ -54,91 +218,22 @@ async def validate_and_resize_reference_image(
         - new_url_or_error: 新的URL（如果调整了则为 OSS URL）或错误信息
         - message: 处理信息
     """
-    import uuid
-    
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(image_url)
-            if response.status_code != 200:
-                return False, f"无法获取图片: HTTP {response.status_code}", ""
-            
-            # 读取图片
-            img = Image.open(BytesIO(response.content))
-            width, height = img.size
-            
-            # 检查是否需要调整
-            needs_resize = False
-            new_width, new_height = width, height
-            
-            # 检查最小尺寸
-            if width < min_dim or height < min_dim:
-                needs_resize = True
-                # 按比例放大到最小尺寸
-                scale = max(min_dim / width, min_dim / height)
-                new_width = int(width * scale)
-                new_height = int(height * scale)
-            
-            # 检查最大尺寸
-            if new_width > max_dim or new_height > max_dim:
-                needs_resize = True
-                # 按比例缩小到最大尺寸
-                scale = min(max_dim / new_width, max_dim / new_height)
-                new_width = int(new_width * scale)
-                new_height = int(new_height * scale)
-            
-            if not needs_resize:
-                return True, image_url, f"图片尺寸 {width}x{height} 符合要求"
-            
-            # 调整图片尺寸
-            print(f"[wan2.6-image] 调整参考图尺寸: {width}x{height} -> {new_width}x{new_height}")
-            
-            # 使用高质量重采样
-            resized_img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # 保存到字节流
-            buffer = BytesIO()
-            # 保存为原格式或默认 PNG
-            img_format = img.format or 'PNG'
-            if img_format.upper() == 'JPEG':
-                resized_img = resized_img.convert('RGB')
-                extension = 'jpg'
+        with span("reference_image.prepare", min_dim=min_dim, max_dim=max_dim):
+            if reference_cache.is_cacheable(image_url):
+                key = reference_cache.make_key(image_url, min_dim, max_dim)
+                entry = await reference_cache.get_or_process(
+                    key,
+                    lambda: _preprocess_reference_image(image_url, min_dim, max_dim, project_id)
+                )
             else:
-                extension = img_format.lower()
-            resized_img.save(buffer, format=img_format, quality=95)
-            buffer.seek(0)
-            image_bytes = buffer.getvalue()
-            
-            # 上传到 OSS 获取持久化 URL（避免使用 base64）
-            if oss_service.is_enabled():
-                try:
-                    success, result = oss_service.upload_from_bytes(
-                        image_bytes, 
-                        "image", 
-                        extension,
-                        project_id
-                    )
-                    if success:
-                        print(f"[wan2.6-image] 调整后的图片已上传到 OSS: {result}")
-                        return True, result, f"图片已从 {width}x{height} 调整为 {new_width}x{new_height}，已上传到 OSS"
-                    else:
-                        print(f"[wan2.6-image] OSS 上传失败: {result}")
-                except Exception as e:
-                    print(f"[wan2.6-image] OSS 上传异常: {str(e)}")
-            
-            # OSS 未启用或上传失败时，退回到 base64（不推荐，但作为降级方案）
-            print(f"[wan2.6-image] 警告: OSS 未启用或上传失败，使用 base64 作为降级方案")
-            img_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            mime_type = f"image/{img_format.lower()}"
-            if img_format.upper() == 'JPEG':
-                mime_type = "image/jpeg"
-            elif img_format.upper() == 'PNG':
-                mime_type = "image/png"
-            
-            base64_url = f"data:{mime_type};base64,{img_base64}"
-            return True, base64_url, f"图片已从 {width}x{height} 调整为 {new_width}x{new_height}（使用 base64，建议启用 OSS）"
-            
+                entry = await _preprocess_reference_image(image_url, min_dim, max_dim, project_id)
     except Exception as e:
         return False, f"处理图片失败: {str(e)}", ""
+    
+    # 本地图片外部无法访问，发送前转换
+    final_url = entry.get("resized_url") or image_url
+    return True, media_store.to_api_url(final_url), entry.get("message", "")
 
 
 class TextToImageService:
@@ -177,7 +272,8 @@ class TextToImageService:
         prompt_extend: Optional[bool] = None,
         watermark: Optional[bool] = None,
         seed: Optional[int] = None,
-        project_id: str = ""
+        project_id: str = "",
+        use_cache: Optional[bool] = None
     ) -> str:
         """
         生成单张图片
@@ -192,11 +288,12 @@ class TextToImageService:
             watermark: 是否添加水印（仅 wan2.6 支持）
             seed: 种子（使用配置默认值）
             project_id: 项目ID，用于 OSS 上传路径
+            use_cache: 为 False 时跳过结果缓存读取
             
         Returns:
             图片 URL（如果启用 OSS，返回 OSS URL）
         """
-        urls = await self.generate_batch(
+        result = await self.generate_batch(
             prompt=prompt,
             negative_prompt=negative_prompt,
             width=width,
@@ -206,9 +303,10 @@ class TextToImageService:
             prompt_extend=prompt_extend,
             watermark=watermark,
             seed=seed,
-            project_id=project_id
+            project_id=project_id,
+            use_cache=use_cache
         )
-        return urls[0] if urls else ""
+        return result.urls[0] if result.urls else ""
     
     async def generate_batch(
         self,
@@ -221,7 +319,8 @@ class TextToImageService:
         prompt_extend: Optional[bool] = None,
         watermark: Optional[bool] = None,
         seed: Optional[int] = None,
-        project_id: str = ""
+        project_id: str = "",
+        use_cache: Optional[bool] = None
     ) -> GenerationResult:
         """
         批量生成图片
@@ -237,38 +336,145 @@ class TextToImageService:
             watermark: 是否添加水印（仅 wan2.6 支持）
             seed: 种子
             project_id: 项目ID，用于 OSS 上传路径
+            use_cache: 为 False 时跳过结果缓存读取（指定种子且开启缓存时生效）
             
         Returns:
             GenerationResult: 包含图片URL列表和task_id/request_id
         """
-        # 使用配置的默认值
-        final_width = width if width is not None else self.image_config.width
-        final_height = height if height is not None else self.image_config.height
-        final_model = model or self.image_config.model
+        params, cache_key = self._prepare_batch(
+            prompt, negative_prompt, width, height, n, model, prompt_extend, watermark, seed
+        )
+        # 相同请求（指定种子）直接返回缓存的结果
+        cached_urls = get_cached_generation(cache_key, use_cache)
+        if cached_urls:
+            return GenerationResult(urls=cached_urls)
         
-        # 获取模型配置
+        result = await self._dispatch_generate_batch(**params, project_id=project_id)
+        save_generation(cache_key, result.urls)
+        return result
+    
+    def supports_submit(self, model: Optional[str] = None) -> bool:
+        """模型是否支持只创建任务（submit_batch），同步接口和 SDK 调用的模型不支持"""
+        final_model = model or self.image_config.model
         model_info = IMAGE_MODELS.get(final_model, {})
-        use_http = model_info.get('use_http', False)
-        is_async = model_info.get('is_async', False)
+        return final_model == 'wan2.6-image' or bool(model_info.get('use_http') and model_info.get('is_async'))
+    
+    def _prepare_batch(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        width: Optional[int],
+        height: Optional[int],
+        n: int,
+        model: Optional[str],
+        prompt_extend: Optional[bool],
+        watermark: Optional[bool],
+        seed: Optional[int]
+    ) -> Tuple[dict, str]:
+        """
+        补全默认参数，计算结果缓存键
         
-        # 构造 size 参数
-        size = f"{final_width}*{final_height}"
+        Returns:
+            (生成参数, 结果缓存键)
+        """
+        # 使用配置的默认值
+        final_width = width if width is not None else self.image_config.width
+        final_height = height if height is not None else self.image_config.height
         
         # 种子设置
         final_seed = seed if seed is not None else self.image_config.seed
         final_prompt_extend = prompt_extend if prompt_extend is not None else self.image_config.prompt_extend
         final_watermark = watermark if watermark is not None else getattr(self.image_config, 'watermark', False)
         
+        params = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "size": f"{final_width}*{final_height}",
+            "n": n,
+            "model": model or self.image_config.model,
+            "prompt_extend": final_prompt_extend,
+            "watermark": final_watermark,
+            "seed": final_seed
+        }
+        cache_key = generation_cache_key(params["model"], {
+            key: value for key, value in params.items() if key != "model"
+        })
+        return params, cache_key
+    
+    async def submit_batch(
+        self,
+        prompt: str,
+        negative_prompt: str = "",
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        n: int = 1,
+        model: Optional[str] = None,
+        prompt_extend: Optional[bool] = None,
+        watermark: Optional[bool] = None,
+        seed: Optional[int] = None,
+        project_id: str = "",
+        use_cache: Optional[bool] = None
+    ) -> SubmittedImageTask:
+        """
+        只创建生成任务，不等待结果（参数同 generate_batch，模型需支持异步任务）
+        结果由调用方通过 query_image_task 查询
+        
+        Returns:
+            已创建的任务（命中缓存时直接包含图片）
+        """
+        params, cache_key = self._prepare_batch(
+            prompt, negative_prompt, width, height, n, model, prompt_extend, watermark, seed
+        )
+        if not self.supports_submit(params["model"]):
+            raise ValueError(f"模型 {params['model']} 不支持异步任务")
+        
+        cached_urls = get_cached_generation(cache_key, use_cache)
+        if cached_urls:
+            return SubmittedImageTask(cache_key=cache_key, urls=cached_urls)
+        
+        if params["model"] == 'wan2.6-image':
+            submitted = await self._create_wan26_image_task(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                size=params["size"],
+                n=n,
+                prompt_extend=params["prompt_extend"],
+                watermark=params["watermark"],
+                seed=params["seed"],
+                project_id=project_id
+            )
+        else:
+            submitted = await self._create_http_async_task(**params)
+        submitted.cache_key = cache_key
+        return submitted
+    
+    async def _dispatch_generate_batch(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        size: str,
+        n: int,
+        model: str,
+        prompt_extend: bool,
+        watermark: bool,
+        seed: Optional[int],
+        project_id: str
+    ) -> GenerationResult:
+        """按模型类型选择调用方式"""
+        model_info = IMAGE_MODELS.get(model, {})
+        use_http = model_info.get('use_http', False)
+        is_async = model_info.get('is_async', False)
+        
         # wan2.6-image 使用 HTTP 异步调用（需要轮询）
-        if final_model == 'wan2.6-image':
+        if model == 'wan2.6-image':
             urls = await self._generate_batch_wan26_image(
                 prompt=prompt,
                 negative_prompt=negative_prompt,
                 size=size,
                 n=n,
-                prompt_extend=final_prompt_extend,
-                watermark=final_watermark,
-                seed=final_seed,
+                prompt_extend=prompt_extend,
+                watermark=watermark,
+                seed=seed,
                 project_id=project_id,
                 image_urls=None,  # 纯文生图不需要参考图
                 enable_interleave=False
@@ -283,10 +489,10 @@ class TextToImageService:
                 negative_prompt=negative_prompt,
                 size=size,
                 n=n,
-                model=final_model,
-                prompt_extend=final_prompt_extend,
-                watermark=final_watermark,
-                seed=final_seed,
+                model=model,
+                prompt_extend=prompt_extend,
+                watermark=watermark,
+                seed=seed,
                 project_id=project_id
             )
         
@@ -297,10 +503,10 @@ class TextToImageService:
                 negative_prompt=negative_prompt,
                 size=size,
                 n=n,
-                model=final_model,
-                prompt_extend=final_prompt_extend,
-                watermark=final_watermark,
-                seed=final_seed,
+                model=model,
+                prompt_extend=prompt_extend,
+                watermark=watermark,
+                seed=seed,
                 project_id=project_id
             )
             return GenerationResult(urls=urls)
@@ -311,10 +517,10 @@ class TextToImageService:
             negative_prompt=negative_prompt,
             size=size,
             n=n,
-            model=final_model,
-            prompt_extend=final_prompt_extend,
-            watermark=final_watermark,
-            seed=final_seed,
+            model=model,
+            prompt_extend=prompt_extend,
+            watermark=watermark,
+            seed=seed,
             project_id=project_id
         )
         return GenerationResult(urls=urls)
@@ -424,7 +630,7 @@ class TextToImageService:
             print(f"[文生图HTTP] 异常: {str(e)}")
             raise
     
-    async def _generate_batch_http_async(
+    async def _create_http_async_task(
         self,
         prompt: str,
         negative_prompt: str,
@@ -433,22 +639,14 @@ class TextToImageService:
         model: str,
         prompt_extend: bool,
         watermark: bool,
-        seed: Optional[int],
-        project_id: str
-    ) -> List[str]:
+        seed: Optional[int]
+    ) -> SubmittedImageTask:
         """
-        使用 HTTP 异步接口生成图片（wan2.6-t2i）
-        
-        步骤：
-        1. 创建任务获取 task_id
-        2. 轮询获取结果
+        创建 HTTP 异步生成任务（wan2.6-t2i），只返回 task_id
         
         参考: https://help.aliyun.com/zh/model-studio/text-to-image-v2-api-reference
         """
-        import asyncio
-        import json
         
-        # 步骤1：创建任务
         # 注意：异步调用使用不同的端点
         url = f"{self.base_url}/services/aigc/image-generation/generation"
         
@@ -491,30 +689,70 @@ class TextToImageService:
         print(f"[文生图HTTP异步] 模型: {model}, 尺寸: {size}, 数量: {n}")
         print(f"[文生图HTTP异步] 提示词: {prompt[:100]}...")
         
+        try:
+            response = await get_http_client().post(url, json=request_body, headers=headers, timeout=60)
+        except httpx.TimeoutException:
+            print(f"[文生图HTTP异步] 请求超时")
+            raise Exception("文生图请求超时")
+        result = response.json()
+        
+        log_debug(logger, "[文生图HTTP异步] 创建任务响应", status_code=response.status_code, response=result)
+        
+        # 获取 request_id
+        request_id = result.get("request_id")
+        
+        if response.status_code != 200:
+            error_code = result.get('code', 'Unknown')
+            error_message = result.get('message', response.text)
+            print(f"[文生图HTTP异步] 创建任务失败: {error_code} - {error_message}")
+            raise Exception(f"创建任务失败: {error_code} - {error_message}")
+        
+        task_id = result.get("output", {}).get("task_id")
+        if not task_id:
+            raise Exception(f"创建任务失败: 未返回 task_id")
+        
+        print(f"[文生图HTTP异步] 任务已创建，task_id: {task_id}, request_id: {request_id}")
+        return SubmittedImageTask(task_id=task_id, request_id=request_id)
+    
+    async def _generate_batch_http_async(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        size: str,
+        n: int,
+        model: str,
+        prompt_extend: bool,
+        watermark: bool,
+        seed: Optional[int],
+        project_id: str
+    ) -> List[str]:
+        """
+        使用 HTTP 异步接口生成图片（wan2.6-t2i）
+        
+        步骤：
+        1. 创建任务获取 task_id
+        2. 轮询获取结果
+        """
+        import asyncio
+        
+        submitted = await self._create_http_async_task(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            size=size,
+            n=n,
+            model=model,
+            prompt_extend=prompt_extend,
+            watermark=watermark,
+            seed=seed
+        )
+        task_id = submitted.task_id
+        request_id = submitted.request_id
+        # 登记任务，轮询中断时由后台回收结果
+        track_image_task(task_id, project_id, prompt=prompt)
+        
         try:
             # 使用较长的超时时间以支持轮询
             async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=60.0)) as client:
-                # 创建任务
-                response = await client.post(url, json=request_body, headers=headers)
-                result = response.json()
-                
-                print(f"[文生图HTTP异步] 创建任务响应: {json.dumps(result, ensure_ascii=False)[:500]}")
-                
-                # 获取 request_id
-                request_id = result.get("request_id")
-                
-                if response.status_code != 200:
-                    error_code = result.get('code', 'Unknown')
-                    error_message = result.get('message', response.text)
-                    print(f"[文生图HTTP异步] 创建任务失败: {error_code} - {error_message}")
-                    raise Exception(f"创建任务失败: {error_code} - {error_message}")
-                
-                task_id = result.get("output", {}).get("task_id")
-                if not task_id:
-                    raise Exception(f"创建任务失败: 未返回 task_id")
-                
-                print(f"[文生图HTTP异步] 任务已创建，task_id: {task_id}, request_id: {request_id}")
-                
                 # 步骤2：轮询获取结果
                 query_url = f"{self.base_url}/tasks/{task_id}"
                 max_wait_time = 300  # 5分钟
@@ -533,7 +771,7 @@ class TextToImageService:
                     query_result = query_response.json()
                     
                     task_status = query_result.get("output", {}).get("task_status", "UNKNOWN")
-                    print(f"[文生图HTTP异步] 任务状态: {task_status}, 已等待: {elapsed_time}s")
+                    log_debug(logger, "[文生图HTTP异步] 任务状态", task_id=task_id, task_status=task_status, elapsed=elapsed_time)
                     
                     if task_status == "SUCCEEDED":
                         # 从 choices 中提取图片 URL
@@ -554,15 +792,18 @@ class TextToImageService:
                             for img_url in urls:
                                 oss_url = await oss_service.upload_image_async(img_url, project_id)
                                 oss_urls.append(oss_url)
+                            finish_image_task(task_id)
                             return GenerationResult(urls=oss_urls, task_id=task_id, request_id=request_id)
                         
+                        finish_image_task(task_id)
                         return GenerationResult(urls=urls, task_id=task_id, request_id=request_id)
                     
                     elif task_status == "FAILED":
                         error_code = query_result.get("output", {}).get("code", "Unknown")
                         error_msg = query_result.get("output", {}).get("message", "未知错误")
                         print(f"[文生图HTTP异步] 任务失败: {error_code} - {error_msg}")
-                        print(f"[文生图HTTP异步] 完整响应: {json.dumps(query_result, ensure_ascii=False)}")
+                        log_debug(logger, "[文生图HTTP异步] 完整响应", response=query_result)
+                        finish_image_task(task_id)
                         raise Exception(f"图片生成失败: {error_code} - {error_msg}")
                     
                     elif task_status in ["PENDING", "RUNNING"]:
@@ -575,9 +816,11 @@ class TextToImageService:
                 
         except httpx.TimeoutException:
             print(f"[文生图HTTP异步] 请求超时")
+            release_image_task(task_id)
             raise Exception("文生图请求超时")
-        except Exception as e:
+        except BaseException as e:
             print(f"[文生图HTTP异步] 异常: {str(e)}")
+            release_image_task(task_id)
             raise
     
     async def _generate_batch_sdk(
@@ -659,7 +902,7 @@ class TextToImageService:
         
         raise Exception(f"图片生成超时（已等待 {max_wait_time} 秒）")
     
-    async def _generate_batch_wan26_image(
+    async def _create_wan26_image_task(
         self,
         prompt: str,
         negative_prompt: str,
@@ -672,9 +915,9 @@ class TextToImageService:
         image_urls: Optional[List[str]] = None,
         enable_interleave: bool = False,
         max_images: int = 5
-    ) -> List[str]:
+    ) -> SubmittedImageTask:
         """
-        使用 HTTP 异步接口生成图片（wan2.6-image）
+        创建 wan2.6-image 生成任务（HTTP 异步接口），只返回 task_id
         支持：
         - 参考图生图 (enable_interleave=false, 1-3张参考图)
         - 图文混合输出 (enable_interleave=true, 0-1张参考图)
@@ -682,8 +925,6 @@ class TextToImageService:
         
         注意：参考图片尺寸必须在 384-5000 像素之间，否则会自动调整
         """
-        import asyncio
-        import json
         
         # 构建请求 URL
         url = f"{self.base_url}/services/aigc/image-generation/generation"
@@ -756,84 +997,132 @@ class TextToImageService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                # 步骤1：创建任务
-                response = await client.post(url, headers=headers, json=request_body)
-                result = response.json()
-                
-                print(f"[wan2.6-image] 创建任务响应: {json.dumps(result, ensure_ascii=False)[:500]}")
+            response = await get_http_client().post(url, headers=headers, json=request_body, timeout=30)
+        except httpx.TimeoutException:
+            print(f"[wan2.6-image] 请求超时")
+            raise Exception("wan2.6-image 请求超时")
+        result = response.json()
+        
+        log_debug(logger, "[wan2.6-image] 创建任务响应", status_code=response.status_code, response=result)
+        
+        if "output" not in result or "task_id" not in result.get("output", {}):
+            error_code = result.get("code", "Unknown")
+            error_msg = result.get("message", "未知错误")
+            raise Exception(f"创建任务失败: {error_code} - {error_msg}")
+        
+        task_id = result["output"]["task_id"]
+        print(f"[wan2.6-image] 任务已创建，task_id: {task_id}")
+        return SubmittedImageTask(task_id=task_id, request_id=result.get("request_id"))
+    
+    async def _generate_batch_wan26_image(
+        self,
+        prompt: str,
+        negative_prompt: str,
+        size: str,
+        n: int,
+        prompt_extend: bool,
+        watermark: bool,
+        seed: Optional[int],
+        project_id: str,
+        image_urls: Optional[List[str]] = None,
+        enable_interleave: bool = False,
+        max_images: int = 5,
+        cache_key: Optional[str] = None
+    ) -> List[str]:
+        """
+        使用 HTTP 异步接口生成图片（wan2.6-image）
+        创建任务后轮询结果，参数说明见 _create_wan26_image_task；
+        轮询中断时由后台回收结果（有 cache_key 时写入结果缓存，否则保存到图库）
+        """
+        import asyncio
+        
+        submitted = await self._create_wan26_image_task(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            size=size,
+            n=n,
+            prompt_extend=prompt_extend,
+            watermark=watermark,
+            seed=seed,
+            project_id=project_id,
+            image_urls=image_urls,
+            enable_interleave=enable_interleave,
+            max_images=max_images
+        )
+        task_id = submitted.task_id
+        # 登记任务，轮询中断时由后台回收结果
+        track_image_task(task_id, project_id, cache_key, prompt)
+        
+        try:
+            client = get_http_client()
+            # 步骤2：轮询获取结果
+            query_url = f"{self.base_url}/tasks/{task_id}"
+            max_wait_time = 300  # 5分钟
+            poll_interval = 10  # 每10秒检查一次
+            elapsed_time = 0
+            
+            query_headers = {
+                "Authorization": f"Bearer {self.api_key}"
+            }
+            
+            while elapsed_time < max_wait_time:
+                await asyncio.sleep(poll_interval)
+                elapsed_time += poll_interval
                 
-                if "output" not in result or "task_id" not in result.get("output", {}):
-                    error_code = result.get("code", "Unknown")
-                    error_msg = result.get("message", "未知错误")
-                    raise Exception(f"创建任务失败: {error_code} - {error_msg}")
+                query_response = await client.get(query_url, headers=query_headers, timeout=30.0)
+                query_result = query_response.json()
                 
-                task_id = result["output"]["task_id"]
-                print(f"[wan2.6-image] 任务已创建，task_id: {task_id}")
+                task_status = query_result.get("output", {}).get("task_status", "UNKNOWN")
+                log_debug(logger, "[wan2.6-image] 任务状态", task_id=task_id, task_status=task_status, elapsed=elapsed_time)
                 
-                # 步骤2：轮询获取结果
-                query_url = f"{self.base_url}/tasks/{task_id}"
-                max_wait_time = 300  # 5分钟
-                poll_interval = 10  # 每10秒检查一次
-                elapsed_time = 0
-                
-                query_headers = {
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                while elapsed_time < max_wait_time:
-                    await asyncio.sleep(poll_interval)
-                    elapsed_time += poll_interval
+                if task_status == "SUCCEEDED":
+                    # 从 choices 中提取图片 URL
+                    choices = query_result.get("output", {}).get("choices", [])
+                    urls = []
                     
-                    query_response = await client.get(query_url, headers=query_headers)
-                    query_result = query_response.json()
-                    
-                    task_status = query_result.get("output", {}).get("task_status", "UNKNOWN")
-                    print(f"[wan2.6-image] 任务状态: {task_status}, 已等待: {elapsed_time}s")
-                    
-                    if task_status == "SUCCEEDED":
-                        # 从 choices 中提取图片 URL
-                        choices = query_result.get("output", {}).get("choices", [])
-                        urls = []
-                        
-                        for choice in choices:
-                            message_content = choice.get("message", {}).get("content", [])
-                            for item in message_content:
-                                if item.get("type") == "image" and item.get("image"):
-                                    urls.append(item["image"])
-                        
-                        print(f"[wan2.6-image] 生成成功，共 {len(urls)} 张图片")
-                        
-                        # 上传到 OSS（使用异步方法）
-                        if oss_service.is_enabled():
-                            oss_urls = []
-                            for img_url in urls:
-                                oss_url = await oss_service.upload_image_async(img_url, project_id)
-                                oss_urls.append(oss_url)
-                            return oss_urls
-                        
-                        return urls
+                    for choice in choices:
+                        message_content = choice.get("message", {}).get("content", [])
+                        for item in message_content:
+                            if item.get("type") == "image" and item.get("image"):
+                                urls.append(item["image"])
                     
-                    elif task_status == "FAILED":
-                        error_code = query_result.get("output", {}).get("code", "Unknown")
-                        error_msg = query_result.get("output", {}).get("message", "未知错误")
-                        print(f"[wan2.6-image] 任务失败: {error_code} - {error_msg}")
-                        print(f"[wan2.6-image] 完整响应: {json.dumps(query_result, ensure_ascii=False)}")
-                        raise Exception(f"图片生成失败: {error_code} - {error_msg}")
+                    print(f"[wan2.6-image] 生成成功，共 {len(urls)} 张图片")
                     
-                    elif task_status in ["PENDING", "RUNNING"]:
-                        continue
+                    # 上传到 OSS（使用异步方法）
+                    if oss_service.is_enabled():
+                        oss_urls = []
+                        for img_url in urls:
+                            oss_url = await oss_service.upload_image_async(img_url, project_id)
+                            oss_urls.append(oss_url)
+                        finish_image_task(task_id)
+                        return oss_urls
                     
-                    else:
-                        raise Exception(f"未知的任务状态: {task_status}")
+                    finish_image_task(task_id)
+                    return urls
                 
-                raise Exception(f"图片生成超时（已等待 {max_wait_time} 秒）")
+                elif task_status == "FAILED":
+                    error_code = query_result.get("output", {}).get("code", "Unknown")
+                    error_msg = query_result.get("output", {}).get("message", "未知错误")
+                    print(f"[wan2.6-image] 任务失败: {error_code} - {error_msg}")
+                    log_debug(logger, "[wan2.6-image] 完整响应", response=query_result)
+                    finish_image_task(task_id)
+                    raise Exception(f"图片生成失败: {error_code} - {error_msg}")
+                
+                elif task_status in ["PENDING", "RUNNING"]:
+                    continue
                 
+                else:
+                    raise Exception(f"未知的任务状态: {task_status}")
+            
+            raise Exception(f"图片生成超时（已等待 {max_wait_time} 秒）")
+            
         except httpx.TimeoutException:
             print(f"[wan2.6-image] 请求超时")
+            release_image_task(task_id)
             raise Exception("wan2.6-image 请求超时")
-        except Exception as e:
+        except BaseException as e:
             print(f"[wan2.6-image] 异常: {str(e)}")
+            release_image_task(task_id)
             raise
     
     async def generate_with_wan26_image(
@@ -848,7 +1137,8 @@ class TextToImageService:
         seed: Optional[int] = None,
         enable_interleave: bool = False,
         max_images: int = 5,
-        project_id: str = ""
+        project_id: str = "",
+        use_cache: Optional[bool] = None
     ) -> List[str]:
         """
         使用 wan2.6-image 生成图片的公开接口
@@ -865,20 +1155,70 @@ class TextToImageService:
             enable_interleave: 是否启用图文混合模式
             max_images: 图文混合模式下最大生成图数（1-5）
             project_id: 项目ID
+            use_cache: 为 False 时跳过结果缓存读取
         """
-        return await self._generate_batch_wan26_image(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            size=size,
-            n=n,
-            prompt_extend=prompt_extend,
-            watermark=watermark,
-            seed=seed,
-            project_id=project_id,
-            image_urls=image_urls,
-            enable_interleave=enable_interleave,
-            max_images=max_images
+        params = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "size": size,
+            "n": n,
+            "prompt_extend": prompt_extend,
+            "watermark": watermark,
+            "seed": seed,
+            "enable_interleave": enable_interleave,
+            "max_images": max_images
+        }
+        cache_key = generation_cache_key("wan2.6-image", params, image_urls)
+        cached_urls = get_cached_generation(cache_key, use_cache)
+        if cached_urls:
+            return cached_urls
+        
+        urls = await self._generate_batch_wan26_image(
+            **params, project_id=project_id, image_urls=image_urls, cache_key=cache_key
         )
+        save_generation(cache_key, urls)
+        return urls
+    
+    async def submit_wan26_image(
+        self,
+        prompt: str,
+        image_urls: Optional[List[str]] = None,
+        negative_prompt: str = "",
+        n: int = 1,
+        size: str = "1280*1280",
+        prompt_extend: bool = True,
+        watermark: bool = False,
+        seed: Optional[int] = None,
+        enable_interleave: bool = False,
+        max_images: int = 5,
+        project_id: str = "",
+        use_cache: Optional[bool] = None
+    ) -> SubmittedImageTask:
+        """
+        只创建 wan2.6-image 生成任务，不等待结果（参数同 generate_with_wan26_image）
+        
+        Returns:
+            已创建的任务（命中缓存时直接包含图片）
+        """
+        params = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "size": size,
+            "n": n,
+            "prompt_extend": prompt_extend,
+            "watermark": watermark,
+            "seed": seed,
+            "enable_interleave": enable_interleave,
+            "max_images": max_images
+        }
+        cache_key = generation_cache_key("wan2.6-image", params, image_urls)
+        cached_urls = get_cached_generation(cache_key, use_cache)
+        if cached_urls:
+            return SubmittedImageTask(cache_key=cache_key, urls=cached_urls)
+        
+        submitted = await self._create_wan26_image_task(**params, project_id=project_id, image_urls=image_urls)
+        submitted.cache_key = cache_key
+        return submitted
     
     async def generate_character_views(
         self,
@@ -0,0 +1,187 @@
+"""
+视频帧提取服务
+使用 FFmpeg 按时间点直接定位提取视频帧，不需要先下载完整视频
+
+- 尾帧：-sseof 从结尾前一小段开始解码，逐帧覆盖输出，最终留下的就是真正的最后一帧
+- 指定时间点：-ss 输入定位（先跳到之前的关键帧再精确解码到目标时间）；负数表示距结尾的时间
+- 远程视频：FFmpeg 直接读取 URL，只按需请求文件头（moov）和目标位置附近的数据；
+  读取失败时退回到完整下载（写入本地媒体缓存），只重新提取读取失败的时间点；
+  时间点无效（如超出视频时长）时直接报错，不下载
+- 并发：同时运行的 FFmpeg 进程数受 FRAME_WORKERS 限制，子进程执行，不阻塞事件循环
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Union
+
+from app.services.media_store import media_store
+from app.services.image_probe import parse_image_size
+from app.services.video_concat import video_concat_service, FFMPEG_STAGE_SECONDS
+
+# 同时运行的 FFmpeg 进程数
+FRAME_WORKERS = max(2, min(8, os.cpu_count() or 2))
+# 提取尾帧时从结尾前多少秒开始解码（需覆盖最后一个关键帧之后的内容）
+LAST_FRAME_WINDOW = 1.0
+# 读取远程视频的超时（微秒，FFmpeg rw_timeout）
+REMOTE_TIMEOUT_US = 30 * 1000 * 1000
+# 输出 JPEG 质量（FFmpeg -q:v，2-31，越小质量越高）
+JPEG_QUALITY = 2
+
+# 表示尾帧的时间点
+LAST_FRAME = "last"
+
+
+@dataclass
+class ExtractedFrame:
+    """提取出的单帧"""
+    timestamp: Union[float, str]  # 请求的时间点（秒，负数表示距结尾；"last" 表示尾帧）
+    data: bytes  # JPEG 数据
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+class FrameExtractError(Exception):
+    """帧提取失败"""
+    pass
+
+
+class FrameSourceError(FrameExtractError):
+    """视频无法读取（FFmpeg 异常退出），远程视频可改为下载后再提取"""
+    pass
+
+
+class FrameExtractService:
+    """视频帧提取服务"""
+
+    def __init__(self):
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def _run(self, cmd: List[str]) -> tuple:
+        """执行 FFmpeg（受进程数限制），返回 (returncode, stderr)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(FRAME_WORKERS)
+        async with self._semaphore:
+            with FFMPEG_STAGE_SECONDS.time(stage="frame_extract"):
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                try:
+                    _, stderr = await process.communicate()
+                except asyncio.CancelledError:
+                    # 调用方取消时结束进程，避免继续写入即将删除的临时目录
+                    process.kill()
+                    await process.wait()
+                    raise
+            return process.returncode, stderr.decode("utf-8", errors="ignore")
+
+    @staticmethod
+    def _build_command(source: str, timestamp: Union[float, str], output_path: str) -> List[str]:
+        cmd = ["ffmpeg", "-y", "-v", "error"]
+        if source.startswith(("http://", "https://")):
+            cmd += ["-rw_timeout", str(REMOTE_TIMEOUT_US)]
+        if timestamp == LAST_FRAME:
+            # 解码最后一小段，每一帧覆盖同一个文件，结束时保留最后一帧
+            cmd += ["-sseof", f"-{LAST_FRAME_WINDOW}", "-i", source, "-update", "1"]
+        elif timestamp < 0:
+            cmd += ["-sseof", f"{timestamp:.3f}", "-i", source, "-frames:v", "1"]
+        else:
+            cmd += ["-ss", f"{timestamp:.3f}", "-i", source, "-frames:v", "1"]
+        cmd += ["-an", "-sn", "-q:v", str(JPEG_QUALITY), output_path]
+        return cmd
+
+    async def _extract_one(
+        self,
+        source: str,
+        timestamp: Union[float, str],
+        work_dir: str,
+        index: int
+    ) -> ExtractedFrame:
+        output_path = os.path.join(work_dir, f"frame_{index}.jpg")
+        returncode, stderr = await self._run(self._build_command(source, timestamp, output_path))
+        if returncode != 0:
+            raise FrameSourceError(f"时间点 {timestamp} 提取失败: {stderr.strip()[-300:] or f'FFmpeg 退出码 {returncode}'}")
+        if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+            # FFmpeg 正常结束但没有输出帧：时间点超出视频范围
+            raise FrameExtractError(f"时间点 {timestamp} 提取失败: 没有输出帧（时间点可能超出视频时长）")
+        with open(output_path, "rb") as f:
+            data = f.read()
+        size = parse_image_size(data) or (None, None)
+        return ExtractedFrame(timestamp=timestamp, data=data, width=size[0], height=size[1])
+
+    async def _extract_from(self, source: str, timestamps: Sequence[Union[float, str]]) -> list:
+        """
+        提取全部时间点，按顺序返回 ExtractedFrame 或失败时的异常
+
+        所有 FFmpeg 进程结束后才删除临时目录（某个时间点失败不会中断其他进程）。
+        """
+        work_dir = tempfile.mkdtemp(prefix="frames_")
+        try:
+            return await asyncio.gather(*[
+                self._extract_one(source, timestamp, work_dir, i)
+                for i, timestamp in enumerate(timestamps)
+            ], return_exceptions=True)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _frames(results: list) -> List[ExtractedFrame]:
+        """有时间点失败时抛出第一个异常"""
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def extract(self, url: str, timestamps: Sequence[Union[float, str]]) -> List[ExtractedFrame]:
+        """
+        从同一个视频提取多帧，结果按 timestamps 顺序返回
+
+        Args:
+            url: 视频 URL（本地 /assets、已缓存的远程 URL 或任意 http(s) URL）
+            timestamps: 时间点列表；秒数（负数表示距结尾），或 LAST_FRAME 表示尾帧
+
+        Raises:
+            FrameExtractError: 视频无法读取或某个时间点提取失败
+        """
+        if not timestamps:
+            return []
+        if not video_concat_service.check_ffmpeg():
+            raise FrameExtractError("FFmpeg 不可用，请先安装 FFmpeg")
+
+        local_path = media_store.get_path(url)
+        if local_path is not None:
+            return self._frames(await self._extract_from(str(local_path), timestamps))
+        if media_store.is_local_url(url):
+            raise FrameExtractError(f"本地文件不存在: {url}")
+
+        # 直接读取远程视频，FFmpeg 按需发送 Range 请求
+        results = await self._extract_from(url, timestamps)
+        failed = [i for i, result in enumerate(results) if isinstance(result, FrameSourceError)]
+        if not failed:
+            # 全部成功，或只是时间点无效（下载完整视频也无法提取）
+            return self._frames(results)
+        print(f"[帧提取] 远程读取失败，改为下载完整视频: {results[failed[0]]}")
+
+        try:
+            await media_store.fetch(url, timeout=120.0)
+        except Exception as e:
+            raise FrameExtractError(f"无法下载视频: {e}")
+        local_path = media_store.get_path(url)
+        if local_path is None:
+            raise FrameExtractError("视频下载后无法写入本地缓存")
+        retried = await self._extract_from(str(local_path), [timestamps[i] for i in failed])
+        for i, result in zip(failed, retried):
+            results[i] = result
+        return self._frames(results)
+
+    async def extract_last_frame(self, url: str) -> ExtractedFrame:
+        """提取视频尾帧"""
+        return (await self.extract(url, [LAST_FRAME]))[0]
+
+
+# 全局帧提取服务实例
+frame_extract_service = FrameExtractService()
@@ -0,0 +1,204 @@
+"""
+图片尺寸探测
+只读取文件头部（HTTP Range 请求前几十 KB）解析 PNG / JPEG / WebP / GIF 的宽高，
+无法从头部解析时才完整下载并用 PIL 解码
+
+- 本地 /assets 文件和已缓存的远程文件直接读取本地副本
+- data URL 直接解码
+- 远程 URL 使用共享连接池发送 Range 请求；服务器不支持 Range 时读到足够字节后立即断开
+"""
+
+import asyncio
+import base64
+import struct
+from io import BytesIO
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from app.services.media_store import media_store
+from app.services.dashscope.http_client import get_http_client
+
+# 头部探测读取的最大字节数（JPEG 的 EXIF 段可能较大，SOF 标记不一定在最前面）
+PROBE_HEAD_BYTES = 64 * 1024
+# 单次探测请求超时（秒）
+PROBE_TIMEOUT = 15.0
+# 批量探测的默认并发数
+PROBE_CONCURRENCY = 8
+
+# 带尺寸信息的 JPEG SOF 标记（排除 DHT=C4、JPG=C8、DAC=CC）
+_JPEG_SOF_MARKERS = {
+    0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+    0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF
+}
+# 没有长度字段的 JPEG 标记（TEM、RST0-7、SOI）
+_JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+
+def _parse_jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """逐段跳过 JPEG 标记，直到找到 SOF 段"""
+    i = 2
+    length = len(data)
+    while i < length:
+        if data[i] != 0xFF:
+            return None
+        # 跳过填充字节
+        while i < length and data[i] == 0xFF:
+            i += 1
+        if i >= length:
+            return None
+        marker = data[i]
+        i += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9 or i + 2 > length:
+            return None
+        segment_length = struct.unpack(">H", data[i:i + 2])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if i + 7 > length:
+                return None
+            height, width = struct.unpack(">HH", data[i + 3:i + 7])
+            return width, height
+        i += segment_length
+    return None
+
+
+def _parse_webp_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """解析 WebP 的 VP8 / VP8L / VP8X 块"""
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        # 有损格式：关键帧起始码之后是 14 位宽高
+        if data[23:26] != b"\x9d\x01\x2a":
+            return None
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        # 无损格式：签名 0x2f 之后 14 位宽 - 1、14 位高 - 1
+        if data[20] != 0x2F:
+            return None
+        b0, b1, b2, b3 = data[21:25]
+        width = 1 + (((b1 & 0x3F) << 8) | b0)
+        height = 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+        return width, height
+    if chunk == b"VP8X":
+        # 扩展格式：24 位画布宽 - 1、24 位画布高 - 1
+        width = 1 + int.from_bytes(data[24:27], "little")
+        height = 1 + int.from_bytes(data[27:30], "little")
+        return width, height
+    return None
+
+
+def parse_image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    从文件头部解析图片宽高
+
+    Args:
+        data: 文件开头的若干字节（不需要完整文件）
+
+    Returns:
+        (width, height)；格式不支持或字节不足时返回 None
+    """
+    if len(data) >= 24 and data[:8] == b"\x89PNG\r\n\x1a\n" and data[12:16] == b"IHDR":
+        return struct.unpack(">II", data[16:24])
+    if len(data) >= 4 and data[:2] == b"\xff\xd8":
+        return _parse_jpeg_size(data)
+    if len(data) >= 16 and data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _parse_webp_size(data)
+    if len(data) >= 10 and data[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", data[6:10])
+    return None
+
+
+def _decode_size(data: bytes) -> Tuple[int, int]:
+    """完整解码获取尺寸（头部解析失败时的兜底，在线程中执行）"""
+    with Image.open(BytesIO(data)) as img:
+        return img.size
+
+
+def _probe_local_file(path: Path) -> Tuple[int, int]:
+    """读取本地文件头部解析尺寸，失败时交给 PIL（只会读取文件头）"""
+    with open(path, "rb") as f:
+        head = f.read(PROBE_HEAD_BYTES)
+    size = parse_image_size(head)
+    if size is not None:
+        return size
+    with Image.open(path) as img:
+        return img.size
+
+
+async def _probe_remote_head(url: str) -> Optional[Tuple[int, int]]:
+    """
+    通过 Range 请求读取远程图片头部
+    服务器忽略 Range 返回完整内容时，读到能解析尺寸的字节后立即关闭连接
+    """
+    client = get_http_client()
+    headers = {"Range": f"bytes=0-{PROBE_HEAD_BYTES - 1}"}
+    head = b""
+    async with client.stream("GET", url, headers=headers, timeout=PROBE_TIMEOUT, follow_redirects=True) as response:
+        if response.status_code not in (200, 206):
+            raise Exception(f"HTTP {response.status_code}")
+        async for chunk in response.aiter_bytes():
+            head += chunk
+            size = parse_image_size(head)
+            if size is not None:
+                return size
+            if len(head) >= PROBE_HEAD_BYTES:
+                break
+    return None
+
+
+async def probe_image_size(url: str) -> Optional[Tuple[int, int]]:
+    """
+    探测图片尺寸，优先只读取文件头部
+
+    Returns:
+        (width, height)；获取或解析失败时返回 None
+    """
+    if not url:
+        return None
+    try:
+        # data URL：内容已在内存中
+        if url.startswith("data:"):
+            data = base64.b64decode(url.split(",", 1)[1])
+            size = parse_image_size(data[:PROBE_HEAD_BYTES])
+            return size or await asyncio.to_thread(_decode_size, data)
+
+        # 本地文件或已缓存的远程文件
+        path = media_store.get_path(url)
+        if path is not None:
+            return await asyncio.to_thread(_probe_local_file, path)
+        if media_store.is_local_url(url):
+            return None
+
+        try:
+            size = await _probe_remote_head(url)
+            if size is not None:
+                return size
+        except Exception as e:
+            print(f"[尺寸探测] 头部请求失败，改为完整下载: {url[:80]} ({e})")
+
+        # 兜底：完整下载（写入本地媒体缓存，后续读取无需再次下载）
+        data = await media_store.fetch(url, timeout=30.0)
+        return await asyncio.to_thread(_decode_size, data)
+    except Exception as e:
+        print(f"[尺寸探测] 获取图片尺寸失败: {url[:80]} ({e})")
+        return None
+
+
+async def probe_many(
+    urls: Sequence[str],
+    concurrency: int = PROBE_CONCURRENCY
+) -> List[Optional[Tuple[int, int]]]:
+    """
+    批量探测图片尺寸，结果按输入顺序返回（失败项为 None）
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def probe(url: str) -> Optional[Tuple[int, int]]:
+        async with semaphore:
+            return await probe_image_size(url)
+
+    return await asyncio.gather(*[probe(url) for url in urls])
@@ -0,0 +1,388 @@
+"""
+持久化后台任务队列
+导出视频、批量生成图片等耗时操作不在 HTTP 请求中执行：接口创建任务后立即返回任务ID，
+由后台 worker 执行，前端通过 /api/jobs 查询进度和结果
+
+- 任务记录：保存在各用户数据目录的 jobs/ 下（与其他数据一样按用户隔离）
+- 待办索引：data/cache/job_queue.json 记录所有未结束的任务（任务ID -> 用户、状态、执行者），
+  worker 通过文件锁领取任务，因此应用内 worker 和独立的 `python -m app.worker` 进程可以同时工作
+- 进程退出：启动时以及运行期间定期（ORPHAN_CHECK_INTERVAL）把执行者进程已退出的任务重新放回队列
+  （超过 MAX_ATTEMPTS 次则标记失败），某个 worker 进程崩溃时其他仍在运行的进程会接手
+- 取消：排队中的任务直接取消；执行中的任务由执行它的进程取消（跨进程通过任务记录中的 cancel_requested）
+
+注册任务处理函数：
+
+    @job_queue.handler("video_export")
+    async def run_video_export(job: Job, ctx: JobContext) -> dict:
+        ...
+        ctx.report(0.5, "拼接中")
+        return {...}
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models.job import Job, JobStatus
+from app.middleware.auth import enter_user_context
+from app.services.storage import get_current_user_id, get_user_storage, get_default_storage, StorageService
+from app.services.metrics import metrics
+from app.services.tracing import traced, current_trace
+from app.services.shared_state import SharedJsonFile, process_id, process_alive
+
+# 应用内 worker 数
+JOB_WORKERS = 4
+# 没有新任务通知时检查队列的间隔（秒），用于发现其他进程提交的任务
+POLL_INTERVAL = 2.0
+# 检查跨进程取消请求的间隔（秒）
+CANCEL_CHECK_INTERVAL = 2.0
+# 检查执行者进程是否已退出的间隔（秒）
+ORPHAN_CHECK_INTERVAL = 30.0
+# 单个任务最多开始执行的次数（进程重启导致中断时会重新执行）
+MAX_ATTEMPTS = 3
+
+JobHandler = Callable[[Job, "JobContext"], Awaitable[Any]]
+
+
+def _storage_for(user_id: Optional[str]) -> StorageService:
+    return get_user_storage(user_id) if user_id else get_default_storage()
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+    pass
+
+
+class JobContext:
+    """任务执行上下文：上报进度"""
+
+    def __init__(self, job: Job, storage: StorageService):
+        self.job = job
+        self._storage = storage
+
+    def report(self, progress: float, message: str = ""):
+        """更新任务进度（0-1）"""
+        self.job.progress = max(0.0, min(1.0, progress))
+        if message:
+            self.job.message = message
+        # 保留其他进程写入的取消请求，避免被进度更新覆盖
+        stored = self._storage.get_job(self.job.id)
+        if stored is not None and stored.cancel_requested:
+            self.job.cancel_requested = True
+        self._storage.save_job(self.job)
+
+
+class QueueIndex:
+    """未结束任务的全局索引（跨进程共享，文件锁保护）"""
+
+    def __init__(self, index_dir: Optional[str] = None):
+        if index_dir is None:
+            self.index_dir = Path(__file__).parent.parent.parent / "data" / "cache"
+        else:
+            self.index_dir = Path(index_dir)
+        self.index_file = self.index_dir / "job_queue.json"
+        self.lock_file = self.index_dir / "job_queue.lock"
+        self._file = SharedJsonFile(self.index_file, lock_file=self.lock_file)
+
+    def _update(self, func: Callable[[Dict[str, dict]], Any]) -> Any:
+        """在文件锁内读取、修改并写回索引"""
+        return self._file.update(func)
+
+    def add(self, job: Job):
+        def func(entries):
+            entries[job.id] = {
+                "user_id": job.user_id,
+                "kind": job.kind,
+                "status": JobStatus.QUEUED.value,
+                "worker": None,
+                "time": time.time()
+            }
+        self._update(func)
+
+    def remove(self, job_id: str):
+        self._update(lambda entries: entries.pop(job_id, None))
+
+    def claim(self, worker: str, kinds: List[str]) -> Optional[Tuple[str, Optional[str]]]:
+        """领取最早提交的排队任务，返回 (job_id, user_id)"""
+        # 没有排队任务时只读取（索引未变化时不访问文件内容），多个 worker 空闲轮询时不争用文件锁
+        if not any(
+            entry["status"] == JobStatus.QUEUED.value and entry["kind"] in kinds
+            for entry in self._file.read().values()
+        ):
+            return None
+
+        def func(entries):
+            queued = [
+                (entry["time"], job_id) for job_id, entry in entries.items()
+                if entry["status"] == JobStatus.QUEUED.value and entry["kind"] in kinds
+            ]
+            if not queued:
+                return None
+            _, job_id = min(queued)
+            entries[job_id]["status"] = JobStatus.RUNNING.value
+            entries[job_id]["worker"] = worker
+            return job_id, entries[job_id]["user_id"]
+        return self._update(func)
+
+    def requeue_orphans(self) -> List[Tuple[str, Optional[str]]]:
+        """把执行者进程已退出的任务放回队列，返回 [(job_id, user_id)]"""
+        # 没有中断的任务时只读取，定期检查不争用文件锁
+        if not any(
+            entry["status"] == JobStatus.RUNNING.value and not process_alive(entry["worker"])
+            for entry in self._file.read().values()
+        ):
+            return []
+
+        def func(entries):
+            orphans = []
+            for job_id, entry in entries.items():
+                if entry["status"] == JobStatus.RUNNING.value and not process_alive(entry["worker"]):
+                    entry["status"] = JobStatus.QUEUED.value
+                    entry["worker"] = None
+                    orphans.append((job_id, entry["user_id"]))
+            return orphans
+        return self._update(func)
+
+    def release(self, worker: str) -> int:
+        """把指定执行者领取的任务放回队列（进程正常退出时调用）"""
+        def func(entries):
+            released = 0
+            for entry in entries.values():
+                if entry["status"] == JobStatus.RUNNING.value and entry["worker"] == worker:
+                    entry["status"] = JobStatus.QUEUED.value
+                    entry["worker"] = None
+                    released += 1
+            return released
+        return self._update(func)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        entry = self._file.read().get(job_id)
+        return dict(entry) if entry else None
+
+    def entries(self) -> List[dict]:
+        """所有未结束的任务"""
+        return [dict(entry) for entry in self._file.read().values()]
+
+
+class JobQueue:
+    """后台任务队列"""
+
+    def __init__(self, index: Optional[QueueIndex] = None):
+        self.index = index or QueueIndex()
+        self.worker_id = process_id()
+        self._handlers: Dict[str, JobHandler] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._orphan_checker: Optional[asyncio.Task] = None
+        # 本进程执行中的任务：job_id -> Task
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    # ========== 注册与提交 ==========
+
+    def handler(self, kind: str):
+        """注册任务处理函数的装饰器"""
+        def decorator(func: JobHandler) -> JobHandler:
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def submit(self, kind: str, params: Dict[str, Any], project_id: Optional[str] = None) -> Job:
+        """
+        创建任务并放入队列（属于当前用户），立即返回
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"未知的任务类型: {kind}")
+        job = Job(
+            kind=kind,
+            project_id=project_id,
+            user_id=get_current_user_id(),
+            params=jsonable_encoder(params)
+        )
+        _storage_for(job.user_id).save_job(job)
+        self.index.add(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        print(f"[任务队列] 已提交: {kind} {job.id}")
+        return job
+
+    def cancel(self, job: Job) -> Job:
+        """
+        取消任务：排队中的直接取消；执行中的通知执行进程取消
+
+        Returns:
+            更新后的任务
+        """
+        storage = _storage_for(job.user_id)
+        if job.is_terminal:
+            return job
+        entry = self.index.get(job.id)
+        if job.status == JobStatus.QUEUED and (entry is None or entry["status"] == JobStatus.QUEUED.value):
+            self.index.remove(job.id)
+            self._finish(job, storage, JobStatus.CANCELLED, error="已取消")
+            return job
+
+        job.cancel_requested = True
+        storage.save_job(job)
+        task = self._running.get(job.id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    # ========== 执行 ==========
+
+    def _finish(self, job: Job, storage: StorageService, status: JobStatus, result: Any = None, error: Optional[str] = None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.now()
+        if status == JobStatus.SUCCEEDED:
+            job.progress = 1.0
+        storage.save_job(job)
+
+    async def _watch_cancel(self, job_id: str, storage: StorageService, task: asyncio.Task):
+        """定期检查任务记录，其他进程请求取消时取消本进程中的执行"""
+        while not task.done():
+            await asyncio.sleep(CANCEL_CHECK_INTERVAL)
+            record = await asyncio.to_thread(storage.get_job, job_id)
+            if record is not None and record.cancel_requested:
+                task.cancel()
+                return
+
+    async def _execute(self, job_id: str, user_id: Optional[str]):
+        enter_user_context(user_id)
+        # 每次执行作为一个 trace（handler 中的存储、DashScope、OSS 调用都归入其中）
+        with traced("job", user_id, job_id=job_id):
+            await self._execute_job(job_id, user_id)
+
+    async def _execute_job(self, job_id: str, user_id: Optional[str]):
+        storage = _storage_for(user_id)
+        job = await asyncio.to_thread(storage.get_job, job_id)
+        if job is None:
+            print(f"[任务队列] 任务记录不存在，跳过: {job_id}")
+            self.index.remove(job_id)
+            return
+        if job.cancel_requested:
+            self.index.remove(job_id)
+            self._finish(job, storage, JobStatus.CANCELLED, error="已取消")
+            return
+        if job.attempts >= MAX_ATTEMPTS:
+            self.index.remove(job_id)
+            self._finish(job, storage, JobStatus.FAILED, error=f"任务执行被中断 {job.attempts} 次，已放弃")
+            return
+
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.worker = self.worker_id
+        job.started_at = datetime.now()
+        storage.save_job(job)
+
+        handler = self._handlers[job.kind]
+        current_trace().name = f"job {job.kind}"
+        started = time.perf_counter()
+        task = asyncio.ensure_future(handler(job, JobContext(job, storage)))
+        self._running[job_id] = task
+        watcher = asyncio.ensure_future(self._watch_cancel(job_id, storage, task))
+        try:
+            result = await task
+            self._finish(job, storage, JobStatus.SUCCEEDED, result=jsonable_encoder(result))
+            print(f"[任务队列] 完成: {job.kind} {job_id}，耗时 {time.perf_counter() - started:.1f}s")
+        except asyncio.CancelledError:
+            if self._stopping:
+                # 应用关闭，任务留在索引中，下次启动时重新执行
+                task.cancel()
+                raise
+            self._finish(job, storage, JobStatus.CANCELLED, error="已取消")
+            print(f"[任务队列] 已取消: {job.kind} {job_id}")
+        except Exception as e:
+            message = getattr(e, "detail", None) or str(e)
+            self._finish(job, storage, JobStatus.FAILED, error=message)
+            print(f"[任务队列] 失败: {job.kind} {job_id} ({message})")
+        finally:
+            watcher.cancel()
+            self._running.pop(job_id, None)
+        self.index.remove(job_id)
+
+    async def _worker_loop(self, index: int):
+        kinds = list(self._handlers)
+        while True:
+            claimed = await asyncio.to_thread(self.index.claim, self.worker_id, kinds)
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            job_id, user_id = claimed
+            try:
+                await self._execute(job_id, user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[任务队列] worker {index} 执行异常: {job_id} ({e})")
+                self.index.remove(job_id)
+
+    async def _orphan_loop(self):
+        """定期把执行者进程已退出（崩溃、被杀）的任务放回队列，由仍在运行的 worker 接手"""
+        while True:
+            await asyncio.sleep(ORPHAN_CHECK_INTERVAL)
+            try:
+                orphans = await asyncio.to_thread(self.index.requeue_orphans)
+            except Exception as e:
+                print(f"[任务队列] 检查中断的任务失败: {e}")
+                continue
+            if orphans:
+                print(f"[任务队列] 恢复 {len(orphans)} 个执行进程已退出的任务")
+                self._wakeup.set()
+
+    def start(self, workers: int = JOB_WORKERS):
+        """启动 worker（应用启动时调用）；先把中断的任务放回队列"""
+        if self._workers:
+            return
+        self._stopping = False
+        orphans = self.index.requeue_orphans()
+        if orphans:
+            print(f"[任务队列] 恢复 {len(orphans)} 个中断的任务")
+        self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        self._workers = [asyncio.ensure_future(self._worker_loop(i)) for i in range(workers)]
+        self._orphan_checker = asyncio.ensure_future(self._orphan_loop())
+        print(f"[任务队列] 已启动 {workers} 个 worker（{self.worker_id}）")
+
+    async def stop(self):
+        """停止 worker（应用关闭时调用），执行中的任务会在下次启动时重新执行"""
+        self._stopping = True
+        tasks = self._workers + ([self._orphan_checker] if self._orphan_checker else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._orphan_checker = None
+        # 本进程领取的任务放回队列
+        released = self.index.release(self.worker_id)
+        if released:
+            print(f"[任务队列] {released} 个执行中的任务将在下次启动时重新执行")
+
+
+# 全局任务队列实例
+job_queue = JobQueue()
+
+JOB_QUEUE_DEPTH = metrics.gauge(
+    "job_queue_depth", "后台任务队列中未结束的任务数", ["kind", "status"], shared=True
+)
+
+
+@metrics.collector
+def collect_job_queue_depth():
+    counts: Dict[Tuple[str, str], int] = {}
+    for entry in job_queue.index.entries():
+        key = (entry["kind"], entry["status"])
+        counts[key] = counts.get(key, 0) + 1
+    JOB_QUEUE_DEPTH.clear()
+    for (kind, status), count in counts.items():
+        JOB_QUEUE_DEPTH.set(count, kind=kind, status=status)
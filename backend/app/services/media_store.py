@@ -0,0 +1,318 @@
+"""
+本地媒体存储服务
+按内容寻址（SHA-256）把媒体文件保存在 data/assets/media 下，通过 /assets 静态路由访问
+
+包含两部分：
+- store：OSS 未启用时的持久存储目标，不会被淘汰
+- cache：OSS / 远程 URL 的本地副本，按总大小做 LRU 淘汰，用于加速后端重复读取
+
+URL 索引（远程 URL -> 本地副本）保存在 data/cache/media_url_index.json，
+不放在 /assets 静态路由下，避免未登录即可列出各用户的 OSS/远程 URL
+
+注意：DashScope 无法访问本机的 /assets 地址，
+调用外部 API 前需要用 to_api_url() 把本地 URL 转换为 data URL
+"""
+
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+
+from app.services.shared_state import SharedJsonFile
+from app.services.tracing import span
+
+# 本地缓存总大小上限（字节），超过后按最近最少使用淘汰
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+# 静态路由前缀（与 main.py 中的挂载点一致）
+ASSETS_URL_PREFIX = "/assets"
+
+_MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "gif": "image/gif",
+    "mp4": "video/mp4",
+    "mov": "video/quicktime",
+    "webm": "video/webm",
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+}
+
+
+class MediaStore:
+    """本地内容寻址媒体存储"""
+
+    def __init__(
+        self,
+        assets_dir: Optional[str] = None,
+        max_cache_bytes: int = MAX_CACHE_BYTES,
+        index_dir: Optional[str] = None
+    ):
+        data_dir = Path(__file__).parent.parent.parent / "data"
+        if assets_dir is None:
+            self.assets_dir = data_dir / "assets"
+        else:
+            self.assets_dir = Path(assets_dir)
+        self.root = self.assets_dir / "media"
+        self.store_dir = self.root / "store"
+        self.cache_dir = self.root / "cache"
+        # 索引不能放在 /assets 下（静态路由公开访问）
+        self.index_dir = Path(index_dir) if index_dir is not None else data_dir / "cache"
+        self.url_index_file = self.index_dir / "media_url_index.json"
+        self.max_cache_bytes = max_cache_bytes
+
+        self._lock = threading.RLock()
+        self._loaded = False
+        # 缓存文件 LRU：相对路径 -> 文件大小（越靠后越新）
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_bytes = 0
+        # 远程 URL -> 本地相对路径（多个 worker 进程共享）
+        self._url_index = SharedJsonFile(self.url_index_file)
+
+    # ========== 内部工具 ==========
+
+    def _ensure_loaded(self):
+        """首次使用时扫描缓存目录，按修改时间重建 LRU 顺序"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._migrate_index()
+
+            entries = []
+            for path in self.cache_dir.glob("*/*"):
+                try:
+                    stat = path.stat()
+                    entries.append((stat.st_mtime, self._rel(path), stat.st_size))
+                except OSError:
+                    continue
+            for _, rel, size in sorted(entries):
+                self._lru[rel] = size
+                self._cache_bytes += size
+
+            # 清理指向已删除文件的索引
+            missing = [
+                url for url, rel in self._url_index.read().items()
+                if not (self.assets_dir / rel).exists()
+            ]
+            if missing:
+                self._remove_urls(missing)
+            self._loaded = True
+            print(f"[本地媒体] 缓存 {len(self._lru)} 个文件，共 {self._cache_bytes / 1024 / 1024:.1f} MB")
+
+    def _migrate_index(self):
+        """旧版本把 URL 索引放在 media/ 下（可通过 /assets 访问），移到索引目录并删除旧文件"""
+        old_index = self.root / "url_index.json"
+        if old_index.exists() and not self.url_index_file.exists():
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                os.replace(old_index, self.url_index_file)
+                print(f"[本地媒体] URL 索引已移到 {self.url_index_file}")
+            except OSError as e:
+                print(f"[本地媒体] 移动 URL 索引失败: {e}")
+        for path in [old_index, self.root / "url_index.json.lock", *self.root.glob(".url_index.json.*.tmp")]:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def _rel(self, path: Path) -> str:
+        return path.relative_to(self.assets_dir).as_posix()
+
+    def _remove_urls(self, urls):
+        def mutate(index: Dict[str, str]):
+            for url in urls:
+                index.pop(url, None)
+        self._url_index.update(mutate)
+
+    def _write(self, base_dir: Path, data: bytes, extension: str) -> Path:
+        """按内容哈希写入文件，已存在则直接复用"""
+        extension = (extension or "bin").lstrip(".").lower()
+        digest = hashlib.sha256(data).hexdigest()
+        path = base_dir / digest[:2] / f"{digest}.{extension}"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 临时文件名包含进程号和线程号，多个进程/线程同时写入相同内容时互不干扰
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return path
+
+    def _touch(self, rel: str):
+        """标记缓存文件为最近使用"""
+        if rel in self._lru:
+            self._lru.move_to_end(rel)
+            try:
+                os.utime(self.assets_dir / rel, None)
+            except OSError:
+                pass
+
+    def _pop_evicted(self) -> list:
+        """缓存超出上限时从 LRU 中移出最久未使用的文件（需持有 _lock），返回相对路径列表"""
+        removed = []
+        while self._cache_bytes > self.max_cache_bytes and self._lru:
+            rel, size = self._lru.popitem(last=False)
+            self._cache_bytes -= size
+            removed.append(rel)
+        return removed
+
+    def _delete_evicted(self, removed: list):
+        """删除已移出 LRU 的缓存文件（不持有 _lock）"""
+        for rel in removed:
+            try:
+                (self.assets_dir / rel).unlink()
+            except OSError:
+                pass
+        print(f"[本地媒体] 淘汰 {len(removed)} 个缓存文件，当前 {self._cache_bytes / 1024 / 1024:.1f} MB")
+
+    def _local_path(self, url: str) -> Optional[Path]:
+        """把本地 /assets URL 转换为文件路径"""
+        if not url or not url.startswith(ASSETS_URL_PREFIX + "/"):
+            return None
+        rel = url[len(ASSETS_URL_PREFIX) + 1:].split("?")[0]
+        path = (self.assets_dir / rel).resolve()
+        # 防止路径穿越
+        if self.assets_dir.resolve() not in path.parents:
+            return None
+        return path
+
+    # ========== 公开接口 ==========
+
+    def is_local_url(self, url: str) -> bool:
+        """是否为本地 /assets URL"""
+        return bool(url) and url.startswith(ASSETS_URL_PREFIX + "/")
+
+    def save(self, data: bytes, extension: str) -> str:
+        """
+        持久保存文件（OSS 未启用时使用），不会被 LRU 淘汰
+
+        Returns:
+            本地访问 URL，如 /assets/media/store/ab/abcd....png
+        """
+        self._ensure_loaded()
+        path = self._write(self.store_dir, data, extension)
+        return f"{ASSETS_URL_PREFIX}/{self._rel(path)}"
+
+    def cache(self, url: str, data: bytes, extension: str = "") -> None:
+        """
+        把远程 URL 的内容写入本地缓存（上传 OSS 或下载后调用）
+
+        写文件不持有锁（按内容哈希命名，写入临时文件后原子替换），
+        并行上传时只有 LRU 记账短暂串行；异步代码中应通过 asyncio.to_thread 调用
+        """
+        if not url or self.is_local_url(url) or url.startswith("data:"):
+            return
+        if not extension:
+            extension = os.path.splitext(url.split("?")[0])[1] or "bin"
+        self._ensure_loaded()
+        try:
+            path = self._write(self.cache_dir, data, extension)
+            rel = self._rel(path)
+            with self._lock:
+                if rel not in self._lru:
+                    self._lru[rel] = len(data)
+                    self._cache_bytes += len(data)
+                self._touch(rel)
+                removed = self._pop_evicted()
+            if removed:
+                self._delete_evicted(removed)
+            removed_set = set(removed)
+
+            # URL 索引只在需要时更新（文件锁保证多进程间一致）
+            index = self._url_index.read()
+            stale = [u for u, r in index.items() if r in removed_set]
+            if index.get(url) != rel or stale:
+                def mutate(current: Dict[str, str]):
+                    for u in stale:
+                        current.pop(u, None)
+                    if rel not in removed_set:
+                        current[url] = rel
+                self._url_index.update(mutate)
+        except Exception as e:
+            # 缓存失败不影响主流程
+            print(f"[本地媒体] 写入缓存失败: {e}")
+
+    def get_path(self, url: str) -> Optional[Path]:
+        """
+        获取 URL 对应的本地文件路径（本地 URL 或已缓存的远程 URL），未命中返回 None
+        """
+        path = self._local_path(url)
+        if path is not None:
+            return path if path.exists() else None
+
+        self._ensure_loaded()
+        with self._lock:
+            rel = self._url_index.read().get(url)
+            if not rel:
+                return None
+            path = self.assets_dir / rel
+            if not path.exists():
+                # 可能已被其他进程淘汰
+                self._remove_urls([url])
+                return None
+            self._touch(rel)
+            return path
+
+    def read(self, url: str) -> Optional[bytes]:
+        """读取本地副本，未命中返回 None"""
+        path = self.get_path(url)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    async def fetch(self, url: str, timeout: float = 60.0) -> bytes:
+        """
+        获取 URL 内容：优先读取本地副本，未命中时下载并写入缓存
+
+        Raises:
+            Exception: 下载失败
+        """
+        data = await asyncio.to_thread(self.read, url)
+        if data is not None:
+            return data
+        if self.is_local_url(url):
+            raise Exception(f"本地文件不存在: {url}")
+
+        with span("media.download") as attrs:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                response = await client.get(url, follow_redirects=True)
+                if response.status_code != 200:
+                    raise Exception(f"下载失败: HTTP {response.status_code}")
+                data = response.content
+            attrs["bytes"] = len(data)
+
+        await asyncio.to_thread(self.cache, url, data)
+        return data
+
+    def to_api_url(self, url: str) -> str:
+        """
+        转换为外部 API 可用的 URL
+        本地 URL 外部服务无法访问，仅在发送请求时转换为 data URL（不写入存储）
+        """
+        if not self.is_local_url(url):
+            return url
+        path = self._local_path(url)
+        if path is None or not path.exists():
+            return url
+        extension = path.suffix.lstrip(".").lower()
+        mime_type = _MIME_TYPES.get(extension, "application/octet-stream")
+        encoded = base64.b64encode(path.read_bytes()).decode("utf-8")
+        return f"data:{mime_type};base64,{encoded}"
+
+
+# 全局本地媒体存储实例
+media_store = MediaStore()
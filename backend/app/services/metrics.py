@@ -0,0 +1,368 @@
+"""
+运行指标（Prometheus 文本格式）
+通过 GET /api/metrics 导出，不依赖 prometheus_client
+
+- Counter / Gauge / Histogram：各模块在导入时定义自己的指标，记录时按标签累加
+- 采集回调：队列深度等在导出时才读取的指标通过 @metrics.collector 注册
+- 事件循环延迟：后台循环定期测量 sleep 的实际超时
+- 多进程：每个进程定期把自己的指标写到 data/cache/metrics/ 下，导出时合并所有仍在运行的进程；
+  Counter / Histogram 相加，Gauge 按 worker 标签区分；
+  共享 Gauge（shared=True，如从多进程共享的队列索引读取的队列深度）各进程读到的值相同，只取导出进程的值
+- 按用户统计：设置环境变量 METRICS_PER_USER=1 后，请求和 DashScope 指标增加 user 标签（默认关闭，
+  避免用户数多时标签组合过多）；user 标签只在设置了 METRICS_TOKEN 且抓取请求带有该 token 时导出，
+  否则按用户合并后导出（指标接口不需要登录，不能公开用户ID和各用户的活动）
+
+定义指标：
+
+    UPLOAD_BYTES = metrics.counter("oss_upload_bytes_total", "OSS 上传字节数", ["kind"])
+    UPLOAD_BYTES.inc(len(data), kind="image")
+
+    with STAGE_SECONDS.time(stage="concat"):
+        ...
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.services.shared_state import atomic_write_json, process_alive, process_id
+
+# 默认耗时分桶（秒），覆盖本地读写到视频生成轮询
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+# 事件循环延迟采样间隔（秒）
+LOOP_LAG_INTERVAL = 0.5
+# 写出本进程指标快照的间隔（秒）
+SNAPSHOT_INTERVAL = 10.0
+
+PER_USER_LABELS = os.environ.get("METRICS_PER_USER", "").lower() in ("1", "true", "yes")
+# 指标抓取 token（Authorization: Bearer <token>），设置后 /api/metrics 必须携带
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LabelKey = Tuple[str, ...]
+
+
+def user_labels() -> List[str]:
+    """开启按用户统计时返回 ["user"]，用于拼接标签名"""
+    return ["user"] if PER_USER_LABELS else []
+
+
+def current_user_label() -> str:
+    """当前上下文的用户ID（未登录为空）"""
+    from app.services.storage import get_current_user_id
+    return get_current_user_id() or ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = list(labelnames)
+        self._lock = threading.Lock()
+        self._samples: Dict[LabelKey, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        if "user" in self.labelnames and "user" not in labels:
+            labels["user"] = current_user_label()
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Dict[LabelKey, Any]:
+        with self._lock:
+            return {key: (list(value) if isinstance(value, list) else value) for key, value in self._samples.items()}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), shared: bool = False):
+        super().__init__(name, help, labelnames)
+        # 各进程读取同一份共享数据得到的值（导出时不按 worker 区分，只取一个进程的值）
+        self.shared = shared
+
+    def set(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = sorted(buckets)
+
+    def observe(self, value: float, **labels: Any):
+        key = self._key(labels)
+        with self._lock:
+            # [各分桶计数..., 总和, 次数]
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """记录代码块耗时（异常时同样记录）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class MetricsRegistry:
+    """指标注册表（每个进程一个）"""
+
+    def __init__(self, snapshot_dir: Optional[str] = None):
+        if snapshot_dir is None:
+            self.snapshot_dir = Path(__file__).parent.parent.parent / "data" / "cache" / "metrics"
+        else:
+            self.snapshot_dir = Path(snapshot_dir)
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._monitor: Optional[asyncio.Task] = None
+
+    # ========== 定义 ==========
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = (), shared: bool = False) -> Gauge:
+        return self._register(Gauge(name, help, labelnames, shared))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def collector(self, func: Callable[[], None]) -> Callable[[], None]:
+        """注册导出前调用的采集函数（用于设置队列深度等 Gauge）"""
+        self._collectors.append(func)
+        return func
+
+    def track_executor(self, name: str, get_executor: Callable[[], Any]):
+        """导出线程池/进程池的排队任务数（get_executor 返回 None 表示尚未创建）"""
+        @self.collector
+        def collect():
+            executor = get_executor()
+            if executor is None:
+                return
+            if hasattr(executor, "_work_queue"):
+                depth = executor._work_queue.qsize()
+            else:
+                depth = len(getattr(executor, "_pending_work_items", {}))
+            EXECUTOR_QUEUE_DEPTH.set(depth, executor=name)
+
+    # ========== 导出 ==========
+
+    def _collect(self):
+        for func in self._collectors:
+            try:
+                func()
+            except Exception as e:
+                print(f"[指标] 采集失败: {e}")
+
+    def snapshot(self) -> dict:
+        """本进程的全部指标"""
+        self._collect()
+        metrics = {}
+        for metric in list(self._metrics.values()):
+            entry = {
+                "type": metric.kind,
+                "help": metric.help,
+                "labelnames": metric.labelnames,
+                "samples": [[list(key), value] for key, value in metric.samples().items()]
+            }
+            if isinstance(metric, Histogram):
+                entry["buckets"] = metric.buckets
+            elif isinstance(metric, Gauge) and metric.shared:
+                entry["shared"] = True
+            metrics[metric.name] = entry
+        return {"process": process_id(), "updated_at": time.time(), "metrics": metrics}
+
+    def _snapshot_file(self, process: str) -> Path:
+        return self.snapshot_dir / f"{process.replace(':', '_')}.json"
+
+    def write_snapshot(self):
+        """写出本进程的指标，供其他进程导出时合并"""
+        try:
+            atomic_write_json(self._snapshot_file(process_id()), self.snapshot())
+        except Exception as e:
+            print(f"[指标] 写入快照失败: {e}")
+
+    def _other_snapshots(self) -> List[dict]:
+        snapshots = []
+        current = process_id()
+        if not self.snapshot_dir.exists():
+            return snapshots
+        for path in self.snapshot_dir.glob("*.json"):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            process = snapshot.get("process")
+            if process == current:
+                continue
+            if not process_alive(process):
+                # 已退出的进程
+                path.unlink(missing_ok=True)
+                continue
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self, include_user: bool = True) -> str:
+        """
+        合并所有进程的指标，输出 Prometheus 文本格式
+
+        Args:
+            include_user: 是否导出 user 标签；False 时按用户合并
+        """
+        snapshots = [self.snapshot()] + self._other_snapshots()
+        merged: Dict[str, dict] = {}
+        for snapshot in snapshots:
+            worker = str(snapshot.get("process", "")).rpartition(":")[2]
+            for name, entry in snapshot["metrics"].items():
+                if entry.get("shared") and name in merged:
+                    # 共享 Gauge 只取第一个进程（导出进程，值最新）的值
+                    continue
+                labelnames = entry["labelnames"]
+                user_index = labelnames.index("user") if not include_user and "user" in labelnames else None
+                if user_index is not None:
+                    labelnames = labelnames[:user_index] + labelnames[user_index + 1:]
+                target = merged.setdefault(name, {**entry, "labelnames": labelnames, "samples": {}})
+                for key, value in entry["samples"]:
+                    if user_index is not None:
+                        key = key[:user_index] + key[user_index + 1:]
+                    if entry["type"] == "gauge":
+                        if not entry.get("shared"):
+                            # Gauge 不能相加，按进程区分
+                            key = list(key) + [worker]
+                        current = target["samples"].get(tuple(key))
+                        target["samples"][tuple(key)] = value if current is None or user_index is None else current + value
+                    elif entry["type"] == "histogram":
+                        current = target["samples"].get(tuple(key))
+                        target["samples"][tuple(key)] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        target["samples"][tuple(key)] = target["samples"].get(tuple(key), 0) + value
+
+        lines = []
+        for name in sorted(merged):
+            entry = merged[name]
+            if not entry["samples"]:
+                continue
+            labelnames = entry["labelnames"]
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            for key, value in sorted(entry["samples"].items()):
+                if entry["type"] == "gauge":
+                    labels = _format_labels(labelnames + ([] if entry.get("shared") else ["worker"]), key)
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+                elif entry["type"] == "histogram":
+                    for bound, count in zip(entry["buckets"], value):
+                        labels = _format_labels(labelnames, key, f'le="{_format_value(bound)}"')
+                        lines.append(f"{name}_bucket{labels} {count}")
+                    labels = _format_labels(labelnames, key, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{labels} {value[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(value[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labelnames, key)} {value[-1]}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    # ========== 后台监控 ==========
+
+    async def _monitor_loop(self):
+        loop = asyncio.get_running_loop()
+        last_snapshot = loop.time()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(0.0, loop.time() - started - LOOP_LAG_INTERVAL)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+            if loop.time() - last_snapshot >= SNAPSHOT_INTERVAL:
+                last_snapshot = loop.time()
+                await asyncio.to_thread(self.write_snapshot)
+
+    def start(self):
+        """启动事件循环延迟监控和快照写出（应用启动时调用）"""
+        if self._monitor is None:
+            self._monitor = asyncio.ensure_future(self._monitor_loop())
+
+    async def stop(self):
+        """停止监控并删除本进程的快照（应用关闭时调用）"""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+        self._snapshot_file(process_id()).unlink(missing_ok=True)
+
+
+# 全局指标注册表
+metrics = MetricsRegistry()
+
+EVENT_LOOP_LAG = metrics.gauge("event_loop_lag_seconds", "最近一次测得的事件循环延迟")
+EVENT_LOOP_LAG_SECONDS = metrics.histogram(
+    "event_loop_lag_distribution_seconds", "事件循环延迟分布",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+EXECUTOR_QUEUE_DEPTH = metrics.gauge("executor_queue_depth", "线程池/进程池中排队等待的任务数", ["executor"])
+
+
+def _default_executor():
+    try:
+        return getattr(asyncio.get_running_loop(), "_default_executor", None)
+    except RuntimeError:
+        return None
+
+
+metrics.track_executor("asyncio_default", _default_executor)
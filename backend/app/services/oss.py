@@ -11,7 +11,10 @@ import uuid
 import hashlib
 import requests
 import threading
+import time
 import asyncio
+import contextvars
+import functools
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
@@ -25,9 +28,16 @@ except ImportError:
     OSS_AVAILABLE = False
 
 from app.config import get_config, OSSConfig
+from app.services.media_store import media_store
+from app.services.metrics import metrics
+from app.services.tracing import span
 
 # 全局线程池，用于执行 OSS 上传操作
 _oss_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="oss_upload")
+metrics.track_executor("oss_upload", lambda: _oss_executor)
+
+OSS_UPLOAD_BYTES = metrics.counter("oss_upload_bytes_total", "OSS 上传字节数", ["kind"])
+OSS_UPLOAD_SECONDS = metrics.histogram("oss_upload_duration_seconds", "OSS 单次上传耗时", ["kind", "status"])
 
 
 class OSSService:
@@ -110,6 +120,20 @@ class OSSService:
         else:
             return f"{prefix}/{file_type}/{date_str}/{timestamp}_{unique_id}.{extension}"
     
+    def _put_object(self, bucket: 'oss2.Bucket', object_key: str, data: bytes, kind: str):
+        """上传对象并记录字节数和耗时"""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with span("oss.put_object", kind=kind, bytes=len(data)):
+                result = bucket.put_object(object_key, data)
+            status = str(result.status)
+            return result
+        finally:
+            OSS_UPLOAD_SECONDS.observe(time.perf_counter() - started, kind=kind, status=status)
+            if status == "200":
+                OSS_UPLOAD_BYTES.inc(len(data), kind=kind)
+    
     def _upload_from_url_sync(
         self, 
         url: str, 
@@ -134,51 +158,54 @@ class OSSService:
             # OSS 未启用，返回原始 URL
             return True, url
         
-        # 使用锁确保每次只有一个线程初始化客户端
+        # 锁只保护客户端初始化，下载和上传在锁外执行，允许多个线程并行上传
         with self._lock:
             success, bucket = self._init_client()
-            if not success or bucket is None:
-                return False, "OSS 初始化失败"
-            
-            try:
-                # 下载文件
+        if not success or bucket is None:
+            return False, "OSS 初始化失败"
+        
+        try:
+            # 下载文件
+            with span("oss.download_source", kind=file_type):
                 response = requests.get(url, timeout=60)
-                if response.status_code != 200:
-                    return False, f"下载文件失败: HTTP {response.status_code}"
-                
-                # 根据 Content-Type 自动判断扩展名
-                content_type = response.headers.get('Content-Type', '')
-                if 'jpeg' in content_type or 'jpg' in content_type:
-                    extension = 'jpg'
-                elif 'png' in content_type:
-                    extension = 'png'
-                elif 'webp' in content_type:
-                    extension = 'webp'
-                elif 'mp4' in content_type:
-                    extension = 'mp4'
-                elif 'video' in content_type:
-                    extension = 'mp4'
-                
-                # 生成对象键
-                object_key = self._generate_object_key(file_type, extension, project_id)
-                
-                # 上传到 OSS
-                result = bucket.put_object(object_key, response.content)
+            if response.status_code != 200:
+                return False, f"下载文件失败: HTTP {response.status_code}"
+            
+            # 根据 Content-Type 自动判断扩展名
+            content_type = response.headers.get('Content-Type', '')
+            if 'jpeg' in content_type or 'jpg' in content_type:
+                extension = 'jpg'
+            elif 'png' in content_type:
+                extension = 'png'
+            elif 'webp' in content_type:
+                extension = 'webp'
+            elif 'mp4' in content_type:
+                extension = 'mp4'
+            elif 'video' in content_type:
+                extension = 'mp4'
+            
+            # 生成对象键
+            object_key = self._generate_object_key(file_type, extension, project_id)
+            
+            # 上传到 OSS
+            result = self._put_object(bucket, object_key, response.content, file_type)
+            
+            if result.status == 200:
+                # 构建公开访问 URL
+                config = self._get_config()
+                oss_url = f"https://{config.bucket_name}.{config.endpoint_host}/{object_key}"
+                # 写入本地缓存，后续读取无需再从 OSS 下载
+                media_store.cache(oss_url, response.content, extension)
+                return True, oss_url
+            else:
+                return False, f"上传失败: HTTP {result.status}"
                 
-                if result.status == 200:
-                    # 构建公开访问 URL
-                    config = self._get_config()
-                    oss_url = f"https://{config.bucket_name}.{config.endpoint_host}/{object_key}"
-                    return True, oss_url
-                else:
-                    return False, f"上传失败: HTTP {result.status}"
-                    
-            except requests.exceptions.Timeout:
-                return False, "下载超时"
-            except requests.exceptions.RequestException as e:
-                return False, f"下载失败: {str(e)}"
-            except Exception as e:
-                return False, f"上传失败: {str(e)}"
+        except requests.exceptions.Timeout:
+            return False, "下载超时"
+        except requests.exceptions.RequestException as e:
+            return False, f"下载失败: {str(e)}"
+        except Exception as e:
+            return False, f"上传失败: {str(e)}"
     
     def upload_from_url(
         self, 
@@ -222,10 +249,11 @@ class OSSService:
             (success, url_or_error): 成功时返回 OSS URL，失败时返回错误信息
         """
         loop = asyncio.get_event_loop()
+        # run_in_executor 不会传递 contextvars，复制上下文以保证线程内使用当前用户的 OSS 配置
+        ctx = contextvars.copy_context()
         return await loop.run_in_executor(
             _oss_executor,
-            self._upload_from_url_sync,
-            url, file_type, extension, project_id
+            functools.partial(ctx.run, self._upload_from_url_sync, url, file_type, extension, project_id)
         )
     
     def _upload_from_bytes_sync(
@@ -243,22 +271,23 @@ class OSSService:
         
         with self._lock:
             success, bucket = self._init_client()
-            if not success or bucket is None:
-                return False, "OSS 初始化失败"
+        if not success or bucket is None:
+            return False, "OSS 初始化失败"
+        
+        try:
+            object_key = self._generate_object_key(file_type, extension, project_id)
+            result = self._put_object(bucket, object_key, data, file_type)
             
-            try:
-                object_key = self._generate_object_key(file_type, extension, project_id)
-                result = bucket.put_object(object_key, data)
+            if result.status == 200:
+                config = self._get_config()
+                oss_url = f"https://{config.bucket_name}.{config.endpoint_host}/{object_key}"
+                media_store.cache(oss_url, data, extension)
+                return True, oss_url
+            else:
+                return False, f"上传失败: HTTP {result.status}"
                 
-                if result.status == 200:
-                    config = self._get_config()
-                    oss_url = f"https://{config.bucket_name}.{config.endpoint_host}/{object_key}"
-                    return True, oss_url
-                else:
-                    return False, f"上传失败: HTTP {result.status}"
-                    
-            except Exception as e:
-                return False, f"上传失败: {str(e)}"
+        except Exception as e:
+            return False, f"上传失败: {str(e)}"
     
     def upload_from_bytes(
         self, 
@@ -290,24 +319,25 @@ class OSSService:
         
         with self._lock:
             success, bucket = self._init_client()
-            if not success or bucket is None:
-                raise Exception("OSS 初始化失败")
+        if not success or bucket is None:
+            raise Exception("OSS 初始化失败")
+        
+        try:
+            config = self._get_config()
+            prefix = config.prefix.rstrip('/')
+            full_path = f"{prefix}/{object_path}"
             
-            try:
-                config = self._get_config()
-                prefix = config.prefix.rstrip('/')
-                full_path = f"{prefix}/{object_path}"
-                
-                result = bucket.put_object(full_path, data)
+            result = self._put_object(bucket, full_path, data, object_path.split('/', 1)[0])
+            
+            if result.status == 200:
+                oss_url = f"https://{config.bucket_name}.{config.endpoint_host}/{full_path}"
+                media_store.cache(oss_url, data)
+                return oss_url
+            else:
+                raise Exception(f"上传失败: HTTP {result.status}")
                 
-                if result.status == 200:
-                    oss_url = f"https://{config.bucket_name}.{config.endpoint_host}/{full_path}"
-                    return oss_url
-                else:
-                    raise Exception(f"上传失败: HTTP {result.status}")
-                    
-            except Exception as e:
-                raise Exception(f"上传失败: {str(e)}")
+        except Exception as e:
+            raise Exception(f"上传失败: {str(e)}")
     
     def upload_bytes(self, data: bytes, object_path: str) -> str:
         """
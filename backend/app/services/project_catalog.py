@@ -0,0 +1,180 @@
+"""
+项目目录
+
+每个用户一份 data/project_catalog.json，保存各项目的轻量摘要（名称、分镜/角色/场景/道具数、
+已生成的首帧和视频、时间），项目列表和项目摘要接口只读取这一个文件，
+不再解析完整的项目 JSON（剧本、分镜、版本历史）或扫描首帧、视频目录。
+
+- 由 StorageService 在保存/删除项目、首帧、视频时同步更新
+- 文件不存在（升级后首次使用）时扫描一次全部数据建立
+- 通过 SharedJsonFile 在多个 worker 进程间共享
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from app.models.project import Project, ProjectSummary
+from app.models.frame import Frame
+from app.models.video import Video
+from app.services.shared_state import SharedJsonFile
+
+if TYPE_CHECKING:
+    from app.services.storage import StorageService
+
+# 目录格式版本（字段变化时递增，旧文件会重新建立）
+CATALOG_VERSION = 1
+
+# 记录已生成首帧/视频 ID 的字段（保存 ID 而不是计数，重复保存同一条记录时计数不会出错）
+GENERATED_FRAMES = "generated_frames"
+GENERATED_VIDEOS = "generated_videos"
+
+
+def _project_fields(project: Project) -> dict:
+    """项目本身的摘要字段"""
+    return {
+        "id": project.id,
+        "name": project.name,
+        "description": project.description,
+        "shots_count": len(project.script.shots) if project.script else 0,
+        "characters_count": len(project.character_ids),
+        "scenes_count": len(project.scene_ids),
+        "props_count": len(project.prop_ids),
+        "created_at": project.created_at.isoformat(),
+        "updated_at": project.updated_at.isoformat()
+    }
+
+
+def _to_summary(entry: dict) -> ProjectSummary:
+    fields = {key: value for key, value in entry.items() if key not in (GENERATED_FRAMES, GENERATED_VIDEOS)}
+    return ProjectSummary(
+        **fields,
+        frames_generated=len(entry[GENERATED_FRAMES]),
+        videos_generated=len(entry[GENERATED_VIDEOS])
+    )
+
+
+class ProjectCatalog:
+    """项目目录（每个 StorageService 一份）"""
+
+    def __init__(self, storage: "StorageService"):
+        self.storage = storage
+        self._file = SharedJsonFile(storage.data_dir / "project_catalog.json")
+
+    # ============ 建立 ============
+
+    def _build(self, data: dict):
+        """扫描全部项目、首帧、视频建立目录（在文件锁内执行）"""
+        projects: Dict[str, dict] = {}
+        for file_path in self.storage.projects_dir.glob("*.json"):
+            raw = self.storage._read_json_with_lock(file_path)
+            try:
+                project = Project(**raw) if raw else None
+            except Exception:
+                continue  # 跳过格式错误的文件
+            if project:
+                projects[project.id] = {**_project_fields(project), GENERATED_FRAMES: [], GENERATED_VIDEOS: []}
+
+        for field, directory, model in (
+            (GENERATED_FRAMES, self.storage.frames_dir, Frame),
+            (GENERATED_VIDEOS, self.storage.videos_dir, Video)
+        ):
+            for file_path in directory.glob("*.json"):
+                raw = self.storage._read_json_with_lock(file_path)
+                entry = projects.get(raw.get("project_id")) if raw else None
+                if entry is None:
+                    continue
+                try:
+                    item = model(**raw)
+                except Exception:
+                    continue
+                if self._is_generated(item):
+                    entry[field].append(item.id)
+
+        data.clear()
+        data.update(version=CATALOG_VERSION, projects=projects)
+        print(f"[项目目录] 已建立 {self.storage.data_dir.name} 的项目目录，共 {len(projects)} 个项目")
+
+    def _projects(self, data: dict) -> Dict[str, dict]:
+        """修改前确保目录已建立"""
+        if data.get("version") != CATALOG_VERSION:
+            self._build(data)
+        return data["projects"]
+
+    def _read(self) -> Dict[str, dict]:
+        """当前目录（只读）"""
+        data = self._file.read()
+        if data.get("version") != CATALOG_VERSION:
+            self._file.update(self._projects)
+            data = self._file.read()
+        return data["projects"]
+
+    @staticmethod
+    def _is_generated(item) -> bool:
+        if isinstance(item, Frame):
+            return bool(item.selected_url)
+        return bool(item.video_url)
+
+    # ============ 查询 ============
+
+    def list_projects(self) -> List[ProjectSummary]:
+        """全部项目摘要（按更新时间倒序）"""
+        summaries = [_to_summary(entry) for entry in self._read().values()]
+        return sorted(summaries, key=lambda s: s.updated_at, reverse=True)
+
+    def get_summary(self, project_id: str) -> Optional[ProjectSummary]:
+        entry = self._read().get(project_id)
+        return _to_summary(entry) if entry else None
+
+    # ============ 更新 ============
+
+    def save_project(self, project: Project):
+        fields = _project_fields(project)
+
+        def mutate(data: dict):
+            entry = self._projects(data).setdefault(project.id, {GENERATED_FRAMES: [], GENERATED_VIDEOS: []})
+            entry.update(fields)
+
+        self._file.update(mutate)
+
+    def delete_project(self, project_id: str):
+        self._file.update(lambda data: self._projects(data).pop(project_id, None))
+
+    def save_frame(self, frame: Frame):
+        self._set_generated(GENERATED_FRAMES, frame.project_id, frame.id, self._is_generated(frame))
+
+    def delete_frame(self, frame_id: str):
+        self._remove(GENERATED_FRAMES, frame_id)
+
+    def save_video(self, video: Video):
+        self._set_generated(GENERATED_VIDEOS, video.project_id, video.id, self._is_generated(video))
+
+    def delete_video(self, video_id: str):
+        self._remove(GENERATED_VIDEOS, video_id)
+
+    def _set_generated(self, field: str, project_id: str, item_id: str, generated: bool):
+        """记录首帧/视频是否已生成（状态未变化时不写文件）"""
+        entry = self._read().get(project_id)
+        if entry is None or (item_id in entry[field]) == generated:
+            return
+
+        def mutate(data: dict):
+            entry = self._projects(data).get(project_id)
+            if entry is None:
+                return  # 项目已删除
+            items = entry[field]
+            if generated and item_id not in items:
+                items.append(item_id)
+            elif not generated and item_id in items:
+                items.remove(item_id)
+
+        self._file.update(mutate)
+
+    def _remove(self, field: str, item_id: str):
+        if not any(item_id in entry[field] for entry in self._read().values()):
+            return
+
+        def mutate(data: dict):
+            for entry in self._projects(data).values():
+                if item_id in entry[field]:
+                    entry[field].remove(item_id)
+
+        self._file.update(mutate)
@@ -0,0 +1,91 @@
+"""
+参考图预处理缓存
+缓存参考图的尺寸探测和缩放结果，同一张角色/场景/道具图在多个分镜、多组生成中复用时无需重复下载和处理
+
+- 键：源 URL + 尺寸约束（最小/最大边长）
+- 值：原图尺寸、缩放后的持久 URL（OSS 或本地媒体存储，不需要缩放时为空）
+- 并发请求同一张图时共享同一个处理任务
+"""
+
+import asyncio
+import hashlib
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.services.shared_state import SharedJsonFile
+
+# 缓存条数上限
+MAX_REFERENCE_ENTRIES = 5000
+
+
+class ReferenceImageCache:
+    """参考图预处理结果缓存"""
+    
+    def __init__(self, cache_dir: Optional[str] = None):
+        if cache_dir is None:
+            self.cache_dir = Path(__file__).parent.parent.parent / "data" / "cache"
+        else:
+            self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / "reference_index.json"
+        # 多个 worker 进程共享索引
+        self._index = SharedJsonFile(self.index_file)
+        # 处理中的任务：缓存键 -> Task
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    @staticmethod
+    def make_key(url: str, min_dim: int, max_dim: int) -> str:
+        raw = f"{url}|{min_dim}|{max_dim}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def is_cacheable(url: str) -> bool:
+        """data URL 内容随请求传入，不缓存"""
+        return bool(url) and not url.startswith("data:")
+    
+    def get(self, key: str) -> Optional[dict]:
+        """获取预处理结果"""
+        return self._index.read().get(key)
+    
+    def put(self, key: str, entry: dict):
+        """保存预处理结果"""
+        def mutate(entries: Dict[str, dict]):
+            entries[key] = dict(entry, time=time.time())
+            # 超出上限时删除最早的记录
+            if len(entries) > MAX_REFERENCE_ENTRIES:
+                oldest = sorted(entries.items(), key=lambda kv: kv[1].get("time", 0))
+                for old_key, _ in oldest[:len(entries) - MAX_REFERENCE_ENTRIES]:
+                    entries.pop(old_key, None)
+        try:
+            self._index.update(mutate)
+        except Exception as e:
+            print(f"[参考图缓存] 保存缓存失败: {e}")
+    
+    async def get_or_process(self, key: str, process: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        读取缓存，未命中时执行 process 并缓存结果
+        同一个键同时只会执行一次 process，其他调用方等待同一个结果
+        
+        Raises:
+            Exception: process 执行失败（失败结果不缓存）
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        
+        task = self._inflight.get(key)
+        if task is None:
+            async def run() -> dict:
+                result = await process()
+                self.put(key, result)
+                return result
+            
+            task = asyncio.ensure_future(run())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：单个调用方取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+
+# 全局参考图缓存实例
+reference_cache = ReferenceImageCache()
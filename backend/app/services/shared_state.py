@@ -0,0 +1,159 @@
+"""
+多进程共享状态
+以 `uvicorn --workers N` 启动多个进程时，各进程的内存互不可见。会话、用户、配置、
+任务跟踪索引和各类缓存索引都保存在 data/ 下的 JSON 文件中，通过这里的工具在进程间保持一致：
+
+- atomic_write_json：写入临时文件后原子替换，其他进程不会读到写了一半的文件
+- file_lock：跨进程互斥（fcntl），用于"读取-修改-写回"
+- SharedJsonFile：带内存缓存的 JSON 文件。其他进程写入后文件的 mtime/大小/inode 会变化，
+  下次读取时自动重新加载（文件监视，未变化时只需一次 stat）；修改在文件锁内基于最新内容进行，
+  不会覆盖其他进程的写入
+- try_lock：非阻塞独占锁，用于只需一个进程执行的后台任务（如 DashScope 任务轮询）
+- process_id / process_alive：标识当前进程，判断其他进程是否仍在运行
+"""
+
+import fcntl
+import json
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def process_id() -> str:
+    """当前进程标识（主机名:pid）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def process_alive(process: Optional[str]) -> bool:
+    """判断进程是否仍在运行（其他主机的进程无法判断，视为运行中）"""
+    if not process:
+        return False
+    host, _, pid = process.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+def atomic_write_json(path: Path, data: Any, indent: Optional[int] = None, default: Optional[Callable] = None):
+    """写入临时文件后原子替换（临时文件名包含进程和线程，并发写入互不干扰）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent, default=default)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(lock_path: Path) -> Iterator[None]:
+    """跨进程独占锁（阻塞等待）；同一线程内不可嵌套获取同一把锁"""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def try_lock(lock_path: Path) -> Optional[IO]:
+    """
+    尝试获取跨进程独占锁（不等待）
+
+    Returns:
+        获取成功返回锁文件对象（关闭即释放，进程退出时由系统释放），已被其他进程持有时返回 None
+    """
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    lock = open(lock_path, "a")
+    try:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+class SharedJsonFile:
+    """多进程共享的 JSON 字典文件"""
+
+    def __init__(self, path: Path, indent: Optional[int] = None, lock_file: Optional[Path] = None):
+        self.path = Path(path)
+        self.lock_file = Path(lock_file) if lock_file else self.path.with_name(self.path.name + ".lock")
+        self.indent = indent
+        self._lock = threading.RLock()
+        self._data: Optional[Dict[str, Any]] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _current(self) -> Dict[str, Any]:
+        """文件变化（或首次读取）时重新加载"""
+        signature = self._stat()
+        if self._data is None or signature != self._signature:
+            data = {}
+            if signature is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except (json.JSONDecodeError, OSError) as e:
+                    print(f"[共享状态] 读取 {self.path.name} 失败: {e}")
+            self._data = data if isinstance(data, dict) else {}
+            self._signature = signature
+        return self._data
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def read(self) -> Dict[str, Any]:
+        """当前内容（返回缓存的字典，调用方不要修改；修改请使用 update）"""
+        with self._lock:
+            return self._current()
+
+    def read_with_signature(self) -> Tuple[Optional[Tuple[int, int, int]], Dict[str, Any]]:
+        """当前内容及对应的文件签名；签名不变时内容不变，调用方可据此缓存解析结果"""
+        with self._lock:
+            data = self._current()
+            return self._signature, data
+
+    def update(self, mutate: Callable[[Dict[str, Any]], T]) -> T:
+        """在文件锁内读取最新内容，原地修改后写回，返回 mutate 的返回值"""
+        with self._lock, file_lock(self.lock_file):
+            data = self._current()
+            try:
+                result = mutate(data)
+                atomic_write_json(self.path, data, indent=self.indent)
+            except BaseException:
+                # 修改失败时丢弃内存中的改动，下次从文件重新加载
+                self._data = None
+                raise
+            self._signature = self._stat()
+            return result
+
+    def replace(self, data: Dict[str, Any]):
+        """整体替换文件内容"""
+        def mutate(current: Dict[str, Any]):
+            current.clear()
+            current.update(data)
+        self.update(mutate)
@@ -0,0 +1,213 @@
+"""
+分镜解析服务
+长剧本按场景边界切分为多个片段，并发调用 LLM 解析后按顺序合并
+
+- 切分：优先在场景标题（第X场、INT./EXT.、内景/外景 等）处切分，没有场景标题时按段落切分
+- 并发：同时解析的片段数受 CHUNK_CONCURRENCY 限制
+- 重试：单个片段失败只重试该片段；成功片段的回复已写入 LLM 缓存，整体重新请求时也不会重复调用
+"""
+
+import asyncio
+import json
+import re
+from typing import List, Optional, Tuple
+
+from app.services.dashscope.llm import LLMService
+
+# 单个片段的最大字符数
+DEFAULT_CHUNK_CHARS = 3000
+# 超过该长度的剧本自动使用分段解析
+CHUNK_THRESHOLD_CHARS = 6000
+# 同时解析的片段数上限
+CHUNK_CONCURRENCY = 4
+# 单个片段最大尝试次数
+CHUNK_MAX_ATTEMPTS = 3
+
+# 场景标题：第X场/幕/集/章、场景X、INT./EXT.、内景/外景、【场景】等
+SCENE_HEADING_RE = re.compile(
+    r"^\s*("
+    r"第[0-9一二三四五六七八九十百千零]+[场幕集章节]"
+    r"|场景\s*[0-9一二三四五六七八九十百千零]+"
+    r"|(INT|EXT|INT/EXT|I/E)[\.\s]"
+    r"|[内外]景[\s　：:.，,]"
+    r"|【[^】]*场[^】]*】"
+    r")",
+    re.IGNORECASE
+)
+
+CHUNK_NOTE = "（以下是完整剧本的第 {index}/{total} 部分，只为这一部分生成分镜，镜头序号从1开始）\n"
+
+
+class ChunkParseError(Exception):
+    """分段解析失败"""
+    pass
+
+
+def _split_scenes(content: str) -> List[str]:
+    """按场景标题切分，没有场景标题时按空行分段"""
+    segments = []
+    current: List[str] = []
+    for line in content.splitlines(keepends=True):
+        if SCENE_HEADING_RE.match(line) and any(l.strip() for l in current):
+            segments.append("".join(current))
+            current = []
+        current.append(line)
+    if current:
+        segments.append("".join(current))
+
+    if len(segments) <= 1:
+        segments = [p + "\n\n" for p in re.split(r"\n\s*\n", content) if p.strip()]
+    return segments
+
+
+def _split_oversized(segment: str, max_chars: int) -> List[str]:
+    """单个场景超过上限时按行切分（单行过长时直接截断）"""
+    pieces = []
+    current = ""
+    for line in segment.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_script(content: str, max_chars: int = DEFAULT_CHUNK_CHARS) -> List[str]:
+    """
+    把剧本切分为不超过 max_chars 的片段（尽量保持场景完整）
+
+    Returns:
+        按原文顺序排列的片段列表
+    """
+    chunks = []
+    current = ""
+    for segment in _split_scenes(content):
+        if len(segment) > max_chars:
+            if current.strip():
+                chunks.append(current)
+            current = ""
+            chunks.extend(_split_oversized(segment, max_chars))
+            continue
+        if len(current) + len(segment) > max_chars and current.strip():
+            chunks.append(current)
+            current = ""
+        current += segment
+    if current.strip():
+        chunks.append(current)
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def parse_shot_list(result: str) -> List[dict]:
+    """
+    解析 LLM 返回的分镜 JSON 数组
+
+    Raises:
+        ValueError: 返回内容不是 JSON 数组
+    """
+    result = result.strip()
+    if result.startswith("```json"):
+        result = result[7:]
+    elif result.startswith("```"):
+        result = result[3:]
+    if result.endswith("```"):
+        result = result[:-3]
+
+    data = json.loads(result)
+    if not isinstance(data, list):
+        raise ValueError("返回内容不是 JSON 数组")
+    return data
+
+
+def renumber_shots(shots: List[dict]) -> List[dict]:
+    """按顺序重新编号 shot_number（从 1 开始）"""
+    for i, shot in enumerate(shots, 1):
+        shot["shot_number"] = i
+    return shots
+
+
+async def parse_shots_chunked(
+    prompt: str,
+    content: str,
+    model: str,
+    use_cache: Optional[bool] = None,
+    max_chars: int = DEFAULT_CHUNK_CHARS,
+    concurrency: int = CHUNK_CONCURRENCY
+) -> Tuple[List[dict], dict]:
+    """
+    分段并发解析分镜
+
+    Args:
+        prompt: 分镜生成提示词（剧本内容拼接在其后）
+        content: 剧本内容
+        model: LLM 模型
+        use_cache: 为 False 时首次请求跳过 LLM 缓存
+        max_chars: 单个片段最大字符数
+        concurrency: 同时解析的片段数上限
+
+    Returns:
+        (重新编号后的分镜列表, 统计信息)
+
+    Raises:
+        ChunkParseError: 有片段在重试后仍然失败
+    """
+    chunks = split_script(content, max_chars)
+    total = len(chunks)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    attempts = [0] * total
+
+    print(f"[分镜解析] 剧本 {len(content)} 字，切分为 {total} 段，并发 {concurrency}")
+
+    async def parse_chunk(index: int, chunk: str) -> List[dict]:
+        note = CHUNK_NOTE.format(index=index + 1, total=total) if total > 1 else ""
+        last_error = None
+        for attempt in range(CHUNK_MAX_ATTEMPTS):
+            if attempt > 0:
+                # 等待后重试（指数退避）
+                await asyncio.sleep(2 * attempt)
+                print(f"[分镜解析] 第 {index + 1} 段重试 ({attempt + 1}/{CHUNK_MAX_ATTEMPTS})")
+            attempts[index] += 1
+            llm_service = LLMService()
+            try:
+                async with semaphore:
+                    result = await llm_service.chat(
+                        prompt=prompt + note + chunk,
+                        model=model,
+                        use_cache=use_cache
+                    )
+                return parse_shot_list(result)
+            except Exception as e:
+                # 格式错误的回复不能留在缓存里，否则重试会直接命中
+                llm_service.discard_last_cached()
+                last_error = e
+                print(f"[分镜解析] 第 {index + 1} 段解析失败: {e}")
+        raise ChunkParseError(f"第 {index + 1}/{total} 段解析失败: {last_error}")
+
+    results = await asyncio.gather(
+        *[parse_chunk(i, chunk) for i, chunk in enumerate(chunks)],
+        return_exceptions=True
+    )
+
+    errors = [str(r) for r in results if isinstance(r, Exception)]
+    if errors:
+        raise ChunkParseError("；".join(errors))
+
+    shots = []
+    for chunk_shots in results:
+        shots.extend(chunk_shots)
+    renumber_shots(shots)
+
+    stats = {
+        "chunks": total,
+        "attempts": sum(attempts),
+        "shots": len(shots)
+    }
+    print(f"[分镜解析] 完成: {stats}")
+    return shots, stats
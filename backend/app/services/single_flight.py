@@ -0,0 +1,103 @@
+"""
+相同读取合并（single-flight）
+
+多个调用方同时发起相同 key 的读取时，只执行一次，其他调用方等待并共享结果（或异常）：
+- do(key, fn)：同步调用，其他线程中相同 key 的调用等待第一个完成
+- run(key, fn)：异步调用，fn 在线程中执行，等待中的协程不占用线程；与 do 的调用也会合并
+- forget(group)：写入后调用，之后的读取不再复用写入前发起、仍在进行中的读取
+
+只合并进行中的调用，结果不缓存。key 为元组，第一个元素为分组（如 ("projects", project_id)）。
+"""
+
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        # 等待结果的协程 (事件循环, future)
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    """合并相同 key 的并发调用（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # 复用进行中调用的次数
+        self.shared = 0
+
+    def _execute(self, key: Hashable, call: _Call, fn: Callable[[], Any]):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                # forget 之后可能已有新的调用占用了这个 key
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                waiters, call.waiters = call.waiters, []
+            call.done.set()
+            for loop, future in waiters:
+                try:
+                    loop.call_soon_threadsafe(_wake, future)
+                except RuntimeError:
+                    pass  # 事件循环已关闭
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """执行 fn，或等待进行中的相同调用并共享其结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+        if leader:
+            self._execute(key, call, fn)
+        else:
+            call.done.wait()
+        return call.outcome()
+
+    async def run(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """在线程中执行 fn（不阻塞事件循环），或等待进行中的相同调用并共享其结果"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+                future = loop.create_future()
+                call.waiters.append((loop, future))
+        if leader:
+            # 调用方被取消时线程中的读取继续完成，其他等待者仍能拿到结果
+            await asyncio.shield(asyncio.to_thread(self._execute, key, call, fn))
+        else:
+            await future
+        return call.outcome()
+
+    def forget(self, group: Hashable):
+        """之后相同分组的调用重新执行（已在等待的调用方仍得到进行中调用的结果）"""
+        with self._lock:
+            for key in [key for key in self._calls if key[0] == group]:
+                del self._calls[key]
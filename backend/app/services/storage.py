@@ -6,26 +6,43 @@ JSON 文件存储服务
 - storage_service 会自动使用当前用户的数据目录
 - 使用文件锁确保并发安全
 - 如果未设置用户，使用全局默认目录（向后兼容）
+- 项目、项目下首帧/视频列表的并发相同读取合并为一次（*_async 版本在线程中读取，不阻塞事件循环）
+- 项目列表和项目摘要读取项目目录（project_catalog.py），保存项目、首帧、视频时同步更新
 """
 
 import json
 import fcntl
 import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional, List
 from datetime import datetime
 from contextvars import ContextVar
 
-from app.models.project import Project
+from app.models.project import Project, ProjectSummary
 from app.models.character import Character
 from app.models.scene import Scene
 from app.models.prop import Prop
 from app.models.frame import Frame
-from app.models.video import Video
+from app.models.video import Video, TaskStatus as VideoTaskStatus
 from app.models.style import Style
 from app.models.gallery import GalleryImage
 from app.models.studio import StudioTask
 from app.models.media import AudioItem, VideoItem, TextItem, VideoStudioTask
+from app.models.job import Job
+from app.services.task_tracker import task_tracker
+from app.services.shared_state import atomic_write_json
+from app.services.metrics import metrics
+from app.services.tracing import span
+from app.services.single_flight import SingleFlight
+from app.services.project_catalog import ProjectCatalog
+
+STORAGE_OPERATIONS = metrics.counter("storage_operations_total", "存储读写次数", ["op", "collection"])
+STORAGE_SECONDS = metrics.histogram(
+    "storage_operation_duration_seconds", "存储单次读写耗时（含 JSON 解析/序列化）", ["op", "collection"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
 
 # 当前用户 ID 的上下文变量
 _current_user_id: ContextVar[Optional[str]] = ContextVar('current_user_id', default=None)
@@ -41,6 +58,19 @@ def get_current_user_id() -> Optional[str]:
     return _current_user_id.get()
 
 
+def _is_active_video(video: Video) -> bool:
+    """视频是否已提交生成且尚未结束"""
+    return bool(
+        video.task and video.task.task_id
+        and video.task.status in (VideoTaskStatus.PENDING, VideoTaskStatus.PROCESSING)
+    )
+
+
+def _is_active_studio_task(task: StudioTask) -> bool:
+    """图片工作室任务是否有等待后台取回结果的生成任务"""
+    return task.status == "generating" and any(t.status == "pending" for t in task.generation_tasks)
+
+
 class StorageService:
     """JSON 文件存储服务 - 支持并发安全"""
     
@@ -64,9 +94,13 @@ class StorageService:
         self.video_library_dir = self.data_dir / "video_library"
         self.text_library_dir = self.data_dir / "text_library"
         self.video_studio_dir = self.data_dir / "video_studio"
+        self.jobs_dir = self.data_dir / "jobs"
         
         self._lock = threading.RLock()  # 可重入锁，支持并发访问
+        # 合并并发的相同读取（只共享读取和解析出的 dict，每个调用方各自构造模型，互不影响）
+        self._reads = SingleFlight()
         self._ensure_dirs()
+        self.catalog = ProjectCatalog(self)
     
     def _ensure_dirs(self):
         """确保所有目录存在"""
@@ -74,7 +108,8 @@ class StorageService:
             self.projects_dir, self.characters_dir, self.scenes_dir,
             self.props_dir, self.frames_dir, self.videos_dir, self.styles_dir,
             self.gallery_dir, self.studio_dir,
-            self.audio_dir, self.video_library_dir, self.text_library_dir, self.video_studio_dir
+            self.audio_dir, self.video_library_dir, self.text_library_dir, self.video_studio_dir,
+            self.jobs_dir
         ]:
             dir_path.mkdir(parents=True, exist_ok=True)
     
@@ -84,28 +119,53 @@ class StorageService:
             return obj.isoformat()
         raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
     
+    @staticmethod
+    @contextmanager
+    def _timed(op: str, file_path: Path):
+        """记录一次读写的指标和链路追踪 span（collection 为数据目录名，如 projects、frames）"""
+        collection = file_path.parent.name
+        started = time.perf_counter()
+        try:
+            with span(f"storage.{op}", collection=collection, id=file_path.stem):
+                yield
+        finally:
+            STORAGE_OPERATIONS.inc(op=op, collection=collection)
+            STORAGE_SECONDS.observe(time.perf_counter() - started, op=op, collection=collection)
+    
+    def _load_json(self, file_path: Path) -> dict:
+        """读取 JSON 文件（格式错误时抛出异常）"""
+        with self._timed("read", file_path):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    
     def _read_json_with_lock(self, file_path: Path) -> Optional[dict]:
         """带文件锁的 JSON 读取"""
         if not file_path.exists():
             return None
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                fcntl.flock(f.fileno(), fcntl.LOCK_SH)  # 共享锁
-                try:
-                    return json.load(f)
-                finally:
-                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
-        except (json.JSONDecodeError, IOError):
-            return None
+        with self._timed("read", file_path):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_SH)  # 共享锁
+                    try:
+                        return json.load(f)
+                    finally:
+                        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            except (json.JSONDecodeError, IOError):
+                return None
     
     def _write_json_with_lock(self, file_path: Path, data: dict):
-        """带文件锁的 JSON 写入"""
-        with open(file_path, 'w', encoding='utf-8') as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_EX)  # 排他锁
-            try:
-                json.dump(data, f, ensure_ascii=False, indent=2, default=self._serialize_datetime)
-            finally:
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        """JSON 写入（写临时文件后原子替换，其他线程/进程读取时不会读到写了一半的文件）"""
+        with self._timed("write", file_path):
+            atomic_write_json(file_path, data, indent=2, default=self._serialize_datetime)
+    
+    def _scan_by_project(self, directory: Path, project_id: str) -> List[dict]:
+        """读取目录下属于项目的所有记录"""
+        records = []
+        for file_path in directory.glob("*.json"):
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                records.append(data)
+        return records
     
     # ============ Project ============
     
@@ -115,27 +175,34 @@ class StorageService:
             project.updated_at = datetime.now()
             file_path = self.projects_dir / f"{project.id}.json"
             self._write_json_with_lock(file_path, project.model_dump())
+            # 之后的读取不再复用写入前发起的读取
+            self._reads.forget("projects")
+            self.catalog.save_project(project)
+    
+    def _load_project_data(self, project_id: str) -> Optional[dict]:
+        return self._read_json_with_lock(self.projects_dir / f"{project_id}.json")
     
     def get_project(self, project_id: str) -> Optional[Project]:
         """获取项目（线程安全）"""
-        file_path = self.projects_dir / f"{project_id}.json"
-        data = self._read_json_with_lock(file_path)
+        data = self._reads.do(("projects", project_id), lambda: self._load_project_data(project_id))
         if data:
             return Project(**data)
         return None
     
-    def list_projects(self) -> List[Project]:
-        """列出所有项目（线程安全）"""
-        projects = []
-        with self._lock:
-            for file_path in self.projects_dir.glob("*.json"):
-                data = self._read_json_with_lock(file_path)
-                if data:
-                    try:
-                        projects.append(Project(**data))
-                    except Exception:
-                        pass  # 跳过格式错误的文件
-        return sorted(projects, key=lambda p: p.updated_at, reverse=True)
+    async def get_project_async(self, project_id: str) -> Optional[Project]:
+        """获取项目（在线程中读取，并发的相同读取合并为一次）"""
+        data = await self._reads.run(("projects", project_id), lambda: self._load_project_data(project_id))
+        if data:
+            return Project(**data)
+        return None
+    
+    def list_projects(self) -> List[ProjectSummary]:
+        """列出所有项目的摘要（按更新时间倒序，只读取项目目录）"""
+        return self.catalog.list_projects()
+    
+    def get_project_summary(self, project_id: str) -> Optional[ProjectSummary]:
+        """获取项目摘要（只读取项目目录）"""
+        return self.catalog.get_summary(project_id)
     
     def delete_project(self, project_id: str) -> None:
         """删除项目（线程安全）"""
@@ -143,6 +210,8 @@ class StorageService:
             file_path = self.projects_dir / f"{project_id}.json"
             if file_path.exists():
                 file_path.unlink()
+            self._reads.forget("projects")
+            self.catalog.delete_project(project_id)
     
     # ============ Character ============
     
@@ -158,9 +227,8 @@ class StorageService:
         file_path = self.characters_dir / f"{character_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return Character(**data)
+        data = self._load_json(file_path)
+        return Character(**data)
     
     def delete_character(self, character_id: str) -> None:
         """删除角色"""
@@ -182,9 +250,8 @@ class StorageService:
         file_path = self.scenes_dir / f"{scene_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return Scene(**data)
+        data = self._load_json(file_path)
+        return Scene(**data)
     
     def delete_scene(self, scene_id: str) -> None:
         """删除场景"""
@@ -206,9 +273,8 @@ class StorageService:
         file_path = self.props_dir / f"{prop_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return Prop(**data)
+        data = self._load_json(file_path)
+        return Prop(**data)
     
     def delete_prop(self, prop_id: str) -> None:
         """删除道具"""
@@ -216,6 +282,30 @@ class StorageService:
         if file_path.exists():
             file_path.unlink()
     
+    # ============ Bulk ============
+    
+    def save_extracted(
+        self,
+        project: Project,
+        characters: List[Character],
+        scenes: List[Scene],
+        props: List[Prop]
+    ) -> None:
+        """批量保存剧本提取结果并关联到项目（一次加锁，项目文件只写一次）"""
+        with self._lock:
+            now = datetime.now()
+            for items, target_dir, id_list in (
+                (characters, self.characters_dir, project.character_ids),
+                (scenes, self.scenes_dir, project.scene_ids),
+                (props, self.props_dir, project.prop_ids),
+            ):
+                for item in items:
+                    item.updated_at = now
+                    self._write_json_with_lock(target_dir / f"{item.id}.json", item.model_dump())
+                    if item.id not in id_list:
+                        id_list.append(item.id)
+            self.save_project(project)
+    
     # ============ Frame ============
     
     def save_frame(self, frame: Frame) -> None:
@@ -224,33 +314,35 @@ class StorageService:
             frame.updated_at = datetime.now()
             file_path = self.frames_dir / f"{frame.id}.json"
             self._write_json_with_lock(file_path, frame.model_dump())
+            self._reads.forget("frames")
+            self.catalog.save_frame(frame)
     
     def get_frame(self, frame_id: str) -> Optional[Frame]:
         """获取首帧"""
         file_path = self.frames_dir / f"{frame_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return Frame(**data)
+        data = self._load_json(file_path)
+        return Frame(**data)
     
     def get_frame_by_shot(self, project_id: str, shot_id: str) -> Optional[Frame]:
         """根据分镜ID获取首帧"""
         for file_path in self.frames_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id and data.get("shot_id") == shot_id:
-                    return Frame(**data)
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id and data.get("shot_id") == shot_id:
+                return Frame(**data)
         return None
     
     def get_frames_by_project(self, project_id: str) -> List[Frame]:
         """获取项目所有首帧"""
-        frames = []
-        for file_path in self.frames_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    frames.append(Frame(**data))
+        records = self._reads.do(("frames", project_id), lambda: self._scan_by_project(self.frames_dir, project_id))
+        frames = [Frame(**data) for data in records]
+        return sorted(frames, key=lambda f: f.shot_number)
+    
+    async def get_frames_by_project_async(self, project_id: str) -> List[Frame]:
+        """获取项目所有首帧（在线程中读取，并发的相同读取合并为一次）"""
+        records = await self._reads.run(("frames", project_id), lambda: self._scan_by_project(self.frames_dir, project_id))
+        frames = [Frame(**data) for data in records]
         return sorted(frames, key=lambda f: f.shot_number)
     
     def delete_frame(self, frame_id: str) -> None:
@@ -258,6 +350,8 @@ class StorageService:
         file_path = self.frames_dir / f"{frame_id}.json"
         if file_path.exists():
             file_path.unlink()
+        self._reads.forget("frames")
+        self.catalog.delete_frame(frame_id)
     
     # ============ Video ============
     
@@ -267,43 +361,57 @@ class StorageService:
             video.updated_at = datetime.now()
             file_path = self.videos_dir / f"{video.id}.json"
             self._write_json_with_lock(file_path, video.model_dump())
+            self._reads.forget("videos")
+            self.catalog.save_video(video)
+        # 生成中的视频登记到任务跟踪索引，结束后移除
+        task_tracker.sync("video", video.id, video.project_id, _is_active_video(video))
     
     def get_video(self, video_id: str) -> Optional[Video]:
         """获取视频"""
         file_path = self.videos_dir / f"{video_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return Video(**data)
+        data = self._load_json(file_path)
+        return Video(**data)
     
     def get_video_by_task(self, task_id: str) -> Optional[Video]:
         """根据任务ID获取视频"""
         for file_path in self.videos_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                task = data.get("task")
-                if task and task.get("task_id") == task_id:
-                    return Video(**data)
+            data = self._load_json(file_path)
+            task = data.get("task")
+            if task and task.get("task_id") == task_id:
+                return Video(**data)
         return None
     
-    def get_videos_by_project(self, project_id: str) -> List[Video]:
-        """获取项目所有视频"""
+    def get_active_videos(self) -> List[Video]:
+        """获取所有生成中的视频（首次建立任务跟踪索引时使用）"""
         videos = []
         for file_path in self.videos_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    videos.append(Video(**data))
+            data = self._read_json_with_lock(file_path)
+            if data:
+                video = Video(**data)
+                if _is_active_video(video):
+                    videos.append(video)
+        return videos
+    
+    def get_videos_by_project(self, project_id: str) -> List[Video]:
+        """获取项目所有视频"""
+        records = self._reads.do(("videos", project_id), lambda: self._scan_by_project(self.videos_dir, project_id))
+        videos = [Video(**data) for data in records]
+        return sorted(videos, key=lambda v: v.shot_number)
+    
+    async def get_videos_by_project_async(self, project_id: str) -> List[Video]:
+        """获取项目所有视频（在线程中读取，并发的相同读取合并为一次）"""
+        records = await self._reads.run(("videos", project_id), lambda: self._scan_by_project(self.videos_dir, project_id))
+        videos = [Video(**data) for data in records]
         return sorted(videos, key=lambda v: v.shot_number)
     
     def get_video_by_shot(self, project_id: str, shot_id: str) -> Optional[Video]:
         """根据分镜ID获取视频"""
         for file_path in self.videos_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id and data.get("shot_id") == shot_id:
-                    return Video(**data)
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id and data.get("shot_id") == shot_id:
+                return Video(**data)
         return None
     
     def delete_video(self, video_id: str) -> None:
@@ -311,6 +419,9 @@ class StorageService:
         file_path = self.videos_dir / f"{video_id}.json"
         if file_path.exists():
             file_path.unlink()
+        self._reads.forget("videos")
+        self.catalog.delete_video(video_id)
+        task_tracker.untrack("video", video_id)
     
     # ============ Style ============
     
@@ -326,9 +437,8 @@ class StorageService:
         file_path = self.styles_dir / f"{style_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return Style(**data)
+        data = self._load_json(file_path)
+        return Style(**data)
     
     def delete_style(self, style_id: str) -> None:
         """删除风格"""
@@ -350,18 +460,16 @@ class StorageService:
         file_path = self.gallery_dir / f"{image_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return GalleryImage(**data)
+        data = self._load_json(file_path)
+        return GalleryImage(**data)
     
     def get_gallery_images_by_project(self, project_id: str) -> List[GalleryImage]:
         """获取项目所有图库图片"""
         images = []
         for file_path in self.gallery_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    images.append(GalleryImage(**data))
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                images.append(GalleryImage(**data))
         return sorted(images, key=lambda i: i.created_at, reverse=True)
     
     def delete_gallery_image(self, image_id: str) -> None:
@@ -378,24 +486,23 @@ class StorageService:
             task.updated_at = datetime.now()
             file_path = self.studio_dir / f"{task.id}.json"
             self._write_json_with_lock(file_path, task.model_dump())
+        task_tracker.sync("studio", task.id, task.project_id, _is_active_studio_task(task))
     
     def get_studio_task(self, task_id: str) -> Optional[StudioTask]:
         """获取图片工作室任务"""
         file_path = self.studio_dir / f"{task_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return StudioTask(**data)
+        data = self._load_json(file_path)
+        return StudioTask(**data)
     
     def get_studio_tasks_by_project(self, project_id: str) -> List[StudioTask]:
         """获取项目所有图片工作室任务"""
         tasks = []
         for file_path in self.studio_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    tasks.append(StudioTask(**data))
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                tasks.append(StudioTask(**data))
         return sorted(tasks, key=lambda t: t.created_at, reverse=True)
     
     def delete_studio_task(self, task_id: str) -> None:
@@ -403,6 +510,7 @@ class StorageService:
         file_path = self.studio_dir / f"{task_id}.json"
         if file_path.exists():
             file_path.unlink()
+        task_tracker.untrack("studio", task_id)
     
     # ============ Audio Library ============
     
@@ -418,18 +526,16 @@ class StorageService:
         file_path = self.audio_dir / f"{audio_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return AudioItem(**data)
+        data = self._load_json(file_path)
+        return AudioItem(**data)
     
     def get_audio_items(self, project_id: str) -> List[AudioItem]:
         """获取项目所有音频"""
         audios = []
         for file_path in self.audio_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    audios.append(AudioItem(**data))
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                audios.append(AudioItem(**data))
         return sorted(audios, key=lambda a: a.created_at, reverse=True)
     
     def delete_audio_item(self, audio_id: str) -> None:
@@ -452,18 +558,16 @@ class StorageService:
         file_path = self.video_library_dir / f"{video_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return VideoItem(**data)
+        data = self._load_json(file_path)
+        return VideoItem(**data)
     
     def get_video_items(self, project_id: str) -> List[VideoItem]:
         """获取项目所有视频"""
         videos = []
         for file_path in self.video_library_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    videos.append(VideoItem(**data))
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                videos.append(VideoItem(**data))
         return sorted(videos, key=lambda v: v.created_at, reverse=True)
     
     def delete_video_item(self, video_id: str) -> None:
@@ -486,18 +590,16 @@ class StorageService:
         file_path = self.text_library_dir / f"{text_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return TextItem(**data)
+        data = self._load_json(file_path)
+        return TextItem(**data)
     
     def get_text_items(self, project_id: str) -> List[TextItem]:
         """获取项目所有文本"""
         texts = []
         for file_path in self.text_library_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    texts.append(TextItem(**data))
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                texts.append(TextItem(**data))
         return sorted(texts, key=lambda t: t.created_at, reverse=True)
     
     def delete_text_item(self, text_id: str) -> None:
@@ -514,34 +616,72 @@ class StorageService:
             task.updated_at = datetime.now()
             file_path = self.video_studio_dir / f"{task.id}.json"
             self._write_json_with_lock(file_path, task.model_dump())
+        task_tracker.sync("video_studio", task.id, task.project_id, task.status == "processing" and bool(task.task_ids))
     
     def get_video_studio_task(self, task_id: str) -> Optional[VideoStudioTask]:
         """获取视频工作室任务"""
         file_path = self.video_studio_dir / f"{task_id}.json"
         if not file_path.exists():
             return None
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return VideoStudioTask(**data)
+        data = self._load_json(file_path)
+        return VideoStudioTask(**data)
     
     def get_video_studio_tasks(self, project_id: str) -> List[VideoStudioTask]:
         """获取项目所有视频工作室任务"""
         tasks = []
         for file_path in self.video_studio_dir.glob("*.json"):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data.get("project_id") == project_id:
-                    tasks.append(VideoStudioTask(**data))
+            data = self._load_json(file_path)
+            if data.get("project_id") == project_id:
+                tasks.append(VideoStudioTask(**data))
         return sorted(tasks, key=lambda t: t.created_at, reverse=True)
     
+    def get_active_video_studio_tasks(self) -> List[VideoStudioTask]:
+        """获取所有生成中的视频工作室任务（首次建立任务跟踪索引时使用）"""
+        tasks = []
+        for file_path in self.video_studio_dir.glob("*.json"):
+            data = self._read_json_with_lock(file_path)
+            if data and data.get("status") == "processing" and data.get("task_ids"):
+                tasks.append(VideoStudioTask(**data))
+        return tasks
+    
     def delete_video_studio_task(self, task_id: str) -> None:
         """删除视频工作室任务"""
         file_path = self.video_studio_dir / f"{task_id}.json"
         if file_path.exists():
             file_path.unlink()
+        task_tracker.untrack("video_studio", task_id)
+    
+    # ============ Job ============
+    
+    def save_job(self, job: Job) -> None:
+        """保存后台任务（线程安全）"""
+        with self._lock:
+            job.updated_at = datetime.now()
+            file_path = self.jobs_dir / f"{job.id}.json"
+            self._write_json_with_lock(file_path, job.model_dump(mode="json"))
+    
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """获取后台任务"""
+        data = self._read_json_with_lock(self.jobs_dir / f"{job_id}.json")
+        return Job(**data) if data else None
+    
+    def get_jobs(self, project_id: Optional[str] = None) -> List[Job]:
+        """获取后台任务（可按项目过滤），按创建时间倒序"""
+        jobs = []
+        for file_path in self.jobs_dir.glob("*.json"):
+            data = self._read_json_with_lock(file_path)
+            if data and (project_id is None or data.get("project_id") == project_id):
+                jobs.append(Job(**data))
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+    
+    def delete_job(self, job_id: str) -> None:
+        """删除后台任务"""
+        file_path = self.jobs_dir / f"{job_id}.json"
+        if file_path.exists():
+            file_path.unlink()
 
 
-# 存储服务缓存
+# 存储服务缓存（StorageService 不在内存中保存数据，每次读写文件，多个 worker 进程各自缓存实例即可）
 _storage_cache: dict = {}
 _default_storage: Optional[StorageService] = None
 
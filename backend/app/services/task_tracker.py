@@ -0,0 +1,315 @@
+"""
+DashScope 任务跟踪
+记录所有已提交到 DashScope、尚未取得结果的任务，后台轮询并回收结果，
+服务重启或前端不再轮询时结果也不会丢失
+
+- 索引：data/cache/dashscope_tasks.json 记录未结束的任务（类型、记录ID、所属用户、项目），
+  启动时直接读取索引恢复，不需要遍历所有用户的数据目录
+- 维护：视频、视频工作室任务由存储层在保存记录时自动登记/移除；
+  图片任务由生成服务在创建任务后登记、取得结果后移除
+- 回收：各类型注册自己的刷新函数（查询一次 DashScope 状态并写回记录），
+  后台轮询与接口查询共用同一次刷新，不会重复上传结果
+- 多进程：索引在进程间共享（文件锁 + 文件变化时重新加载）；后台轮询只在持有轮询锁的
+  一个进程中运行，该进程退出后由其他进程接管；请求自行轮询的任务记录所属进程，
+  进程退出后才交给后台
+
+注册刷新函数：
+
+    @task_tracker.refresher("video")
+    async def refresh_video_task(record_id: str, entry: dict) -> bool:
+        ...
+        return finished  # True 表示任务已结束，从索引移除
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable, Dict, List, Optional
+
+from app.services.metrics import metrics
+from app.services.tracing import traced
+from app.services.shared_state import SharedJsonFile, process_id, process_alive, try_lock
+
+# 后台轮询间隔（秒）
+TRACK_POLL_INTERVAL = 10.0
+# 同时刷新的任务数
+TRACK_CONCURRENCY = 4
+# 任务最长跟踪时间（秒）：DashScope 任务结果保留 24 小时，超过后无法再取回
+TASK_MAX_AGE = 24 * 3600
+
+TaskRefresher = Callable[[str, dict], Awaitable[bool]]
+
+
+class TaskTracker:
+    """未结束的 DashScope 任务索引与后台轮询"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        if cache_dir is None:
+            self.cache_dir = Path(__file__).parent.parent.parent / "data" / "cache"
+        else:
+            self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / "dashscope_tasks.json"
+        self._index = SharedJsonFile(self.index_file)
+        self._refreshers: Dict[str, TaskRefresher] = {}
+        # 刷新中的任务：索引键 -> Task
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._poller: Optional[asyncio.Task] = None
+        # 后台轮询锁（多进程时只有持有者轮询）
+        self._poller_lock: Optional[IO] = None
+
+    # ========== 索引 ==========
+
+    @staticmethod
+    def _key(kind: str, record_id: str) -> str:
+        return f"{kind}:{record_id}"
+
+    def track(self, kind: str, record_id: str, project_id: str = "", local: bool = False, **extra: Any):
+        """
+        登记未结束的任务（属于当前用户）
+
+        Args:
+            kind: 任务类型（video、video_studio、image 等，需注册对应的刷新函数）
+            record_id: 记录ID（图片任务为 DashScope task_id）
+            local: 由当前请求自行轮询，后台暂不处理（中断时调用 release 交给后台，
+                当前进程退出后也会由后台接管）
+            extra: 刷新时需要的其他信息（如结果缓存键）
+        """
+        from app.services.storage import get_current_user_id
+        key = self._key(kind, record_id)
+        owner = process_id() if local else None
+        entry = self._index.read().get(key)
+        # 已登记的任务（存储层每次保存都会调用）不重复写入
+        if entry is not None and (not local or entry.get("owner") == owner):
+            return
+        user_id = get_current_user_id()
+
+        def mutate(entries: Dict[str, dict]):
+            if key in entries:
+                if local:
+                    entries[key]["owner"] = owner
+                return
+            entries[key] = {
+                "kind": kind,
+                "record_id": record_id,
+                "user_id": user_id,
+                "project_id": project_id,
+                "created_at": time.time(),
+                "owner": owner,
+                **extra
+            }
+        self._index.update(mutate)
+
+    def release(self, kind: str, record_id: str):
+        """请求不再轮询该任务（超时、取消、服务关闭），交给后台回收结果"""
+        key = self._key(kind, record_id)
+        entry = self._index.read().get(key)
+        if entry is None or entry.get("owner") is None:
+            return
+
+        def mutate(entries: Dict[str, dict]):
+            if key in entries:
+                entries[key]["owner"] = None
+        self._index.update(mutate)
+
+    def untrack(self, kind: str, record_id: str):
+        """任务结束（或记录删除）后移除"""
+        key = self._key(kind, record_id)
+        if key not in self._index.read():
+            return
+        self._index.update(lambda entries: entries.pop(key, None))
+
+    def sync(self, kind: str, record_id: str, project_id: str, active: bool):
+        """按记录当前状态登记或移除（存储层保存记录时调用）"""
+        if active:
+            self.track(kind, record_id, project_id)
+        else:
+            self.untrack(kind, record_id)
+
+    def is_tracked(self, kind: str, record_id: str) -> bool:
+        return self._key(kind, record_id) in self._index.read()
+
+    def pending(self, kind: Optional[str] = None) -> List[dict]:
+        """未结束的任务列表"""
+        return [
+            dict(entry) for entry in list(self._index.read().values())
+            if kind is None or entry["kind"] == kind
+        ]
+
+    # ========== 刷新 ==========
+
+    def refresher(self, kind: str):
+        """注册刷新函数的装饰器"""
+        def decorator(func: TaskRefresher) -> TaskRefresher:
+            self._refreshers[kind] = func
+            return func
+        return decorator
+
+    async def refresh(self, kind: str, record_id: str) -> bool:
+        """
+        查询一次任务状态并写回记录
+        同一任务同时只会刷新一次（后台轮询和接口查询共用结果）
+
+        Returns:
+            任务是否已结束
+        """
+        key = self._key(kind, record_id)
+        task = self._inflight.get(key)
+        if task is None:
+            entry = dict(self._index.read().get(key) or {"kind": kind, "record_id": record_id})
+            task = asyncio.ensure_future(self._refresh_entry(key, entry))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _refresh_entry(self, key: str, entry: dict) -> bool:
+        refresher = self._refreshers.get(entry["kind"])
+        if refresher is None:
+            return False
+        finished = await refresher(entry["record_id"], entry)
+        if finished:
+            self.untrack(entry["kind"], entry["record_id"])
+        return finished
+
+    def _should_poll(self, entry: dict) -> bool:
+        if entry["kind"] not in self._refreshers:
+            return False
+        # 请求正在自行轮询的任务（如图片生成）在所属进程退出或 release 前不重复查询
+        return not process_alive(entry.get("owner"))
+
+    async def _poll_entry(self, entry: dict, semaphore: asyncio.Semaphore):
+        from app.middleware.auth import enter_user_context
+        async with semaphore:
+            # 在任务所属用户的上下文中刷新（存储、API Key、OSS 配置）
+            enter_user_context(entry.get("user_id"))
+            try:
+                with traced(f"refresh {entry['kind']}", entry.get("user_id"), record_id=entry["record_id"]):
+                    await self.refresh(entry["kind"], entry["record_id"])
+            except Exception as e:
+                print(f"[任务跟踪] 刷新失败: {entry['kind']} {entry['record_id']} ({e})")
+
+    async def poll_once(self) -> int:
+        """
+        刷新所有需要后台处理的任务
+
+        Returns:
+            本轮刷新的任务数
+        """
+        now = time.time()
+        entries = []
+        for entry in self.pending():
+            if now - entry.get("created_at", now) > TASK_MAX_AGE:
+                print(f"[任务跟踪] 任务超过 {TASK_MAX_AGE // 3600} 小时仍未结束，停止跟踪: {entry['kind']} {entry['record_id']}")
+                self.untrack(entry["kind"], entry["record_id"])
+                continue
+            if self._should_poll(entry):
+                entries.append(entry)
+        if entries:
+            semaphore = asyncio.Semaphore(TRACK_CONCURRENCY)
+            # 每个任务在独立的上下文中执行，切换用户互不影响
+            await asyncio.gather(*[
+                asyncio.ensure_future(self._poll_entry(entry, semaphore)) for entry in entries
+            ])
+        return len(entries)
+
+    def _acquire_poller(self) -> bool:
+        """多进程时只有一个进程轮询；持有者退出后由其他进程接管"""
+        if self._poller_lock is None:
+            self._poller_lock = try_lock(self.cache_dir / "dashscope_tasks.poller.lock")
+            if self._poller_lock is not None:
+                print(f"[任务跟踪] 本进程负责后台轮询（{process_id()}）")
+        return self._poller_lock is not None
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                if self._acquire_poller():
+                    await self.poll_once()
+            except Exception as e:
+                print(f"[任务跟踪] 轮询异常: {e}")
+            await asyncio.sleep(TRACK_POLL_INTERVAL)
+
+    # ========== 启动恢复 ==========
+
+    def bootstrap(self) -> int:
+        """
+        首次运行（索引文件不存在）时扫描一次已有数据，登记未结束的任务
+        之后索引由存储层维护，启动时不再遍历数据目录
+
+        Returns:
+            登记的任务数
+        """
+        if self._index.exists():
+            return 0
+        from app.services.storage import get_default_storage, get_user_storage, set_current_user
+        from app.services.user_service import get_user_service
+
+        stores = [(user_id, get_user_storage(user_id)) for user_id in get_user_service()._load_users()]
+        # 未登录模式的数据（默认存储）只在已存在时扫描，避免创建空目录
+        if (self.cache_dir.parent / "videos").exists():
+            stores.insert(0, (None, get_default_storage()))
+        found = []
+        for user_id, store in stores:
+            set_current_user(user_id)
+            for video in store.get_active_videos():
+                found.append(("video", video.id, video.project_id, user_id))
+            for task in store.get_active_video_studio_tasks():
+                found.append(("video_studio", task.id, task.project_id, user_id))
+        set_current_user(None)
+
+        def mutate(entries: Dict[str, dict]) -> int:
+            added = 0
+            for kind, record_id, project_id, user_id in found:
+                key = self._key(kind, record_id)
+                if key not in entries:
+                    entries[key] = {
+                        "kind": kind,
+                        "record_id": record_id,
+                        "user_id": user_id,
+                        "project_id": project_id,
+                        "created_at": time.time(),
+                        "owner": None
+                    }
+                    added += 1
+            return added
+        # 多个进程同时启动时可能都会扫描，合并写入不会重复登记
+        return self._index.update(mutate)
+
+    def start(self):
+        """启动后台轮询（应用启动时调用）"""
+        if self._poller is not None:
+            return
+        added = self.bootstrap()
+        if added:
+            print(f"[任务跟踪] 首次运行，已登记 {added} 个未结束的任务")
+        pending = self.pending()
+        if pending:
+            print(f"[任务跟踪] 恢复 {len(pending)} 个未结束的 DashScope 任务")
+        self._poller = asyncio.ensure_future(self._poll_loop())
+
+    async def stop(self):
+        """停止后台轮询（应用关闭时调用）"""
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        if self._poller_lock is not None:
+            self._poller_lock.close()
+            self._poller_lock = None
+
+
+# 全局任务跟踪实例
+task_tracker = TaskTracker()
+
+PENDING_TASKS = metrics.gauge(
+    "dashscope_pending_tasks", "已提交、尚未取得结果的 DashScope 任务数", ["kind"], shared=True
+)
+
+
+@metrics.collector
+def collect_pending_tasks():
+    counts: Dict[str, int] = {}
+    for entry in task_tracker.pending():
+        counts[entry["kind"]] = counts.get(entry["kind"], 0) + 1
+    PENDING_TASKS.clear()
+    for kind, count in counts.items():
+        PENDING_TASKS.set(count, kind=kind)
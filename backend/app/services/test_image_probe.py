@@ -0,0 +1,151 @@
+"""
+图片尺寸探测测试脚本
+
+验证：
+1. PNG / JPEG / WebP（有损、无损、扩展格式）/ GIF 只靠文件头部即可解析尺寸
+2. 远程图片只通过 Range 请求读取头部，不下载完整文件
+3. 服务器不支持 Range 时读到足够字节即停止
+
+运行方式:
+    cd backend
+    python -m app.services.test_image_probe
+"""
+
+import sys
+import asyncio
+from io import BytesIO
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+from PIL import Image
+
+from app.services import image_probe
+from app.services.image_probe import parse_image_size, probe_image_size, PROBE_HEAD_BYTES
+
+
+def make_image(fmt: str, size=(1234, 567), **kwargs) -> bytes:
+    """生成测试图片"""
+    mode = "RGBA" if kwargs.pop("alpha", False) else "RGB"
+    img = Image.new(mode, size, (200, 100, 50))
+    buffer = BytesIO()
+    img.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def make_large_jpeg(size=(3000, 2000)) -> bytes:
+    """生成带大块 EXIF 的 JPEG（SOF 标记位于 EXIF 之后）"""
+    img = Image.effect_noise(size, 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010E] = "x" * 30000  # ImageDescription
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", exif=exif.tobytes(), quality=95)
+    return buffer.getvalue()
+
+
+def check_parse_headers() -> bool:
+    """逐个格式解析头部，打印结果，返回是否全部通过"""
+    cases = {
+        "PNG": make_image("PNG"),
+        "JPEG": make_image("JPEG"),
+        "JPEG+EXIF": make_large_jpeg((1234, 567)),
+        "WebP 有损": make_image("WEBP", quality=80),
+        "WebP 无损": make_image("WEBP", lossless=True),
+        "WebP 扩展": make_image("WEBP", alpha=True, quality=80),
+        "GIF": make_image("GIF"),
+    }
+    ok = True
+    for name, data in cases.items():
+        expected = Image.open(BytesIO(data)).size
+        head = data[:PROBE_HEAD_BYTES]
+        size = parse_image_size(head)
+        passed = size == expected
+        ok = ok and passed
+        print(f"  {'✅' if passed else '❌'} {name}: 头部 {len(head)} 字节 -> {size}（实际 {expected}）")
+
+    # 字节不足时返回 None，不抛异常
+    truncated = parse_image_size(make_image("PNG")[:10])
+    if truncated is not None:
+        print("  ❌ 截断数据应返回 None")
+        ok = False
+    return ok
+
+
+async def run_remote_test(data: bytes, honor_range: bool) -> dict:
+    """模拟远程图片服务器，统计实际发送的字节数"""
+    stats = {"sent": 0, "range": None}
+
+    async def body(payload: bytes):
+        # 按 8KB 分块发送，便于统计客户端提前断开时实际读取的字节
+        for i in range(0, len(payload), 8192):
+            chunk = payload[i:i + 8192]
+            stats["sent"] += len(chunk)
+            yield chunk
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        range_header = request.headers.get("Range")
+        stats["range"] = range_header
+        if honor_range and range_header:
+            start, end = range_header.split("=")[1].split("-")
+            payload = data[int(start):int(end) + 1]
+            return httpx.Response(206, content=body(payload))
+        return httpx.Response(200, content=body(data))
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    original = image_probe.get_http_client
+    image_probe.get_http_client = lambda: client
+    try:
+        stats["size"] = await probe_image_size("https://example.com/image.jpg")
+    finally:
+        image_probe.get_http_client = original
+        await client.aclose()
+    return stats
+
+
+def check_remote_probe() -> bool:
+    """分别模拟支持/不支持 Range 的服务器，打印结果，返回是否全部通过"""
+    data = make_large_jpeg()
+    expected = Image.open(BytesIO(data)).size
+    ok = True
+    for honor_range in (True, False):
+        stats = asyncio.run(run_remote_test(data, honor_range))
+        label = "支持 Range" if honor_range else "不支持 Range"
+        passed = stats["size"] == expected and stats["sent"] < len(data) and stats["sent"] <= PROBE_HEAD_BYTES
+        ok = ok and passed
+        print(
+            f"  {'✅' if passed else '❌'} {label}: 文件 {len(data)} 字节，"
+            f"读取 {stats['sent']} 字节 -> {stats['size']}（请求头 {stats['range']}）"
+        )
+    return ok
+
+
+def test_parse_headers():
+    assert check_parse_headers(), "图片头部解析结果不正确"
+
+
+def test_remote_probe():
+    assert check_remote_probe(), "远程图片头部探测结果不正确"
+
+
+def main():
+    print("=" * 60)
+    print("图片尺寸探测测试")
+    print("=" * 60)
+
+    print("\n1. 文件头部解析")
+    ok = check_parse_headers()
+
+    print("\n2. 远程图片头部探测")
+    ok = check_remote_probe() and ok
+
+    print("\n" + "=" * 60)
+    print("✅ 测试通过!" if ok else "❌ 测试失败!")
+    print("=" * 60)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+后台任务队列测试脚本
+
+验证：
+1. 提交后立即返回，worker 执行并保存进度和结果
+2. 执行失败记录错误信息
+3. 取消排队中的任务、执行中的任务，以及其他进程发起的取消（cancel_requested）
+4. 执行者进程退出后任务重新入队（启动时和运行期间定期检查）；应用关闭时执行中的任务在下次启动时重新执行
+
+运行方式:
+    cd backend
+    python -m app.services.test_job_queue
+"""
+
+import sys
+import asyncio
+import shutil
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.models.job import Job, JobStatus
+from app.services import storage, job_queue as job_queue_module
+from app.services.storage import StorageService
+from app.services.job_queue import JobQueue, JobContext, QueueIndex
+
+
+def make_queue(index: QueueIndex) -> JobQueue:
+    """创建测试队列并注册测试用的任务类型"""
+    queue = JobQueue(index)
+
+    @queue.handler("echo")
+    async def echo(job: Job, ctx: JobContext) -> dict:
+        ctx.report(0.5, "处理中")
+        await asyncio.sleep(0.05)
+        return {"value": job.params["value"]}
+
+    @queue.handler("fail")
+    async def fail(job: Job, ctx: JobContext) -> dict:
+        raise Exception("生成失败")
+
+    @queue.handler("slow")
+    async def slow(job: Job, ctx: JobContext) -> dict:
+        await asyncio.sleep(30)
+        return {}
+
+    return queue
+
+
+async def wait_status(store: StorageService, job_id: str, statuses, timeout: float = 5.0) -> Job:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = store.get_job(job_id)
+        if job and job.status in statuses:
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"任务 {job_id} 未在 {timeout}s 内进入状态 {statuses}")
+
+
+async def main():
+    print("=" * 60)
+    print("后台任务队列测试")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp(prefix="job_queue_test_")
+    # 使用临时目录作为默认存储和队列索引
+    storage._default_storage = StorageService(work_dir)
+    store = storage._default_storage
+    job_queue_module.POLL_INTERVAL = 0.1
+    job_queue_module.CANCEL_CHECK_INTERVAL = 0.1
+    index = QueueIndex(str(Path(work_dir) / "cache"))
+
+    try:
+        queue = make_queue(index)
+        queue.start(2)
+
+        # 1. 提交并执行
+        started = time.perf_counter()
+        job = queue.submit("echo", {"value": 42}, project_id="p1")
+        submit_ms = (time.perf_counter() - started) * 1000
+        assert job.status == JobStatus.QUEUED
+        done = await wait_status(store, job.id, {JobStatus.SUCCEEDED})
+        assert done.result == {"value": 42}, done.result
+        assert done.progress == 1.0 and done.attempts == 1
+        assert index.get(job.id) is None, "结束的任务应从索引移除"
+        print(f"✅ 提交耗时 {submit_ms:.1f}ms，worker 执行完成并保存结果")
+
+        # 2. 执行失败
+        job = queue.submit("fail", {})
+        failed = await wait_status(store, job.id, {JobStatus.FAILED})
+        assert failed.error == "生成失败", failed.error
+        print("✅ 执行失败时记录错误信息")
+
+        # 3. 取消执行中的任务
+        job = queue.submit("slow", {})
+        running = await wait_status(store, job.id, {JobStatus.RUNNING})
+        queue.cancel(running)
+        cancelled = await wait_status(store, job.id, {JobStatus.CANCELLED})
+        print(f"✅ 取消执行中的任务: {cancelled.error}")
+
+        # 其他进程发起的取消：只修改任务记录
+        job = queue.submit("slow", {})
+        running = await wait_status(store, job.id, {JobStatus.RUNNING})
+        running.cancel_requested = True
+        store.save_job(running)
+        await wait_status(store, job.id, {JobStatus.CANCELLED})
+        print("✅ 通过任务记录跨进程取消")
+
+        # 4. 应用关闭时执行中的任务重新入队，下次启动重新执行
+        job = queue.submit("slow", {})
+        await wait_status(store, job.id, {JobStatus.RUNNING})
+        await queue.stop()
+        entry = index.get(job.id)
+        assert entry and entry["status"] == JobStatus.QUEUED.value, entry
+        print("✅ 应用关闭后执行中的任务重新入队")
+
+        # 排队中的任务直接取消
+        queued = queue.submit("echo", {"value": 1})
+        assert queue.cancel(queued).status == JobStatus.CANCELLED
+        assert index.get(queued.id) is None
+        print("✅ 取消排队中的任务")
+
+        # 执行者进程已退出的任务
+        orphan = Job(kind="echo", params={"value": 7})
+        store.save_job(orphan)
+        index.add(orphan)
+        index.claim(f"{socket.gethostname()}:999999999", ["echo"])
+        job_queue_module.ORPHAN_CHECK_INTERVAL = 0.2
+        restarted = make_queue(index)
+        restarted.start(2)
+        done = await wait_status(store, orphan.id, {JobStatus.SUCCEEDED})
+        assert done.result == {"value": 7}
+        again = await wait_status(store, job.id, {JobStatus.RUNNING})
+        assert again.attempts == 2, again.attempts
+        print("✅ 重启后恢复中断的任务（重新执行次数已累计）")
+
+        # 运行期间其他 worker 进程退出
+        crashed = Job(kind="echo", params={"value": 9})
+        store.save_job(crashed)
+        index.add(crashed)
+        index.claim(f"{socket.gethostname()}:999999998", ["echo"])
+        done = await wait_status(store, crashed.id, {JobStatus.SUCCEEDED})
+        assert done.result == {"value": 9}
+        print("✅ 运行期间定期恢复执行进程已退出的任务")
+        restarted.cancel(again)
+        await wait_status(store, job.id, {JobStatus.CANCELLED})
+        await restarted.stop()
+    finally:
+        storage._default_storage = None
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
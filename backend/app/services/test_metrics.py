@@ -0,0 +1,195 @@
+"""
+运行指标测试脚本
+
+验证：
+1. Counter / Gauge / Histogram 的 Prometheus 文本输出（分桶累计）
+2. 多进程合并：其他进程的 Counter 相加、Gauge 按 worker 区分，已退出进程的快照被清理；
+   共享 Gauge 只取一个进程的值；公开导出时按用户合并，不出现用户ID
+3. 请求指标按路由模板统计
+4. DashScope 请求（httpx 和 SDK 使用的 requests）按模型和接口统计耗时与错误
+5. 存储读写次数
+
+运行方式:
+    cd backend
+    python -m app.services.test_metrics
+"""
+
+import sys
+import os
+import json
+import asyncio
+import shutil
+import socket
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import httpx
+import httpcore
+import requests
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.project import Project
+from app.services.metrics import MetricsRegistry, metrics
+from app.services.storage import StorageService
+
+
+class FakePool:
+    """替代 httpx 传输层的连接池，直接返回指定状态码"""
+
+    def __init__(self, status: int):
+        self.status = status
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def handle_async_request(self, request: httpcore.Request) -> httpcore.Response:
+        return httpcore.Response(self.status, headers=[(b"content-type", b"application/json")], content=b"{}")
+
+
+class FakeAdapter(requests.adapters.BaseAdapter):
+    """替代 requests 的 HTTP 适配器"""
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 400
+        response.url = request.url
+        response._content = b"{}"
+        return response
+
+    def close(self):
+        pass
+
+
+def sample(text: str, prefix: str) -> float:
+    """取第一条以 prefix 开头的样本值"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"没有找到指标: {prefix}")
+
+
+async def call_dashscope():
+    transport = httpx.AsyncHTTPTransport()
+    transport._pool = FakePool(200)
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.post(
+            "https://dashscope.aliyuncs.com/api/v1/services/aigc/text2image/image-synthesis",
+            json={"model": "wan2.6-t2i", "input": {"prompt": "猫"}}
+        )
+        transport._pool = FakePool(500)
+        await client.get("https://dashscope.aliyuncs.com/api/v1/tasks/abc-123")
+
+
+def main():
+    print("=" * 60)
+    print("运行指标测试")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp(prefix="metrics_test_")
+    try:
+        # 1. 文本输出
+        registry = MetricsRegistry(str(Path(work_dir) / "metrics"))
+        counter = registry.counter("demo_total", "示例计数", ["kind"])
+        histogram = registry.histogram("demo_seconds", "示例耗时", ["kind"], buckets=(0.1, 1.0))
+        gauge = registry.gauge("demo_depth", "示例深度")
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        histogram.observe(0.05, kind="a")
+        histogram.observe(0.5, kind="a")
+        histogram.observe(5, kind="a")
+        gauge.set(3)
+        text = registry.render()
+        assert 'demo_total{kind="a"} 3' in text, text
+        assert 'demo_seconds_bucket{kind="a",le="0.1"} 1' in text
+        assert 'demo_seconds_bucket{kind="a",le="1"} 2' in text
+        assert 'demo_seconds_bucket{kind="a",le="+Inf"} 3' in text
+        assert 'demo_seconds_count{kind="a"} 3' in text
+        assert "# TYPE demo_seconds histogram" in text
+        print("✅ Prometheus 文本格式输出，直方图分桶累计")
+
+        # 2. 多进程合并
+        other = registry.snapshot()
+        other["process"] = f"{socket.gethostname()}:{os.getppid()}"
+        dead = dict(other, process=f"{socket.gethostname()}:999999999")
+        registry.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        for snapshot in (other, dead):
+            with open(registry._snapshot_file(snapshot["process"]), "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+        text = registry.render()
+        assert 'demo_total{kind="a"} 6' in text, text
+        assert 'demo_seconds_count{kind="a"} 6' in text
+        assert f'demo_depth{{worker="{os.getpid()}"}} 3' in text
+        assert f'demo_depth{{worker="{os.getppid()}"}} 3' in text
+        assert not registry._snapshot_file(dead["process"]).exists(), "已退出进程的快照应被删除"
+        print("✅ 合并其他进程的指标，清理已退出进程的快照")
+
+        shared = registry.gauge("demo_queue_depth", "示例共享深度", shared=True)
+        per_user = registry.counter("demo_user_total", "示例按用户计数", ["kind", "user"])
+        shared.set(4)
+        per_user.inc(kind="a", user="u1")
+        per_user.inc(kind="a", user="u2")
+        other = registry.snapshot()
+        other["process"] = f"{socket.gethostname()}:{os.getppid()}"
+        with open(registry._snapshot_file(other["process"]), "w", encoding="utf-8") as f:
+            json.dump(other, f)
+        text = registry.render(include_user=False)
+        assert [line for line in text.splitlines() if line.startswith("demo_queue_depth")] == ["demo_queue_depth 4"], text
+        assert 'demo_user_total{kind="a"} 4' in text and "u1" not in text, text
+        assert 'demo_user_total{kind="a",user="u1"} 2' in registry.render()
+        print("✅ 共享 Gauge 不按进程重复，公开导出时按用户合并")
+
+        # 3. 请求指标
+        client = TestClient(app)
+        assert client.get("/api/health").status_code == 200
+        assert client.get("/api/projects/p-1").status_code == 401
+        assert client.post("/api/auth/login", json={"username": "nobody", "password": "wrong"}).status_code == 401
+        response = client.get("/api/metrics")
+        assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+        text = response.text
+        assert sample(text, 'http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}') >= 1
+        assert sample(text, 'http_request_duration_seconds_count{method="GET",route="<unmatched>",status="401"}') >= 1
+        assert sample(text, 'http_request_duration_seconds_count{method="POST",route="/api/auth/login",status="401"}') >= 1
+        print("✅ 请求耗时按路由模板统计（未通过认证的请求同样统计）")
+
+        # 4. DashScope 请求
+        asyncio.run(call_dashscope())
+        session = requests.Session()
+        session.mount("https://", FakeAdapter())
+        session.post(
+            "https://dashscope.aliyuncs.com/api/v1/services/aigc/video-generation/video-synthesis",
+            json={"model": "wan2.6-i2v", "input": {}}
+        )
+        text = metrics.render()
+        assert sample(text, 'dashscope_request_duration_seconds_count{model="wan2.6-t2i",endpoint="/api/v1/services/aigc/text2image/image-synthesis"}') == 1
+        assert sample(text, 'dashscope_request_errors_total{model="",endpoint="/api/v1/tasks/{task_id}",code="500"}') == 1
+        assert sample(text, 'dashscope_request_errors_total{model="wan2.6-i2v",endpoint="/api/v1/services/aigc/video-generation/video-synthesis",code="400"}') == 1
+        print("✅ DashScope 请求按模型和接口统计耗时与错误（httpx 和 SDK）")
+
+        # 5. 存储读写
+        store = StorageService(str(Path(work_dir) / "data"))
+        project = Project(name="测试")
+        store.save_project(project)
+        before = metrics.render()
+        reads = sample(before, 'storage_operations_total{op="read",collection="projects"}') if 'op="read",collection="projects"' in before else 0
+        assert store.get_project(project.id) is not None
+        text = metrics.render()
+        assert sample(text, 'storage_operations_total{op="read",collection="projects"}') == reads + 1
+        assert sample(text, 'storage_operations_total{op="write",collection="projects"}') >= 1
+        print("✅ 存储读写次数和耗时")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+项目目录测试脚本
+
+验证：
+1. 已有数据首次使用时扫描一次建立目录，计数与逐个读取的结果一致
+2. 保存首帧/视频时更新已生成数；重复保存不会重复计数，清除结果后减少
+3. 项目列表和摘要只读取目录，不读取项目、首帧、视频文件
+4. 另一个实例（另一个 worker 进程）的修改立即可见
+5. 删除首帧、视频、项目后目录同步更新
+
+运行方式:
+    cd backend
+    python -m app.services.test_project_catalog
+"""
+
+import sys
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.models.project import Project, Script, Shot
+from app.models.frame import Frame, FrameImage
+from app.models.video import Video
+from app.services.storage import StorageService
+
+
+def write_raw(directory: Path, model):
+    """不经过 StorageService 写入（模拟升级前已有的数据）"""
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f"{model.id}.json", "w", encoding="utf-8") as f:
+        json.dump(model.model_dump(mode="json"), f, ensure_ascii=False)
+
+
+def main():
+    print("=" * 60)
+    print("项目目录测试")
+    print("=" * 60)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="project_catalog_test_"))
+    try:
+        # 1. 已有数据建立目录
+        project = Project(
+            name="旧项目",
+            script=Script(shots=[Shot(shot_number=i + 1) for i in range(4)]),
+            character_ids=["c1", "c2"],
+            scene_ids=["s1"]
+        )
+        other = Project(name="另一个项目")
+        for item in (project, other):
+            write_raw(work_dir / "projects", item)
+        frames = [
+            Frame(project_id=project.id, shot_id=shot.id, shot_number=shot.shot_number,
+                  image_groups=[FrameImage(url=f"/media/{i}.png")] if i < 3 else [])
+            for i, shot in enumerate(project.script.shots)
+        ]
+        for frame in frames:
+            write_raw(work_dir / "frames", frame)
+        write_raw(work_dir / "videos", Video(project_id=project.id, shot_id="x", video_url="/media/v.mp4"))
+        write_raw(work_dir / "videos", Video(project_id=other.id, shot_id="y"))
+
+        storage = StorageService(str(work_dir))
+        summary = storage.get_project_summary(project.id)
+        assert (summary.shots_count, summary.characters_count, summary.scenes_count) == (4, 2, 1)
+        assert summary.frames_generated == 3 and summary.videos_generated == 1, summary
+        assert storage.get_project_summary(other.id).videos_generated == 0
+        assert (work_dir / "project_catalog.json").exists()
+        print("✅ 已有数据首次使用时建立目录，计数正确")
+
+        # 2. 保存首帧/视频
+        frames[3].image_groups = [FrameImage(url="/media/3.png")]
+        storage.save_frame(frames[3])
+        storage.save_frame(frames[3])
+        assert storage.get_project_summary(project.id).frames_generated == 4, "重复保存不应重复计数"
+        frames[0].image_groups = []
+        storage.save_frame(frames[0])
+        assert storage.get_project_summary(project.id).frames_generated == 3
+        video = Video(project_id=other.id, shot_id="z")
+        storage.save_video(video)
+        assert storage.get_project_summary(other.id).videos_generated == 0
+        video.video_url = "/media/z.mp4"
+        storage.save_video(video)
+        assert storage.get_project_summary(other.id).videos_generated == 1
+        print("✅ 保存首帧/视频时更新已生成数，重复保存不重复计数")
+
+        # 3. 列表和摘要只读取目录
+        other.name = "改名后"
+        storage.save_project(other)
+
+        def forbidden(*args, **kwargs):
+            raise AssertionError("项目列表和摘要不应读取数据文件")
+
+        original = storage._read_json_with_lock, storage._load_json
+        storage._read_json_with_lock = storage._load_json = forbidden
+        try:
+            projects = storage.list_projects()
+            assert [p.name for p in projects] == ["改名后", "旧项目"], "按更新时间倒序"
+            assert storage.get_project_summary(project.id).frames_generated == 3
+            assert storage.get_project_summary("missing") is None
+        finally:
+            storage._read_json_with_lock, storage._load_json = original
+        print("✅ 项目列表和摘要只读取目录文件")
+
+        # 4. 其他实例的修改可见
+        another = StorageService(str(work_dir))
+        new_project = Project(name="新项目")
+        another.save_project(new_project)
+        another.delete_frame(frames[1].id)
+        assert [p.name for p in storage.list_projects()][0] == "新项目"
+        assert storage.get_project_summary(project.id).frames_generated == 2
+        print("✅ 其他实例（worker 进程）的修改立即可见")
+
+        # 5. 删除
+        storage.delete_video(video.id)
+        assert storage.get_project_summary(other.id).videos_generated == 0
+        storage.delete_project(other.id)
+        assert storage.get_project_summary(other.id) is None
+        assert {p.name for p in another.list_projects()} == {"旧项目", "新项目"}
+        print("✅ 删除首帧、视频、项目后目录同步更新")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+多进程共享状态测试脚本
+
+验证：
+1. 多个进程并发修改同一个 SharedJsonFile，不丢失更新
+2. 其他进程写入后，已缓存内容的实例自动重新加载
+3. 会话：一个进程登录产生的 token，另一个进程可以验证；登出后失效
+4. 配置：文件未变化时复用已解析的配置；一个进程保存配置后，另一个进程读取到新值
+5. 轮询锁只能被一个进程持有，持有者退出后可被接管
+
+运行方式:
+    cd backend
+    python -m app.services.test_shared_state
+"""
+
+import sys
+import shutil
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.config import ConfigManager
+from app.services.shared_state import SharedJsonFile, try_lock
+from app.services.user_service import UserService
+
+PROCESSES = 4
+INCREMENTS = 50
+
+
+def increment_worker(path: str, name: str):
+    shared = SharedJsonFile(Path(path))
+
+    def mutate(data: dict):
+        data["count"] = data.get("count", 0) + 1
+        writers = data.setdefault("writers", {})
+        writers[name] = writers.get(name, 0) + 1
+
+    for _ in range(INCREMENTS):
+        shared.update(mutate)
+
+
+def login_worker(data_dir: str, queue):
+    service = UserService(data_dir)
+    result = service.login("alice", "secret1")
+    queue.put(result[0] if result else None)
+
+
+def logout_worker(data_dir: str, token: str):
+    UserService(data_dir).logout(token)
+
+
+def config_worker(config_dir: str, queue):
+    manager = ConfigManager(config_dir)
+    manager.update(llm={"model": "qwen-max"})
+    queue.put(True)
+
+
+def lock_worker(lock_path: str, queue):
+    queue.put(try_lock(Path(lock_path)) is not None)
+
+
+def run(target, *args):
+    process = multiprocessing.Process(target=target, args=args)
+    process.start()
+    process.join()
+    assert process.exitcode == 0, f"{target.__name__} 退出码 {process.exitcode}"
+
+
+def main():
+    print("=" * 60)
+    print("多进程共享状态测试")
+    print("=" * 60)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="shared_state_test_"))
+    queue = multiprocessing.Queue()
+    try:
+        # 1. 并发修改
+        path = work_dir / "counter.json"
+        local = SharedJsonFile(path)
+        assert local.read() == {}
+        processes = [
+            multiprocessing.Process(target=increment_worker, args=(str(path), f"p{i}"))
+            for i in range(PROCESSES)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        data = local.read()
+        assert data["count"] == PROCESSES * INCREMENTS, data
+        assert all(count == INCREMENTS for count in data["writers"].values())
+        print(f"✅ {PROCESSES} 个进程各修改 {INCREMENTS} 次，没有丢失更新")
+
+        # 2. 其他进程写入后重新加载
+        local.update(lambda d: d.__setitem__("count", 0))
+        run(increment_worker, str(path), "late")
+        assert local.read()["count"] == INCREMENTS
+        print("✅ 其他进程写入后自动重新加载")
+
+        # 3. 会话在进程间可见
+        data_dir = str(work_dir / "data")
+        service = UserService(data_dir)
+        assert service.register("alice", "secret1") is not None
+        # 让 service 先缓存会话文件
+        assert service.get_user_by_token("missing") is None
+        process = multiprocessing.Process(target=login_worker, args=(data_dir, queue))
+        process.start()
+        token = queue.get(timeout=30)
+        process.join()
+        assert token and service.get_user_by_token(token) is not None, "其他进程登录的 token 应有效"
+        run(logout_worker, data_dir, token)
+        assert service.get_user_by_token(token) is None, "其他进程登出后 token 应失效"
+        assert service.register("alice", "other") is None, "用户名重复"
+        print("✅ 会话在进程间共享：其他进程登录/登出立即生效")
+
+        # 4. 配置在进程间可见
+        config_dir = str(work_dir / "config")
+        manager = ConfigManager(config_dir)
+        assert manager.load().llm.model != "qwen-max"
+        assert manager.load() is manager.load(), "文件未变化时应复用已解析的配置"
+        process = multiprocessing.Process(target=config_worker, args=(config_dir, queue))
+        process.start()
+        queue.get(timeout=30)
+        process.join()
+        assert manager.load().llm.model == "qwen-max"
+        print("✅ 文件未变化时复用已解析的配置，其他进程保存的配置立即可见")
+
+        # 5. 轮询锁
+        lock_path = work_dir / "poller.lock"
+        holder = try_lock(lock_path)
+        assert holder is not None
+        process = multiprocessing.Process(target=lock_worker, args=(str(lock_path), queue))
+        process.start()
+        assert queue.get(timeout=30) is False
+        process.join()
+        holder.close()
+        process = multiprocessing.Process(target=lock_worker, args=(str(lock_path), queue))
+        process.start()
+        assert queue.get(timeout=30) is True
+        process.join()
+        print("✅ 轮询锁同时只有一个进程持有，释放后可被接管")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
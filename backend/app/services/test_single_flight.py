@@ -0,0 +1,183 @@
+"""
+存储层相同读取合并测试脚本
+
+验证：
+1. 多个线程同时读取同一项目的首帧列表，只扫描一次目录；每个调用方得到各自的模型对象
+2. 多个协程同时读取同一项目（*_async），只读取一次文件，且不阻塞事件循环
+3. 写入后发起的读取不复用写入前发起的读取，能读到写入后的数据
+4. 读取异常同样传给所有等待的调用方
+5. 不同项目的读取互不混淆；先后发生的读取不合并（不缓存结果）
+
+运行方式:
+    cd backend
+    python -m app.services.test_single_flight
+"""
+
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.models.project import Project
+from app.models.frame import Frame
+from app.services.single_flight import SingleFlight
+from app.services.storage import StorageService
+
+READ_DELAY = 0.05
+
+
+class SlowStorage(StorageService):
+    """读取文件时等待一段时间，让并发读取重叠，并统计读取次数"""
+
+    def __init__(self, data_dir: str):
+        super().__init__(data_dir)
+        self.reads = 0
+        self._count_lock = threading.Lock()
+
+    def _count(self):
+        with self._count_lock:
+            self.reads += 1
+        time.sleep(READ_DELAY)
+
+    def _load_json(self, file_path: Path) -> dict:
+        data = super()._load_json(file_path)
+        self._count()
+        return data
+
+    def _read_json_with_lock(self, file_path: Path):
+        data = super()._read_json_with_lock(file_path)
+        self._count()
+        return data
+
+
+def run_threads(count: int, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(index: int):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+async def concurrent_project_reads(storage: SlowStorage, project_id: str, count: int):
+    ticks = 0
+    stop = asyncio.Event()
+
+    async def ticker():
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticker_task = asyncio.create_task(ticker())
+    projects = await asyncio.gather(*(storage.get_project_async(project_id) for _ in range(count)))
+    stop.set()
+    await ticker_task
+    return projects, ticks
+
+
+async def read_during_write(storage: SlowStorage, project: Project):
+    """读取进行中时保存项目，之后发起的读取应读到新数据"""
+    stale_read = asyncio.create_task(storage.get_project_async(project.id))
+    await asyncio.sleep(READ_DELAY / 5)
+    project.name = "改名后"
+    storage.save_project(project)
+    fresh = await storage.get_project_async(project.id)
+    return await stale_read, fresh
+
+
+async def failing_reads(flight: SingleFlight, count: int):
+    calls = 0
+
+    def fail():
+        nonlocal calls
+        calls += 1
+        time.sleep(READ_DELAY)
+        raise ValueError("文件损坏")
+
+    results = await asyncio.gather(*(flight.run(("broken", 1), fail) for _ in range(count)), return_exceptions=True)
+    return results, calls
+
+
+def main():
+    print("=" * 60)
+    print("存储层相同读取合并测试")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp(prefix="single_flight_test_")
+    try:
+        storage = SlowStorage(work_dir)
+        project = Project(name="测试项目")
+        other = Project(name="其他项目")
+        storage.save_project(project)
+        storage.save_project(other)
+        for index in range(5):
+            storage.save_frame(Frame(project_id=project.id, shot_id=f"s{index}", shot_number=index + 1))
+
+        # 1. 线程并发读取首帧列表
+        storage.reads = 0
+        results = run_threads(8, lambda: storage.get_frames_by_project(project.id))
+        assert all(len(frames) == 5 for frames in results)
+        assert storage.reads == 5, f"应只扫描一次目录（5 个文件），实际读取 {storage.reads} 次"
+        assert results[0][0] is not results[1][0], "每个调用方应得到各自的模型对象"
+        results[0][0].prompt = "只修改自己的副本"
+        assert results[1][0].prompt != "只修改自己的副本"
+        print(f"✅ 8 个线程同时读取首帧列表，只读取 {storage.reads} 个文件（未合并时为 40 次）")
+
+        # 2. 协程并发读取项目
+        storage.reads = 0
+        projects, ticks = asyncio.run(concurrent_project_reads(storage, project.id, 20))
+        assert all(p.id == project.id for p in projects)
+        assert storage.reads == 1, f"应只读取一次，实际 {storage.reads} 次"
+        assert len({id(p) for p in projects}) == 20
+        assert ticks >= 3, "读取在线程中进行，事件循环应能继续处理其他任务"
+        print("✅ 20 个协程同时读取同一项目，只读取 1 次文件，读取期间事件循环不阻塞")
+
+        # 3. 写入后的读取
+        storage.reads = 0
+        stale, fresh = asyncio.run(read_during_write(storage, project))
+        assert stale.name == "测试项目", "写入前发起的读取返回旧数据"
+        assert fresh.name == "改名后", "写入后发起的读取不应复用写入前的读取"
+        assert storage.reads == 2
+        print("✅ 写入后发起的读取重新读取文件，读到写入后的数据")
+
+        # 4. 异常
+        flight = SingleFlight()
+        results, calls = asyncio.run(failing_reads(flight, 5))
+        assert calls == 1 and all(isinstance(r, ValueError) for r in results)
+        assert flight.shared == 4
+        print("✅ 读取异常传给所有等待的调用方")
+
+        # 5. 不同 key / 先后发生的读取
+        storage.reads = 0
+        results = run_threads(4, lambda: (storage.get_project(project.id), storage.get_project(other.id)))
+        assert all(a.name == "改名后" and b.name == "其他项目" for a, b in results)
+        assert storage.reads <= 4
+        storage.reads = 0
+        storage.get_project(project.id)
+        storage.get_project(project.id)
+        assert storage.reads == 2, "先后发生的读取不合并（不缓存结果）"
+        print("✅ 不同项目的读取互不混淆；只合并同时进行的读取，不缓存结果")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+图片工作室异步生成测试脚本
+
+验证：
+1. 只创建 DashScope 任务就返回：创建的任务记录到 StudioTask，命中缓存的组直接写入图片，
+   创建失败的组重试后仍失败时占位
+2. 生成中的任务登记到任务跟踪索引
+3. 后台刷新：任务未结束时保持 generating，全部结束后写入图片并完成，从索引移除
+4. 刷新期间任务被重新生成时，不写回旧结果
+
+运行方式:
+    cd backend
+    python -m app.services.test_studio_generation
+"""
+
+import sys
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.models.studio import StudioTask
+from app.services import storage
+from app.services.storage import StorageService
+from app.services.task_tracker import TaskTracker
+from app.services.dashscope.image_tasks import SubmittedImageTask
+from app.routers import studio
+
+
+async def main():
+    print("=" * 60)
+    print("图片工作室异步生成测试")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp(prefix="studio_generation_test_")
+    tracker = TaskTracker(str(Path(work_dir) / "cache"))
+    tracker._refreshers["studio"] = studio.refresh_studio_generation
+    original_tracker = storage.task_tracker
+    original_query = studio.query_image_task
+    storage.task_tracker = tracker
+    storage._default_storage = StorageService(str(Path(work_dir) / "data"))
+    store = storage._default_storage
+
+    # DashScope 任务状态（task_id -> output）
+    outputs = {}
+
+    async def fake_query(task_id: str) -> dict:
+        return outputs[task_id]
+
+    studio.query_image_task = fake_query
+
+    try:
+        # 1. 创建任务
+        task = StudioTask(project_id="p1", prompt="一只猫", n=2, group_count=4, status="generating")
+        calls = {"count": 0}
+
+        async def submit_group() -> SubmittedImageTask:
+            calls["count"] += 1
+            index = calls["count"]
+            if index == 2:
+                return SubmittedImageTask(urls=["/media/cached-1.png", "/media/cached-2.png"])
+            if index == 4:
+                raise Exception("Throttling")
+            return SubmittedImageTask(task_id=f"dash-{index}", request_id=f"req-{index}")
+
+        started = time.perf_counter()
+        await studio.submit_generation_groups(task, 2, submit_group)
+        elapsed = time.perf_counter() - started
+        studio.finish_generation(task)
+        store.save_studio_task(task)
+
+        assert [t.task_id for t in task.generation_tasks] == ["dash-1", "dash-3", "dash-5"], task.generation_tasks
+        assert [t.group_index for t in task.generation_tasks] == [0, 2, 3]
+        assert [img.group_index for img in task.images] == [2, 3], "命中缓存的组直接写入图片"
+        assert task.status == "generating" and task.last_task_id == "dash-5"
+        print(f"✅ 创建任务后返回（{elapsed:.1f}s，含一次限流重试），命中缓存的组直接写入图片")
+
+        # 2. 登记到任务跟踪
+        assert tracker.is_tracked("studio", task.id)
+        print("✅ 生成中的任务已登记到任务跟踪索引")
+
+        # 3. 后台刷新
+        outputs["dash-1"] = {"task_status": "SUCCEEDED", "results": [{"url": "/media/a.png"}, {"url": "/media/b.png"}]}
+        outputs["dash-3"] = {"task_status": "RUNNING"}
+        outputs["dash-5"] = {"task_status": "FAILED", "code": "DataInspectionFailed", "message": "内容审核未通过"}
+        assert await tracker.refresh("studio", task.id) is False
+        saved = store.get_studio_task(task.id)
+        assert saved.status == "generating"
+        assert [t.status for t in saved.generation_tasks] == ["succeeded", "pending", "failed"]
+        assert tracker.is_tracked("studio", task.id)
+
+        outputs["dash-3"] = {"task_status": "SUCCEEDED", "results": [{"url": "/media/c.png"}, {"url": "/media/d.png"}]}
+        assert await tracker.refresh("studio", task.id) is True
+        saved = store.get_studio_task(task.id)
+        assert saved.status == "completed", saved.status
+        assert [img.group_index for img in saved.images] == list(range(8))
+        assert [img.url for img in saved.images] == [
+            "/media/a.png", "/media/b.png", "/media/cached-1.png", "/media/cached-2.png",
+            "/media/c.png", "/media/d.png", None, None
+        ], [img.url for img in saved.images]
+        assert not tracker.is_tracked("studio", task.id)
+        print("✅ 后台刷新取回结果，全部结束后完成任务并移除跟踪")
+
+        # 4. 刷新期间重新生成
+        task = StudioTask(project_id="p1", prompt="一只狗", n=1, group_count=1, status="generating")
+
+        async def submit_single() -> SubmittedImageTask:
+            return SubmittedImageTask(task_id="dash-old")
+
+        await studio.submit_generation_groups(task, 1, submit_single)
+        store.save_studio_task(task)
+
+        async def slow_query(task_id: str) -> dict:
+            # 查询期间用户重新生成
+            regenerated = store.get_studio_task(task.id)
+            regenerated.images = []
+            regenerated.generation_tasks = []
+            await studio.submit_generation_groups(regenerated, 1, lambda: asyncio.sleep(0, SubmittedImageTask(task_id="dash-new")))
+            store.save_studio_task(regenerated)
+            return {"task_status": "SUCCEEDED", "results": [{"url": "/media/old.png"}]}
+
+        studio.query_image_task = slow_query
+        assert await tracker.refresh("studio", task.id) is False
+        saved = store.get_studio_task(task.id)
+        assert saved.status == "generating" and not saved.images
+        assert [t.task_id for t in saved.generation_tasks] == ["dash-new"]
+        assert tracker.is_tracked("studio", task.id)
+        print("✅ 刷新期间重新生成时不写回旧结果")
+    finally:
+        storage.task_tracker = original_tracker
+        storage._default_storage = None
+        studio.query_image_task = original_query
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""
+DashScope 任务跟踪测试脚本
+
+验证：
+1. 保存生成中的视频/视频工作室任务时自动登记，结束或删除后移除
+2. 索引持久化：重启（新实例）后直接从索引恢复，不遍历数据目录
+3. 后台轮询：跳过请求自行轮询的任务，release 后接管；同一任务的并发刷新只执行一次
+4. 首次运行（没有索引文件）时扫描一次已有数据
+5. 两种图片任务结果格式的 URL 提取
+
+运行方式:
+    cd backend
+    python -m app.services.test_task_tracker
+"""
+
+import sys
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.models.video import Video, VideoTask, TaskStatus
+from app.models.media import VideoStudioTask
+from app.services import storage
+from app.services.storage import StorageService
+from app.services.task_tracker import TaskTracker
+from app.services.dashscope.image_tasks import extract_image_urls
+
+
+async def main():
+    print("=" * 60)
+    print("DashScope 任务跟踪测试")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp(prefix="task_tracker_test_")
+    cache_dir = str(Path(work_dir) / "cache")
+    tracker = TaskTracker(cache_dir)
+    # 存储层使用测试实例
+    original_tracker = storage.task_tracker
+    storage.task_tracker = tracker
+    store = StorageService(str(Path(work_dir) / "data"))
+
+    try:
+        # 1. 存储层自动维护索引
+        video = Video(project_id="p1", shot_id="s1", task=VideoTask(task_id="dash-1", status=TaskStatus.PROCESSING))
+        store.save_video(video)
+        studio_task = VideoStudioTask(project_id="p1", status="processing", task_ids=["dash-2", "dash-3"])
+        store.save_video_studio_task(studio_task)
+        assert tracker.is_tracked("video", video.id)
+        assert tracker.is_tracked("video_studio", studio_task.id)
+
+        video.task.status = TaskStatus.SUCCEEDED
+        store.save_video(video)
+        assert not tracker.is_tracked("video", video.id)
+        store.delete_video_studio_task(studio_task.id)
+        assert not tracker.is_tracked("video_studio", studio_task.id)
+        print("✅ 保存生成中的记录时登记，结束或删除后移除")
+
+        # 2. 新实例直接读取索引
+        tracker.track("video", "v-restart", "p1")
+        restarted = TaskTracker(cache_dir)
+        assert restarted.bootstrap() == 0, "已有索引时不应扫描数据目录"
+        assert [e["record_id"] for e in restarted.pending()] == ["v-restart"]
+        print("✅ 重启后从索引恢复未结束的任务")
+
+        # 3. 后台轮询
+        calls = []
+
+        @restarted.refresher("video")
+        async def refresh_video(record_id: str, entry: dict) -> bool:
+            calls.append(record_id)
+            await asyncio.sleep(0.05)
+            return len(calls) >= 2
+
+        @restarted.refresher("image")
+        async def refresh_image(record_id: str, entry: dict) -> bool:
+            calls.append(record_id)
+            return True
+
+        restarted.track("image", "img-1", "p1", local=True)
+        assert await restarted.poll_once() == 1, "请求自行轮询的图片任务不应被后台处理"
+        assert calls == ["v-restart"]
+
+        # 接口查询与后台轮询同时刷新同一任务，只查询一次
+        results = await asyncio.gather(
+            restarted.refresh("video", "v-restart"),
+            restarted.refresh("video", "v-restart")
+        )
+        assert calls == ["v-restart", "v-restart"] and results == [True, True], (calls, results)
+        assert not restarted.is_tracked("video", "v-restart")
+
+        restarted.release("image", "img-1")
+        assert await restarted.poll_once() == 1
+        assert calls[-1] == "img-1" and not restarted.pending()
+        print("✅ 后台轮询接管中断的任务，并发刷新共用一次查询")
+
+        # 4. 首次运行扫描已有数据
+        active = Video(project_id="p2", shot_id="s2", task=VideoTask(task_id="dash-4", status=TaskStatus.PROCESSING))
+        store.save_video(active)
+        done = Video(project_id="p2", shot_id="s3", task=VideoTask(task_id="dash-5", status=TaskStatus.FAILED))
+        store.save_video(done)
+        fresh = TaskTracker(str(Path(work_dir) / "data" / "cache"))
+        original_default = storage._default_storage
+        storage._default_storage = store
+        try:
+            added = fresh.bootstrap()
+        finally:
+            storage._default_storage = original_default
+        assert added == 1 and fresh.is_tracked("video", active.id), fresh.pending()
+        assert fresh.bootstrap() == 0
+        print("✅ 首次运行时扫描一次已有数据建立索引")
+
+        # 5. 图片结果格式
+        assert extract_image_urls({"results": [{"url": "https://a/1.png"}, {"code": "x"}]}) == ["https://a/1.png"]
+        assert extract_image_urls({"choices": [{"message": {"content": [
+            {"type": "text", "text": "..."}, {"type": "image", "image": "https://a/2.png"}
+        ]}}]}) == ["https://a/2.png"]
+        print("✅ 提取两种格式的图片结果")
+    finally:
+        storage.task_tracker = original_tracker
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
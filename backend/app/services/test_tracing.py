@@ -0,0 +1,121 @@
+"""
+链路追踪测试脚本
+
+验证：
+1. span 嵌套关系；asyncio.gather 子任务和 asyncio.to_thread 中的调用归入同一个 trace
+2. 没有 trace 时 span 不记录；单个 trace 的 span 数有上限
+3. 请求经过 AuthMiddleware 时创建 trace，响应头返回 X-Trace-Id，按路由模板命名
+4. JSONL 导出后按耗时查询最慢的 trace（按用户过滤）
+5. OTLP JSON 格式转换
+
+运行方式:
+    cd backend
+    python -m app.services.test_tracing
+"""
+
+import sys
+import asyncio
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import tracing
+from app.services.tracing import Tracer, span, traced, start_trace, finish_trace, to_otlp
+
+
+async def traced_work():
+    with traced("demo", "u1") as trace:
+        with span("outer"):
+            async def child(index: int):
+                with span("child", index=index):
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(child(0), child(1))
+
+            def blocking():
+                with span("in_thread"):
+                    time.sleep(0.01)
+
+            await asyncio.to_thread(blocking)
+    return trace
+
+
+def main():
+    print("=" * 60)
+    print("链路追踪测试")
+    print("=" * 60)
+
+    work_dir = tempfile.mkdtemp(prefix="tracing_test_")
+    original_tracer = tracing.tracer
+    tracing.tracer = Tracer(export="jsonl", trace_dir=Path(work_dir))
+    try:
+        # 1. 嵌套关系
+        trace = asyncio.run(traced_work())
+        spans = {item["name"]: item for item in trace.spans}
+        assert sorted(item["name"] for item in trace.spans) == ["child", "child", "in_thread", "outer"]
+        assert spans["outer"]["parent_id"] == trace.root_span_id
+        assert all(item["parent_id"] == spans["outer"]["span_id"] for item in trace.spans if item["name"] != "outer")
+        assert spans["outer"]["duration_ms"] >= 20 and trace.duration_ms >= spans["outer"]["duration_ms"]
+        assert tracing.current_trace() is None
+        print("✅ span 嵌套关系正确，子任务和线程中的调用归入同一个 trace")
+
+        # 2. 无 trace / 上限
+        with span("orphan") as attrs:
+            attrs["x"] = 1
+        many = start_trace("many")
+        for _ in range(tracing.MAX_SPANS_PER_TRACE + 10):
+            with span("storage.read"):
+                pass
+        finish_trace(many)
+        assert len(many.spans) == tracing.MAX_SPANS_PER_TRACE and many.dropped_spans == 10
+        print("✅ 没有 trace 时不记录，span 数超过上限时只计数")
+
+        # 3. 请求
+        client = TestClient(app)
+        assert "X-Trace-Id" not in client.get("/api/health").headers
+        response = client.post("/api/auth/login", json={"username": "nobody", "password": "wrong"})
+        assert response.status_code == 401
+        trace_id = response.headers.get("X-Trace-Id")
+        assert trace_id and len(trace_id) == 32
+        request_trace = next(t for t in tracing.tracer._recent if t.trace_id == trace_id)
+        assert request_trace.name == "POST /api/auth/login" and request_trace.attrs["status"] == 401
+        assert client.get("/api/debug/traces").status_code == 401, "调试接口需要登录"
+        print("✅ 请求创建 trace，响应头返回 X-Trace-Id")
+
+        # 4. 导出与查询
+        tracing.tracer.flush()
+        lines = tracing.tracer.trace_file().read_text(encoding="utf-8").splitlines()
+        assert len(lines) == len(tracing.tracer._recent), (len(lines), len(tracing.tracer._recent))
+        fresh = Tracer(export="jsonl", trace_dir=Path(work_dir))
+        slowest = fresh.slowest(limit=5, user_id="u1")
+        assert [item["name"] for item in slowest] == ["demo"], "应从 JSONL 读取，且只返回该用户的"
+        assert len(slowest[0]["spans"]) == 4
+        print(f"✅ 导出 {len(lines)} 条 trace 到 JSONL，按用户查询最慢的 trace")
+
+        # 5. OTLP
+        payload = to_otlp([trace.to_dict()])
+        otlp_spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert len(otlp_spans) == 5
+        root = otlp_spans[0]
+        assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16 and "parentSpanId" not in root
+        assert all(item["parentSpanId"] for item in otlp_spans[1:])
+        assert int(root["endTimeUnixNano"]) > int(root["startTimeUnixNano"])
+        print("✅ 转换为 OTLP/HTTP JSON 格式")
+    finally:
+        tracing.tracer = original_tracer
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("✅ 所有测试通过!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+缩略图服务
+为图库、图片工作室、首帧、角色等图片生成多个尺寸的 WebP 预览图，列表页无需加载原图
+
+- 尺寸：按最长边缩放（sm / md / lg），小图不放大
+- 存储：与原图放在一起（原图在 OSS 时上传到 OSS，本地图片保存到本地媒体存储）
+- 索引：原图 URL -> {尺寸名: 缩略图 URL}，保存在 data/cache/thumbnail_index.json
+- 生成：图片入库时或首次被列表访问时在后台生成；解码和编码在进程池中执行，不占用事件循环
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from PIL import Image
+
+from app.services.media_store import media_store
+from app.services.oss import oss_service
+from app.services.metrics import metrics
+from app.services.shared_state import SharedJsonFile
+
+# 缩略图尺寸（最长边像素）
+THUMBNAIL_SIZES = {
+    "sm": 256,
+    "md": 512,
+    "lg": 1024,
+}
+# WebP 编码质量
+THUMBNAIL_QUALITY = 80
+# 进程池大小（同时也是后台生成的并发上限）
+THUMBNAIL_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# 生成失败后多久可以重试（秒）
+FAILURE_RETRY_SECONDS = 600
+# 索引条数上限
+MAX_THUMBNAIL_ENTRIES = 50000
+
+
+def render_thumbnails(source: Union[str, bytes], sizes: Dict[str, int], quality: int = THUMBNAIL_QUALITY) -> Dict[str, bytes]:
+    """
+    生成各尺寸的 WebP 缩略图（在进程池中执行）
+    
+    Args:
+        source: 本地文件路径或图片字节
+        sizes: 尺寸名 -> 最长边像素
+    
+    Returns:
+        尺寸名 -> WebP 字节
+    """
+    with Image.open(source if isinstance(source, str) else BytesIO(source)) as img:
+        # JPEG 按最大尺寸直接以低分辨率解码，大幅减少解码耗时
+        largest = max(sizes.values())
+        img.draft("RGB", (largest, largest))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        else:
+            img.load()
+        
+        results = {}
+        # 从大到小依次缩放，每一级都基于上一级的结果
+        current = img
+        for name, max_dim in sorted(sizes.items(), key=lambda kv: -kv[1]):
+            current = current.copy()
+            current.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            current.save(buffer, format="WEBP", quality=quality, method=4)
+            results[name] = buffer.getvalue()
+        return results
+
+
+class ThumbnailService:
+    """缩略图生成与索引"""
+    
+    def __init__(self, cache_dir: Optional[str] = None):
+        if cache_dir is None:
+            self.cache_dir = Path(__file__).parent.parent.parent / "data" / "cache"
+        else:
+            self.cache_dir = Path(cache_dir)
+        self.index_file = self.cache_dir / "thumbnail_index.json"
+        # 多个 worker 进程共享索引
+        self._index = SharedJsonFile(self.index_file)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 生成中的任务：原图 URL -> Task
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 最近失败的原图 URL -> 失败时间
+        self._failed: Dict[str, float] = {}
+    
+    # ========== 索引 ==========
+    
+    def get(self, url: str) -> Dict[str, str]:
+        """获取已生成的缩略图（尺寸名 -> URL），没有时返回空字典"""
+        if not url:
+            return {}
+        entry = self._index.read().get(url)
+        return dict(entry["urls"]) if entry else {}
+    
+    def _put(self, url: str, urls: Dict[str, str]):
+        def mutate(entries: Dict[str, dict]):
+            entries[url] = {"urls": urls, "time": time.time()}
+            if len(entries) > MAX_THUMBNAIL_ENTRIES:
+                oldest = sorted(entries.items(), key=lambda kv: kv[1].get("time", 0))
+                for old_url, _ in oldest[:len(entries) - MAX_THUMBNAIL_ENTRIES]:
+                    entries.pop(old_url, None)
+        try:
+            self._index.update(mutate)
+        except Exception as e:
+            print(f"[缩略图] 保存索引失败: {e}")
+    
+    # ========== 生成 ==========
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn：不复制父进程的线程和事件循环状态
+            self._pool = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+    
+    @staticmethod
+    def is_supported(url: Optional[str]) -> bool:
+        """data URL 随请求传入，不生成缩略图"""
+        return isinstance(url, str) and bool(url) and not url.startswith("data:")
+    
+    async def _store(self, data: bytes, source_url: str, project_id: str) -> str:
+        """保存单张缩略图，与原图放在同一存储"""
+        if not media_store.is_local_url(source_url) and oss_service.is_enabled():
+            success, result = await asyncio.to_thread(
+                oss_service.upload_from_bytes, data, "thumbnail", "webp", project_id
+            )
+            if success:
+                return result
+            print(f"[缩略图] OSS 上传失败，改为保存到本地: {result}")
+        return media_store.save(data, "webp")
+    
+    async def _generate(self, url: str, project_id: str) -> Dict[str, str]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(THUMBNAIL_WORKERS)
+        async with self._semaphore:
+            started = time.perf_counter()
+            # 优先读取本地副本；下载后写入本地缓存，进程池直接读取文件
+            data = await media_store.fetch(url, timeout=60.0)
+            path = media_store.get_path(url)
+            source: Union[str, bytes] = str(path) if path is not None else data
+            
+            loop = asyncio.get_running_loop()
+            try:
+                rendered = await loop.run_in_executor(
+                    self._get_pool(), render_thumbnails, source, THUMBNAIL_SIZES
+                )
+            except BrokenProcessPool:
+                # 子进程异常退出后进程池不可再用，下次重新创建
+                self._pool = None
+                raise
+            urls = {}
+            for name, thumb in rendered.items():
+                urls[name] = await self._store(thumb, url, project_id)
+        
+        self._put(url, urls)
+        self._failed.pop(url, None)
+        total = sum(len(thumb) for thumb in rendered.values())
+        print(
+            f"[缩略图] 已生成 {len(urls)} 个尺寸（原图 {len(data) // 1024}KB -> 共 {total // 1024}KB），"
+            f"耗时 {time.perf_counter() - started:.2f}s"
+        )
+        return urls
+    
+    async def ensure(self, url: str, project_id: str = "") -> Dict[str, str]:
+        """
+        获取缩略图，没有时生成
+        同一张图同时只会生成一次，其他调用方等待同一个结果
+        
+        Raises:
+            Exception: 获取原图或生成失败
+        """
+        existing = self.get(url)
+        if existing or not self.is_supported(url):
+            return existing
+        
+        task = self._inflight.get(url)
+        if task is None:
+            async def run() -> Dict[str, str]:
+                try:
+                    return await self._generate(url, project_id)
+                except Exception:
+                    self._failed[url] = time.time()
+                    raise
+            
+            task = asyncio.ensure_future(run())
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+    
+    def schedule(self, urls: Iterable[Optional[str]], project_id: str = ""):
+        """
+        在后台为还没有缩略图的图片生成缩略图（不等待结果）
+        后台任务会复制当前上下文，OSS 上传使用当前用户的配置
+        """
+        now = time.time()
+        for url in urls:
+            if not self.is_supported(url) or url in self._inflight or self.get(url):
+                continue
+            failed_at = self._failed.get(url)
+            if failed_at and now - failed_at < FAILURE_RETRY_SECONDS:
+                continue
+            task = asyncio.ensure_future(self.ensure(url, project_id))
+            task.add_done_callback(_log_failure(url))
+    
+    def attach(self, holders: Iterable[object], project_id: str = "") -> int:
+        """
+        为列表中的图片对象填充 thumbnails 字段，缺少的在后台生成
+        
+        Args:
+            holders: 带 url 和 thumbnails 字段的对象（如 GalleryImage、FrameImage）
+        
+        Returns:
+            已有缩略图的数量
+        """
+        attached = 0
+        missing = []
+        for holder in holders:
+            url = getattr(holder, "url", None)
+            if not self.is_supported(url):
+                continue
+            thumbs = self.get(url)
+            if thumbs:
+                holder.thumbnails = thumbs
+                attached += 1
+            else:
+                missing.append(url)
+        if missing:
+            self.schedule(missing, project_id)
+        return attached
+    
+    def shutdown(self):
+        """关闭进程池（应用关闭时调用）"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def _log_failure(url: str):
+    def callback(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[缩略图] 生成失败: {url[:80]} ({task.exception()})")
+    return callback
+
+
+# 全局缩略图服务实例
+thumbnail_service = ThumbnailService()
+metrics.track_executor("thumbnails", lambda: thumbnail_service._pool)
@@ -0,0 +1,341 @@
+"""
+请求链路追踪
+一次请求（或一个后台任务）内的存储读写、参考图处理、DashScope 调用、OSS 上传分别记录为 span，
+用于查看时间花在哪里
+
+- trace：AuthMiddleware 为每个请求创建（响应头 X-Trace-Id 返回 ID），后台任务队列、任务轮询各自创建
+- span：with span("storage.read", collection="frames"): ...  没有当前 trace 时不记录
+- 上下文通过 ContextVar 传递，asyncio.gather 创建的子任务、asyncio.to_thread 中的调用都归入同一个 trace
+- 导出（TRACE_EXPORT 环境变量）：
+  jsonl（默认）写入 logs/traces_YYYYMMDD.jsonl；otlp 以 OTLP/HTTP JSON 发送到 TRACE_OTLP_ENDPOINT；
+  none 只保留在内存中。导出在后台线程执行，不阻塞事件循环
+- GET /api/debug/traces 查看最近最慢的请求
+"""
+
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+# 导出方式：jsonl / otlp / none
+TRACE_EXPORT = os.environ.get("TRACE_EXPORT", "jsonl").lower()
+# OTLP/HTTP 收集器地址（如 http://localhost:4318）
+TRACE_OTLP_ENDPOINT = os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318")
+# 单个 trace 最多记录的 span 数（列表接口可能读取上千个文件）
+MAX_SPANS_PER_TRACE = 256
+# 内存中保留的最近 trace 数
+RECENT_TRACES = 500
+# 查询最慢请求时读取的 JSONL 末尾字节数
+TRACE_FILE_TAIL_BYTES = 4 * 1024 * 1024
+
+TRACE_DIR = Path(__file__).parent.parent.parent / "logs"
+
+
+def _new_id(nbytes: int) -> str:
+    return secrets.token_hex(nbytes)
+
+
+class Trace:
+    """一次请求或后台任务"""
+
+    def __init__(self, name: str, user_id: Optional[str] = None, **attrs: Any):
+        self.trace_id = _new_id(16)
+        self.root_span_id = _new_id(8)
+        self.name = name
+        self.user_id = user_id
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[dict] = []
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, span: dict):
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS_PER_TRACE:
+                self.dropped_spans += 1
+            else:
+                self.spans.append(span)
+
+    def finish(self, **attrs: Any):
+        self.attrs.update(attrs)
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 2)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.root_span_id,
+            "name": self.name,
+            "user_id": self.user_id,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": spans,
+            "dropped_spans": self.dropped_spans
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span_id: ContextVar[Optional[str]] = ContextVar("current_span_id", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def start_trace(name: str, user_id: Optional[str] = None, **attrs: Any) -> Trace:
+    """在当前上下文开始一个 trace（之后的 span 都归入其中）"""
+    trace = Trace(name, user_id, **attrs)
+    _current_trace.set(trace)
+    _current_span_id.set(trace.root_span_id)
+    return trace
+
+
+def finish_trace(trace: Trace, **attrs: Any):
+    """结束 trace，加入最近列表并导出"""
+    trace.finish(**attrs)
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+        _current_span_id.set(None)
+    tracer.record(trace)
+
+
+@contextmanager
+def traced(name: str, user_id: Optional[str] = None, **attrs: Any) -> Iterator[Trace]:
+    """后台任务使用：整个代码块作为一个 trace"""
+    trace = start_trace(name, user_id, **attrs)
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if error:
+            trace.attrs["error"] = error
+        finish_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[dict]:
+    """
+    记录一段调用的耗时（没有当前 trace 时不记录）
+
+    Yields:
+        span 的属性字典，可在代码块内补充属性
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    span_id = _new_id(8)
+    parent_id = _current_span_id.get()
+    token = _current_span_id.set(span_id)
+    started_at = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"[:200]
+        raise
+    finally:
+        _current_span_id.reset(token)
+        record = {
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "started_at": started_at,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+            "attrs": attrs
+        }
+        if error:
+            record["error"] = error
+        trace.add_span(record)
+
+
+# ========== 导出 ==========
+
+def _otlp_attributes(attrs: Dict[str, Any]) -> List[dict]:
+    result = []
+    for key, value in attrs.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            result.append({"key": key, "value": {"boolValue": value}})
+        elif isinstance(value, int):
+            result.append({"key": key, "value": {"intValue": str(value)}})
+        elif isinstance(value, float):
+            result.append({"key": key, "value": {"doubleValue": value}})
+        else:
+            result.append({"key": key, "value": {"stringValue": str(value)}})
+    return result
+
+
+def to_otlp(traces: List[dict]) -> dict:
+    """转换为 OTLP/HTTP JSON 格式"""
+    spans = []
+    for trace in traces:
+        root_end = trace["started_at"] + (trace["duration_ms"] or 0) / 1000
+        spans.append({
+            "traceId": trace["trace_id"],
+            "spanId": trace["span_id"],
+            "name": trace["name"],
+            "kind": 2,  # SERVER
+            "startTimeUnixNano": str(int(trace["started_at"] * 1e9)),
+            "endTimeUnixNano": str(int(root_end * 1e9)),
+            "attributes": _otlp_attributes({**trace["attrs"], "user.id": trace["user_id"]})
+        })
+        for item in trace["spans"]:
+            end = item["started_at"] + item["duration_ms"] / 1000
+            otlp_span = {
+                "traceId": trace["trace_id"],
+                "spanId": item["span_id"],
+                "parentSpanId": item["parent_id"] or trace["span_id"],
+                "name": item["name"],
+                "kind": 3,  # CLIENT
+                "startTimeUnixNano": str(int(item["started_at"] * 1e9)),
+                "endTimeUnixNano": str(int(end * 1e9)),
+                "attributes": _otlp_attributes(item["attrs"])
+            }
+            if item.get("error"):
+                otlp_span["status"] = {"code": 2, "message": item["error"]}
+            spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": _otlp_attributes({"service.name": "miemie-studio"})},
+        "scopeSpans": [{"scope": {"name": "app.services.tracing"}, "spans": spans}]
+    }]}
+
+
+class Tracer:
+    """保存最近的 trace，后台线程导出"""
+
+    def __init__(self, export: str = TRACE_EXPORT, trace_dir: Optional[Path] = None):
+        self.export = export
+        self.trace_dir = Path(trace_dir) if trace_dir else TRACE_DIR
+        self._recent: "deque[Trace]" = deque(maxlen=RECENT_TRACES)
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=10000)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def trace_file(self) -> Path:
+        return self.trace_dir / f"traces_{datetime.now().strftime('%Y%m%d')}.jsonl"
+
+    def record(self, trace: Trace):
+        self._recent.append(trace)
+        if self.export not in ("jsonl", "otlp"):
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(trace.to_dict())
+        except queue.Full:
+            pass
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace_exporter", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # 合并积压的 trace 一次写出
+            while len(batch) < 200:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if self.export == "otlp":
+                    self._send_otlp(batch)
+                else:
+                    self._append_jsonl(batch)
+            except Exception as e:
+                print(f"[链路追踪] 导出失败: {e}")
+
+    def _append_jsonl(self, batch: List[dict]):
+        self.trace_dir.mkdir(parents=True, exist_ok=True)
+        lines = "".join(json.dumps(item, ensure_ascii=False, default=str) + "\n" for item in batch)
+        with open(self.trace_file(), "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _send_otlp(self, batch: List[dict]):
+        import requests
+        response = requests.post(
+            TRACE_OTLP_ENDPOINT.rstrip("/") + "/v1/traces",
+            json=to_otlp(batch),
+            timeout=5
+        )
+        if response.status_code >= 400:
+            print(f"[链路追踪] OTLP 收集器返回 HTTP {response.status_code}")
+
+    def flush(self, timeout: float = 5.0):
+        """等待已结束的 trace 导出完成（测试和关闭时使用）"""
+        deadline = time.time() + timeout
+        while not self._queue.empty() and time.time() < deadline:
+            time.sleep(0.01)
+        # 最后一批可能仍在写入
+        time.sleep(0.05)
+
+    def _file_traces(self) -> List[dict]:
+        """读取今天 JSONL 文件末尾的 trace（包括其他 worker 进程写入的）"""
+        path = self.trace_file()
+        if not path.exists():
+            return []
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - TRACE_FILE_TAIL_BYTES))
+            data = f.read()
+        lines = data.split(b"\n")
+        if size > TRACE_FILE_TAIL_BYTES:
+            lines = lines[1:]  # 第一行可能不完整
+        traces = []
+        for line in lines:
+            if line.strip():
+                try:
+                    traces.append(json.loads(line))
+                except ValueError:
+                    continue
+        return traces
+
+    def slowest(self, limit: int = 20, user_id: Optional[str] = None, name: Optional[str] = None) -> List[dict]:
+        """最近最慢的 trace（只返回指定用户的）"""
+        if self.export == "jsonl":
+            traces = {item["trace_id"]: item for item in self._file_traces()}
+            # 尚未写出的
+            for trace in list(self._recent):
+                traces.setdefault(trace.trace_id, trace.to_dict())
+            candidates = list(traces.values())
+        else:
+            candidates = [trace.to_dict() for trace in list(self._recent)]
+        candidates = [
+            item for item in candidates
+            if item.get("duration_ms") is not None and item.get("user_id") == user_id
+            and (not name or name in item["name"])
+        ]
+        candidates.sort(key=lambda item: item["duration_ms"], reverse=True)
+        return candidates[:limit]
+
+
+# 全局链路追踪实例
+tracer = Tracer()
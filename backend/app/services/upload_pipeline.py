@@ -0,0 +1,130 @@
+"""
+批量上传流水线
+将批量上传拆分为 读取 -> 哈希 -> 上传 -> 保存记录 几个阶段并发执行：
+- 使用信号量限制同时处理的文件数（背压），避免一次性把所有文件读入内存
+- OSS / 存储等同步调用放到线程池执行，不阻塞事件循环
+- 线程池任务会复制当前上下文（用户ID、配置目录），保证多用户隔离
+- 结果按输入顺序返回
+"""
+
+import asyncio
+import contextvars
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from app.config import get_config
+from app.services.metrics import metrics
+
+# 默认并发数（可在 OSS 配置的 upload_concurrency 中修改）
+DEFAULT_UPLOAD_CONCURRENCY = 4
+# 并发上限，同时也是上传线程池的大小
+MAX_UPLOAD_CONCURRENCY = 16
+
+_upload_executor = ThreadPoolExecutor(
+    max_workers=MAX_UPLOAD_CONCURRENCY,
+    thread_name_prefix="upload_pipeline"
+)
+metrics.track_executor("upload_pipeline", lambda: _upload_executor)
+
+
+class UploadError(Exception):
+    """单个文件上传失败"""
+    pass
+
+
+@dataclass
+class UploadResult:
+    """单个文件的处理结果"""
+    index: int  # 在输入列表中的位置
+    item: Any = None  # 成功时为保存的记录
+    error: Optional[str] = None  # 失败时的错误信息
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def get_upload_concurrency() -> int:
+    """获取当前用户配置的上传并发数"""
+    try:
+        value = int(get_config().oss.upload_concurrency)
+    except Exception:
+        value = DEFAULT_UPLOAD_CONCURRENCY
+    return max(1, min(value, MAX_UPLOAD_CONCURRENCY))
+
+
+def compute_hash(data: bytes) -> str:
+    """计算内容的 SHA-256 哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """
+    在上传线程池中执行同步函数
+
+    注意：run_in_executor 不会自动传递 contextvars，
+    这里显式复制上下文，确保线程内 get_config()/storage_service 使用当前用户
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _upload_executor,
+        functools.partial(ctx.run, func, *args, **kwargs)
+    )
+
+
+class UploadPipeline:
+    """
+    一次批量上传对应一个流水线实例
+
+    用法：
+        pipeline = UploadPipeline()
+        results = await pipeline.run(files, handle_one)
+
+    handle_one(index, source) 为协程，返回保存后的记录，失败时抛出异常
+    """
+
+    def __init__(self, concurrency: Optional[int] = None):
+        if concurrency is None:
+            concurrency = get_upload_concurrency()
+        self.concurrency = max(1, min(concurrency, MAX_UPLOAD_CONCURRENCY))
+        # 同一批次内相同内容（哈希或URL）只上传一次
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def upload_once(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        以 key 去重执行上传
+        同一批次中重复的文件会等待并复用第一次上传的结果
+        """
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_blocking(func, *args, **kwargs))
+            self._inflight[key] = future
+        return await asyncio.shield(future)
+
+    async def run(
+        self,
+        sources: Sequence[Any],
+        handler: Callable[[int, Any], Awaitable[Any]]
+    ) -> List[UploadResult]:
+        """
+        并发处理所有输入，返回与输入顺序一致的结果列表
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _process(index: int, source: Any) -> UploadResult:
+            async with semaphore:
+                try:
+                    item = await handler(index, source)
+                    return UploadResult(index=index, item=item)
+                except Exception as e:
+                    return UploadResult(index=index, error=str(e))
+
+        print(f"[上传流水线] 开始处理 {len(sources)} 个文件，并发数: {self.concurrency}")
+        results = await asyncio.gather(*(_process(i, s) for i, s in enumerate(sources)))
+        success_count = sum(1 for r in results if r.ok)
+        print(f"[上传流水线] 完成: 成功 {success_count}，失败 {len(results) - success_count}")
+        return list(results)
@@ -1,8 +1,10 @@
 """
 用户服务 - 处理用户注册、登录、数据隔离
+
+用户和会话保存在 data/users.json、data/sessions.json，多个 worker 进程共享：
+在一个进程登录/登出后，其他进程下次验证 token 时会重新加载会话文件
 """
 
-import json
 import uuid
 import hashlib
 from pathlib import Path
@@ -10,17 +12,26 @@ from typing import Optional, Dict
 from datetime import datetime
 
 from app.models.user import User, UserResponse
+from app.services.shared_state import SharedJsonFile
 
 
 class UserService:
     """用户服务"""
     
-    def __init__(self):
-        self.data_dir = Path(__file__).parent.parent.parent / "data"
+    def __init__(self, data_dir: Optional[str] = None):
+        if data_dir is None:
+            self.data_dir = Path(__file__).parent.parent.parent / "data"
+        else:
+            self.data_dir = Path(data_dir)
         self.users_file = self.data_dir / "users.json"
-        self.sessions: Dict[str, str] = {}  # token -> user_id
+        self._users = SharedJsonFile(self.users_file, indent=2)
+        self._sessions = SharedJsonFile(self.data_dir / "sessions.json", indent=2)  # token -> user_id
         self._ensure_data_dir()
-        self._load_sessions()
+    
+    @property
+    def sessions(self) -> Dict[str, str]:
+        """当前所有会话（token -> user_id，其他进程的登录/登出会自动同步）"""
+        return self._sessions.read()
     
     def _ensure_data_dir(self):
         """确保数据目录存在"""
@@ -30,31 +41,11 @@ class UserService:
     
     def _load_users(self) -> Dict[str, dict]:
         """加载所有用户"""
-        if self.users_file.exists():
-            with open(self.users_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {}
+        return dict(self._users.read())
     
     def _save_users(self, users: Dict[str, dict]):
         """保存所有用户"""
-        with open(self.users_file, 'w', encoding='utf-8') as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
-    
-    def _load_sessions(self):
-        """加载会话（从文件恢复）"""
-        sessions_file = self.data_dir / "sessions.json"
-        if sessions_file.exists():
-            try:
-                with open(sessions_file, 'r', encoding='utf-8') as f:
-                    self.sessions = json.load(f)
-            except:
-                self.sessions = {}
-    
-    def _save_sessions(self):
-        """保存会话到文件"""
-        sessions_file = self.data_dir / "sessions.json"
-        with open(sessions_file, 'w', encoding='utf-8') as f:
-            json.dump(self.sessions, f, ensure_ascii=False, indent=2)
+        self._users.replace(users)
     
     def _generate_token(self, user_id: str) -> str:
         """生成简单的会话 token"""
@@ -68,13 +59,6 @@ class UserService:
         Returns:
             注册成功返回用户对象，用户名已存在返回 None
         """
-        users = self._load_users()
-        
-        # 检查用户名是否已存在
-        for user_data in users.values():
-            if user_data.get('username') == username:
-                return None
-        
         # 创建新用户
         user = User(
             username=username,
@@ -82,8 +66,16 @@ class UserService:
             display_name=display_name or username
         )
         
-        users[user.id] = user.model_dump()
-        self._save_users(users)
+        def add_user(users: Dict[str, dict]) -> bool:
+            # 检查用户名是否已存在（在文件锁内检查，多个进程同时注册同名用户时只有一个成功）
+            for user_data in users.values():
+                if user_data.get('username') == username:
+                    return False
+            users[user.id] = user.model_dump()
+            return True
+        
+        if not self._users.update(add_user):
+            return None
         
         # 创建用户数据目录
         self._ensure_user_data_dir(user.id)
@@ -97,31 +89,37 @@ class UserService:
         Returns:
             登录成功返回 (token, user)，失败返回 None
         """
-        users = self._load_users()
+        def matches(user_data: dict) -> bool:
+            return user_data.get('username') == username and user_data.get('password') == password
         
-        for user_id, user_data in users.items():
-            if user_data.get('username') == username and user_data.get('password') == password:
-                # 更新最后登录时间
-                user_data['last_login'] = datetime.now().isoformat()
-                users[user_id] = user_data
-                self._save_users(users)
-                
-                # 生成 token
-                token = self._generate_token(user_id)
-                self.sessions[token] = user_id
-                self._save_sessions()
-                
-                return token, User(**user_data)
+        # 密码错误时不写文件
+        if not any(matches(user_data) for user_data in self._users.read().values()):
+            return None
         
-        return None
+        def check_login(users: Dict[str, dict]) -> Optional[tuple[str, dict]]:
+            for user_id, user_data in users.items():
+                if matches(user_data):
+                    # 更新最后登录时间
+                    user_data['last_login'] = datetime.now().isoformat()
+                    return user_id, dict(user_data)
+            return None
+        
+        found = self._users.update(check_login)
+        if found is None:
+            return None
+        user_id, user_data = found
+        
+        # 生成 token
+        token = self._generate_token(user_id)
+        self._sessions.update(lambda sessions: sessions.__setitem__(token, user_id))
+        
+        return token, User(**user_data)
     
     def logout(self, token: str) -> bool:
         """用户登出"""
-        if token in self.sessions:
-            del self.sessions[token]
-            self._save_sessions()
-            return True
-        return False
+        if token not in self.sessions:
+            return False
+        return self._sessions.update(lambda sessions: sessions.pop(token, None) is not None)
     
     def get_user_by_token(self, token: str) -> Optional[User]:
         """通过 token 获取用户"""
@@ -161,7 +159,7 @@ class UserService:
         subdirs = [
             "projects", "characters", "scenes", "props", 
             "frames", "videos", "styles", "gallery", "studio",
-            "audio", "video_library", "text_library", "video_studio"
+            "audio", "video_library", "text_library", "video_studio", "jobs"
         ]
         
         for subdir in subdirs:
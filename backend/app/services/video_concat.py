@@ -2,16 +2,89 @@
 视频拼接服务
 
 使用 FFmpeg 将多个视频按顺序拼接成一个完整视频。
+
+流程：先并发下载并探测所有视频，再决定是否需要转码：
+- 所有视频的编码、分辨率、帧率、像素格式、音频参数一致时，直接流复制拼接
+- 否则以多数视频的参数为目标，只转码不一致的视频
+- 下载并发数由 DOWNLOAD_CONCURRENCY 控制，转码并发数按 CPU 核数确定
+- FFmpeg / FFprobe 通过 asyncio 子进程执行，不阻塞事件循环
+- 探测结果和转码后的片段会缓存（见 clip_cache），重复导出时只处理有变化的分镜
 """
 
 import os
+import shutil
 import subprocess
 import tempfile
+import time
 import uuid
-from typing import List, Optional, Tuple
-import httpx
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 import json
 
+from app.services.media_store import media_store
+from app.services.clip_cache import clip_cache
+from app.services.metrics import metrics
+
+# 同时下载的视频数
+DOWNLOAD_CONCURRENCY = 6
+
+FFMPEG_STAGE_SECONDS = metrics.histogram(
+    "ffmpeg_stage_duration_seconds", "FFmpeg 各阶段单次执行耗时", ["stage"]
+)
+# 拼接流程中记录到指标的阶段（download 不是 FFmpeg 阶段）
+FFMPEG_STAGES = ("probe", "normalize", "concat")
+
+
+@dataclass(frozen=True)
+class ClipSpec:
+    """拼接时需要保持一致的视频参数（相同参数的视频可以直接流复制拼接）"""
+    vcodec: str
+    width: int
+    height: int
+    fps: str  # r_frame_rate，如 "30/1"
+    pix_fmt: str
+    time_base: str  # 视频流时间基，如 "1/15360"
+    acodec: Optional[str] = None  # None 表示没有音频
+    sample_rate: int = 0
+    channels: int = 0
+    
+    @classmethod
+    def from_probe(cls, info: dict) -> Optional["ClipSpec"]:
+        """从 ffprobe 结果提取参数，没有视频流时返回 None"""
+        video = None
+        audio = None
+        for stream in info.get('streams', []):
+            if stream.get('codec_type') == 'video' and video is None:
+                video = stream
+            elif stream.get('codec_type') == 'audio' and audio is None:
+                audio = stream
+        if video is None:
+            return None
+        return cls(
+            vcodec=video.get('codec_name', ''),
+            width=int(video.get('width', 0)),
+            height=int(video.get('height', 0)),
+            fps=video.get('r_frame_rate', ''),
+            pix_fmt=video.get('pix_fmt', ''),
+            time_base=video.get('time_base', ''),
+            acodec=audio.get('codec_name') if audio else None,
+            sample_rate=int(audio.get('sample_rate', 0)) if audio else 0,
+            channels=int(audio.get('channels', 0)) if audio else 0,
+        )
+    
+    @property
+    def can_be_target(self) -> bool:
+        """标准化输出为 H.264/yuv420p/AAC，只有同类参数才能作为转码目标"""
+        return (
+            self.vcodec == 'h264'
+            and self.pix_fmt == 'yuv420p'
+            and self.width % 2 == 0
+            and self.height % 2 == 0
+            and self.acodec in (None, 'aac')
+        )
+
 
 class VideoConcatService:
     """视频拼接服务"""
@@ -22,21 +95,40 @@ class VideoConcatService:
         self.target_fps = 30
         self.target_width = 1920
         self.target_height = 1080
+        # 同时运行的转码进程数（按 CPU 核数）
+        self.cpu_count = os.cpu_count() or 2
+        self._ffmpeg_available: Optional[bool] = None
     
     def check_ffmpeg(self) -> bool:
-        """检查 FFmpeg 是否可用"""
-        try:
-            result = subprocess.run(
-                ['ffmpeg', '-version'],
-                capture_output=True,
-                text=True
-            )
-            return result.returncode == 0
-        except FileNotFoundError:
-            return False
+        """检查 FFmpeg 是否可用（结果会缓存）"""
+        if self._ffmpeg_available is None:
+            try:
+                result = subprocess.run(
+                    ['ffmpeg', '-version'],
+                    capture_output=True,
+                    text=True
+                )
+                self._ffmpeg_available = result.returncode == 0
+            except FileNotFoundError:
+                self._ffmpeg_available = False
+        return self._ffmpeg_available
+    
+    async def _run(self, cmd: List[str]) -> Tuple[int, str, str]:
+        """异步执行命令，返回 (returncode, stdout, stderr)"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+        return (
+            process.returncode,
+            stdout.decode('utf-8', errors='ignore'),
+            stderr.decode('utf-8', errors='ignore')
+        )
     
-    def get_video_info(self, video_path: str) -> dict:
-        """获取视频信息"""
+    async def get_video_info(self, video_path: str) -> dict:
+        """获取视频信息（每个视频只需探测一次）"""
         try:
             cmd = [
                 'ffprobe',
@@ -46,139 +138,208 @@ class VideoConcatService:
                 '-show_format',
                 video_path
             ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                return json.loads(result.stdout)
+            returncode, stdout, _ = await self._run(cmd)
+            if returncode == 0:
+                return json.loads(stdout)
         except Exception as e:
             print(f"[视频信息] 获取失败: {e}")
         return {}
     
-    def has_audio_stream(self, video_path: str) -> bool:
-        """检查视频是否有音频流"""
-        info = self.get_video_info(video_path)
-        streams = info.get('streams', [])
-        for stream in streams:
+    @staticmethod
+    def has_audio_stream(info: dict) -> bool:
+        """根据探测信息判断视频是否有音频流"""
+        for stream in info.get('streams', []):
             if stream.get('codec_type') == 'audio':
                 return True
         return False
     
     async def download_video(self, url: str, output_path: str) -> bool:
-        """下载视频到本地"""
+        """下载视频到本地（优先使用本地媒体缓存）"""
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                response = await client.get(url, follow_redirects=True)
-                if response.status_code == 200:
-                    with open(output_path, 'wb') as f:
-                        f.write(response.content)
-                    return True
-                else:
-                    print(f"[视频下载] 失败: {url}, 状态码: {response.status_code}")
-                    return False
+            local_path = media_store.get_path(url)
+            if local_path is not None:
+                await asyncio.to_thread(shutil.copyfile, local_path, output_path)
+                print(f"[视频下载] 命中本地缓存: {url[:80]}")
+                return True
+            
+            content = await media_store.fetch(url, timeout=120.0)
+            await asyncio.to_thread(self._write_file, output_path, content)
+            return True
         except Exception as e:
             print(f"[视频下载] 异常: {url}, 错误: {e}")
             return False
     
-    def normalize_video(self, input_path: str, output_path: str, has_audio: bool) -> bool:
+    @staticmethod
+    def _write_file(path: str, content: bytes):
+        with open(path, 'wb') as f:
+            f.write(content)
+    
+    def default_target(self, reference: Optional[ClipSpec]) -> ClipSpec:
+        """没有可直接复用的目标参数时，使用默认标准化参数（保持多数视频的分辨率）"""
+        if reference and reference.width and reference.height:
+            # 确保是偶数（FFmpeg 要求）
+            width = reference.width + reference.width % 2
+            height = reference.height + reference.height % 2
+        else:
+            width, height = self.target_width, self.target_height
+        return ClipSpec(
+            vcodec='h264',
+            width=width,
+            height=height,
+            fps=f"{self.target_fps}/1",
+            pix_fmt='yuv420p',
+            time_base='1/15360',
+            acodec='aac',
+            sample_rate=44100,
+            channels=2,
+        )
+    
+    def plan_normalization(self, specs: List[Optional[ClipSpec]]) -> Tuple[ClipSpec, List[bool]]:
         """
-        标准化视频：统一帧率、分辨率、编码
+        确定拼接目标参数以及需要转码的视频
+        
+        以出现次数最多的参数作为目标，与目标一致的视频无需转码
         
-        这是解决音画不同步的关键步骤
+        Returns:
+            (目标参数, 每个视频是否需要转码)
         """
-        print(f"[视频标准化] 处理: {os.path.basename(input_path)}")
+        valid = [spec for spec in specs if spec is not None]
+        majority = Counter(valid).most_common(1)[0][0] if valid else None
+        
+        if majority is not None and majority.can_be_target:
+            target = majority
+        else:
+            target = self.default_target(majority)
         
-        # 获取原视频信息
-        info = self.get_video_info(input_path)
-        streams = info.get('streams', [])
+        return target, [spec != target for spec in specs]
+    
+    async def normalize_video(
+        self,
+        input_path: str,
+        output_path: str,
+        info: dict,
+        target: ClipSpec,
+        threads: int = 0
+    ) -> bool:
+        """
+        标准化视频：统一帧率、分辨率、编码
         
-        # 找到视频流获取原始分辨率
-        video_stream = None
-        for stream in streams:
-            if stream.get('codec_type') == 'video':
-                video_stream = stream
-                break
+        这是解决音画不同步的关键步骤，输出参数与 target 完全一致，
+        以便与其他视频直接流复制拼接
         
-        if video_stream:
-            orig_width = int(video_stream.get('width', 1920))
-            orig_height = int(video_stream.get('height', 1080))
-            # 保持原始分辨率，但确保是偶数（FFmpeg 要求）
-            target_w = orig_width if orig_width % 2 == 0 else orig_width + 1
-            target_h = orig_height if orig_height % 2 == 0 else orig_height + 1
-        else:
-            target_w = self.target_width
-            target_h = self.target_height
+        Args:
+            input_path: 输入文件
+            output_path: 输出文件
+            info: ffprobe 探测结果（由调用方传入，避免重复探测）
+            target: 目标参数
+            threads: 编码线程数（0 表示由 FFmpeg 自动决定）
+        """
+        print(f"[视频标准化] 处理: {os.path.basename(input_path)}")
+        
+        has_audio = self.has_audio_stream(info)
+        w, h = target.width, target.height
         
         # 构建 FFmpeg 命令
         # 关键：使用 fps 滤镜统一帧率，使用 scale 确保分辨率一致
-        video_filter = f"fps={self.target_fps},scale={target_w}:{target_h}:force_original_aspect_ratio=decrease,pad={target_w}:{target_h}:(ow-iw)/2:(oh-ih)/2"
+        video_filter = f"fps={target.fps},scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+        timescale = target.time_base.split('/')[-1] if '/' in target.time_base else "15360"
         
-        if has_audio:
-            cmd = [
-                'ffmpeg',
-                '-y',
-                '-i', input_path,
-                '-vf', video_filter,
-                '-c:v', 'libx264',
-                '-preset', 'fast',
-                '-crf', '23',
-                '-r', str(self.target_fps),  # 强制输出帧率
+        cmd = ['ffmpeg', '-y', '-i', input_path]
+        if target.acodec and not has_audio:
+            # 没有音频，添加静音音轨（确保所有视频都有音频，方便拼接）
+            layout = 'mono' if target.channels == 1 else 'stereo'
+            cmd += ['-f', 'lavfi', '-i', f'anullsrc=r={target.sample_rate}:cl={layout}']
+        
+        cmd += [
+            '-vf', video_filter,
+            '-c:v', 'libx264',
+            '-preset', 'fast',
+            '-crf', '23',
+            '-pix_fmt', 'yuv420p',
+            '-threads', str(threads),
+            '-r', target.fps,  # 强制输出帧率
+            '-video_track_timescale', timescale,
+        ]
+        
+        if target.acodec:
+            cmd += [
                 '-c:a', 'aac',
-                '-ar', '44100',  # 统一音频采样率
-                '-ac', '2',  # 统一为立体声
+                '-ar', str(target.sample_rate),  # 统一音频采样率
+                '-ac', str(target.channels),  # 统一声道数
                 '-b:a', '128k',
                 '-shortest',  # 以最短的流为准
-                output_path
             ]
+            if not has_audio:
+                cmd += ['-map', '0:v:0', '-map', '1:a:0']
         else:
-            # 没有音频，添加静音音轨（确保所有视频都有音频，方便拼接）
-            cmd = [
-                'ffmpeg',
-                '-y',
-                '-i', input_path,
-                '-f', 'lavfi',
-                '-i', 'anullsrc=r=44100:cl=stereo',
-                '-vf', video_filter,
-                '-c:v', 'libx264',
-                '-preset', 'fast',
-                '-crf', '23',
-                '-r', str(self.target_fps),
-                '-c:a', 'aac',
-                '-ar', '44100',
-                '-ac', '2',
-                '-b:a', '128k',
-                '-shortest',
-                '-map', '0:v:0',
-                '-map', '1:a:0',
-                output_path
-            ]
+            # 目标没有音频，去掉音轨
+            cmd += ['-an']
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        cmd.append(output_path)
         
-        if result.returncode != 0:
-            print(f"[视频标准化] 失败: {result.stderr[:500]}")
+        returncode, _, stderr = await self._run(cmd)
+        
+        if returncode != 0:
+            print(f"[视频标准化] 失败: {stderr[:500]}")
             return False
         
         return os.path.exists(output_path) and os.path.getsize(output_path) > 0
     
+    async def _remux_to_ts(self, input_path: str, output_path: str) -> bool:
+        """
+        流复制转封装为 MPEG-TS
+        
+        转码后的视频与原视频来自不同编码器（SPS/PPS 不同），
+        TS 中参数集随码流携带，拼接后可以正确解码
+        """
+        cmd = [
+            'ffmpeg', '-y',
+            '-i', input_path,
+            '-c', 'copy',
+            '-bsf:v', 'h264_mp4toannexb',
+            '-f', 'mpegts',
+            output_path
+        ]
+        returncode, _, stderr = await self._run(cmd)
+        if returncode != 0:
+            print(f"[转封装] 失败: {stderr[:300]}")
+            return False
+        return True
+    
+    @staticmethod
+    def _add_timing(timings: Dict[str, float], stage: str, started: float):
+        """累计某个阶段的耗时（多个视频并发时为各视频耗时之和）"""
+        elapsed = time.perf_counter() - started
+        timings[stage] = round(timings.get(stage, 0.0) + elapsed, 3)
+        if stage in FFMPEG_STAGES:
+            FFMPEG_STAGE_SECONDS.observe(elapsed, stage=stage)
+    
     async def concat_videos(
         self,
         video_urls: List[str],
-        output_filename: Optional[str] = None
+        output_filename: Optional[str] = None,
+        timings: Optional[Dict[str, float]] = None
     ) -> Tuple[bool, str]:
         """
         拼接多个视频
         
         流程：
-        1. 下载所有视频
-        2. 标准化所有视频（统一帧率、编码）
-        3. 使用 concat demuxer 拼接（因为已经统一格式，可以安全使用）
+        1. 并发下载并探测所有视频
+        2. 以多数视频的参数为目标，只标准化参数不一致的视频（全部一致时跳过）
+        3. 使用 concat demuxer 流复制拼接
         
         Args:
             video_urls: 视频URL列表（按顺序）
             output_filename: 输出文件名（可选）
+            timings: 可选，传入字典用于接收各阶段耗时（秒）
         
         Returns:
             (成功标志, 输出文件路径或错误信息)
         """
+        if timings is None:
+            timings = {}
+        total_started = time.perf_counter()
+        
         if not self.check_ffmpeg():
             return False, "FFmpeg 未安装或不可用"
         
@@ -189,53 +350,160 @@ class VideoConcatService:
         work_dir = os.path.join(self.temp_dir, f"concat_{uuid.uuid4().hex}")
         os.makedirs(work_dir, exist_ok=True)
         
-        downloaded_files = []
-        normalized_files = []
+        downloaded_files: List[str] = []
+        normalized_files: List[str] = []
+        
+        download_semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+        single_video = len(video_urls) == 1
+        
+        async def download_clip(i: int) -> str:
+            """下载单个视频到工作目录"""
+            url = video_urls[i]
+            original_path = os.path.join(work_dir, f"original_{i:03d}.mp4")
+            downloaded_files.append(original_path)
+            
+            async with download_semaphore:
+                started = time.perf_counter()
+                print(f"[下载] {i+1}/{len(video_urls)}: {url[:80]}...")
+                ok = await self.download_video(url, original_path)
+                self._add_timing(timings, "download", started)
+            if not ok:
+                raise RuntimeError(f"下载第 {i+1} 个视频失败")
+            return original_path
+        
+        async def fetch_clip(i: int, url: str) -> Tuple[Optional[str], dict]:
+            """
+            获取单个视频的探测信息
+            已缓存探测结果的视频暂不下载（可能直接命中转码缓存）
+            """
+            # 如果只有一个视频，无需探测
+            if single_video:
+                return await download_clip(i), {}
+            
+            info = clip_cache.get_probe(url)
+            if info:
+                timings["probe_cached"] = timings.get("probe_cached", 0) + 1
+                return None, info
+            
+            original_path = await download_clip(i)
+            started = time.perf_counter()
+            info = await self.get_video_info(original_path)
+            self._add_timing(timings, "probe", started)
+            clip_cache.put_probe(url, info)
+            return original_path, info
+        
+        async def run_all(coros) -> list:
+            """并发执行，任意一个失败时取消其余任务"""
+            tasks = [asyncio.create_task(c) for c in coros]
+            try:
+                return await asyncio.gather(*tasks)
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
         
         try:
-            # 步骤 1：下载所有视频
+            # 步骤 1：并发下载并探测（已缓存探测结果的视频跳过）
             print(f"\n{'='*60}")
-            print(f"步骤 1/3: 下载视频")
+            print(f"步骤 1/3: 下载并探测视频")
             print(f"{'='*60}")
             
-            for i, url in enumerate(video_urls):
-                local_path = os.path.join(work_dir, f"original_{i:03d}.mp4")
-                print(f"[下载] {i+1}/{len(video_urls)}: {url[:80]}...")
-                
-                if await self.download_video(url, local_path):
-                    downloaded_files.append(local_path)
-                else:
-                    return False, f"下载第 {i+1} 个视频失败"
+            stage_started = time.perf_counter()
+            try:
+                fetched = await run_all(fetch_clip(i, url) for i, url in enumerate(video_urls))
+            except Exception as e:
+                return False, str(e)
+            timings["fetch_wall"] = round(time.perf_counter() - stage_started, 3)
             
-            # 如果只有一个视频，跳过拼接直接返回
-            if len(downloaded_files) == 1:
+            if single_video:
                 print("[视频拼接] 只有一个视频，跳过拼接")
-                return True, downloaded_files[0]
+                downloaded_files.remove(fetched[0][0])
+                return True, fetched[0][0]
+            
+            # 步骤 2：只转码参数不一致的视频
+            specs = [ClipSpec.from_probe(info) for _, info in fetched]
+            target, needs_normalize = self.plan_normalization(specs)
+            normalize_count = sum(needs_normalize)
+            timings["clips"] = len(video_urls)
+            timings["normalized"] = normalize_count
             
-            # 步骤 2：标准化所有视频
             print(f"\n{'='*60}")
-            print(f"步骤 2/3: 标准化视频（统一帧率、编码）")
+            print(f"步骤 2/3: 标准化视频（需要转码 {normalize_count}/{len(video_urls)}）")
+            print(f"目标参数: {target}")
             print(f"{'='*60}")
             
-            for i, original_path in enumerate(downloaded_files):
+            # 转码并发数不超过待转码视频数，剩余核数分给每个 FFmpeg 进程
+            normalize_workers = max(1, min(self.cpu_count, normalize_count))
+            threads_per_job = max(1, self.cpu_count // normalize_workers)
+            normalize_semaphore = asyncio.Semaphore(normalize_workers)
+            
+            cache_params = repr(target)
+            
+            async def normalize_clip(i: int) -> str:
+                original_path, info = fetched[i]
+                url = video_urls[i]
+                if not needs_normalize[i]:
+                    return original_path or await download_clip(i)
+                
                 normalized_path = os.path.join(work_dir, f"normalized_{i:03d}.mp4")
-                has_audio = self.has_audio_stream(original_path)
-                print(f"[标准化] {i+1}/{len(downloaded_files)}, 有音频: {has_audio}")
+                normalized_files.append(normalized_path)
                 
-                if self.normalize_video(original_path, normalized_path, has_audio):
-                    normalized_files.append(normalized_path)
-                else:
-                    return False, f"标准化第 {i+1} 个视频失败"
+                # 相同源视频、相同目标参数已转码过，直接复用
+                if clip_cache.get_normalized(url, cache_params, normalized_path):
+                    timings["normalize_cached"] = timings.get("normalize_cached", 0) + 1
+                    print(f"[标准化] {i+1}/{len(video_urls)}, 命中片段缓存")
+                    return normalized_path
+                
+                if original_path is None:
+                    original_path = await download_clip(i)
+                
+                async with normalize_semaphore:
+                    started = time.perf_counter()
+                    print(f"[标准化] {i+1}/{len(video_urls)}, 原参数: {specs[i]}")
+                    ok = await self.normalize_video(original_path, normalized_path, info, target, threads_per_job)
+                    self._add_timing(timings, "normalize", started)
+                if not ok:
+                    raise RuntimeError(f"标准化第 {i+1} 个视频失败")
+                
+                clip_cache.put_normalized(url, cache_params, normalized_path)
+                
+                # 原始文件已不再需要，尽早释放磁盘
+                try:
+                    os.remove(original_path)
+                except OSError:
+                    pass
+                return normalized_path
+            
+            stage_started = time.perf_counter()
+            try:
+                clip_files = await run_all(normalize_clip(i) for i in range(len(video_urls)))
+            except Exception as e:
+                return False, str(e)
+            timings["normalize_wall"] = round(time.perf_counter() - stage_started, 3)
             
             # 步骤 3：拼接视频
             print(f"\n{'='*60}")
             print(f"步骤 3/3: 拼接视频")
             print(f"{'='*60}")
             
+            stage_started = time.perf_counter()
+            
+            # 转码视频与原视频混合时，先转封装为 TS 再拼接
+            mixed = 0 < normalize_count < len(video_urls)
+            concat_inputs = clip_files
+            if mixed:
+                ts_files = [os.path.join(work_dir, f"segment_{i:03d}.ts") for i in range(len(clip_files))]
+                normalized_files.extend(ts_files)
+                results = await asyncio.gather(*(
+                    self._remux_to_ts(src, dst) for src, dst in zip(clip_files, ts_files)
+                ))
+                concat_inputs = ts_files if all(results) else []
+            
             # 创建文件列表
             list_file = os.path.join(work_dir, "files.txt")
             with open(list_file, 'w') as f:
-                for file_path in normalized_files:
+                for file_path in concat_inputs:
                     escaped_path = file_path.replace("'", "'\\''")
                     f.write(f"file '{escaped_path}'\n")
             
@@ -245,7 +513,7 @@ class VideoConcatService:
             else:
                 output_path = os.path.join(work_dir, f"output_{uuid.uuid4().hex}.mp4")
             
-            # 使用 concat demuxer 拼接（因为视频已经标准化，可以安全使用 -c copy）
+            # 使用 concat demuxer 拼接（所有视频参数一致，可以安全使用 -c copy）
             cmd = [
                 'ffmpeg',
                 '-y',
@@ -253,57 +521,70 @@ class VideoConcatService:
                 '-safe', '0',
                 '-i', list_file,
                 '-c', 'copy',
-                output_path
             ]
+            if mixed and target.acodec:
+                cmd += ['-bsf:a', 'aac_adtstoasc']
+            cmd.append(output_path)
             
-            print(f"[拼接] 合并 {len(normalized_files)} 个视频...")
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            print(f"[拼接] 合并 {len(clip_files)} 个视频...")
+            if concat_inputs:
+                returncode, _, stderr = await self._run(cmd)
+            else:
+                # 转封装失败，参数集不同的视频不能直接流复制拼接
+                returncode = -1
             
-            if result.returncode != 0:
+            if returncode != 0:
                 print(f"[拼接] concat demuxer 失败，尝试重新编码拼接...")
                 
                 # 如果 copy 失败，使用重新编码方式
                 inputs = []
                 filter_parts = []
-                for i, file_path in enumerate(normalized_files):
+                with_audio = target.acodec is not None
+                for i, file_path in enumerate(clip_files):
                     inputs.extend(['-i', file_path])
-                    filter_parts.append(f'[{i}:v:0][{i}:a:0]')
+                    filter_parts.append(f'[{i}:v:0][{i}:a:0]' if with_audio else f'[{i}:v:0]')
                 
-                filter_str = ''.join(filter_parts) + f'concat=n={len(normalized_files)}:v=1:a=1[outv][outa]'
+                if with_audio:
+                    filter_str = ''.join(filter_parts) + f'concat=n={len(clip_files)}:v=1:a=1[outv][outa]'
+                    maps = ['-map', '[outv]', '-map', '[outa]', '-c:a', 'aac', '-b:a', '128k']
+                else:
+                    filter_str = ''.join(filter_parts) + f'concat=n={len(clip_files)}:v=1:a=0[outv]'
+                    maps = ['-map', '[outv]']
                 
                 cmd = [
                     'ffmpeg',
                     '-y',
                     *inputs,
                     '-filter_complex', filter_str,
-                    '-map', '[outv]',
-                    '-map', '[outa]',
                     '-c:v', 'libx264',
                     '-preset', 'fast',
                     '-crf', '23',
-                    '-c:a', 'aac',
-                    '-b:a', '128k',
+                    *maps,
                     output_path
                 ]
                 
-                result = subprocess.run(cmd, capture_output=True, text=True)
+                returncode, _, stderr = await self._run(cmd)
                 
-                if result.returncode != 0:
-                    print(f"[拼接] 失败: {result.stderr[:500]}")
-                    return False, f"视频拼接失败: {result.stderr[:200]}"
+                if returncode != 0:
+                    print(f"[拼接] 失败: {stderr[:500]}")
+                    return False, f"视频拼接失败: {stderr[:200]}"
+            
+            self._add_timing(timings, "concat", stage_started)
             
             # 检查输出文件
             if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
                 file_size = os.path.getsize(output_path) / 1024 / 1024
+                timings["total"] = round(time.perf_counter() - total_started, 3)
                 print(f"\n{'='*60}")
                 print(f"拼接成功！")
                 print(f"输出文件: {output_path}")
                 print(f"文件大小: {file_size:.2f} MB")
+                print(f"阶段耗时: {timings}")
                 print(f"{'='*60}\n")
                 return True, output_path
             else:
                 return False, "输出文件不存在或为空"
-            
+        
         except Exception as e:
             print(f"[视频拼接] 异常: {e}")
             import traceback
@@ -312,13 +593,7 @@ class VideoConcatService:
         
         finally:
             # 清理临时文件（保留输出文件）
-            for file_path in downloaded_files:
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except:
-                    pass
-            for file_path in normalized_files:
+            for file_path in downloaded_files + normalized_files:
                 try:
                     if os.path.exists(file_path):
                         os.remove(file_path)
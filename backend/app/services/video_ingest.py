@@ -0,0 +1,303 @@
+"""
+视频预处理服务
+视频入库（上传、URL 导入、导出）后在后台探测一次视频参数，并生成封面帧和拖动预览雪碧图，
+视频库列表和时间轴拖动预览无需加载完整的 MP4
+
+- 探测：ffprobe 获取时长、分辨率、帧率，结果同时写入片段缓存（拼接导出时可复用）
+- 封面：在视频开头附近截取一帧，输出 JPEG
+- 雪碧图：按固定间隔截取缩略帧拼成一张 JPEG，前端按 VideoSprite 中的行列信息定位
+- 后台执行：同时处理的视频数受 INGEST_CONCURRENCY 限制，FFmpeg 以子进程运行，不阻塞事件循环
+- 补做：pending/processing 状态超过 INGEST_STALE_SECONDS 未更新（处理它的进程重启或崩溃）时重新处理
+"""
+
+import asyncio
+import math
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from app.models.media import VideoItem, VideoSprite
+from app.services.storage import storage_service
+from app.services.oss import oss_service
+from app.services.media_store import media_store
+from app.services.clip_cache import clip_cache
+from app.services.video_concat import video_concat_service, FFMPEG_STAGE_SECONDS
+
+# 同时预处理的视频数
+INGEST_CONCURRENCY = 2
+# pending/processing 状态超过多少秒未更新视为中断，重新处理
+INGEST_STALE_SECONDS = 15 * 60
+# 封面最大宽度
+POSTER_MAX_WIDTH = 960
+# 封面截取时间点：视频时长的 10%，最多 1 秒（避开开头的黑帧）
+POSTER_OFFSET_RATIO = 0.1
+POSTER_MAX_OFFSET = 1.0
+# 雪碧图参数
+SPRITE_TILE_WIDTH = 160
+SPRITE_MAX_COLUMNS = 10
+SPRITE_MAX_TILES = 100
+SPRITE_MIN_INTERVAL = 0.5
+# JPEG 质量（FFmpeg -q:v，2-31，越小质量越高）
+JPEG_QUALITY = 4
+
+
+def _parse_rate(rate: str) -> Optional[float]:
+    """解析 "30000/1001" 形式的帧率"""
+    try:
+        num, _, den = (rate or "").partition("/")
+        value = float(num) / float(den or 1)
+        return round(value, 3) if value > 0 else None
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def parse_video_meta(info: dict) -> dict:
+    """
+    从 ffprobe 结果提取视频元数据
+    
+    Returns:
+        {"width", "height", "fps", "duration"}，缺失的字段为 None
+    """
+    video = next((s for s in info.get("streams", []) if s.get("codec_type") == "video"), None)
+    duration = None
+    for source in (info.get("format", {}), video or {}):
+        try:
+            duration = float(source.get("duration"))
+            break
+        except (TypeError, ValueError):
+            continue
+    if video is None:
+        return {"width": None, "height": None, "fps": None, "duration": duration}
+    return {
+        "width": int(video.get("width") or 0) or None,
+        "height": int(video.get("height") or 0) or None,
+        "fps": _parse_rate(video.get("avg_frame_rate")) or _parse_rate(video.get("r_frame_rate")),
+        "duration": duration
+    }
+
+
+def plan_sprite(duration: float, width: int, height: int) -> dict:
+    """
+    计算雪碧图布局
+    
+    Returns:
+        {"interval", "count", "columns", "rows", "tile_width", "tile_height"}
+    """
+    interval = max(SPRITE_MIN_INTERVAL, duration / SPRITE_MAX_TILES)
+    count = max(1, min(SPRITE_MAX_TILES, math.ceil(duration / interval)))
+    columns = min(SPRITE_MAX_COLUMNS, count)
+    rows = math.ceil(count / columns)
+    # 保持宽高比，高度取偶数
+    tile_height = max(2, int(round(SPRITE_TILE_WIDTH * height / width / 2)) * 2)
+    return {
+        "interval": round(interval, 3),
+        "count": count,
+        "columns": columns,
+        "rows": rows,
+        "tile_width": SPRITE_TILE_WIDTH,
+        "tile_height": tile_height
+    }
+
+
+class VideoIngestService:
+    """视频预处理服务"""
+    
+    def __init__(self):
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 处理中的视频：视频ID -> Task
+        self._inflight: dict = {}
+    
+    async def _run(self, cmd: List[str]) -> Tuple[int, str]:
+        """执行 FFmpeg 命令，返回 (returncode, stderr)"""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        return process.returncode, stderr.decode("utf-8", errors="ignore")
+    
+    async def _local_copy(self, url: str, work_dir: str) -> str:
+        """获取视频的本地文件（优先使用本地媒体缓存，避免重复下载）"""
+        path = media_store.get_path(url)
+        if path is not None:
+            return str(path)
+        output_path = os.path.join(work_dir, "source.mp4")
+        if not await video_concat_service.download_video(url, output_path):
+            raise Exception("视频下载失败")
+        return output_path
+    
+    async def _extract_poster(self, video_path: str, offset: float, output_path: str):
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-ss", f"{offset:.3f}",
+            "-i", video_path,
+            "-frames:v", "1",
+            "-vf", f"scale='min({POSTER_MAX_WIDTH},iw)':-2",
+            "-q:v", str(JPEG_QUALITY),
+            output_path
+        ]
+        with FFMPEG_STAGE_SECONDS.time(stage="poster"):
+            returncode, stderr = await self._run(cmd)
+        if returncode != 0 or not os.path.exists(output_path):
+            raise Exception(f"封面截取失败: {stderr[-300:]}")
+    
+    async def _build_sprite(self, video_path: str, layout: dict, output_path: str):
+        vf = (
+            f"fps=1/{layout['interval']},"
+            f"scale={layout['tile_width']}:{layout['tile_height']},"
+            f"tile={layout['columns']}x{layout['rows']}"
+        )
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-i", video_path,
+            "-an", "-sn",
+            "-vf", vf,
+            "-frames:v", "1",
+            "-q:v", str(JPEG_QUALITY),
+            output_path
+        ]
+        with FFMPEG_STAGE_SECONDS.time(stage="sprite"):
+            returncode, stderr = await self._run(cmd)
+        if returncode != 0 or not os.path.exists(output_path):
+            raise Exception(f"雪碧图生成失败: {stderr[-300:]}")
+    
+    async def _store(self, path: str, video: VideoItem, kind: str) -> str:
+        """保存封面/雪碧图，与视频放在同一存储"""
+        with open(path, "rb") as f:
+            data = f.read()
+        if not media_store.is_local_url(video.url) and oss_service.is_enabled():
+            filename = f"{datetime.now().strftime('%Y%m%d/%H%M%S')}_{uuid.uuid4().hex[:8]}.jpg"
+            try:
+                return await asyncio.to_thread(
+                    oss_service.upload_bytes, data, f"video_library/{video.project_id}/{kind}/{filename}"
+                )
+            except Exception as e:
+                print(f"[视频预处理] OSS 上传失败，改为保存到本地: {e}")
+        return media_store.save(data, "jpg")
+    
+    async def _process(self, video: VideoItem) -> dict:
+        """
+        探测视频并生成封面和雪碧图
+        
+        Returns:
+            需要更新到 VideoItem 的字段
+        """
+        work_dir = tempfile.mkdtemp(prefix="ingest_")
+        try:
+            video_path = await self._local_copy(video.url, work_dir)
+            
+            info = clip_cache.get_probe(video.url)
+            if not info:
+                info = await video_concat_service.get_video_info(video_path)
+                clip_cache.put_probe(video.url, info)
+            meta = parse_video_meta(info)
+            if not meta["width"] or not meta["height"]:
+                raise Exception("未找到视频流")
+            
+            updates = dict(meta)
+            duration = meta["duration"] or 0.0
+            offset = min(duration * POSTER_OFFSET_RATIO, POSTER_MAX_OFFSET)
+            
+            poster_path = os.path.join(work_dir, "poster.jpg")
+            sprite_path = os.path.join(work_dir, "sprite.jpg")
+            tasks = [self._extract_poster(video_path, offset, poster_path)]
+            layout = None
+            if duration > 0:
+                layout = plan_sprite(duration, meta["width"], meta["height"])
+                tasks.append(self._build_sprite(video_path, layout, sprite_path))
+            await asyncio.gather(*tasks)
+            
+            updates["thumbnail_url"] = await self._store(poster_path, video, "poster")
+            if layout is not None:
+                sprite_url = await self._store(sprite_path, video, "sprite")
+                updates["sprite"] = VideoSprite(url=sprite_url, **layout)
+            return updates
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    async def _update(self, video_id: str, **fields) -> Optional[VideoItem]:
+        """重新读取视频记录后更新字段（处理期间记录可能被修改或删除）"""
+        video = await asyncio.to_thread(storage_service.get_video_item, video_id)
+        if video is None:
+            return None
+        for key, value in fields.items():
+            setattr(video, key, value)
+        await asyncio.to_thread(storage_service.save_video_item, video)
+        return video
+    
+    async def ingest(self, video_id: str) -> Optional[VideoItem]:
+        """
+        预处理单个视频并更新记录
+        
+        Returns:
+            更新后的视频记录；记录不存在时返回 None
+        """
+        video = await asyncio.to_thread(storage_service.get_video_item, video_id)
+        if video is None:
+            return None
+        if not video_concat_service.check_ffmpeg():
+            print("[视频预处理] FFmpeg 不可用，跳过")
+            return video
+        
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+        async with self._semaphore:
+            await self._update(video_id, ingest_status="processing", ingest_error=None)
+            started = asyncio.get_running_loop().time()
+            try:
+                updates = await self._process(video)
+            except Exception as e:
+                print(f"[视频预处理] 失败: {video.name} ({e})")
+                return await self._update(video_id, ingest_status="failed", ingest_error=str(e)[:500])
+        
+        elapsed = asyncio.get_running_loop().time() - started
+        print(
+            f"[视频预处理] 完成: {video.name} {updates['width']}x{updates['height']} "
+            f"{updates['fps']}fps {updates['duration']}s，耗时 {elapsed:.2f}s"
+        )
+        return await self._update(video_id, ingest_status="completed", **updates)
+    
+    def needs_ingest(self, video: VideoItem) -> bool:
+        """是否需要（重新）预处理：从未处理过，或处理中断（状态长时间未更新且本进程没有在处理）"""
+        if video.ingest_status is None:
+            return True
+        if video.ingest_status in ("pending", "processing") and video.id not in self._inflight:
+            return (datetime.now() - video.updated_at).total_seconds() > INGEST_STALE_SECONDS
+        return False
+    
+    def schedule(self, video_ids: Iterable[str]):
+        """
+        在后台预处理视频（不等待结果）
+        后台任务会复制当前上下文，读写的是当前用户的视频库
+        """
+        for video_id in video_ids:
+            if video_id in self._inflight:
+                continue
+            task = asyncio.ensure_future(self.ingest(video_id))
+            self._inflight[video_id] = task
+            task.add_done_callback(lambda t, vid=video_id: self._on_done(vid, t))
+    
+    def _on_done(self, video_id: str, task: asyncio.Task):
+        self._inflight.pop(video_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"[视频预处理] 后台任务异常: {video_id} ({task.exception()})")
+    
+    def is_processing(self, video_id: str) -> bool:
+        return video_id in self._inflight
+    
+    async def run(self, video_id: str) -> Optional[VideoItem]:
+        """
+        预处理单个视频并等待完成
+        已在处理中（后台任务或其他请求发起）时等待同一个任务，不重复处理；
+        调用方断开时后台任务继续完成
+        """
+        self.schedule([video_id])
+        return await asyncio.shield(self._inflight[video_id])
+
+
+# 全局视频预处理服务实例
+video_ingest_service = VideoIngestService()
@@ -0,0 +1,51 @@
+"""
+独立的后台任务 worker 进程
+
+与 API 服务共用 data/ 目录，从同一个任务队列领取任务执行：
+
+    python -m app.worker --workers 4
+
+API 服务设置环境变量 JOB_WORKERS=0 时只提交任务，全部由独立 worker 执行；
+否则 API 进程内的 worker 和独立 worker 同时工作
+"""
+
+import argparse
+import asyncio
+import signal
+
+from app.services.job_queue import job_queue, JOB_WORKERS
+
+
+async def run(workers: int):
+    # 导入应用以注册各路由中的任务处理函数
+    import app.main  # noqa: F401
+    from app.services.dashscope.http_client import close_http_client
+    from app.services.thumbnails import thumbnail_service
+    from app.services.metrics import metrics
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    job_queue.start(workers)
+    # 指标写入快照，由 API 进程的 /api/metrics 合并导出
+    metrics.start()
+    await stop.wait()
+    
+    print("[任务队列] 正在停止 worker...")
+    await job_queue.stop()
+    await metrics.stop()
+    await close_http_client()
+    thumbnail_service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后台任务 worker")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS, help="并发执行的任务数")
+    args = parser.parse_args()
+    asyncio.run(run(args.workers))
+
+
+if __name__ == "__main__":
+    main()
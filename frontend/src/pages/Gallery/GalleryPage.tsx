@@ -239,10 +239,11 @@ const GalleryPage = () => {
             >
               <div className="asset-card-image" style={{ position: 'relative' }}>
                 <Image
-                  src={image.url}
+                  src={image.thumbnails?.md || image.url}
                   alt={image.name}
                   style={{ width: '100%', height: '100%', objectFit: 'cover' }}
                   preview={{
+                    src: image.url,
                     mask: <EyeOutlined style={{ fontSize: 24 }} />
                   }}
                 />
@@ -7,7 +7,7 @@ import dayjs from 'dayjs'
 
 const ProjectsPage = () => {
   const navigate = useNavigate()
-  const { projects, loading, fetchProjects, createProject, deleteProject, setCurrentProject } = useProjectStore()
+  const { projects, loading, fetchProjects, fetchProject, createProject, deleteProject } = useProjectStore()
   const [isModalOpen, setIsModalOpen] = useState(false)
   const [form] = Form.useForm()
 
@@ -31,12 +31,10 @@ const ProjectsPage = () => {
     }
   }
 
-  const handleOpenProject = (projectId: string) => {
-    const project = projects.find(p => p.id === projectId)
-    if (project) {
-      setCurrentProject(project)
-      navigate(`/project/${projectId}/script`)
-    }
+  const handleOpenProject = async (projectId: string) => {
+    // 列表只有摘要，打开时加载完整项目
+    await fetchProject(projectId)
+    navigate(`/project/${projectId}/script`)
   }
 
   const handleDeleteProject = async (projectId: string) => {
@@ -146,8 +144,8 @@ const ProjectsPage = () => {
                       {project.description || '暂无描述'}
                     </p>
                     <div style={{ fontSize: 12, color: '#666' }}>
-                      <div>分镜数：{project.script?.shots?.length || 0}</div>
-                      <div>角色数：{project.character_ids?.length || 0}</div>
+                      <div>分镜数：{project.shots_count}</div>
+                      <div>角色数：{project.characters_count}</div>
                       <div>更新时间：{dayjs(project.updated_at).format('YYYY-MM-DD HH:mm')}</div>
                     </div>
                   </div>
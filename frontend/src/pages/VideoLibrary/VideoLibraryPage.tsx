@@ -239,16 +239,28 @@ const VideoLibraryPage = () => {
                       }}
                       onClick={() => handlePreview(video)}
                     >
-                      <video
-                        src={video.url}
-                        style={{ 
-                          width: '100%', 
-                          height: '100%', 
-                          objectFit: 'cover' 
-                        }}
-                        preload="metadata"
-                        muted
-                      />
+                      {video.thumbnail_url ? (
+                        <img
+                          src={video.thumbnail_url}
+                          alt={video.name}
+                          style={{ 
+                            width: '100%', 
+                            height: '100%', 
+                            objectFit: 'cover' 
+                          }}
+                        />
+                      ) : (
+                        <video
+                          src={video.url}
+                          style={{ 
+                            width: '100%', 
+                            height: '100%', 
+                            objectFit: 'cover' 
+                          }}
+                          preload="metadata"
+                          muted
+                        />
+                      )}
                       <div style={{
                         position: 'absolute',
                         top: 0,
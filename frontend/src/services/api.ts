@@ -50,6 +50,59 @@ api.interceptors.response.use(
   }
 )
 
+// ============ 后台任务 API ============
+
+export type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed' | 'cancelled'
+
+export interface Job<T = any> {
+  id: string
+  kind: string
+  project_id?: string
+  status: JobStatus
+  progress: number  // 进度（0-1）
+  message: string
+  result?: T  // 执行结果（与原同步接口的返回值一致）
+  error?: string
+  created_at: string
+  started_at?: string
+  finished_at?: string
+}
+
+export interface JobSubmitResponse {
+  job_id: string
+  job: Job
+}
+
+export const jobsApi = {
+  list: (params?: { project_id?: string; status?: JobStatus; limit?: number }) =>
+    api.get<any, { jobs: Job[] }>('/jobs', { params }),
+  get: <T = any>(id: string) => api.get<any, Job<T>>(`/jobs/${id}`),
+  cancel: (id: string) => api.post<any, Job>(`/jobs/${id}/cancel`),
+  delete: (id: string) => api.delete(`/jobs/${id}`),
+}
+
+/**
+ * 等待后台任务结束，返回任务结果（失败或取消时抛出错误）
+ * 耗时接口提交任务后立即返回任务ID，这里轮询任务状态
+ */
+export async function waitForJob<T = any>(
+  jobId: string,
+  onProgress?: (job: Job<T>) => void,
+  interval = 1500
+): Promise<T> {
+  for (;;) {
+    const job = await jobsApi.get<T>(jobId)
+    onProgress?.(job)
+    if (job.status === 'succeeded') {
+      return job.result as T
+    }
+    if (job.status === 'failed' || job.status === 'cancelled') {
+      throw new Error(job.error || (job.status === 'cancelled' ? '任务已取消' : '任务失败'))
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval))
+  }
+}
+
 // ============ 设置 API ============
 
 export interface LLMModelInfo {
@@ -345,6 +398,21 @@ export interface Project {
   updated_at: string
 }
 
+// 项目摘要（项目列表返回，不含剧本等完整内容）
+export interface ProjectSummary {
+  id: string
+  name: string
+  description: string
+  shots_count: number
+  characters_count: number
+  scenes_count: number
+  props_count: number
+  frames_generated: number
+  videos_generated: number
+  created_at: string
+  updated_at: string
+}
+
 export interface Script {
   id: string
   title: string
@@ -390,7 +458,7 @@ export interface Shot {
 }
 
 export const projectsApi = {
-  list: () => api.get<any, { projects: Project[]; total: number }>('/projects'),
+  list: () => api.get<any, { projects: ProjectSummary[]; total: number }>('/projects'),
   get: (id: string) => api.get<any, Project>(`/projects/${id}`),
   create: (data: { name: string; description?: string }) => api.post<any, Project>('/projects', data),
   update: (id: string, data: { name?: string; description?: string }) => api.put<any, Project>(`/projects/${id}`, data),
@@ -598,6 +666,7 @@ export interface CharacterImage {
   side_url?: string
   back_url?: string
   prompt_used?: string
+  thumbnails?: Record<string, Record<string, string>>  // front/side/back -> 尺寸名 -> URL
   created_at: string
 }
 
@@ -669,7 +738,8 @@ export const charactersApi = {
     prompt_extend?: boolean
     watermark?: boolean
     seed?: number
-  }) => api.post<any, { image_groups: CharacterImage[] }>(`/characters/${id}/generate-all`, data),
+  }) => api.post<any, JobSubmitResponse>(`/characters/${id}/generate-all`, data)
+    .then((res) => waitForJob<{ image_groups: CharacterImage[] }>(res.job_id)),
   delete: (id: string) => api.delete(`/characters/${id}`),
   deleteAll: (projectId: string) => api.delete(`/characters/project/${projectId}/all`),
 }
@@ -829,6 +899,7 @@ export interface FrameImage {
   group_index: number
   url?: string
   prompt_used?: string
+  thumbnails?: Record<string, string>  // 尺寸名 sm/md/lg -> URL
   created_at: string
 }
 
@@ -870,7 +941,8 @@ export const framesApi = {
     // wan2.6-image 专用参数
     enable_interleave?: boolean  // 图文混合模式
   }) => api.post<any, { frame: Frame; generated_count?: number }>('/frames/generate', data),
-  generateBatch: (projectId: string) => api.post('/frames/generate-batch', { project_id: projectId }),
+  generateBatch: (projectId: string) => api.post<any, JobSubmitResponse>('/frames/generate-batch', { project_id: projectId })
+    .then((res) => waitForJob<{ frames: Frame[]; errors: any[]; success_count: number; error_count: number }>(res.job_id)),
   update: (id: string, data: { prompt?: string; selected_group_index?: number }) => api.put(`/frames/${id}`, data),
   delete: (id: string) => api.delete(`/frames/${id}`),
   setFromGallery: (data: {
@@ -950,7 +1022,8 @@ export const videosApi = {
   selectFromLibrary: (data: { project_id: string; shot_id: string; video_library_id: string }) =>
     api.post<any, { message: string; shot_id: string; video_url: string; video_name: string }>('/videos/select-from-library', data),
   export: (data: { project_id: string; name?: string }) =>
-    api.post<any, { message: string; video: any; url: string; shot_count: number; warning?: string }>('/videos/export', data),
+    api.post<any, JobSubmitResponse>('/videos/export', data)
+      .then((res) => waitForJob<{ message: string; video: any; url: string; shot_count: number; warning?: string }>(res.job_id)),
 }
 
 // ============ 风格 API ============
@@ -1055,6 +1128,9 @@ export interface GalleryImage {
   source: string
   task_id?: string
   tags: string[]
+  width?: number
+  height?: number
+  thumbnails?: Record<string, string>
   created_at: string
   updated_at: string
 }
@@ -1125,6 +1201,7 @@ export interface StudioTaskImage {
   url?: string
   prompt_used?: string
   is_selected: boolean
+  thumbnails?: Record<string, string>
   created_at: string
 }
 
@@ -1146,6 +1223,8 @@ export interface StudioTask {
   // wan2.6-image 专用参数
   enable_interleave?: boolean  // 图文混合模式
   max_images?: number  // 图文混合模式下最大生成图数
+  // 已提交、由后台取回结果的 DashScope 任务（每组一个）
+  generation_tasks?: Array<{ group_index: number; task_id: string; n: number; status: 'pending' | 'succeeded' | 'failed'; error?: string }>
   // 追踪ID
   last_task_id?: string  // DashScope 任务ID
   last_request_id?: string  // DashScope 请求ID
@@ -1157,6 +1236,18 @@ export interface StudioTask {
   updated_at: string
 }
 
+// 异步模型的生成任务创建后由后台取回结果，轮询任务直到不再是 generating
+async function waitForStudioTask(task: StudioTask, interval = 2000): Promise<{ task: StudioTask }> {
+  while (task.status === 'generating') {
+    await new Promise((resolve) => setTimeout(resolve, interval))
+    task = await studioApi.get(task.id)
+  }
+  if (task.status === 'failed') {
+    throw new Error(task.error_message || '图片生成失败')
+  }
+  return { task }
+}
+
 export const studioApi = {
   list: (projectId: string) => api.get<any, { tasks: StudioTask[] }>('/studio', { params: { project_id: projectId } }),
   get: (id: string) => api.get<any, StudioTask>(`/studio/${id}`),
@@ -1185,7 +1276,9 @@ export const studioApi = {
     // wan2.6-image 专用参数
     enable_interleave?: boolean  // 图文混合模式
     max_images?: number  // 图文混合模式下最大图片数 (1-5)
-  }) => api.post<any, { task: StudioTask }>(`/studio/${id}/generate`, data || {}),
+  }) => api.post<any, JobSubmitResponse & { task: StudioTask }>(`/studio/${id}/generate`, data || {})
+    .then((res) => waitForJob<{ task: StudioTask }>(res.job_id))
+    .then((res) => waitForStudioTask(res.task)),
   saveToGallery: (id: string, imageIds: string[]) => api.post<any, { saved_images: GalleryImage[] }>(`/studio/${id}/save-to-gallery`, { image_ids: imageIds }),
   delete: (id: string) => api.delete(`/studio/${id}`),
   deleteAll: (projectId: string) => api.delete(`/studio/project/${projectId}/all`),
@@ -1256,6 +1349,16 @@ export const audioApi = {
 }
 
 // ============ 视频库 API ============
+export interface VideoSprite {
+  url: string
+  interval: number  // 相邻两帧的时间间隔（秒）
+  count: number
+  columns: number
+  rows: number
+  tile_width: number
+  tile_height: number
+}
+
 export interface VideoLibraryItem {
   id: string
   project_id: string
@@ -1269,6 +1372,9 @@ export interface VideoLibraryItem {
   height?: number
   fps?: number
   thumbnail_url?: string
+  sprite?: VideoSprite
+  ingest_status?: 'pending' | 'processing' | 'completed' | 'failed'
+  ingest_error?: string
   created_at: string
   updated_at: string
 }
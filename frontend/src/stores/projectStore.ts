@@ -1,8 +1,23 @@
 import { create } from 'zustand'
-import { Project, projectsApi } from '../services/api'
+import { Project, ProjectSummary, projectsApi } from '../services/api'
+
+// 由完整项目更新列表中的摘要（首帧/视频数保留原值）
+const toSummary = (project: Project, previous?: ProjectSummary): ProjectSummary => ({
+  id: project.id,
+  name: project.name,
+  description: project.description,
+  shots_count: project.script?.shots?.length || 0,
+  characters_count: project.character_ids?.length || 0,
+  scenes_count: project.scene_ids?.length || 0,
+  props_count: project.prop_ids?.length || 0,
+  frames_generated: previous?.frames_generated || 0,
+  videos_generated: previous?.videos_generated || 0,
+  created_at: project.created_at,
+  updated_at: project.updated_at,
+})
 
 interface ProjectState {
-  projects: Project[]
+  projects: ProjectSummary[]
   currentProject: Project | null
   loading: boolean
   error: string | null
@@ -48,7 +63,7 @@ export const useProjectStore = create<ProjectState>((set, get) => ({
     try {
       const project = await projectsApi.create({ name, description })
       set((state) => ({
-        projects: [project, ...state.projects],
+        projects: [toSummary(project), ...state.projects],
         loading: false,
       }))
       return project
@@ -62,7 +77,7 @@ export const useProjectStore = create<ProjectState>((set, get) => ({
     try {
       const updatedProject = await projectsApi.update(id, data)
       set((state) => ({
-        projects: state.projects.map((p) => (p.id === id ? updatedProject : p)),
+        projects: state.projects.map((p) => (p.id === id ? toSummary(updatedProject, p) : p)),
         currentProject: state.currentProject?.id === id ? updatedProject : state.currentProject,
       }))
     } catch (error) {
@@ -10,6 +10,10 @@ export default defineConfig({
       '/api': {
         target: 'http://localhost:8000',
         changeOrigin: true
+      },
+      '/assets': {
+        target: 'http://localhost:8000',
+        changeOrigin: true
       }
     }
   }
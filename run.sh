@@ -191,6 +191,9 @@ install_all_deps() {
 BACKEND_PORT=8000
 FRONTEND_PORT=3000
 
+# 后端 worker 进程数（大于 1 时以多进程方式启动，不启用 --reload）
+BACKEND_WORKERS=${WORKERS:-1}
+
 # ======================
 # 服务状态检查
 # ======================
@@ -279,11 +282,18 @@ start_backend() {
     # 清空旧日志（避免混淆）
     > "$BACKEND_LOG"
     
-    log_info "启动后端服务..."
+    # 开发模式自动重载；多进程模式下 uvicorn 不支持 --reload
+    local uvicorn_opts="--reload"
+    if [ "$BACKEND_WORKERS" -gt 1 ] 2>/dev/null; then
+        uvicorn_opts="--workers $BACKEND_WORKERS"
+        log_info "启动后端服务（$BACKEND_WORKERS 个 worker 进程）..."
+    else
+        log_info "启动后端服务..."
+    fi
     screen -dmS "$BACKEND_SESSION" bash -c "
         cd '$BACKEND_DIR'
         source '$VENV_DIR/bin/activate'
-        uvicorn app.main:app --reload --host 0.0.0.0 --port $BACKEND_PORT 2>&1 | tee -a '$BACKEND_LOG'
+        uvicorn app.main:app $uvicorn_opts --host 0.0.0.0 --port $BACKEND_PORT 2>&1 | tee -a '$BACKEND_LOG'
     "
     
     sleep 2